@@ -67,6 +67,230 @@ class BaseController:
         """Return the acceleration of the controller."""
         raise NotImplementedError
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """Return the accelerations of several controllers of this class.
+
+        Controllers that support batched evaluation override this method to
+        compute the output of `get_accel` for all controllers at once. The
+        default implementation returns None, in which case `get_accel` is
+        called separately for every controller.
+
+        Parameters
+        ----------
+        controllers : list of BaseController
+            controllers of this class
+        env : flow.envs.Env
+            state of the environment at the current time step
+        state : dict < str, array_like >
+            state of the vehicles controlled by the controllers, containing
+            the ids ("veh_ids"), speeds ("speed"), headways ("headway"),
+            leader ids ("leader"), and leader speeds ("lead_speed") of the
+            vehicles
+
+        Returns
+        -------
+        np.ndarray or None
+            the acceleration of every controller, with a value of NaN
+            wherever `get_accel` would return None
+        """
+        return None
+
+    @staticmethod
+    def get_batch_params(controllers, *names):
+        """Return the values of attributes of several controllers as arrays.
+
+        The values are collected at every call (rather than stored once), as
+        environments may modify the parameters of controllers during a
+        rollout (e.g. the desired speed of a FollowerStopper).
+
+        Parameters
+        ----------
+        controllers : list of BaseController
+            controllers
+        names : str
+            names of the attributes
+
+        Returns
+        -------
+        list of np.ndarray
+            values of every attribute for every controller
+        """
+        return [np.array([getattr(c, name) for c in controllers], dtype=float)
+                for name in names]
+
+    @classmethod
+    def supports_batch(cls):
+        """Return whether the controllers of this class can be batched.
+
+        A class supports batched evaluation if its `get_accel_batch` method
+        is implemented by the same class as its `get_accel` method, i.e. if
+        the batched version computes the same accelerations. Subclasses that
+        override `get_accel` (or `get_action`) without overriding
+        `get_accel_batch` are evaluated one controller at a time.
+        """
+        def owner(name):
+            return next(c for c in cls.__mro__ if name in c.__dict__)
+
+        return owner('get_accel_batch') is not BaseController \
+            and owner('get_accel_batch') is owner('get_accel') \
+            and owner('get_action') is BaseController
+
+    @classmethod
+    def get_action_batch(cls, controllers, env):
+        """Return the actions of several controllers of this class at once.
+
+        This is equivalent to calling `get_action` for every controller, but
+        computes the accelerations, noise, and failsafes of all controllers
+        with vectorized operations if the class supports batched evaluation
+        (see `supports_batch`).
+
+        Parameters
+        ----------
+        controllers : list of BaseController
+            controllers of this class
+        env : flow.envs.Env
+            state of the environment at the current time step
+
+        Returns
+        -------
+        list of float or None
+            the modified form of the acceleration of every controller
+        """
+        if not cls.supports_batch():
+            return [controller.get_action(env) for controller in controllers]
+
+        veh_ids = [controller.veh_id for controller in controllers]
+        accel = np.full(len(veh_ids), np.nan)
+
+        # vehicles whose data is not yet subscribed, or that are located in a
+        # junction, are controlled by sumo (see get_action)
+        edges = env.k.vehicle.get_edge(veh_ids)
+        active = np.array([len(edge) > 0 and edge[0] != ":"
+                           for edge in edges], dtype=bool)
+        if not active.any():
+            return [None] * len(veh_ids)
+
+        index = np.flatnonzero(active)
+        controllers = [controllers[i] for i in index]
+        veh_ids = [veh_ids[i] for i in index]
+        state = {
+            "veh_ids": veh_ids,
+            "speed": env.k.vehicle.get_speed_array(veh_ids),
+            "headway": env.k.vehicle.get_headway_array(veh_ids),
+            "leader": env.k.vehicle.get_leader(veh_ids),
+            "lead_speed": env.k.vehicle.get_leader_speed_array(veh_ids),
+        }
+        active_accel = np.array(
+            cls.get_accel_batch(controllers, env, state), dtype=float)
+
+        # add noise to the accelerations, if requested
+        noise = np.array([c.accel_noise for c in controllers], dtype=float)
+        noisy = (noise > 0) & ~np.isnan(active_accel)
+        if noisy.any():
+            active_accel[noisy] += np.random.normal(0, noise[noisy])
+
+        # run the failsafes, if requested
+        fail_safe = np.array([c.fail_safe for c in controllers], dtype=object)
+        mask = (fail_safe == 'instantaneous') & ~np.isnan(active_accel)
+        if mask.any():
+            active_accel[mask] = cls._safe_action_instantaneous_batch(
+                env, state, mask, active_accel[mask])
+        mask = (fail_safe == 'safe_velocity') & ~np.isnan(active_accel)
+        if mask.any():
+            delay = np.array([c.delay for c in controllers], dtype=float)
+            active_accel[mask] = cls._safe_velocity_action_batch(
+                env, state, mask, active_accel[mask], delay[mask])
+
+        accel[index] = active_accel
+
+        # NaN values (for which a != a) are replaced by None
+        return [None if a != a else a for a in accel.tolist()]
+
+    @staticmethod
+    def _safe_action_instantaneous_batch(env, state, mask, action):
+        """Perform the "instantaneous" failsafe action on several vehicles.
+
+        See `get_safe_action_instantaneous`.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            current environment
+        state : dict < str, array_like >
+            state of the vehicles, see `get_accel_batch`
+        mask : np.ndarray
+            mask of the vehicles in `state` that use this failsafe
+        action : np.ndarray
+            requested acceleration actions of the masked vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the requested actions if they do not lead to a crash; and stopping
+            actions otherwise
+        """
+        # if there is only one vehicle in the network, all actions are safe
+        if env.k.vehicle.num_vehicles == 1:
+            return action
+
+        has_leader = np.array(
+            [lead_id is not None for lead_id in state["leader"]])[mask]
+        this_vel = state["speed"][mask]
+        h = state["headway"][mask]
+        sim_step = env.sim_step
+        next_vel = this_vel + action * sim_step
+
+        # if the vehicle will crash into the vehicle ahead of it in the next
+        # time step (assuming the vehicle ahead of it is not moving), then
+        # stop immediately
+        unsafe = has_leader & (next_vel > 0) & (
+            h < sim_step * next_vel + this_vel * 1e-3 +
+            0.5 * this_vel * sim_step)
+
+        return np.where(unsafe, -this_vel / sim_step, action)
+
+    @staticmethod
+    def _safe_velocity_action_batch(env, state, mask, action, delay):
+        """Perform the "safe_velocity" failsafe action on several vehicles.
+
+        See `get_safe_velocity_action`.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            current environment
+        state : dict < str, array_like >
+            state of the vehicles, see `get_accel_batch`
+        mask : np.ndarray
+            mask of the vehicles in `state` that use this failsafe
+        action : np.ndarray
+            requested acceleration actions of the masked vehicles
+        delay : np.ndarray
+            delay of the controllers of the masked vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the requested actions clipped by the safe velocities
+        """
+        # if there is only one vehicle in the network, all actions are safe
+        if env.k.vehicle.num_vehicles == 1:
+            return action
+
+        this_vel = state["speed"][mask]
+        h = state["headway"][mask]
+        sim_step = env.sim_step
+        dv = state["lead_speed"][mask] - this_vel
+        safe_velocity = 2 * h / sim_step + dv - this_vel * (2 * delay)
+
+        return np.where(
+            this_vel + action * sim_step > safe_velocity,
+            np.where(safe_velocity > 0,
+                     (safe_velocity - this_vel) / sim_step,
+                     -this_vel / sim_step),
+            action)
+
     def get_action(self, env):
         """Convert the get_accel() acceleration into an action.
 
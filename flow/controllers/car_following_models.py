@@ -87,6 +87,19 @@ class CFMController(BaseController):
         return self.k_d*(d_l - self.d_des) + self.k_v*(lead_vel - this_vel) + \
             self.k_c*(self.v_des - this_vel)
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        k_d, k_v, k_c, d_des, v_des, max_accel = cls.get_batch_params(
+            controllers, 'k_d', 'k_v', 'k_c', 'd_des', 'v_des', 'max_accel')
+        has_leader = np.array([bool(lead_id) for lead_id in state["leader"]])
+        this_vel = state["speed"]
+
+        accel = k_d * (state["headway"] - d_des) + \
+            k_v * (state["lead_speed"] - this_vel) + k_c * (v_des - this_vel)
+
+        return np.where(has_leader, accel, max_accel)
+
 
 class BCMController(BaseController):
     """Bilateral car-following model controller.
@@ -175,6 +188,25 @@ class BCMController(BaseController):
             self.k_v * ((lead_vel - this_vel) - (this_vel - trail_vel)) + \
             self.k_c * (self.v_des - this_vel)
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        k_d, k_v, k_c, v_des, max_accel = cls.get_batch_params(
+            controllers, 'k_d', 'k_v', 'k_c', 'v_des', 'max_accel')
+        has_leader = np.array([bool(lead_id) for lead_id in state["leader"]])
+        this_vel = state["speed"]
+        lead_vel = state["lead_speed"]
+
+        trail_ids = env.k.vehicle.get_follower(state["veh_ids"])
+        trail_vel = env.k.vehicle.get_speed_array(trail_ids)
+        footway = env.k.vehicle.get_headway_array(trail_ids)
+
+        accel = k_d * (state["headway"] - footway) + \
+            k_v * ((lead_vel - this_vel) - (this_vel - trail_vel)) + \
+            k_c * (v_des - this_vel)
+
+        return np.where(has_leader, accel, max_accel)
+
 
 class LACController(BaseController):
     """Linear Adaptive Cruise Control.
@@ -244,6 +276,25 @@ class LACController(BaseController):
 
         return self.a
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        k_1, k_2, h, tau, a = cls.get_batch_params(
+            controllers, 'k_1', 'k_2', 'h', 'tau', 'a')
+        this_vel = state["speed"]
+        L = env.k.vehicle.get_length_array(state["veh_ids"])
+        ex = state["headway"] - L - h * this_vel
+        ev = state["lead_speed"] - this_vel
+        u = k_1 * ex + k_2 * ev
+        a_dot = -(a / tau) + (u / tau)
+        a = a_dot * env.sim_step + a
+
+        # update the acceleration state of every controller
+        for controller, a_i in zip(controllers, a):
+            controller.a = float(a_i)
+
+        return a
+
 
 class OVMController(BaseController):
     """Optimal Vehicle Model controller.
@@ -327,6 +378,29 @@ class OVMController(BaseController):
 
         return self.alpha * (v_h - this_vel) + self.beta * h_dot
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        alpha, beta, h_st, h_go, v_max, max_accel = cls.get_batch_params(
+            controllers, 'alpha', 'beta', 'h_st', 'h_go', 'v_max', 'max_accel')
+        has_leader = np.array([bool(lead_id) for lead_id in state["leader"]])
+        this_vel = state["speed"]
+        h = state["headway"]
+        h_dot = state["lead_speed"] - this_vel
+
+        # V function here - input: h, output : Vh
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v_h = np.where(
+                h <= h_st, 0,
+                np.where(h < h_go,
+                         v_max / 2 * (1 - np.cos(np.pi * (h - h_st) /
+                                                 (h_go - h_st))),
+                         v_max))
+
+        accel = alpha * (v_h - this_vel) + beta * h_dot
+
+        return np.where(has_leader, accel, max_accel)
+
 
 class LinearOVM(BaseController):
     """Linear OVM controller.
@@ -396,6 +470,22 @@ class LinearOVM(BaseController):
 
         return (v_h - this_vel) / self.adaptation
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        v_max, adaptation, h_st = cls.get_batch_params(
+            controllers, 'v_max', 'adaptation', 'h_st')
+        this_vel = state["speed"]
+        h = state["headway"]
+
+        # V function here - input: h, output : Vh
+        alpha = 1.689  # the average value from Nakayama paper
+        v_h = np.where(
+            h < h_st, 0,
+            np.where(h <= h_st + v_max / alpha, alpha * (h - h_st), v_max))
+
+        return (v_h - this_vel) / adaptation
+
 
 class IDMController(BaseController):
     """Intelligent Driver Model (IDM) controller.
@@ -485,6 +575,26 @@ class IDMController(BaseController):
 
         return self.a * (1 - (v / self.v0)**self.delta - (s_star / h)**2)
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        v0, T, a, b, delta, s0 = cls.get_batch_params(
+            controllers, 'v0', 'T', 'a', 'b', 'delta', 's0')
+        has_leader = np.array([bool(lead_id) for lead_id in state["leader"]])
+        v = state["speed"]
+        h = state["headway"]
+
+        # in order to deal with ZeroDivisionError
+        h = np.where(np.abs(h) < 1e-3, 1e-3, h)
+
+        s_star = np.where(
+            has_leader,
+            s0 + np.maximum(0, v * T + v * (v - state["lead_speed"]) /
+                            (2 * np.sqrt(a * b))),
+            0)
+
+        return a * (1 - (v / v0)**delta - (s_star / h)**2)
+
 
 class SimCarFollowingController(BaseController):
     """Controller whose actions are purely defined by the simulator.
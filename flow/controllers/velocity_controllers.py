@@ -115,6 +115,51 @@ class FollowerStopper(BaseController):
             # compute the acceleration from the desired velocity
             return (v_cmd - this_vel) / env.sim_step
 
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        # controllers without a desired speed let sumo take over
+        v_des = np.array([np.nan if c.v_des is None else c.v_des
+                          for c in controllers], dtype=float)
+        dx_1_0, dx_2_0, dx_3_0, d_1, d_2, d_3 = cls.get_batch_params(
+            controllers, 'dx_1_0', 'dx_2_0', 'dx_3_0', 'd_1', 'd_2', 'd_3')
+        has_leader = np.array(
+            [lead_id is not None for lead_id in state["leader"]])
+        this_vel = state["speed"]
+        lead_vel = state["lead_speed"]
+        dx = state["headway"]
+
+        dv_minus = np.minimum(lead_vel - this_vel, 0)
+        dx_1 = dx_1_0 + 1 / (2 * d_1) * dv_minus**2
+        dx_2 = dx_2_0 + 1 / (2 * d_2) * dv_minus**2
+        dx_3 = dx_3_0 + 1 / (2 * d_3) * dv_minus**2
+        v = np.minimum(np.maximum(lead_vel, 0), v_des)
+
+        # compute the desired velocity
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v_cmd = np.select(
+                [dx <= dx_1, dx <= dx_2, dx <= dx_3],
+                [0,
+                 v * (dx - dx_1) / (dx_2 - dx_1),
+                 v + (v_des - this_vel) * (dx - dx_2) / (dx_3 - dx_2)],
+                v_des)
+        v_cmd = np.where(has_leader, v_cmd, v_des)
+
+        # compute the acceleration from the desired velocity
+        accel = np.where(np.isnan(v_des), np.nan,
+                         (v_cmd - this_vel) / env.sim_step)
+
+        # let sumo take over near the end of dangerous edges, or when not on
+        # any edge or in a junction
+        edges = env.k.vehicle.get_edge(state["veh_ids"])
+        for i, (controller, edge) in enumerate(zip(controllers, edges)):
+            if edge == "" or edge[0] == ":" or (
+                    edge in controller.danger_edges and
+                    controller.find_intersection_dist(env) <= 10):
+                accel[i] = np.nan
+
+        return accel
+
 
 class PISaturation(BaseController):
     """Inspired by Dan Work's... work.
@@ -190,3 +235,42 @@ class PISaturation(BaseController):
         accel = (self.v_cmd - this_vel) / env.sim_step
 
         return min(accel, self.max_accel)
+
+    @classmethod
+    def get_accel_batch(cls, controllers, env, state):
+        """See parent class."""
+        gamma, g_l, g_u, v_catch, v_cmd, max_accel = cls.get_batch_params(
+            controllers, 'gamma', 'g_l', 'g_u', 'v_catch', 'v_cmd',
+            'max_accel')
+        this_vel = state["speed"]
+        lead_vel = state["lead_speed"]
+        dx = state["headway"]
+        dv = lead_vel - this_vel
+        dx_s = np.maximum(2 * dv, 4)
+
+        # update the AVs' velocity histories and desired velocity values
+        max_history = int(38 / env.sim_step)
+        v_des = np.empty(len(controllers))
+        for i, controller in enumerate(controllers):
+            controller.v_history.append(this_vel[i])
+            if len(controller.v_history) == max_history:
+                del controller.v_history[0]
+            v_des[i] = np.mean(controller.v_history)
+
+        v_target = v_des + v_catch \
+            * np.clip((dx - g_l) / (g_u - g_l), 0, 1)
+
+        # update the alpha and beta values
+        alpha = np.clip((dx - dx_s) / gamma, 0, 1)
+        beta = 1 - 0.5 * alpha
+
+        # compute desired velocity
+        v_cmd = beta * (alpha * v_target + (1 - alpha) * lead_vel) \
+            + (1 - beta) * v_cmd
+        for controller, v_cmd_i in zip(controllers, v_cmd):
+            controller.v_cmd = float(v_cmd_i)
+
+        # compute the acceleration
+        accel = (v_cmd - this_vel) / env.sim_step
+
+        return np.minimum(accel, max_accel)
@@ -2,9 +2,12 @@
 
 import logging
 import datetime
+import multiprocessing
 import numpy as np
+import random
 import time
 import os
+from copy import deepcopy
 
 from flow.core.util import emission_to_csv
 
@@ -64,7 +67,12 @@ class Experiment:
 
         logging.info("Initializing environment.")
 
-    def run(self, num_runs, num_steps, rl_actions=None, convert_to_csv=False):
+    def run(self,
+            num_runs,
+            num_steps,
+            rl_actions=None,
+            convert_to_csv=False,
+            num_workers=1):
         """Run the given network for a set number of runs and steps per run.
 
         Parameters
@@ -79,6 +87,17 @@ class Experiment:
         convert_to_csv : bool
             Specifies whether to convert the emission file created by sumo
             into a csv file
+        num_workers : int, optional
+            number of processes the runs are distributed across. If greater
+            than one, every worker process creates its own environment from
+            the parameters of the environment of this experiment, and
+            restarts the simulation at the start of every run. The run of
+            index i is then seeded with the seed of the simulation parameters
+            (or 0 if not specified) plus i, regardless of the worker it is
+            performed by. The results of all runs are returned in run order.
+            Every run produces its own emission file, named after the
+            network with a "_run<i>" suffix, which is converted into a csv
+            file by the worker (if requested).
 
         Returns
         -------
@@ -103,36 +122,22 @@ class Experiment:
             def rl_actions(*_):
                 return None
 
-        rets = []
-        mean_rets = []
-        ret_lists = []
-        vels = []
-        mean_vels = []
-        std_vels = []
-        outflows = []
-        for i in range(num_runs):
-            vel = np.zeros(num_steps)
-            logging.info("Iter #" + str(i))
-            ret = 0
-            ret_list = []
-            state = self.env.reset()
-            for j in range(num_steps):
-                state, reward, done, _ = self.env.step(rl_actions(state))
-                vel[j] = np.mean(
-                    self.env.k.vehicle.get_speed(self.env.k.vehicle.get_ids()))
-                ret += reward
-                ret_list.append(reward)
-
-                if done:
-                    break
-            rets.append(ret)
-            vels.append(vel)
-            mean_rets.append(np.mean(ret_list))
-            ret_lists.append(ret_list)
-            mean_vels.append(np.mean(vel))
-            std_vels.append(np.std(vel))
-            outflows.append(self.env.k.vehicle.get_outflow_rate(int(500)))
-            print("Round {0}, return: {1}".format(i, ret))
+        if num_workers > 1:
+            runs = self._run_parallel(
+                num_runs, num_steps, rl_actions, convert_to_csv, num_workers)
+        else:
+            runs = []
+            for i in range(num_runs):
+                logging.info("Iter #" + str(i))
+                runs.append(_rollout(self.env, num_steps, rl_actions))
+                print("Round {0}, return: {1}".format(i, runs[-1]["return"]))
+
+        rets = [run["return"] for run in runs]
+        vels = [run["velocities"] for run in runs]
+        ret_lists = [run["per_step_returns"] for run in runs]
+        mean_rets = [np.mean(ret_list) for ret_list in ret_lists]
+        mean_vels = [np.mean(vel) for vel in vels]
+        outflows = [run["outflow"] for run in runs]
 
         info_dict["returns"] = rets
         info_dict["velocities"] = vels
@@ -144,6 +149,11 @@ class Experiment:
             np.mean(rets), np.std(rets)))
         print("Average, std speed: {}, {}".format(
             np.mean(mean_vels), np.std(mean_vels)))
+
+        if num_workers > 1:
+            # the emission files were converted by the workers
+            return info_dict
+
         self.env.terminate()
 
         if convert_to_csv:
@@ -163,3 +173,180 @@ class Experiment:
             os.remove(emission_path)
 
         return info_dict
+
+    def _run_parallel(self,
+                      num_runs,
+                      num_steps,
+                      rl_actions,
+                      convert_to_csv,
+                      num_workers):
+        """Perform the runs of the experiment in a pool of processes.
+
+        The runs are split into one block per worker. The worker processes
+        are forked from the current process, so that the environment and
+        rl_actions method do not need to be picklable.
+
+        Returns
+        -------
+        list of dict
+            the results of every run (see _rollout), in run order
+        """
+        # the simulation of this environment is not used by the workers. It
+        # is closed beforehand, since the simulators (in particular libsumo)
+        # cannot be shared with forked processes.
+        self.env.terminate()
+
+        # remove the emission file of this environment, which does not
+        # contain any run
+        if self.env.sim_params.emission_path is not None:
+            emission_path = os.path.join(
+                self.env.sim_params.emission_path,
+                "{0}-emission.xml".format(self.env.network.name))
+            if os.path.exists(emission_path):
+                os.remove(emission_path)
+
+        num_workers = min(num_workers, num_runs)
+        blocks = [list(range(i, num_runs, num_workers))
+                  for i in range(num_workers)]
+
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(num_workers,
+                      initializer=_init_worker,
+                      initargs=(self.env, num_steps, rl_actions,
+                                convert_to_csv)) as pool:
+            block_runs = pool.map(_run_worker, blocks, chunksize=1)
+
+        runs = [None] * num_runs
+        for block, block_run in zip(blocks, block_runs):
+            for i, run in zip(block, block_run):
+                runs[i] = run
+
+        return runs
+
+
+def _rollout(env, num_steps, rl_actions):
+    """Perform a single run of an experiment.
+
+    Returns
+    -------
+    dict
+        the return, the per-step returns, the average speed at every step,
+        and the outflow rate of the run
+    """
+    try:
+        pipeline_steps = env.sim_params.pipeline_steps
+    except AttributeError:
+        pipeline_steps = False
+    # the kernel is updated by the intermediate simulation steps of an
+    # environment step, so it only describes the previous environment step
+    # while the next one is simulated if a single simulation step is taken
+    pipeline_steps = pipeline_steps and env.env_params.sims_per_step == 1
+
+    vel = np.zeros(num_steps)
+    ret = 0
+    ret_list = []
+    state = env.reset()
+    if pipeline_steps and num_steps > 0:
+        # the metrics of every step are aggregated while the next step is
+        # simulated, see SumoParams.pipeline_steps
+        env.step_async(rl_actions(state))
+        for j in range(num_steps):
+            state, reward, done, _ = env.step_wait()
+            ret += reward
+            ret_list.append(reward)
+
+            if not done and j < num_steps - 1:
+                env.step_async(rl_actions(state))
+            vel[j] = np.mean(
+                env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+
+            if done:
+                break
+    else:
+        for j in range(num_steps):
+            state, reward, done, _ = env.step(rl_actions(state))
+            vel[j] = np.mean(
+                env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+            ret += reward
+            ret_list.append(reward)
+
+            if done:
+                break
+
+    return {
+        "return": ret,
+        "per_step_returns": ret_list,
+        "velocities": vel,
+        "outflow": env.k.vehicle.get_outflow_rate(int(500)),
+    }
+
+
+# arguments of the experiment run by a worker process, see _init_worker
+_worker_args = None
+
+
+def _init_worker(env, num_steps, rl_actions, convert_to_csv):
+    """Store the arguments of the experiment in a worker process."""
+    global _worker_args
+    _worker_args = (env, num_steps, rl_actions, convert_to_csv)
+
+
+def _run_worker(block):
+    """Perform a block of runs in a worker process.
+
+    Parameters
+    ----------
+    block : list of int
+        indices of the runs to perform
+
+    Returns
+    -------
+    list of dict
+        the results of every run in the block
+    """
+    env, num_steps, rl_actions, convert_to_csv = _worker_args
+
+    # the simulation is restarted at the start of every run, and seeded from
+    # python's random number generator (see Env.reset)
+    sim_params = deepcopy(env.sim_params)
+    sim_params.restart_instance = True
+    for attr, value in [("num_prewarmed_instances", 0),
+                        ("snapshot_reset", False)]:
+        if hasattr(sim_params, attr):
+            setattr(sim_params, attr, value)
+    base_seed = sim_params.seed if sim_params.seed is not None else 0
+
+    # every run is given its own network name, so that the generated network
+    # and emission files are not shared between runs
+    network = deepcopy(env.network)
+    names = ["{}_run{}".format(env.network.name, i) for i in block]
+    network.name = names[0]
+    worker_env = type(env)(
+        env_params=deepcopy(env.env_params),
+        sim_params=sim_params,
+        network=network,
+        simulator=env.simulator)
+
+    runs = []
+    try:
+        for i, name in zip(block, names):
+            logging.info("Iter #" + str(i))
+            random.seed(base_seed + i)
+            np.random.seed(base_seed + i)
+            network.name = name
+            runs.append(_rollout(worker_env, num_steps, rl_actions))
+            print("Round {0}, return: {1}".format(i, runs[-1]["return"]))
+    finally:
+        worker_env.terminate()
+
+    if convert_to_csv:
+        # wait a short period of time to ensure the xml files are readable
+        time.sleep(0.1)
+
+        for name in names:
+            emission_path = os.path.join(
+                sim_params.emission_path, "{0}-emission.xml".format(name))
+            emission_to_csv(emission_path)
+            os.remove(emission_path)
+
+    return runs
@@ -1,11 +1,15 @@
 """Script containing the Flow kernel object for interacting with simulators."""
 
 import warnings
-from flow.core.kernel.simulation import TraCISimulation, AimsunKernelSimulation
+from flow.core.kernel.simulation import TraCISimulation, \
+    LibsumoSimulation, AimsunKernelSimulation
 from flow.core.kernel.network import TraCIKernelNetwork, AimsunKernelNetwork
 from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
     AimsunKernelTrafficLight
+from flow.core.kernel.trajectory import TrajectoryRecorder
+from flow.core.kernel.profiler import StepProfiler
+from flow.core.kernel.step_cache import StepCache
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -25,6 +29,15 @@ class Kernel(object):
     * traffic_light: stores and regularly updates traffic light-specific
       information (see flow/core/kernel/traffic_light/base.py).
 
+    In addition, the kernel may record the trajectories of all vehicles after
+    every update (see flow/core/kernel/trajectory.py), and holds a profiler
+    of the time spent in environment steps, kernel updates, and simulator
+    commands (see flow/core/kernel/profiler.py). Quantities derived from the
+    state of the current time step (e.g. the speeds of all vehicles) may be
+    shared between environments, rewards, and controllers through the cache
+    of the kernel, which is cleared after every simulation step (see
+    flow/core/kernel/step_cache.py).
+
     The above kernel subclasses are designed specifically to support
     simulator-agnostic state information calling. For example, if you would
     like to collect the vehicle speed of a specific vehicle, then simply type:
@@ -51,7 +64,7 @@ class Kernel(object):
         Parameters
         ----------
         simulator : str
-            simulator type, must be one of {"traci"}
+            simulator type, must be one of {"traci", "libsumo", "aimsun"}
         sim_params : flow.core.params.SimParams
             simulation-specific parameters
 
@@ -62,11 +75,19 @@ class Kernel(object):
         """
         self.kernel_api = None
 
+        # cache of the quantities derived from the current state
+        self.cache = StepCache()
+
         if simulator == "traci":
             self.simulation = TraCISimulation(self)
             self.network = TraCIKernelNetwork(self, sim_params)
             self.vehicle = TraCIVehicle(self, sim_params)
             self.traffic_light = TraCITrafficLight(self)
+        elif simulator == "libsumo":
+            self.simulation = LibsumoSimulation(self)
+            self.network = TraCIKernelNetwork(self, sim_params)
+            self.vehicle = TraCIVehicle(self, sim_params)
+            self.traffic_light = TraCITrafficLight(self)
         elif simulator == 'aimsun':
             self.simulation = AimsunKernelSimulation(self)
             self.network = AimsunKernelNetwork(self, sim_params)
@@ -76,15 +97,50 @@ class Kernel(object):
             raise FatalFlowError('Simulator type "{}" is not valid.'.
                                  format(simulator))
 
+        # recorder of the trajectories of all vehicles (if requested)
+        try:
+            trajectory_path = sim_params.trajectory_path
+        except AttributeError:
+            trajectory_path = None
+        if trajectory_path is not None:
+            self.trajectory = TrajectoryRecorder(
+                path=trajectory_path,
+                sim_step=sim_params.sim_step,
+                fields=sim_params.trajectory_fields,
+                period=sim_params.trajectory_period,
+                chunk_size=sim_params.trajectory_chunk_size,
+                file_format=sim_params.trajectory_format)
+        else:
+            self.trajectory = None
+
+        # profiler of the environment steps (disabled unless requested)
+        try:
+            profile = sim_params.profile
+        except AttributeError:
+            profile = False
+        if profile:
+            self.profiler = StepProfiler(
+                enabled=True,
+                path=sim_params.profile_path,
+                period=sim_params.profile_period)
+        else:
+            self.profiler = StepProfiler(enabled=False)
+
     def pass_api(self, kernel_api):
-        """Pass the kernel API to all kernel subclasses."""
+        """Pass the kernel API to all kernel subclasses.
+
+        If profiling is enabled, the commands sent through the kernel API are
+        timed by the profiler.
+        """
+        kernel_api = self.profiler.wrap_api(kernel_api)
         self.kernel_api = kernel_api
+        self.cache.clear()
         self.simulation.pass_api(kernel_api)
         self.network.pass_api(kernel_api)
         self.vehicle.pass_api(kernel_api)
         self.traffic_light.pass_api(kernel_api)
 
-    def update(self, reset):
+    def update(self, reset, record=True, num_steps=1):
         """Update the kernel subclasses after a simulation step.
 
         This is meant to support optimizations in the performance of some
@@ -97,16 +153,55 @@ class Kernel(object):
         reset : bool
             specifies whether the simulator was reset in the last simulation
             step
+        record : bool, optional
+            whether the trajectories of the vehicles are recorded (if
+            requested). If False, `record` must be called for this step
+            before the kernel is updated again.
+        num_steps : int, optional
+            number of simulation steps performed since the last update, see
+            KernelSimulation.simulation_step
+        """
+        # all values derived from the previous state are outdated
+        self.cache.clear()
+
+        profiler = self.profiler
+        with profiler.phase('vehicle', 'kernels'):
+            self.vehicle.update(reset)
+        with profiler.phase('traffic_light', 'kernels'):
+            self.traffic_light.update(reset)
+        with profiler.phase('network', 'kernels'):
+            self.network.update(reset)
+        with profiler.phase('simulation', 'kernels'):
+            self.simulation.update(reset)
+        if record:
+            self.record(reset, num_steps)
+
+    def record(self, reset, num_steps=1):
+        """Record the trajectories of the vehicles (if requested).
+
+        This only reads the state stored in the kernel subclasses, and may as
+        such be performed while the simulator is advancing (see
+        KernelSimulation.simulation_step_async).
+
+        Parameters
+        ----------
+        reset : bool
+            specifies whether the simulator was reset in the last simulation
+            step
+        num_steps : int, optional
+            number of simulation steps performed since the last update
         """
-        self.vehicle.update(reset)
-        self.traffic_light.update(reset)
-        self.network.update(reset)
-        self.simulation.update(reset)
+        if self.trajectory is not None:
+            with self.profiler.phase('trajectory', 'kernels'):
+                self.trajectory.record(self, reset, num_steps)
 
     def close(self):
         """Terminate all components within the simulation and network."""
         self.network.close()
         self.simulation.close()
+        if self.trajectory is not None:
+            self.trajectory.close()
+        self.profiler.close()
 
     @property
     def scenario(self):
@@ -187,6 +187,53 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    def get_edge_batch(self, x):
+        """Compute the edges and relative positions of absolute positions.
+
+        This is the vectorized counterpart of `get_edge`.
+
+        Parameters
+        ----------
+        x : array_like
+            absolute positions in the network
+
+        Returns
+        -------
+        np.ndarray
+            name of the edge of every position, or None if the position is
+            located before the start of the network
+        np.ndarray
+            relative position on the edge of every position (NaN if the edge
+            is None)
+        """
+        edges = np.empty(len(x), dtype=object)
+        positions = np.full(len(x), np.nan)
+        for i, x_i in enumerate(x):
+            pos = self.get_edge(x_i)
+            if pos is not None:
+                edges[i], positions[i] = pos
+        return edges, positions
+
+    def get_x_batch(self, edges, positions):
+        """Return the absolute positions of several edge/position pairs.
+
+        This is the vectorized counterpart of `get_x`.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+        positions : array_like
+            relative positions on the edges
+
+        Returns
+        -------
+        np.ndarray
+            positions with respect to some global reference
+        """
+        return np.array([self.get_x(edge, pos)
+                         for edge, pos in zip(edges, positions)], dtype=float)
+
     def next_edge(self, edge, lane):
         """Return the next edge/lane pair from the given edge/lane.
 
@@ -325,7 +372,7 @@ class BaseKernelNetwork(object):
             pos = self.get_edge(x)
 
             # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
+            while pos[0] in self.internal_edgestarts_dict:
                 # find the location of the internal edge in total_edgestarts,
                 # which has the edges ordered by position
                 edges = [tup[0] for tup in self.total_edgestarts]
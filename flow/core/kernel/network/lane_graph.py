@@ -0,0 +1,214 @@
+"""Script containing the compiled lane connectivity graph of a network."""
+import numpy as np
+
+# number of hops stored in the lookahead tables of the lane graph
+DEFAULT_LOOKAHEAD = 16
+
+
+class LaneGraph(object):
+    """Connectivity between the lanes of a network, compiled into arrays.
+
+    Every lane of every edge and junction in the network is a node of the
+    graph, identified by an integer index. The lanes of an edge are assigned
+    consecutive indices, starting at ``node_offset[edge index]``. The
+    connections between lanes are stored in compressed sparse row (CSR)
+    form, in the same order as the connection data of the network kernel.
+
+    In addition, the graph holds lookahead tables following the first
+    connection of every lane (the lane chain used when searching for
+    leaders and followers), with the cumulative length travelled along the
+    chain. This allows searches along lane chains to advance several hops at
+    a time with vectorized operations, rather than one dictionary lookup per
+    hop.
+
+    Attributes
+    ----------
+    edge_ids : list of str
+        names of all edges and junctions, indexed by edge index
+    edge_index : dict < str, int >
+        edge index of every edge and junction
+    node_offset : np.ndarray
+        index of the first lane of every edge. The last element is the total
+        number of lanes.
+    node_edge : np.ndarray
+        edge index of every lane
+    node_length : np.ndarray
+        length of the edge of every lane
+    next_ptr, next_nodes : np.ndarray
+        CSR representation of the lanes following every lane, i.e. the lanes
+        following lane i are ``next_nodes[next_ptr[i]:next_ptr[i + 1]]``
+    prev_ptr, prev_nodes : np.ndarray
+        CSR representation of the lanes preceding every lane
+    """
+
+    def __init__(self, edges, connections, lookahead=DEFAULT_LOOKAHEAD):
+        """Compile the graph.
+
+        Parameters
+        ----------
+        edges : dict < str, dict >
+            edge data of the network kernel. Must contain the number of lanes
+            ("lanes") and length ("length") of every edge and junction.
+        connections : dict
+            connection data of the network kernel, with the lanes following
+            ("next") and preceding ("prev") every edge/lane pair
+        lookahead : int, optional
+            number of hops stored in the lookahead tables
+        """
+        self.lookahead = max(int(lookahead), 1)
+
+        self.edge_ids = list(edges.keys())
+        self.edge_index = dict(
+            (edge, i) for i, edge in enumerate(self.edge_ids))
+        lanes = np.array([edges[edge]['lanes'] for edge in self.edge_ids],
+                         dtype=np.int64)
+        lengths = np.array([edges[edge].get('length', 0)
+                            for edge in self.edge_ids], dtype=np.float64)
+
+        self.node_offset = np.concatenate(([0], np.cumsum(lanes)))
+        self.num_nodes = int(self.node_offset[-1])
+        self.node_edge = np.repeat(np.arange(len(self.edge_ids)), lanes)
+        self.node_length = lengths[self.node_edge]
+
+        self.next_ptr, self.next_nodes = self._compile(connections['next'])
+        self.prev_ptr, self.prev_nodes = self._compile(connections['prev'])
+
+        # lookahead tables, computed the first time they are needed
+        self._next_table = None
+        self._prev_table = None
+
+    def node(self, edge, lane):
+        """Return the index of a lane, or -1 if it is not in the graph."""
+        index = self.edge_index.get(edge)
+        if index is None:
+            return -1
+        node = self.node_offset[index] + lane
+        if lane < 0 or node >= self.node_offset[index + 1]:
+            return -1
+        return int(node)
+
+    def _compile(self, connections):
+        """Convert connection data into CSR arrays.
+
+        Connections to lanes that are not in the graph are ignored.
+        """
+        ptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        targets = [[] for _ in range(self.num_nodes)]
+        for edge, lanes in connections.items():
+            for lane, pairs in lanes.items():
+                node = self.node(edge, lane)
+                if node < 0:
+                    continue
+                for target_edge, target_lane in pairs:
+                    target = self.node(target_edge, target_lane)
+                    if target >= 0:
+                        targets[node].append(target)
+
+        ptr[1:] = np.cumsum([len(t) for t in targets])
+        nodes = np.fromiter((n for t in targets for n in t),
+                            dtype=np.int64, count=int(ptr[-1]))
+        return ptr, nodes
+
+    def _first(self, ptr, nodes):
+        """Return the first connected lane of every lane (-1 if none)."""
+        has_next = ptr[1:] > ptr[:-1]
+        first = np.full(self.num_nodes, -1, dtype=np.int64)
+        first[has_next] = nodes[ptr[:-1][has_next]]
+        return first
+
+    def _build_table(self, forward):
+        """Compute the lookahead table along the first connection of lanes.
+
+        Returns
+        -------
+        np.ndarray
+            lane reached after every number of hops (-1 past the end of the
+            chain), with shape (num_nodes, lookahead)
+        np.ndarray
+            length added to the distance from the starting lane upon reaching
+            the lane after every number of hops. Moving forward, the length
+            of every lane is added when leaving it; moving backward, it is
+            added when entering it.
+        """
+        if forward:
+            first = self._first(self.next_ptr, self.next_nodes)
+        else:
+            first = self._first(self.prev_ptr, self.prev_nodes)
+
+        # append an unconnected lane of length 0 at index -1, so that the
+        # chain ends propagate through the lookups below
+        first_ext = np.append(first, -1)
+        length_ext = np.append(self.node_length, 0.)
+
+        hops = np.empty((self.num_nodes, self.lookahead), dtype=np.int64)
+        offsets = np.empty((self.num_nodes, self.lookahead))
+        hops[:, 0] = first
+        if forward:
+            offsets[:, 0] = self.node_length
+        else:
+            offsets[:, 0] = length_ext[first]
+        for k in range(1, self.lookahead):
+            hops[:, k] = first_ext[hops[:, k - 1]]
+            if forward:
+                offsets[:, k] = offsets[:, k - 1] + length_ext[hops[:, k - 1]]
+            else:
+                offsets[:, k] = offsets[:, k - 1] + length_ext[hops[:, k]]
+
+        return hops, offsets
+
+    def search(self, node, occupied, max_hops, forward=True):
+        """Find the first occupied lane along the chain of a lane.
+
+        The chain is followed through the first lane connected to every lane,
+        either forward (to find leaders) or backward (to find followers).
+
+        Parameters
+        ----------
+        node : int
+            index of the starting lane
+        occupied : np.ndarray
+            whether every lane is occupied
+        max_hops : int
+            maximum number of lanes to move along the chain
+        forward : bool, optional
+            whether to move forward or backward along the chain
+
+        Returns
+        -------
+        int
+            index of the first occupied lane, or -1 if none was found
+        float
+            distance added from the starting lane to the occupied lane. When
+            moving forward, this is the length of the starting lane and of
+            all lanes in between; when moving backward, this is the length of
+            all lanes in between and of the occupied lane.
+        """
+        if forward:
+            if self._next_table is None:
+                self._next_table = self._build_table(forward=True)
+            hops, offsets = self._next_table
+        else:
+            if self._prev_table is None:
+                self._prev_table = self._build_table(forward=False)
+            hops, offsets = self._prev_table
+
+        base = 0.
+        while max_hops > 0:
+            num_hops = min(self.lookahead, max_hops)
+            row = hops[node, :num_hops]
+            valid = row >= 0
+            hit = valid & occupied[row]
+
+            # stop at the first occupied lane, or at the end of the chain
+            stop = np.flatnonzero(hit | ~valid)
+            if len(stop) > 0:
+                k = stop[0]
+                if hit[k]:
+                    return int(row[k]), base + offsets[node, k]
+                return -1, 0.
+
+            base += offsets[node, num_hops - 1]
+            node = row[num_hops - 1]
+            max_hops -= num_hops
+
+        return -1, 0.
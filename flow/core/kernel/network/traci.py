@@ -1,11 +1,18 @@
 """Script containing the TraCI network kernel class."""
 
 from flow.core.kernel.network import BaseKernelNetwork
-from flow.core.util import makexml, printxml, ensure_dir
+from flow.core.kernel.network.lane_graph import LaneGraph
+from flow.core.util import makexml, printxml, ensure_dir, \
+    iterparse_elements
 import time
 import os
+import numpy as np
+from bisect import bisect_right
+import shutil
+import hashlib
+import pickle
+import tempfile
 import subprocess
-import xml.etree.ElementTree as ElementTree
 from lxml import etree
 from copy import deepcopy
 
@@ -16,6 +23,10 @@ RETRIES_ON_ERROR = 10
 # number of seconds to wait before trying to access the .net.xml file again
 WAIT_ON_ERROR = 1
 
+# processing options passed to netconvert when generating a network
+NETCONVERT_PROCESSING = (('no-internal-links', 'false'),
+                         ('no-turnarounds', 'true'))
+
 
 def _flow(name, vtype, route, **kwargs):
     return E('flow', id=name, route=route, type=vtype, **kwargs)
@@ -30,6 +41,187 @@ def _inputs(net=None, rou=None, add=None, gui=None):
     return inp
 
 
+class NetCache(object):
+    """Persistent cache of the networks generated by netconvert.
+
+    Networks are stored under a hash of the files netconvert is called with
+    (nodes, edges, types, and connections, or OpenStreetMap files), the
+    processing options, and the netconvert binary. For each network, the cache holds the generated
+    .net.xml file along with the edge and connection data imported from it,
+    so that generating an identical network again (e.g. when restarting the
+    simulation, or in other processes sharing the cache directory) requires
+    neither netconvert nor parsing the .net.xml file.
+
+    The cache may additionally hold the data imported from network templates,
+    stored under a hash of the path and contents of the template (see
+    `import_key`).
+
+    Entries are written to temporary files and moved into place, so several
+    processes may use the same cache directory concurrently.
+    """
+
+    def __init__(self, path):
+        """Instantiate the cache.
+
+        Parameters
+        ----------
+        path : str
+            directory in which the cached networks are stored
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        ensure_dir(self.path)
+
+    def key(self, files, options):
+        """Return the key of the network generated from a set of files.
+
+        Parameters
+        ----------
+        files : list of (str, str or None)
+            the role of each input file of netconvert (e.g. "node-files") and
+            its path, or None if no such file is used
+        options : tuple
+            processing options passed to netconvert
+
+        Returns
+        -------
+        str
+            hash of the contents of the files and the options
+        """
+        digest = hashlib.sha1()
+
+        # networks generated by different versions of netconvert may differ
+        netconvert = shutil.which('netconvert')
+        if netconvert is not None:
+            stat = os.stat(netconvert)
+            digest.update(('{}:{}:{}'.format(
+                netconvert, stat.st_size, stat.st_mtime_ns)).encode())
+
+        digest.update(repr(options).encode())
+        for role, path in files:
+            digest.update(role.encode())
+            if path is not None:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+
+        return digest.hexdigest()
+
+    def import_key(self, net_file):
+        """Return the key of the data imported from a network template.
+
+        Parameters
+        ----------
+        net_file : str
+            path to the .net.xml file of the template
+
+        Returns
+        -------
+        str
+            hash of the absolute path and the contents of the file
+        """
+        digest = hashlib.sha1()
+        digest.update(os.path.abspath(net_file).encode())
+        with open(net_file, 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def _paths(self, key):
+        """Return the paths of the .net.xml file and data of a network."""
+        return (os.path.join(self.path, key + '.net.xml'),
+                os.path.join(self.path, key + '.pkl'))
+
+    def _load_data(self, data_path):
+        """Return the data stored in a file, or None if it is unavailable."""
+        try:
+            with open(data_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _store_data(self, data_path, data):
+        """Store data in a file of the cache directory."""
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, data_path)
+
+    def load(self, key, net_file):
+        """Copy a cached network to the specified location.
+
+        Parameters
+        ----------
+        key : str
+            key of the network, see `key`
+        net_file : str
+            path the .net.xml file should be copied to
+
+        Returns
+        -------
+        (dict, dict) or None
+            the edge and connection data of the network, or None if the
+            network is not in the cache
+        """
+        net_path, data_path = self._paths(key)
+        data = self._load_data(data_path)
+        if data is None:
+            return None
+        try:
+            shutil.copyfile(net_path, net_file)
+        except OSError:
+            return None
+        return data
+
+    def store(self, key, net_file, data):
+        """Add a network to the cache.
+
+        Parameters
+        ----------
+        key : str
+            key of the network, see `key`
+        net_file : str
+            path to the .net.xml file generated by netconvert
+        data : (dict, dict)
+            the edge and connection data of the network
+        """
+        net_path, data_path = self._paths(key)
+
+        # the data file is only moved into place once the network file is
+        # available, as its presence marks a complete entry
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        os.close(fd)
+        shutil.copyfile(net_file, tmp)
+        os.replace(tmp, net_path)
+
+        self._store_data(data_path, data)
+
+    def load_import(self, key):
+        """Return the data imported from a network template.
+
+        Parameters
+        ----------
+        key : str
+            key of the template, see `import_key`
+
+        Returns
+        -------
+        (dict, dict) or None
+            the edge and connection data of the template, or None if the
+            template is not in the cache
+        """
+        return self._load_data(self._paths(key)[1])
+
+    def store_import(self, key, data):
+        """Add the data imported from a network template to the cache.
+
+        Parameters
+        ----------
+        key : str
+            key of the template, see `import_key`
+        data : (dict, dict)
+            the edge and connection data of the template
+        """
+        self._store_data(self._paths(key)[1], data)
+
+
 class TraCIKernelNetwork(BaseKernelNetwork):
     """Base network kernel for sumo-based simulations.
 
@@ -62,6 +254,21 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         ensure_dir('%s' % self.net_path)
         ensure_dir('%s' % self.cfg_path)
 
+        # cache of the networks generated by netconvert (if requested)
+        try:
+            net_cache_dir = sim_params.net_cache_dir
+        except AttributeError:
+            net_cache_dir = None
+        self.net_cache = NetCache(net_cache_dir) \
+            if net_cache_dir is not None else None
+
+        # whether the data imported from network templates is cached as well
+        try:
+            self.cache_templates = sim_params.cache_templates \
+                and self.net_cache is not None
+        except AttributeError:
+            self.cache_templates = False
+
         # variables to be defined during network generation
         self.network = None
         self.nodfn = None
@@ -84,6 +291,21 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         self.rts = None
         self.cfg = None
 
+        # start positions of all edges, ordered by position, used to convert
+        # absolute positions into edges by binary search
+        self._edgestart_positions = None
+        # indices, offsets, and whether positions are relative to the offset
+        # of edges, used to convert edges and positions into absolute
+        # positions in a vectorized manner (see `get_edge_index`)
+        self._x_index = None
+        self._x_offsets = None
+        self._x_relative = None
+        self._x_arrays = None
+
+        # compiled lane connectivity graph, computed lazily from the edge and
+        # connection data (see `get_lane_graph`)
+        self._lane_graph = None
+
     def generate_network(self, network):
         """See parent class.
 
@@ -146,6 +368,9 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                 connections
             )
 
+        # the lane graph of any previous network is outdated
+        self._lane_graph = None
+
         # list of edges and internal links (junctions)
         self._edge_list = [
             edge_id for edge_id in self._edges.keys() if edge_id[0] != ':'
@@ -191,6 +416,15 @@ class TraCIKernelNetwork(BaseKernelNetwork):
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
 
+        # tables used to convert between absolute positions and edges
+        self._edgestart_positions = [x for _, x in self.total_edgestarts]
+        self._x_index = {}
+        self._x_offsets = []
+        self._x_relative = []
+        self._x_arrays = None
+        for edge in [''] + [edge for edge, _ in self.total_edgestarts]:
+            self._add_x_edge(edge)
+
         self.__length = sum(
             self._edges[edge_id]['length'] for edge_id in self._edges
         )
@@ -249,9 +483,106 @@ class TraCIKernelNetwork(BaseKernelNetwork):
 
     def get_edge(self, x):
         """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
+        # index of the last edge that starts at or before x
+        i = bisect_right(self._edgestart_positions, x) - 1
+        if i >= 0:
+            edge, start_pos = self.total_edgestarts[i]
+            return edge, x - start_pos
+
+    def get_edge_batch(self, x):
+        """See parent class."""
+        x = np.asarray(x, dtype=float)
+        starts = np.asarray(self._edgestart_positions, dtype=float)
+        names = np.array([edge for edge, _ in self.total_edgestarts] + [None],
+                         dtype=object)
+
+        # index of the last edge that starts at or before every position
+        # (-1 if there is none, which is mapped to the None entry above)
+        index = np.searchsorted(starts, x, side='right') - 1
+        valid = index >= 0
+        positions = np.full(x.shape, np.nan)
+        positions[valid] = x[valid] - starts[index[valid]]
+
+        return names[index], positions
+
+    def _add_x_edge(self, edge):
+        """Add an edge to the tables used by `get_x_batch`.
+
+        The offset of the edge and whether positions are relative to it are
+        chosen so that they reproduce the results of `get_x`.
+
+        Returns
+        -------
+        int
+            index of the edge in the tables
+        """
+        if len(edge) == 0:
+            offset, relative = -1001, False
+        elif edge[0] == ':':
+            if edge in self.internal_edgestarts_dict:
+                offset, relative = self.internal_edgestarts_dict[edge], True
+            else:
+                offset, relative = self.total_edgestarts_dict.get(
+                    edge.rsplit('_', 1)[0], -1001), False
+        else:
+            offset, relative = self.total_edgestarts_dict[edge], True
+
+        index = len(self._x_offsets)
+        self._x_index[edge] = index
+        self._x_offsets.append(offset)
+        self._x_relative.append(relative)
+        self._x_arrays = None
+        return index
+
+    def get_edge_index(self, edges):
+        """Return the indices of edges for use in `get_x_batch`.
+
+        The indices of the edges of vehicles may be computed once and reused
+        in several calls to `get_x_batch`.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray
+            index of every edge
+
+        Raises
+        ------
+        KeyError
+            if a non-internal edge is not in the network
+        """
+        get = self._x_index.get
+        index = np.fromiter((get(edge, -1) for edge in edges),
+                            dtype=np.int64, count=len(edges))
+        for i in np.flatnonzero(index < 0):
+            index[i] = get(edges[i], -1)
+            if index[i] < 0:
+                index[i] = self._add_x_edge(edges[i])
+        return index
+
+    def get_x_batch(self, edges, positions):
+        """See parent class.
+
+        The edges may also be provided as indices computed by
+        `get_edge_index`.
+        """
+        if isinstance(edges, np.ndarray) and \
+                np.issubdtype(edges.dtype, np.integer):
+            index = edges
+        else:
+            index = self.get_edge_index(edges)
+
+        if self._x_arrays is None:
+            self._x_arrays = (np.array(self._x_offsets, dtype=float),
+                              np.array(self._x_relative, dtype=bool))
+        offsets, relative = self._x_arrays
+
+        positions = np.asarray(positions, dtype=float)
+        return offsets[index] + np.where(relative[index], positions, 0.)
 
     def get_x(self, edge, position):
         """See parent class."""
@@ -329,6 +660,21 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         except KeyError:
             return []
 
+    def get_lane_graph(self):
+        """Return the compiled lane connectivity graph of the network.
+
+        The graph is compiled from the edge and connection data the first
+        time it is requested.
+
+        Returns
+        -------
+        flow.core.kernel.network.lane_graph.LaneGraph
+            the lane graph
+        """
+        if self._lane_graph is None:
+            self._lane_graph = LaneGraph(self._edges, self._connections)
+        return self._lane_graph
+
     # TODO: nodes should have a traffic light option
     def generate_net(self,
                      net_params,
@@ -504,11 +850,27 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         t.append(E('output-file', value=self.netfn))
         x.append(t)
         t = E('processing')
-        t.append(E('no-internal-links', value='false'))
-        t.append(E('no-turnarounds', value='true'))
+        for option, value in NETCONVERT_PROCESSING:
+            t.append(E(option, value=value))
         x.append(t)
         printxml(x, self.net_path + self.cfgfn)
 
+        # reuse the network and its data if an identical network was
+        # generated before
+        cache_key = None
+        if self.net_cache is not None:
+            cache_key = self.net_cache.key(
+                [('node-files', self.net_path + self.nodfn),
+                 ('edge-files', self.net_path + self.edgfn),
+                 ('type-files', None if types is None
+                  else self.net_path + self.typfn),
+                 ('connection-files', None if connections is None
+                  else self.net_path + self.confn)],
+                NETCONVERT_PROCESSING)
+            data = self.net_cache.load(cache_key, self.cfg_path + self.netfn)
+            if data is not None:
+                return data
+
         subprocess.call(
             [
                 'netconvert -c ' + self.net_path + self.cfgfn +
@@ -522,11 +884,15 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         for _ in range(RETRIES_ON_ERROR):
             try:
                 edges_dict, conn_dict = self._import_edges_from_net(net_params)
-                return edges_dict, conn_dict
             except Exception as e:
                 print('Error during start: {}'.format(e))
                 print('Retrying in {} seconds...'.format(WAIT_ON_ERROR))
                 time.sleep(WAIT_ON_ERROR)
+            else:
+                if cache_key is not None:
+                    self.net_cache.store(cache_key, self.cfg_path + self.netfn,
+                                         (edges_dict, conn_dict))
+                return edges_dict, conn_dict
         raise error
 
     def generate_net_from_osm(self, net_params):
@@ -558,25 +924,36 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         # specify the location of the output file
         netfn = "%s.net.xml" % self.name
 
-        # generate the network file with sumo
-        net_cmd = "netconvert --osm-files {0} --output-file {1}".\
-            format(osm_path, self.cfg_path + netfn)
+        # name of the .net.xml file (located in cfg_path)
+        self.netfn = netfn
 
         # this handles removing all roads in the network that cannot be ridden
-        # by vehicles
-        net_cmd += " --keep-edges.by-vclass passenger"
+        # by vehicles, and removes edges that are not connected to a network
+        # (isolated)
+        options = " --keep-edges.by-vclass passenger --remove-edges.isolated"
+
+        # reuse the network and its data if the same osm file was converted
+        # before
+        cache_key = None
+        if self.net_cache is not None:
+            cache_key = self.net_cache.key([('osm-files', osm_path)], options)
+            data = self.net_cache.load(cache_key, self.cfg_path + netfn)
+            if data is not None:
+                return data
 
-        # this removes edges that are not connected to a network (isolated)
-        net_cmd += " --remove-edges.isolated"
+        # generate the network file with sumo
+        net_cmd = "netconvert --osm-files {0} --output-file {1}".\
+            format(osm_path, self.cfg_path + netfn) + options
 
         subprocess.call(net_cmd, shell=True)
 
-        # name of the .net.xml file (located in cfg_path)
-        self.netfn = netfn
-
         # collect data from the generated network configuration file
         edges_dict, conn_dict = self._import_edges_from_net(net_params)
 
+        if cache_key is not None:
+            self.net_cache.store(
+                cache_key, self.cfg_path + netfn, (edges_dict, conn_dict))
+
         return edges_dict, conn_dict
 
     def generate_net_from_template(self, net_params):
@@ -817,6 +1194,12 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         network configuration file, and returns the information on the edges
         and junctions located in the file.
 
+        The file is parsed incrementally, so that the memory used does not
+        grow with the size of the network. If requested (see the
+        `cache_templates` attribute of SumoParams), the data imported from
+        network templates is additionally stored in the network cache, from
+        which it is loaded during later imports of the unmodified template.
+
         Parameters
         ----------
         net_params : flow.core.params.NetParams
@@ -835,102 +1218,112 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                     Element = list of edge/lane pairs preceding or following
                     the edge/lane pairs
         """
-        # import the .net.xml file containing all edge/type data
-        parser = etree.XMLParser(recover=True)
         net_path = os.path.join(self.cfg_path, self.netfn) \
             if net_params.template is None else self.netfn
-        tree = ElementTree.parse(net_path, parser=parser)
-        root = tree.getroot()
+
+        # the data of network templates is cached the first time it is
+        # imported, and loaded directly afterwards
+        cache_key = None
+        if net_params.template is not None and self.cache_templates:
+            cache_key = self.net_cache.import_key(net_path)
+            data = self.net_cache.load_import(cache_key)
+            if data is not None:
+                return data
 
         # Collect information on the available types (if any are available).
         # This may be used when specifying some edge data.
         types_data = dict()
 
-        for typ in root.findall('type'):
-            type_id = typ.attrib['id']
-            types_data[type_id] = dict()
-
-            if 'speed' in typ.attrib:
-                types_data[type_id]['speed'] = float(typ.attrib['speed'])
-            else:
-                types_data[type_id]['speed'] = None
-
-            if 'numLanes' in typ.attrib:
-                types_data[type_id]['numLanes'] = int(typ.attrib['numLanes'])
-            else:
-                types_data[type_id]['numLanes'] = None
-
         net_data = dict()
         next_conn_data = dict()  # forward looking connections
         prev_conn_data = dict()  # backward looking connections
 
-        # collect all information on the edges and junctions
-        for edge in root.findall('edge'):
-            edge_id = edge.attrib['id']
+        # import the .net.xml file containing all edge/type data. The file is
+        # streamed, so that only one element is held in memory at a time.
+        for elem in iterparse_elements(
+                net_path, tags=('type', 'edge', 'connection')):
+            if elem.tag == 'type':
+                type_id = elem.attrib['id']
+                types_data[type_id] = dict()
 
-            # create a new key for this edge
-            net_data[edge_id] = dict()
+                if 'speed' in elem.attrib:
+                    types_data[type_id]['speed'] = float(elem.attrib['speed'])
+                else:
+                    types_data[type_id]['speed'] = None
 
-            # check for speed
-            if 'speed' in edge:
-                net_data[edge_id]['speed'] = float(edge.attrib['speed'])
-            else:
+                if 'numLanes' in elem.attrib:
+                    types_data[type_id]['numLanes'] = \
+                        int(elem.attrib['numLanes'])
+                else:
+                    types_data[type_id]['numLanes'] = None
+
+            elif elem.tag == 'edge':
+                # collect all information on the edges and junctions
+                edge_id = elem.attrib['id']
+
+                # create a new key for this edge
+                net_data[edge_id] = dict()
                 net_data[edge_id]['speed'] = None
 
-            # if the edge has a type parameters, check that type for a
-            # speed and parameter if one was not already found
-            if 'type' in edge.attrib and edge.attrib['type'] in types_data:
-                if net_data[edge_id]['speed'] is None:
+                # if the edge has a type parameters, check that type for a
+                # speed and parameter if one was not already found
+                if 'type' in elem.attrib and elem.attrib['type'] in types_data:
                     net_data[edge_id]['speed'] = \
-                        float(types_data[edge.attrib['type']]['speed'])
-
-            # collect the length from the lane sub-element in the edge, the
-            # number of lanes from the number of lane elements, and if needed,
-            # also collect the speed value (assuming it is there)
-            net_data[edge_id]['lanes'] = 0
-            for i, lane in enumerate(edge):
-                net_data[edge_id]['lanes'] += 1
-                if i == 0:
-                    net_data[edge_id]['length'] = float(lane.attrib['length'])
-                    if net_data[edge_id]['speed'] is None \
-                            and 'speed' in lane.attrib:
-                        net_data[edge_id]['speed'] = float(
-                            lane.attrib['speed'])
-
-            # if no speed value is present anywhere, set it to some default
-            if net_data[edge_id]['speed'] is None:
-                net_data[edge_id]['speed'] = 30
-
-        # collect connection data
-        for connection in root.findall('connection'):
-            from_edge = connection.attrib['from']
-            from_lane = int(connection.attrib['fromLane'])
-
-            if from_edge[0] != ":":
-                # if the edge is not an internal link, then get the next
-                # edge/lane pair from the "via" element
-                via = connection.attrib['via'].rsplit('_', 1)
-                to_edge = via[0]
-                to_lane = int(via[1])
+                        float(types_data[elem.attrib['type']]['speed'])
+
+                # collect the length from the lane sub-element in the edge,
+                # the number of lanes from the number of lane elements, and if
+                # needed, also collect the speed value (assuming it is there)
+                net_data[edge_id]['lanes'] = 0
+                for i, lane in enumerate(elem.iterchildren('lane')):
+                    net_data[edge_id]['lanes'] += 1
+                    if i == 0:
+                        net_data[edge_id]['length'] = \
+                            float(lane.attrib['length'])
+                        if net_data[edge_id]['speed'] is None \
+                                and 'speed' in lane.attrib:
+                            net_data[edge_id]['speed'] = float(
+                                lane.attrib['speed'])
+
+                # if no speed value is present anywhere, set it to some default
+                if net_data[edge_id]['speed'] is None:
+                    net_data[edge_id]['speed'] = 30
+
             else:
-                to_edge = connection.attrib['to']
-                to_lane = int(connection.attrib['toLane'])
+                # collect connection data
+                from_edge = elem.attrib['from']
+                from_lane = int(elem.attrib['fromLane'])
+
+                if from_edge[0] != ":" and 'via' in elem.attrib:
+                    # if the edge is not an internal link, then get the next
+                    # edge/lane pair from the "via" element
+                    via = elem.attrib['via'].rsplit('_', 1)
+                    to_edge = via[0]
+                    to_lane = int(via[1])
+                else:
+                    to_edge = elem.attrib['to']
+                    to_lane = int(elem.attrib['toLane'])
 
-            if from_edge not in next_conn_data:
-                next_conn_data[from_edge] = dict()
+                if from_edge not in next_conn_data:
+                    next_conn_data[from_edge] = dict()
 
-            if from_lane not in next_conn_data[from_edge]:
-                next_conn_data[from_edge][from_lane] = list()
+                if from_lane not in next_conn_data[from_edge]:
+                    next_conn_data[from_edge][from_lane] = list()
 
-            if to_edge not in prev_conn_data:
-                prev_conn_data[to_edge] = dict()
+                if to_edge not in prev_conn_data:
+                    prev_conn_data[to_edge] = dict()
 
-            if to_lane not in prev_conn_data[to_edge]:
-                prev_conn_data[to_edge][to_lane] = list()
+                if to_lane not in prev_conn_data[to_edge]:
+                    prev_conn_data[to_edge][to_lane] = list()
 
-            next_conn_data[from_edge][from_lane].append((to_edge, to_lane))
-            prev_conn_data[to_edge][to_lane].append((from_edge, from_lane))
+                next_conn_data[from_edge][from_lane].append(
+                    (to_edge, to_lane))
+                prev_conn_data[to_edge][to_lane].append(
+                    (from_edge, from_lane))
 
         connection_data = {'next': next_conn_data, 'prev': prev_conn_data}
 
+        if cache_key is not None:
+            self.net_cache.store_import(cache_key, (net_data, connection_data))
+
         return net_data, connection_data
@@ -0,0 +1,322 @@
+"""Script containing the profiler of the phases of environment steps."""
+import json
+import os
+import time
+import types
+
+from traci.domain import Domain
+
+# categories of the sections timed by the profiler:
+#
+# * "phases": phases of an environment step (see flow.envs.Env.step)
+# * "kernels": updates of the kernel subclasses after every simulation step
+# * "traci": commands sent through the kernel api, named "<domain>.<method>"
+#   (e.g. "vehicle.getSpeed") or "<method>" (e.g. "simulationStep")
+CATEGORIES = ('phases', 'kernels', 'traci')
+
+# types of the attributes of the kernel api that are timed as commands
+_COMMAND_TYPES = (types.FunctionType, types.BuiltinFunctionType,
+                  types.MethodType, types.BuiltinMethodType)
+
+
+class _Section(object):
+    """Context manager accumulating the wall time spent within a section."""
+
+    __slots__ = ('record', 'step_record', 'start')
+
+    def __init__(self, record, step_record):
+        self.record = record
+        self.step_record = step_record
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.record[0] += 1
+        self.record[1] += elapsed
+        self.step_record[0] += elapsed
+        return False
+
+
+class _NullSection(object):
+    """Context manager used for sections when profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class StepProfiler(object):
+    """Profiler of the wall time spent in the phases of environment steps.
+
+    The profiler accumulates the number of calls and the wall time spent
+    within named sections of three categories (see CATEGORIES): the phases
+    of environment steps (computing controller actions, advancing the
+    simulation, computing observations and rewards, ...), the updates of the
+    kernel subclasses, and the individual commands sent to the simulator
+    through the kernel api (see `wrap_api`). Together, these indicate
+    whether an environment is bound by the simulator or by Python.
+
+    When profiling is disabled, sections are timed by a shared no-op context
+    manager, and the kernel api is not wrapped.
+
+    Usage
+    -----
+    >>> profiler = StepProfiler(enabled=True)
+    >>> with profiler.phase('get_state'):
+    >>>     ...
+    >>> profiler.stats()['phases']['get_state']
+    {'calls': 1, 'time': ..., 'mean': ...}
+
+    Attributes
+    ----------
+    enabled : bool
+        whether sections are timed
+    num_steps : int
+        number of environment steps profiled since the last reset
+    """
+
+    def __init__(self, enabled=False, path=None, period=1000):
+        """Instantiate the profiler.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            whether sections are timed
+        path : str, optional
+            file the statistics are periodically written to (as json), and
+            when the profiler is closed. Defaults to None (no dumps)
+        period : int, optional
+            number of environment steps between dumps
+        """
+        self.enabled = enabled
+        self.path = path
+        self.period = max(int(period), 1)
+        self.num_steps = 0
+
+        # number of calls and total time of every section, per category
+        self._records = {category: {} for category in CATEGORIES}
+        # time spent in every section of the current step, per category
+        self._step_records = {category: {} for category in CATEGORIES}
+        self._sections = {}
+        self._step_start = None
+
+    def reset(self):
+        """Clear all statistics."""
+        self.num_steps = 0
+        self._step_start = None
+        # the records are cleared in place, as they are shared with the
+        # sections and wrapped commands
+        for records in self._records.values():
+            for record in records.values():
+                record[0] = 0
+                record[1] = 0.
+        for records in self._step_records.values():
+            for record in records.values():
+                record[0] = 0.
+
+    def phase(self, name, category='phases'):
+        """Return a context manager timing a section.
+
+        Parameters
+        ----------
+        name : str
+            name of the section
+        category : str, optional
+            category of the section, one of CATEGORIES
+
+        Returns
+        -------
+        context manager
+            timer of the section
+        """
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self._sections.get((category, name))
+        if section is None:
+            section = _Section(*self._new_record(category, name))
+            self._sections[(category, name)] = section
+        return section
+
+    def _new_record(self, category, name):
+        """Create the records of a new section."""
+        record = self._records[category].setdefault(name, [0, 0.])
+        step_record = self._step_records[category].setdefault(name, [0.])
+        return record, step_record
+
+    def begin_step(self):
+        """Mark the start of an environment step."""
+        if not self.enabled:
+            return
+        for records in self._step_records.values():
+            for record in records.values():
+                record[0] = 0.
+        self._step_start = time.perf_counter()
+
+    def end_step(self):
+        """Mark the end of an environment step.
+
+        The statistics are written to disk if a dump is due.
+
+        Returns
+        -------
+        dict < str, float > or None
+            wall time spent in every phase of the step, as well as in the
+            whole step ("step") and in all commands sent to the simulator
+            ("traci"). None if profiling is disabled.
+        """
+        if not self.enabled or self._step_start is None:
+            return None
+        elapsed = time.perf_counter() - self._step_start
+        self._step_start = None
+        self.num_steps += 1
+
+        record = self._records['phases'].setdefault('step', [0, 0.])
+        record[0] += 1
+        record[1] += elapsed
+
+        step_times = {name: record[0] for name, record in
+                      self._step_records['phases'].items()}
+        step_times['step'] = elapsed
+        step_times['traci'] = sum(
+            record[0] for record in self._step_records['traci'].values())
+
+        if self.path is not None and self.num_steps % self.period == 0:
+            self.dump()
+
+        return step_times
+
+    def stats(self):
+        """Return the statistics of all sections.
+
+        Returns
+        -------
+        dict < str, dict < str, dict > >
+            the number of calls ("calls"), total wall time ("time"), and mean
+            wall time per call ("mean") of every section, per category. The
+            "phases" category also contains the whole environment steps
+            ("step").
+        """
+        return {
+            category: {
+                name: {'calls': calls,
+                       'time': total,
+                       'mean': total / calls if calls > 0 else 0.}
+                for name, (calls, total) in records.items()
+            }
+            for category, records in self._records.items()
+        }
+
+    def dump(self, path=None):
+        """Write the statistics to a json file.
+
+        Parameters
+        ----------
+        path : str, optional
+            path to the file, defaults to the path of the profiler
+        """
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats = self.stats()
+        stats['num_steps'] = self.num_steps
+        with open(path, 'w') as f:
+            json.dump(stats, f, indent=4, sort_keys=True)
+
+    def close(self):
+        """Write the statistics to disk (if a path was specified)."""
+        if self.enabled and self.path is not None:
+            self.dump()
+
+    def wrap_api(self, kernel_api):
+        """Wrap a kernel api, so that the commands sent through it are timed.
+
+        Parameters
+        ----------
+        kernel_api : any
+            the kernel api, e.g. a TraCI connection or the libsumo module
+
+        Returns
+        -------
+        any
+            the kernel api if profiling is disabled, or a wrapper around it
+            otherwise. The wrapped api is available under its ``unwrapped``
+            attribute.
+        """
+        if not self.enabled or isinstance(kernel_api, ProfiledAPI):
+            return kernel_api
+        return ProfiledAPI(kernel_api, self)
+
+    def _wrap_command(self, command, name):
+        """Wrap a command of the kernel api, so that its calls are timed."""
+        record, step_record = self._new_record('traci', name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return command(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                record[0] += 1
+                record[1] += elapsed
+                step_record[0] += elapsed
+
+        return timed
+
+
+class ProfiledAPI(object):
+    """Wrapper around a kernel api, timing the commands sent through it.
+
+    Commands are accessed exactly as with the kernel api, e.g.
+    ``api.vehicle.getSpeed(veh_id)`` or ``api.simulationStep()``. Private
+    and non-callable attributes are returned unchanged.
+    """
+
+    def __init__(self, kernel_api, profiler, domain=None):
+        """Instantiate the wrapper.
+
+        Parameters
+        ----------
+        kernel_api : any
+            the kernel api, or one of its domains
+        profiler : StepProfiler
+            the profiler the calls are recorded by
+        domain : str, optional
+            name of the domain, if a domain is wrapped
+        """
+        self.unwrapped = kernel_api
+        self._profiler = profiler
+        self._domain = domain
+
+    def __getattr__(self, name):
+        """Return an attribute of the kernel api, wrapping its commands."""
+        value = getattr(self.unwrapped, name)
+        if name.startswith('_'):
+            return value
+
+        if self._domain is None and \
+                (isinstance(value, Domain) or isinstance(value, type)):
+            # the domains of TraCI connections are Domain objects, while the
+            # domains of libsumo are classes
+            wrapped = ProfiledAPI(value, self._profiler, domain=name)
+        elif isinstance(value, _COMMAND_TYPES):
+            command = name if self._domain is None \
+                else '{}.{}'.format(self._domain, name)
+            wrapped = self._profiler._wrap_command(value, command)
+        else:
+            return value
+
+        # cache the wrapped attribute, so that it is only wrapped once
+        self.__dict__[name] = wrapped
+        return wrapped
@@ -70,8 +70,14 @@ class AimsunKernelSimulation(KernelSimulation):
 
         return FlowAimsunAPI(port=sim_params.port)
 
-    def simulation_step(self):
-        """See parent class."""
+    def simulation_step(self, num_steps=1):
+        """See parent class.
+
+        Aimsun is only advanced by one step at a time.
+        """
+        if num_steps != 1:
+            raise NotImplementedError(
+                'Aimsun can only be advanced by one step at a time.')
         self.kernel_api.simulation_step()
 
     def update(self, reset):
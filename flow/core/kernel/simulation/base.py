@@ -49,13 +49,48 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
-    def simulation_step(self):
+    def simulation_step(self, num_steps=1):
         """Advance the simulation by one step.
 
         This is done in most cases by calling a relevant simulator API method.
+
+        Parameters
+        ----------
+        num_steps : int, optional
+            number of steps to advance the simulation by with a single
+            command. The kernel is only updated once all of them were
+            performed, and must then account for the events of every step
+            (e.g. departures and arrivals). Simulators that do not support
+            this only accept a single step.
         """
         raise NotImplementedError
 
+    def simulation_step_async(self, num_steps=1):
+        """Start advancing the simulation by one step, without waiting.
+
+        The step is completed by `simulation_step_wait`, which must be called
+        before any other command is sent to the simulator. In the meantime,
+        the state stored in the kernel (e.g. the speeds of the vehicles) still
+        describes the previous step, and may be read.
+
+        Simulators that do not support asynchronous steps perform the step
+        when this method is called.
+
+        Parameters
+        ----------
+        num_steps : int, optional
+            number of steps to advance the simulation by, see
+            `simulation_step`
+        """
+        self.simulation_step(num_steps)
+
+    def simulation_step_wait(self):
+        """Wait for the step started by `simulation_step_async` to complete.
+
+        Does nothing if no step was started.
+        """
+        pass
+
     def update(self, reset):
         """Update the internal attributes of the simulation kernel.
 
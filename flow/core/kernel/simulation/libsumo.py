@@ -0,0 +1,77 @@
+"""Script containing the libsumo simulation kernel class."""
+
+from flow.core.kernel.simulation.traci import TraCISimulation
+from traci.exceptions import FatalTraCIError, TraCIException
+import logging
+
+try:
+    import libsumo
+except ImportError:
+    libsumo = None
+
+# exceptions that may be raised by the TraCI API, whether it is accessed
+# through a TraCI connection or through libsumo
+if libsumo is not None:
+    TRACI_EXCEPTIONS = (FatalTraCIError, TraCIException,
+                        libsumo.FatalTraCIError, libsumo.TraCIException)
+else:
+    TRACI_EXCEPTIONS = (FatalTraCIError, TraCIException)
+
+
+class LibsumoSimulation(TraCISimulation):
+    """Sumo simulation kernel running in-process via libsumo.
+
+    libsumo exposes the same API as TraCI, but runs sumo within the Python
+    process instead of in a separate process that is communicated with via a
+    socket. This removes the communication overhead of every TraCI command,
+    as well as the time spent waiting for sumo to start. The other TraCI
+    kernels (network, vehicle, and traffic light) are compatible with this
+    kernel, and are used alongside it.
+
+    Note that libsumo only supports a single simulation per process, and does
+    not support sumo-gui.
+
+    Extends flow.core.kernel.simulation.TraCISimulation
+    """
+
+    def start_simulation(self, network, sim_params):
+        """Start a sumo simulation instance in-process.
+
+        This method uses the configuration files created by the network class
+        to initialize sumo through libsumo. The libsumo module is returned as
+        the kernel api, as it implements the same interface as a TraCI
+        connection.
+
+        Raises
+        ------
+        ImportError
+            if libsumo is not installed
+        """
+        if libsumo is None:
+            raise ImportError(
+                'libsumo could not be imported. Make sure that the libsumo '
+                'Python bindings are installed, or use simulator="traci".')
+
+        if sim_params.render is True:
+            logging.warning(" sumo-gui is not supported by libsumo. Running "
+                            "without the gui.")
+
+        sumo_options, emission_out = self.get_sumo_options(
+            network, sim_params)
+
+        logging.info(" Starting SUMO via libsumo")
+        logging.debug(" Cfg file: " + str(network.cfg))
+        logging.debug(" Emission file: " + str(emission_out))
+        logging.debug(" Step length: " + str(sim_params.sim_step))
+
+        libsumo.start(["sumo"] + sumo_options)
+        libsumo.simulationStep()
+
+        return libsumo
+
+    def teardown_sumo(self):
+        """Close the in-process sumo instance."""
+        try:
+            libsumo.close()
+        except Exception as e:
+            print("Error during teardown: {}".format(e))
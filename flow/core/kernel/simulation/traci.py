@@ -5,17 +5,372 @@ from flow.core.util import ensure_dir
 import flow.config as config
 import traci.constants as tc
 import traci
+import sumolib
 import traceback
 import os
 import time
 import logging
 import subprocess
 import signal
+import random
+import hashlib
+import threading
+import collections
+import re
+import shutil
+import struct
+import tempfile
+from xml.etree import ElementTree
 
 
 # Number of retries on restarting SUMO before giving up
 RETRIES_ON_ERROR = 10
 
+# input files of a sumo configuration file
+CFG_INPUTS = ['net-file', 'route-files', 'additional-files',
+              'gui-settings-file']
+
+# timestamp written by netconvert, which changes whenever a network is rebuilt
+GENERATED_ON = re.compile(b'<!-- generated on [^\n]*')
+
+
+def get_cfg_inputs(cfg):
+    """Return the paths of the input files of a sumo configuration file.
+
+    Parameters
+    ----------
+    cfg : str
+        path to the sumo configuration file
+
+    Returns
+    -------
+    list of str
+        paths to the network, route, additional, and gui settings files, as
+        written in the configuration file (i.e. possibly relative to its
+        directory)
+    """
+    paths = []
+    for elem in ElementTree.parse(cfg).getroot().iter():
+        if elem.tag in CFG_INPUTS and elem.get('value'):
+            paths.extend(elem.get('value').split(','))
+    return paths
+
+
+# private attributes of TraCI connections used to pack several commands into
+# a single message (see TraCICommandBuffer)
+BUFFER_ATTRIBUTES = ('_sendExact', '_string', '_queue')
+
+# private attributes of TraCI connections used to send a simulation step
+# ahead of time (see TraCISimulation.simulation_step_async)
+ASYNC_STEP_ATTRIBUTES = BUFFER_ATTRIBUTES + ('_socket', '_sendCmd')
+
+
+def _defer_send():
+    """Replace the sending of TraCI messages while buffering commands."""
+    return None
+
+
+def _has_attributes(connection, names):
+    """Return whether a TraCI connection has the specified attributes.
+
+    Command buffering and asynchronous simulation steps rely on private
+    attributes of TraCI connections, which may change between TraCI
+    releases. These are checked once per connection, so that Flow falls
+    back to sending commands and steps synchronously rather than failing
+    (or silently misbehaving) with other releases.
+    """
+    return all(hasattr(connection, name) for name in names)
+
+
+class TraCICommandBuffer(object):
+    """Buffer of TraCI commands that are sent to sumo in a single message.
+
+    The TraCI protocol allows several commands to be sent within a single
+    message, in which case sumo responds to all of them with a single
+    message as well. Setter commands (e.g. ``vehicle.slowDown``) that are
+    added to this buffer are only executed once the buffer is flushed,
+    at which point all of them are packed by the TraCI connection as usual
+    and sent to sumo in one message, thereby replacing one socket round trip
+    per command with a single round trip.
+
+    Note that buffered commands must not depend on each other's results,
+    and that their effects are not visible to other TraCI commands until
+    the buffer is flushed.
+    """
+
+    def __init__(self, connection):
+        """Instantiate the buffer.
+
+        Parameters
+        ----------
+        connection : traci.connection.Connection
+            the TraCI connection used to send the commands
+        """
+        self.connection = connection
+        self._commands = []
+
+    def __len__(self):
+        """Return the number of buffered commands."""
+        return len(self._commands)
+
+    def add(self, command, *args, **kwargs):
+        """Add a command to the buffer.
+
+        Parameters
+        ----------
+        command : function
+            a method of the TraCI connection's domains, e.g.
+            ``connection.vehicle.slowDown``
+        args, kwargs
+            arguments the command is called with
+        """
+        self._commands.append((command, args, kwargs))
+
+    def flush(self):
+        """Send all buffered commands to sumo in a single message.
+
+        Raises
+        ------
+        traci.exceptions.TraCIException
+            if any of the commands failed. Commands following the failed
+            command may or may not have been executed.
+        """
+        if len(self._commands) == 0:
+            return
+
+        commands = self._commands
+        self._commands = []
+
+        connection = self.connection
+        # while the commands are called, the connection only appends them to
+        # its outgoing message instead of sending them
+        connection._sendExact = _defer_send
+        try:
+            for command, args, kwargs in commands:
+                command(*args, **kwargs)
+        except Exception:
+            # discard any partially-packed message
+            connection._string = bytes()
+            connection._queue = []
+            raise
+        finally:
+            del connection._sendExact
+
+        connection._sendExact()
+
+
+class _SentSocket(object):
+    """Socket whose messages were already sent.
+
+    This is used to receive the response to a message sent ahead of time
+    through the methods of the TraCI connection, which send the message
+    before receiving its response (see TraCISimulation.simulation_step_wait).
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def send(self, data):
+        return len(data)
+
+    def recv(self, size):
+        return self.sock.recv(size)
+
+    def close(self):
+        self.sock.close()
+
+
+class SumoInstance(object):
+    """A sumo process started in the background.
+
+    The process is started upon instantiation, and a TraCI connection to it
+    is established in a separate thread, so that sumo can load the network
+    while the caller continues running.
+
+    Attributes
+    ----------
+    proc : subprocess.Popen
+        the sumo process
+    port : int
+        port the sumo instance accepts a TraCI connection on
+    seed : int or None
+        seed the sumo instance was started with
+    connection : traci.connection.Connection or None
+        TraCI connection to the instance, available once it is ready
+    """
+
+    def __init__(self, sumo_call, port, seed):
+        """Start the sumo process and connect to it in the background.
+
+        Parameters
+        ----------
+        sumo_call : list of str
+            command used to start sumo
+        port : int
+            port passed to sumo via "--remote-port"
+        seed : int or None
+            seed passed to sumo via "--seed"
+        """
+        self.port = port
+        self.seed = seed
+        self.connection = None
+        self.proc = subprocess.Popen(sumo_call, preexec_fn=os.setsid)
+        self._thread = threading.Thread(target=self._connect, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        """Connect to the sumo process and perform its first step."""
+        try:
+            connection = traci.connect(
+                self.port, numRetries=600, proc=self.proc,
+                waitBetweenRetries=0.1)
+            connection.setOrder(0)
+            connection.simulationStep()
+            self.connection = connection
+        except Exception:
+            logging.warning(" Could not connect to prewarmed SUMO instance "
+                            "on port " + str(self.port))
+
+    def wait(self):
+        """Wait for the instance to be ready, and return whether it is."""
+        self._thread.join()
+        return self.connection is not None
+
+    def kill(self):
+        """Close the connection to the instance and kill its process."""
+        try:
+            os.killpg(self.proc.pid, signal.SIGTERM)
+        except OSError:
+            pass
+        self._thread.join()
+        self.proc.wait()
+        if self.connection is not None:
+            try:
+                self.connection.close(wait=False)
+            except Exception:
+                pass
+            self.connection = None
+
+
+class SumoProcessPool(object):
+    """Pool of sumo instances started ahead of time.
+
+    Starting sumo involves creating a new process, loading the network and
+    route files, and waiting for the TraCI server to accept a connection,
+    which takes up to a few seconds. When sumo is restarted upon every reset
+    (see `SumoParams.restart_instance`), this pool keeps a number of
+    instances for the current configuration started and connected in the
+    background, so that a restart only needs to swap in an instance that is
+    already running.
+
+    Instances are identified by a key that describes the configuration they
+    were started with. Whenever an instance is requested for, or the pool is
+    filled with, a different key (e.g. because the network was modified),
+    all stale instances are killed.
+
+    The network kernel deletes and regenerates its configuration files upon
+    every restart, possibly before a prewarmed instance has finished loading
+    them. Instances are therefore started from a private copy of the
+    configuration files, which is created once per key.
+    """
+
+    def __init__(self, size):
+        """Instantiate the pool.
+
+        Parameters
+        ----------
+        size : int
+            number of instances to keep ready
+        """
+        self.size = size
+        self._key = None
+        self._instances = collections.deque()
+        # directory containing the copy of the configuration files
+        self._cfg_dir = None
+        self._cfg = None
+
+    def __len__(self):
+        """Return the number of instances in the pool."""
+        return len(self._instances)
+
+    def acquire(self, key):
+        """Remove an instance started with a given configuration from the pool.
+
+        This waits for the oldest matching instance to finish starting.
+
+        Parameters
+        ----------
+        key : hashable
+            key describing the configuration of sumo
+
+        Returns
+        -------
+        SumoInstance or None
+            a connected sumo instance, or None if none is available
+        """
+        if key != self._key:
+            self.close()
+            return None
+
+        while len(self._instances) > 0:
+            instance = self._instances.popleft()
+            if instance.wait():
+                return instance
+            instance.kill()
+
+        return None
+
+    def fill(self, key, cfg, sumo_call_fn, seeded):
+        """Start instances until the pool is full.
+
+        Parameters
+        ----------
+        key : hashable
+            key describing the configuration of sumo
+        cfg : str
+            path to the sumo configuration file
+        sumo_call_fn : function
+            returns the command used to start sumo when given the path to the
+            configuration file, and the port and seed of the instance
+        seeded : bool
+            whether each instance should be started with a random seed
+        """
+        if key != self._key:
+            self.close()
+            self._key = key
+            self._copy_cfg(cfg)
+
+        while len(self._instances) < self.size:
+            port = sumolib.miscutils.getFreeSocketPort()
+            seed = random.randint(0, 1e5) if seeded else None
+            self._instances.append(SumoInstance(
+                sumo_call_fn(self._cfg, port, seed), port, seed))
+
+    def _copy_cfg(self, cfg):
+        """Copy a configuration file and its input files.
+
+        Input files with absolute paths (e.g. imported network templates) are
+        not copied, as they are not deleted by the network kernel.
+        """
+        self._cfg_dir = tempfile.mkdtemp(prefix='flow_sumo_')
+        for path in get_cfg_inputs(cfg):
+            if not os.path.isabs(path):
+                dst = os.path.join(self._cfg_dir, path)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy(os.path.join(os.path.dirname(cfg), path), dst)
+        self._cfg = os.path.join(self._cfg_dir, os.path.basename(cfg))
+        shutil.copy(cfg, self._cfg)
+
+    def close(self):
+        """Kill all instances in the pool."""
+        while len(self._instances) > 0:
+            self._instances.popleft().kill()
+        if self._cfg_dir is not None:
+            shutil.rmtree(self._cfg_dir, ignore_errors=True)
+        self._key = None
+        self._cfg_dir = None
+        self._cfg = None
+
 
 class TraCISimulation(KernelSimulation):
     """Sumo simulation kernel.
@@ -35,6 +390,17 @@ class TraCISimulation(KernelSimulation):
         KernelSimulation.__init__(self, master_kernel)
         # contains the subprocess.Popen instance used to start traci
         self.sumo_proc = None
+        # sumo instances started ahead of time, see SumoParams
+        self.prewarm_pool = None
+        # whether setter commands should be buffered, see SumoParams
+        self._buffer_commands = False
+        # buffer of setter commands sent before the next simulation step
+        self.command_buffer = None
+        # TraCI connection whose response to a simulation step is pending,
+        # see simulation_step_async
+        self._pending_step = None
+        # whether simulation steps can be sent ahead of time
+        self._async_steps = False
 
     def pass_api(self, kernel_api):
         """See parent class.
@@ -43,6 +409,26 @@ class TraCISimulation(KernelSimulation):
         """
         KernelSimulation.pass_api(self, kernel_api)
 
+        # setter commands can only be buffered when communicating with sumo
+        # over a TraCI connection (i.e. not via libsumo). If the kernel api
+        # is wrapped by a profiler, the buffer sends the commands through the
+        # underlying connection.
+        connection = getattr(kernel_api, 'unwrapped', kernel_api)
+        self.command_buffer = None
+        if self._buffer_commands and \
+                isinstance(connection, traci.connection.Connection):
+            if _has_attributes(connection, BUFFER_ATTRIBUTES):
+                self.command_buffer = TraCICommandBuffer(connection)
+            else:
+                logging.warning(
+                    " This version of TraCI does not support buffering "
+                    "commands. Commands are sent one at a time instead.")
+
+        # asynchronous steps are only possible over a TraCI connection
+        self._async_steps = \
+            isinstance(connection, traci.connection.Connection) and \
+            _has_attributes(connection, ASYNC_STEP_ATTRIBUTES)
+
         # subscribe some simulation parameters needed to check for entering,
         # exiting, and colliding vehicles
         self.kernel_api.simulation.subscribe([
@@ -51,9 +437,114 @@ class TraCISimulation(KernelSimulation):
             tc.VAR_DELTA_T
         ])
 
-    def simulation_step(self):
-        """See parent class."""
-        self.kernel_api.simulationStep()
+    def simulation_step(self, num_steps=1):
+        """See parent class.
+
+        Any buffered commands are sent to sumo before advancing the
+        simulation. Several steps are performed by asking sumo to advance
+        until the time of the last one, in which case the departed, arrived,
+        and teleported vehicles reported by the subscriptions are
+        accumulated over all steps.
+        """
+        self.simulation_step_wait()
+        self.flush_commands()
+        self.kernel_api.simulationStep(self._target_time(num_steps))
+
+    def _target_time(self, num_steps):
+        """Return the time sumo is advanced to by a number of steps.
+
+        This is 0 for a single step, which sumo interprets as the next step.
+        """
+        if num_steps == 1:
+            return 0.
+        # the current time is subscribed to in ms, and the step length in s
+        sim_obs = self.kernel_api.simulation.getSubscriptionResults()
+        return sim_obs[tc.VAR_TIME_STEP] / 1000. + \
+            num_steps * sim_obs[tc.VAR_DELTA_T]
+
+    def simulation_step_async(self, num_steps=1):
+        """See parent class.
+
+        The step command is written to the socket of the TraCI connection,
+        and its response (including the subscription results) is only read
+        by `simulation_step_wait`, so that sumo advances in its own process
+        while the caller continues running. This requires a TraCI
+        connection: with libsumo, sumo runs within the calling process, and
+        the step is performed synchronously instead. This is also the case
+        with TraCI releases whose connections lack the private attributes
+        needed to send the step ahead of time.
+        """
+        self.simulation_step_wait()
+        if not self._async_steps:
+            self.simulation_step(num_steps)
+            return
+        connection = getattr(self.kernel_api, 'unwrapped', self.kernel_api)
+
+        self.flush_commands()
+        if connection._socket is None:
+            raise traci.exceptions.FatalTraCIError(
+                "Connection already closed.")
+
+        # pack the command as the connection does, and send it without
+        # waiting for the response
+        connection._sendExact = _defer_send
+        try:
+            connection._sendCmd(tc.CMD_SIMSTEP, None, None, "D",
+                                self._target_time(num_steps))
+        finally:
+            del connection._sendExact
+        message = connection._string
+        connection._string = bytes()
+        connection._queue = []
+        connection._socket.send(struct.pack("!i", len(message) + 4) + message)
+        self._pending_step = connection
+
+    def simulation_step_wait(self):
+        """See parent class.
+
+        Raises
+        ------
+        traci.exceptions.FatalTraCIError
+            if the step failed, e.g. if sumo crashed
+        """
+        if self._pending_step is None:
+            return
+        connection, self._pending_step = self._pending_step, None
+
+        # the step command is sent again by the connection, but only its
+        # response is read from the socket, and processed as usual
+        sock = connection._socket
+        connection._socket = _SentSocket(sock)
+        try:
+            self.kernel_api.simulationStep()
+        finally:
+            if connection._socket is not None:
+                connection._socket = sock
+
+    def send_command(self, command, *args, **kwargs):
+        """Send a setter command to sumo.
+
+        If commands are buffered (see SumoParams), the command is added to
+        the buffer and sent before the next simulation step. Otherwise, it is
+        sent immediately.
+
+        Parameters
+        ----------
+        command : function
+            a method of the kernel api's domains, e.g.
+            ``kernel_api.vehicle.slowDown``
+        args, kwargs
+            arguments the command is called with
+        """
+        if self.command_buffer is not None:
+            self.command_buffer.add(command, *args, **kwargs)
+        else:
+            command(*args, **kwargs)
+
+    def flush_commands(self):
+        """Send all buffered commands to sumo (if any)."""
+        if self.command_buffer is not None:
+            self.command_buffer.flush()
 
     def update(self, reset):
         """See parent class."""
@@ -61,18 +552,204 @@ class TraCISimulation(KernelSimulation):
 
     def close(self):
         """See parent class."""
+        try:
+            self.simulation_step_wait()
+        except Exception:
+            # the connection is closed regardless
+            pass
         self.kernel_api.close()
 
+    def close_prewarmed_instances(self):
+        """Kill all sumo instances that were started ahead of time."""
+        if self.prewarm_pool is not None:
+            self.prewarm_pool.close()
+
     def check_collision(self):
         """See parent class."""
         return self.kernel_api.simulation.getStartingTeleportNumber() != 0
 
+    def get_sumo_options(self, network, sim_params):
+        """Return the command line options used to start sumo.
+
+        These options are shared by all methods of running sumo (e.g. via a
+        TraCI connection or in-process via libsumo), and do not include the
+        name of the sumo binary or any connection-specific options.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.TraCIKernelNetwork
+            the network kernel, containing the configuration files created by
+            the network class
+        sim_params : flow.core.params.SumoParams
+            simulation-specific parameters
+
+        Returns
+        -------
+        list of str
+            sumo command line options
+        str or None
+            path to the emission file, or None if no emission output was
+            requested
+        """
+        sumo_options = [
+            "-c", network.cfg,
+            "--step-length", str(sim_params.sim_step)
+        ]
+
+        # add step logs (if requested)
+        if sim_params.no_step_log:
+            sumo_options.append("--no-step-log")
+
+        # add the lateral resolution of the sublanes (if requested)
+        if sim_params.lateral_resolution is not None:
+            sumo_options.append("--lateral-resolution")
+            sumo_options.append(str(sim_params.lateral_resolution))
+
+        # add the emission path to the sumo command (if requested)
+        if sim_params.emission_path is not None:
+            ensure_dir(sim_params.emission_path)
+            emission_out = os.path.join(
+                sim_params.emission_path,
+                "{0}-emission.xml".format(network.name))
+            sumo_options.append("--emission-output")
+            sumo_options.append(emission_out)
+        else:
+            emission_out = None
+
+        if sim_params.overtake_right:
+            sumo_options.append("--lanechange.overtake-right")
+            sumo_options.append("true")
+
+        # specify a simulation seed (if requested)
+        if sim_params.seed is not None:
+            sumo_options.append("--seed")
+            sumo_options.append(str(sim_params.seed))
+
+        if not sim_params.print_warnings:
+            sumo_options.append("--no-warnings")
+            sumo_options.append("true")
+
+        # set the time it takes for a gridlock teleport to occur
+        sumo_options.append("--time-to-teleport")
+        sumo_options.append(str(int(sim_params.teleport_time)))
+
+        # check collisions at intersections
+        sumo_options.append("--collision.check-junctions")
+        sumo_options.append("true")
+
+        # save simulation states losslessly, including the state of the
+        # random number generators (used by snapshot resets). Rollouts that
+        # start from a snapshot thereby replay the same sumo randomness, see
+        # SumoParams.snapshot_reset
+        try:
+            snapshot_reset = sim_params.snapshot_reset
+        except AttributeError:
+            snapshot_reset = False
+        if snapshot_reset:
+            sumo_options.append("--save-state.precision")
+            sumo_options.append("17")
+            sumo_options.append("--save-state.rng")
+
+        return sumo_options, emission_out
+
     def start_simulation(self, network, sim_params):
         """Start a sumo simulation instance.
 
         This method uses the configuration files created by the network class
         to initialize a sumo instance. Also initializes a traci connection to
         interface with sumo from Python.
+
+        If prewarmed instances were requested (see SumoParams), an instance
+        started ahead of time with the same configuration is used if one is
+        available, and the pool of prewarmed instances is refilled.
+        """
+        try:
+            self._buffer_commands = sim_params.buffer_commands
+        except AttributeError:
+            self._buffer_commands = False
+
+        if not self._use_prewarm_pool(sim_params):
+            return self._start_sumo(network, sim_params)
+
+        if self.prewarm_pool is None:
+            self.prewarm_pool = SumoProcessPool(
+                sim_params.num_prewarmed_instances)
+
+        key = self._prewarm_key(network, sim_params)
+        instance = self.prewarm_pool.acquire(key)
+        if instance is not None:
+            logging.info(" Using prewarmed SUMO instance on port " +
+                         str(instance.port))
+            self.sumo_proc = instance.proc
+            sim_params.port = instance.port
+            if instance.seed is not None:
+                sim_params.seed = instance.seed
+            traci_connection = instance.connection
+        else:
+            traci_connection = self._start_sumo(network, sim_params)
+
+        def sumo_call_fn(cfg, port, seed):
+            sumo_options, _ = self.get_sumo_options(network, sim_params)
+            sumo_options[sumo_options.index("-c") + 1] = cfg
+            if seed is not None:
+                sumo_options[sumo_options.index("--seed") + 1] = str(seed)
+            return ["sumo", "--remote-port", str(port)] + sumo_options
+
+        self.prewarm_pool.fill(key, network.cfg, sumo_call_fn,
+                               seeded=sim_params.seed is not None)
+
+        return traci_connection
+
+    def _use_prewarm_pool(self, sim_params):
+        """Return whether sumo should be started from prewarmed instances.
+
+        Instances are only prewarmed if sumo is restarted upon reset, and if
+        they can run independently of the current instance, i.e. without a
+        gui, without writing to the same emission file, and without waiting
+        for additional clients.
+        """
+        try:
+            num_prewarmed = sim_params.num_prewarmed_instances
+        except AttributeError:
+            num_prewarmed = 0
+
+        return num_prewarmed > 0 \
+            and sim_params.restart_instance \
+            and sim_params.render is False \
+            and sim_params.emission_path is None \
+            and sim_params.num_clients == 1
+
+    def _prewarm_key(self, network, sim_params):
+        """Return a key describing the configuration sumo is started with.
+
+        The key consists of the sumo options (excluding the seed, which is
+        chosen separately for every instance) and a digest of the contents of
+        the configuration file and its input files, since these files are
+        regenerated whenever sumo is restarted. The time at which the files
+        were generated is excluded from the digest.
+        """
+        sumo_options, _ = self.get_sumo_options(network, sim_params)
+        if sim_params.seed is not None:
+            i = sumo_options.index("--seed")
+            del sumo_options[i:i + 2]
+
+        digest = hashlib.md5()
+        paths = [network.cfg] + [
+            os.path.join(os.path.dirname(network.cfg), path)
+            for path in get_cfg_inputs(network.cfg)]
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(GENERATED_ON.sub(b'', f.read()))
+
+        return tuple(sumo_options), sim_params.seed is None, digest.digest()
+
+    def _start_sumo(self, network, sim_params):
+        """Start a new sumo process and connect to it.
+
+        Returns
+        -------
+        traci.connection.Connection
+            TraCI connection to the sumo process
         """
         error = None
         for _ in range(RETRIES_ON_ERROR):
@@ -83,54 +760,15 @@ class TraCISimulation(KernelSimulation):
                 sumo_binary = "sumo-gui" if sim_params.render is True \
                     else "sumo"
 
+                sumo_options, emission_out = self.get_sumo_options(
+                    network, sim_params)
+
                 # command used to start sumo
                 sumo_call = [
-                    sumo_binary, "-c", network.cfg,
+                    sumo_binary,
                     "--remote-port", str(sim_params.port),
                     "--num-clients", str(sim_params.num_clients),
-                    "--step-length", str(sim_params.sim_step)
-                ]
-
-                # add step logs (if requested)
-                if sim_params.no_step_log:
-                    sumo_call.append("--no-step-log")
-
-                # add the lateral resolution of the sublanes (if requested)
-                if sim_params.lateral_resolution is not None:
-                    sumo_call.append("--lateral-resolution")
-                    sumo_call.append(str(sim_params.lateral_resolution))
-
-                # add the emission path to the sumo command (if requested)
-                if sim_params.emission_path is not None:
-                    ensure_dir(sim_params.emission_path)
-                    emission_out = os.path.join(
-                        sim_params.emission_path,
-                        "{0}-emission.xml".format(network.name))
-                    sumo_call.append("--emission-output")
-                    sumo_call.append(emission_out)
-                else:
-                    emission_out = None
-
-                if sim_params.overtake_right:
-                    sumo_call.append("--lanechange.overtake-right")
-                    sumo_call.append("true")
-
-                # specify a simulation seed (if requested)
-                if sim_params.seed is not None:
-                    sumo_call.append("--seed")
-                    sumo_call.append(str(sim_params.seed))
-
-                if not sim_params.print_warnings:
-                    sumo_call.append("--no-warnings")
-                    sumo_call.append("true")
-
-                # set the time it takes for a gridlock teleport to occur
-                sumo_call.append("--time-to-teleport")
-                sumo_call.append(str(int(sim_params.teleport_time)))
-
-                # check collisions at intersections
-                sumo_call.append("--collision.check-junctions")
-                sumo_call.append("true")
+                ] + sumo_options
 
                 logging.info(" Starting SUMO on port " + str(port))
                 logging.debug(" Cfg file: " + str(network.cfg))
@@ -0,0 +1,80 @@
+"""Script containing the cache of quantities derived from the kernel state."""
+
+
+class StepCache(object):
+    """Cache of quantities computed from the state of the current time step.
+
+    Environments, rewards, and controllers often compute the same derived
+    quantities several times within a time step, e.g. the speeds of all
+    vehicles, which are needed by the reward of every agent in multi-agent
+    environments. Such quantities may be stored in this cache under a
+    hashable key, so that they are computed at most once per time step and
+    shared between all of their users.
+
+    The cache is cleared by the kernel whenever its state changes, i.e. after
+    every simulation step (see flow.core.kernel.Kernel.update), when a new
+    kernel api is passed, and when vehicles are removed. Values stored in the
+    cache are shared, and must not be modified by their users.
+
+    Usage
+    -----
+    >>> speeds = env.k.cache.get(
+    >>>     ('speeds',), lambda: np.array(env.k.vehicle.get_speed(ids)))
+
+    Attributes
+    ----------
+    epoch : int
+        number of times the cache was cleared, i.e. an identifier of the
+        state the cached values were computed from
+    """
+
+    def __init__(self):
+        """Instantiate an empty cache."""
+        self._values = {}
+        self.epoch = 0
+
+    def __len__(self):
+        """Return the number of cached values."""
+        return len(self._values)
+
+    def __contains__(self, key):
+        """Check whether a value is cached under a key."""
+        return key in self._values
+
+    def get(self, key, compute, *args):
+        """Return a cached value, computing it if it is not cached yet.
+
+        Parameters
+        ----------
+        key : hashable
+            key of the value. Keys should start with a name identifying the
+            quantity, followed by any parameters it depends on, e.g.
+            ``('ids_by_edge', ('edge0', 'edge1'))``
+        compute : callable
+            function computing the value, called with args
+        args : any
+            arguments of compute
+
+        Returns
+        -------
+        any
+            the value
+        """
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = compute(*args)
+            return value
+
+    def discard(self, key):
+        """Remove a cached value (if it is cached).
+
+        This is needed when a quantity is derived from state that changes
+        within a time step, e.g. variables updated by an environment.
+        """
+        self._values.pop(key, None)
+
+    def clear(self):
+        """Remove all cached values."""
+        self._values.clear()
+        self.epoch += 1
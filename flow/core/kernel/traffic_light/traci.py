@@ -61,15 +61,20 @@ class TraCITrafficLight(KernelTrafficLight):
         return self.__ids
 
     def set_state(self, node_id, state, link_index="all"):
-        """See parent class."""
+        """See parent class.
+
+        The command is buffered until the next simulation step if this is
+        requested by the simulation kernel, see SumoParams.
+        """
+        send = self.master_kernel.simulation.send_command
         if link_index == "all":
             # if lights on all lanes are changed
-            self.kernel_api.trafficlight.setRedYellowGreenState(
-                tlsID=node_id, state=state)
+            send(self.kernel_api.trafficlight.setRedYellowGreenState,
+                 tlsID=node_id, state=state)
         else:
             # if lights on a single lane is changed
-            self.kernel_api.trafficlight.setLinkState(
-                tlsID=node_id, tlsLinkIndex=link_index, state=state)
+            send(self.kernel_api.trafficlight.setLinkState,
+                 tlsID=node_id, tlsLinkIndex=link_index, state=state)
 
     def get_state(self, node_id):
         """See parent class."""
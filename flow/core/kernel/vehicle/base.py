@@ -1,4 +1,5 @@
 """Script containing the base vehicle kernel class."""
+import numpy as np
 
 
 class KernelVehicle(object):
@@ -51,6 +52,9 @@ class KernelVehicle(object):
         self.master_kernel = master_kernel
         self.kernel_api = None
         self.sim_step = sim_params.sim_step
+        # number of simulation steps the accelerations applied through
+        # apply_acceleration are held for, see SumoParams.multi_step_advance
+        self.action_steps = 1
 
     def pass_api(self, kernel_api):
         """Acquire the kernel api that was generated by the simulation kernel.
@@ -120,6 +124,9 @@ class KernelVehicle(object):
     def apply_acceleration(self, veh_id, acc):
         """Apply the acceleration requested by a vehicle in the simulator.
 
+        The acceleration is held over the next `action_steps` simulation
+        steps.
+
         Parameters
         ----------
         veh_id : str or list of str
@@ -659,3 +666,129 @@ class KernelVehicle(object):
         float
         """
         raise NotImplementedError
+
+    ###########################################################################
+    #                  Vectorized state acquisition methods                   #
+    ###########################################################################
+
+    # The methods below return the state of several vehicles at once as numpy
+    # arrays. By default they are built from the scalar getters above; vehicle
+    # kernels that store their state in columnar form may override them with
+    # faster implementations.
+
+    def get_speed_array(self, veh_ids, error=-1001):
+        """Return the speeds of the specified vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.asarray(self.get_speed(list(veh_ids), error), dtype=float)
+
+    def get_position_array(self, veh_ids, error=-1001):
+        """Return the positions of the specified vehicles on their edges.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.asarray(self.get_position(list(veh_ids), error),
+                          dtype=float)
+
+    def get_lane_array(self, veh_ids, error=-1001):
+        """Return the lane indices of the specified vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : int, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.asarray(self.get_lane(list(veh_ids), error), dtype=int)
+
+    def get_headway_array(self, veh_ids, error=-1001):
+        """Return the headways of the specified vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.asarray(self.get_headway(list(veh_ids), error), dtype=float)
+
+    def get_length_array(self, veh_ids, error=-1001):
+        """Return the lengths of the specified vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.asarray(self.get_length(list(veh_ids), error), dtype=float)
+
+    def get_x_array(self, veh_ids):
+        """Return the 1-D positions of the specified vehicles.
+
+        See `get_x_by_id`.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.array([self.get_x_by_id(veh_id) for veh_id in veh_ids],
+                        dtype=float)
+
+    def get_leader_speed_array(self, veh_ids, error=-1001):
+        """Return the speeds of the leaders of the specified vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        error : float, optional
+            value that is returned for vehicles that are not found or that do
+            not have a leader
+
+        Returns
+        -------
+        np.ndarray
+        """
+        leaders = self.get_leader(list(veh_ids))
+        return np.array([self.get_speed(leader, error) if leader else error
+                         for leader in leaders], dtype=float)
@@ -0,0 +1,387 @@
+"""Script containing a columnar (struct-of-arrays) vehicle state store."""
+import numpy as np
+
+# initial number of vehicle slots allocated by the store
+DEFAULT_CAPACITY = 64
+
+
+class VehicleStateArrays(object):
+    """Columnar storage of per-vehicle state.
+
+    Every vehicle in the network is assigned a stable integer slot upon
+    entering the store. The state of the vehicle is then held at this index
+    in a collection of preallocated numpy arrays (one per field), allowing
+    the state of many vehicles to be collected with a single fancy-indexing
+    operation instead of one dictionary lookup per vehicle. Slots of removed
+    vehicles are recycled by subsequent vehicles, and the arrays grow
+    geometrically whenever the number of vehicles exceeds the current
+    capacity.
+
+    Attributes
+    ----------
+    speed : np.ndarray
+        speed of the vehicle in each slot (m/s)
+    position : np.ndarray
+        position of the vehicle in each slot relative to its current edge (m)
+    lane : np.ndarray
+        lane index of the vehicle in each slot
+    edge : np.ndarray
+        index of the edge the vehicle in each slot is located on, see
+        ``edge_ids``. Set to -1 if the edge is unknown.
+    headway : np.ndarray
+        bumper-to-bumper gap between the vehicle in each slot and its leader
+    leader : np.ndarray
+        slot of the leader of the vehicle in each slot. Set to -1 if the
+        vehicle has no leader, or if its leader is not in the store.
+    length : np.ndarray
+        length of the vehicle in each slot (m)
+    edge_ids : list of str
+        names of all edges seen by the store, indexed by the edge index
+    """
+
+    # name, dtype, and value of unoccupied slots for each column
+    FIELDS = (
+        ('speed', np.float64, -1001),
+        ('position', np.float64, -1001),
+        ('lane', np.int64, -1001),
+        ('edge', np.int64, -1),
+        ('headway', np.float64, -1001),
+        ('leader', np.int64, -1),
+        ('length', np.float64, -1001),
+    )
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """Instantiate the store.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            number of vehicle slots to preallocate
+        """
+        self.capacity = 0
+        self.veh_ids = np.empty(0, dtype=object)
+        for name, dtype, fill in self.FIELDS:
+            setattr(self, name, np.empty(0, dtype=dtype))
+        self._resize(max(int(capacity), 1))
+
+        # Key = vehicle id, Element = slot
+        self._slots = {}
+        # slots that were freed by removed vehicles
+        self._free = []
+        # next slot that has never been used
+        self._next = 0
+
+        # Key = edge id, Element = edge index
+        self.edge_index = {}
+        self.edge_ids = []
+
+    def __len__(self):
+        """Return the number of vehicles in the store."""
+        return len(self._slots)
+
+    def __contains__(self, veh_id):
+        """Check whether a vehicle is in the store."""
+        return veh_id in self._slots
+
+    def _resize(self, capacity):
+        """Grow all columns to the specified capacity."""
+        old = self.capacity
+        veh_ids = np.empty(capacity, dtype=object)
+        veh_ids[:old] = self.veh_ids
+        self.veh_ids = veh_ids
+        for name, dtype, fill in self.FIELDS:
+            column = np.full(capacity, fill, dtype=dtype)
+            column[:old] = getattr(self, name)
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def _clear_slot(self, slot):
+        """Reset the contents of a slot to their unoccupied values."""
+        self.veh_ids[slot] = None
+        for name, _, fill in self.FIELDS:
+            getattr(self, name)[slot] = fill
+
+    def add(self, veh_id):
+        """Assign a slot to a vehicle, and return it.
+
+        If the vehicle is already in the store, its current slot is returned.
+        """
+        slot = self._slots.get(veh_id)
+        if slot is not None:
+            return slot
+
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._next >= self.capacity:
+                self._resize(2 * self.capacity)
+            slot = self._next
+            self._next += 1
+
+        self._slots[veh_id] = slot
+        self.veh_ids[slot] = veh_id
+        return slot
+
+    def remove(self, veh_id):
+        """Free the slot of a vehicle. Missing vehicles are ignored."""
+        slot = self._slots.pop(veh_id, None)
+        if slot is None:
+            return
+        self._clear_slot(slot)
+        # vehicles following the removed vehicle no longer have a leader
+        self.leader[self.leader == slot] = -1
+        self._free.append(slot)
+
+    def clear(self):
+        """Remove all vehicles from the store."""
+        for slot in self._slots.values():
+            self._clear_slot(slot)
+        self._slots.clear()
+        self._free = []
+        self._next = 0
+
+    def slot(self, veh_id, error=-1):
+        """Return the slot of a vehicle, or `error` if it is not stored."""
+        return self._slots.get(veh_id, error)
+
+    def slots(self, veh_ids):
+        """Return the slots of a list of vehicles.
+
+        Vehicles that are not in the store are assigned a slot of -1.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+
+        Returns
+        -------
+        np.ndarray
+            slot of every vehicle
+        """
+        get = self._slots.get
+        return np.fromiter((get(veh_id, -1) for veh_id in veh_ids),
+                           dtype=np.int64, count=len(veh_ids))
+
+    def intern_edge(self, edge):
+        """Return the index of an edge, registering it if it is new."""
+        index = self.edge_index.get(edge)
+        if index is None:
+            index = len(self.edge_ids)
+            self.edge_index[edge] = index
+            self.edge_ids.append(edge)
+        return index
+
+    def set_state(self, veh_id, **kwargs):
+        """Set one or more fields of a stored vehicle.
+
+        The "edge" field is provided by name and interned, while the "leader"
+        field is provided as a vehicle id and converted to a slot.
+        """
+        slot = self._slots[veh_id]
+        for name, value in kwargs.items():
+            if name == 'edge':
+                value = self.intern_edge(value) if value else -1
+            elif name == 'leader':
+                value = self._slots.get(value, -1) if value else -1
+            getattr(self, name)[slot] = value
+
+    def get(self, name, veh_ids, error=None):
+        """Return the values of a field for a list of vehicles.
+
+        Parameters
+        ----------
+        name : str
+            name of the field, see ``FIELDS``
+        veh_ids : list of str
+            vehicle ids
+        error : any, optional
+            value assigned to vehicles that are not in the store. Defaults to
+            the value of unoccupied slots for the field.
+
+        Returns
+        -------
+        np.ndarray
+            values of the field for every vehicle
+        """
+        slots = self.slots(veh_ids)
+        values = getattr(self, name)[slots]
+        missing = slots < 0
+        if missing.any():
+            if error is None:
+                error = dict((f[0], f[2]) for f in self.FIELDS)[name]
+            if not np.can_cast(np.min_scalar_type(error), values.dtype):
+                values = values.astype(np.float64)
+            values[missing] = error
+        return values
+
+    def get_leader_field(self, name, veh_ids, error):
+        """Return the values of a field for the leaders of several vehicles.
+
+        Parameters
+        ----------
+        name : str
+            name of the field, see ``FIELDS``
+        veh_ids : list of str
+            vehicle ids
+        error : any
+            value assigned to vehicles whose leader is not in the store
+
+        Returns
+        -------
+        np.ndarray
+            values of the field for the leader of every vehicle
+        """
+        slots = self.slots(veh_ids)
+        leaders = np.where(slots < 0, -1, self.leader[slots])
+        values = getattr(self, name)[leaders].astype(np.float64)
+        values[leaders < 0] = error
+        return values
+
+
+class LaneOrdering(object):
+    """Vehicles in the network sorted by edge, lane, and position.
+
+    This is used to identify the leaders and followers of vehicles in every
+    lane of their current edge. The vehicles are sorted once with a single
+    lexicographic sort, after which the vehicles in any lane are a contiguous
+    slice of the sorted arrays, and a vehicle's position within a lane can be
+    found by binary search.
+
+    Attributes
+    ----------
+    ids : np.ndarray
+        sorted vehicle ids
+    positions : np.ndarray
+        positions of the sorted vehicles relative to their edges
+    """
+
+    def __init__(self, veh_ids, edges, lanes, positions):
+        """Sort the vehicles.
+
+        Vehicles that are not located on any edge (i.e. whose edge is an
+        empty string) are ignored.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+        edges : list of str
+            edge of every vehicle
+        lanes : list of int
+            lane index of every vehicle
+        positions : list of float
+            position of every vehicle relative to its edge
+        """
+        edges = np.asarray(edges, dtype=object)
+        valid = np.array([bool(edge) for edge in edges], dtype=bool)
+
+        edge_ids, edge_idx = np.unique(
+            edges[valid].astype(str), return_inverse=True)
+        edge_idx = edge_idx.reshape(-1)
+        lanes = np.asarray(lanes, dtype=np.int64)[valid]
+        positions = np.asarray(positions, dtype=np.float64)[valid]
+
+        # the sort is stable, so vehicles with identical positions remain in
+        # the order in which they were provided
+        order = np.lexsort((positions, lanes, edge_idx))
+        self.ids = np.asarray(veh_ids, dtype=object)[valid][order]
+        self.positions = positions[order]
+        self._edge_idx = edge_idx[order]
+        self._edge_index = dict(
+            (edge, i) for i, edge in enumerate(edge_ids.tolist()))
+
+        # unique key of the (edge, lane) pair of every sorted vehicle, which
+        # is itself sorted
+        self._lanes_per_edge = int(lanes.max()) + 1 if len(lanes) > 0 else 1
+        self._keys = self._edge_idx * self._lanes_per_edge + lanes[order]
+
+        # the lane graph the vehicles were last located in, see `lane_slices`
+        self._graph = None
+        self._graph_slices = None
+
+    def lane_bounds(self, edge, lane):
+        """Return the slice of the sorted vehicles located in a lane.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        int
+            index of the first vehicle in the lane
+        int
+            index after the last vehicle in the lane. Equal to the first
+            index if the lane is empty.
+        """
+        index = self._edge_index.get(edge)
+        if index is None or lane < 0 or lane >= self._lanes_per_edge:
+            return 0, 0
+        key = index * self._lanes_per_edge + lane
+        return (int(np.searchsorted(self._keys, key, side='left')),
+                int(np.searchsorted(self._keys, key, side='right')))
+
+    def lane_slices(self, graph):
+        """Return the sorted vehicles located in every lane of a lane graph.
+
+        Parameters
+        ----------
+        graph : flow.core.kernel.network.lane_graph.LaneGraph
+            lane graph of the network
+
+        Returns
+        -------
+        np.ndarray
+            index of the first sorted vehicle in every lane of the graph
+        np.ndarray
+            number of vehicles in every lane of the graph
+        """
+        if self._graph is graph:
+            return self._graph_slices
+
+        first = np.zeros(graph.num_nodes, dtype=np.int64)
+        count = np.zeros(graph.num_nodes, dtype=np.int64)
+        if len(self.ids) > 0:
+            # lane index of every sorted vehicle in the graph
+            graph_edge = np.array(
+                [graph.edge_index.get(edge, -1) for edge in self._edge_index],
+                dtype=np.int64)[self._edge_idx]
+            lane = self._keys - self._edge_idx * self._lanes_per_edge
+            start = graph.node_offset[np.maximum(graph_edge, 0)]
+            end = graph.node_offset[np.maximum(graph_edge, 0) + 1]
+            nodes = np.where((graph_edge >= 0) & (start + lane < end),
+                             start + lane, -1)
+
+            # vehicles in the same lane are contiguous, so the first vehicle
+            # in every lane is where the lane index changes
+            change = np.flatnonzero(
+                np.concatenate(([True], nodes[1:] != nodes[:-1])))
+            change = change[nodes[change] >= 0]
+            first[nodes[change]] = change
+            valid = nodes >= 0
+            count += np.bincount(nodes[valid], minlength=graph.num_nodes)
+
+        self._graph = graph
+        self._graph_slices = (first, count)
+        return first, count
+
+    def ids_by_edge(self):
+        """Return the sorted ids of the vehicles on every occupied edge.
+
+        Returns
+        -------
+        dict < str, list of str >
+            vehicles on each edge, ordered by lane and then by position
+        """
+        if len(self.ids) == 0:
+            return {}
+        starts = np.flatnonzero(np.diff(self._edge_idx)) + 1
+        bounds = np.concatenate(([0], starts, [len(self.ids)]))
+        edge_ids = list(self._edge_index.keys())
+        return dict(
+            (edge_ids[self._edge_idx[start]], self.ids[start:end].tolist())
+            for start, end in zip(bounds[:-1], bounds[1:]))
@@ -0,0 +1,71 @@
+"""Script containing bounded histories of per-step vehicle statistics."""
+
+
+class RollingCount(object):
+    """Bounded history of a count that is recorded at every time step.
+
+    The running total of the count after each of the last `capacity` time
+    steps is stored in a ring buffer. The sum of the count over any of these
+    time steps can then be computed as the difference between two running
+    totals, regardless of the number of steps considered, while the memory
+    used by the history remains constant over arbitrarily long rollouts.
+    """
+
+    def __init__(self, capacity):
+        """Instantiate the history.
+
+        Parameters
+        ----------
+        capacity : int
+            maximum number of time steps the count can be summed over
+        """
+        self.capacity = max(int(capacity), 1)
+        # running totals, where the total after step i is stored at index
+        # i % (capacity + 1), and the total before the first step is 0
+        self._totals = [0] * (self.capacity + 1)
+        self._total = 0
+        self._steps = 0
+
+    def __len__(self):
+        """Return the number of time steps recorded since the last clear."""
+        return self._steps
+
+    def append(self, count):
+        """Record the count of a new time step."""
+        self._total += count
+        self._steps += 1
+        self._totals[self._steps % (self.capacity + 1)] = self._total
+
+    def clear(self):
+        """Remove all recorded time steps."""
+        self._totals = [0] * (self.capacity + 1)
+        self._total = 0
+        self._steps = 0
+
+    def last(self):
+        """Return the count of the most recent time step (0 if empty)."""
+        return self.window(1)[0]
+
+    def window(self, num_steps):
+        """Return the sum of the count over the most recent time steps.
+
+        Parameters
+        ----------
+        num_steps : int
+            number of time steps to sum over. If this is not positive, all
+            recorded steps are requested. The number of steps is limited to
+            both the number of recorded steps and the capacity of the history.
+
+        Returns
+        -------
+        int
+            sum of the count over the time steps
+        int
+            number of time steps that were summed over
+        """
+        steps = self._steps
+        if num_steps <= 0:
+            num_steps = steps
+        num_steps = min(num_steps, steps, self.capacity)
+        start = self._totals[(steps - num_steps) % (self.capacity + 1)]
+        return self._total - start, num_steps
@@ -0,0 +1,152 @@
+"""Script containing the sets used to keep track of vehicle ids."""
+from bisect import bisect_left, insort
+
+
+class IndexedIdSet(object):
+    """Insertion-ordered set of vehicle ids.
+
+    Ids can be added, removed, and checked for membership in constant time,
+    while iterating over the set yields the ids in the order in which they
+    were added. The ids are also made available as a list through the `ids`
+    method. This list is only rebuilt the first time it is requested after
+    the set was modified, and is never modified afterwards, so that lists
+    returned by previous calls remain valid while vehicles are added and
+    removed.
+    """
+
+    def __init__(self, ids=()):
+        """Instantiate the set.
+
+        Parameters
+        ----------
+        ids : iterable of str, optional
+            initial ids in the set
+        """
+        # Python dictionaries preserve insertion order, and support constant
+        # time insertions and deletions
+        self._index = dict.fromkeys(ids)
+        self._view = None
+
+    def __len__(self):
+        """Return the number of ids in the set."""
+        return len(self._index)
+
+    def __contains__(self, veh_id):
+        """Check whether an id is in the set."""
+        return veh_id in self._index
+
+    def __iter__(self):
+        """Iterate over the ids in the set, in insertion order."""
+        return iter(self.ids())
+
+    def add(self, veh_id):
+        """Add an id to the end of the set.
+
+        Returns
+        -------
+        bool
+            True if the id was added, False if it was already in the set
+        """
+        if veh_id in self._index:
+            return False
+        self._index[veh_id] = None
+        self._view = None
+        return True
+
+    def discard(self, veh_id):
+        """Remove an id from the set if it is present.
+
+        Returns
+        -------
+        bool
+            True if the id was removed, False if it was not in the set
+        """
+        if veh_id not in self._index:
+            return False
+        del self._index[veh_id]
+        self._view = None
+        return True
+
+    def ids(self):
+        """Return the ids in the set as a list, in insertion order."""
+        if self._view is None:
+            self._view = list(self._index)
+        return self._view
+
+
+class SortedIdSet(object):
+    """Set of vehicle ids that is kept sorted.
+
+    Membership is checked in constant time, while ids are inserted into (and
+    removed from) a sorted list by binary search, thereby avoiding a complete
+    sort of the ids whenever the set is modified. As with `IndexedIdSet`,
+    lists returned by the `ids` method are never modified by the set
+    afterwards.
+    """
+
+    def __init__(self, ids=()):
+        """Instantiate the set.
+
+        Parameters
+        ----------
+        ids : iterable of str, optional
+            initial ids in the set
+        """
+        self._members = set(ids)
+        self._sorted = sorted(self._members)
+        # whether the sorted list was returned by the `ids` method, in which
+        # case it is copied before being modified
+        self._shared = False
+
+    def __len__(self):
+        """Return the number of ids in the set."""
+        return len(self._members)
+
+    def __contains__(self, veh_id):
+        """Check whether an id is in the set."""
+        return veh_id in self._members
+
+    def __iter__(self):
+        """Iterate over the ids in the set, in sorted order."""
+        return iter(self.ids())
+
+    def _own(self):
+        """Copy the sorted list if it was handed out by the `ids` method."""
+        if self._shared:
+            self._sorted = list(self._sorted)
+            self._shared = False
+
+    def add(self, veh_id):
+        """Insert an id into the set.
+
+        Returns
+        -------
+        bool
+            True if the id was added, False if it was already in the set
+        """
+        if veh_id in self._members:
+            return False
+        self._own()
+        self._members.add(veh_id)
+        insort(self._sorted, veh_id)
+        return True
+
+    def discard(self, veh_id):
+        """Remove an id from the set if it is present.
+
+        Returns
+        -------
+        bool
+            True if the id was removed, False if it was not in the set
+        """
+        if veh_id not in self._members:
+            return False
+        self._own()
+        self._members.discard(veh_id)
+        del self._sorted[bisect_left(self._sorted, veh_id)]
+        return True
+
+    def ids(self):
+        """Return the ids in the set as a sorted list."""
+        self._shared = True
+        return self._sorted
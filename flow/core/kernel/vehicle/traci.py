@@ -2,16 +2,18 @@
 import traceback
 
 from flow.core.kernel.vehicle import KernelVehicle
+from flow.core.kernel.vehicle.columnar import VehicleStateArrays, \
+    LaneOrdering
+from flow.core.kernel.vehicle.id_sets import IndexedIdSet, SortedIdSet
+from flow.core.kernel.vehicle.history import RollingCount
+from flow.core.kernel.simulation.libsumo import TRACI_EXCEPTIONS
 import traci.constants as tc
-from traci.exceptions import FatalTraCIError, TraCIException
 import numpy as np
 import collections
 import warnings
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
-from bisect import bisect_left
-import itertools
 from copy import deepcopy
 
 # colors for vehicles
@@ -19,6 +21,16 @@ WHITE = (255, 255, 255)
 CYAN = (0, 255, 255)
 RED = (255, 0, 0)
 
+# vehicle variables collected from sumo at every time step
+SUBSCRIPTION_VARS = [
+    tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID, tc.VAR_SPEED,
+    tc.VAR_EDGES, tc.VAR_POSITION, tc.VAR_ANGLE, tc.VAR_SPEED_WITHOUT_TRACI
+]
+
+# additional variables collected by the context subscription, so that newly
+# departed vehicles do not need to be queried individually
+CONTEXT_SUBSCRIPTION_VARS = SUBSCRIPTION_VARS + [tc.VAR_TYPE, tc.VAR_LENGTH]
+
 
 class TraCIVehicle(KernelVehicle):
     """Flow kernel for the TraCI API.
@@ -32,12 +44,14 @@ class TraCIVehicle(KernelVehicle):
         """See parent class."""
         KernelVehicle.__init__(self, master_kernel, sim_params)
 
-        self.__ids = []  # ids of all vehicles
-        self.__human_ids = []  # ids of human-driven vehicles
-        self.__controlled_ids = []  # ids of flow-controlled vehicles
-        self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
-        self.__rl_ids = []  # ids of rl-controlled vehicles
-        self.__observed_ids = []  # ids of the observed vehicles
+        self.__ids = IndexedIdSet()  # ids of all vehicles
+        self.__human_ids = IndexedIdSet()  # ids of human-driven vehicles
+        # ids of flow-controlled vehicles
+        self.__controlled_ids = IndexedIdSet()
+        # ids of flow lc-controlled vehicles
+        self.__controlled_lc_ids = IndexedIdSet()
+        self.__rl_ids = SortedIdSet()  # ids of rl-controlled vehicles, sorted
+        self.__observed_ids = IndexedIdSet()  # ids of the observed vehicles
 
         # vehicles: Key = Vehicle ID, Value = Dictionary describing the vehicle
         # Ordered dictionary used to keep neural net inputs in order
@@ -58,16 +72,33 @@ class TraCIVehicle(KernelVehicle):
         # contain the minGap attribute of each type of vehicle
         self.minGap = {}
 
-        # list of vehicle ids located in each edge in the network
-        self._ids_by_edge = dict()
+        # vehicles sorted by edge, lane and position in the current time step,
+        # used to compute the multi-lane data of vehicles. This is computed
+        # lazily, and is set to None whenever it is outdated.
+        self._lane_ordering = None
+
+        # ids of the vehicles whose multi-lane data is up-to-date
+        self._lane_data_ids = set()
+
+        # number of time steps for which the number of departed and arrived
+        # vehicles is stored, and for which their ids are stored
+        try:
+            rate_horizon = sim_params.rate_horizon
+        except AttributeError:
+            rate_horizon = 3600
+        try:
+            id_history = sim_params.id_history
+        except AttributeError:
+            id_history = 1
+        rate_steps = int(np.ceil(rate_horizon / self.sim_step))
 
         # number of vehicles that entered the network for every time-step
-        self._num_departed = []
-        self._departed_ids = []
+        self._num_departed = RollingCount(rate_steps)
+        self._departed_ids = collections.deque(maxlen=max(id_history, 1))
 
         # number of vehicles to exit the network for every time-step
-        self._num_arrived = []
-        self._arrived_ids = []
+        self._num_arrived = RollingCount(rate_steps)
+        self._arrived_ids = collections.deque(maxlen=max(id_history, 1))
 
         # whether or not to automatically color vehicles
         try:
@@ -75,6 +106,67 @@ class TraCIVehicle(KernelVehicle):
         except AttributeError:
             self._color_vehicles = False
 
+        # columnar copy of the state of all vehicles, used by the vectorized
+        # getters (see flow/core/kernel/vehicle/columnar.py)
+        try:
+            columnar_state = sim_params.columnar_state
+        except AttributeError:
+            columnar_state = False
+        self._state = VehicleStateArrays() if columnar_state else None
+
+        # whether to collect the state of all vehicles through a single
+        # context subscription in the simulation domain
+        try:
+            self._context_subscription = sim_params.context_subscription
+        except AttributeError:
+            self._context_subscription = False
+
+        # ids of the vehicles in the network during the last time step, as
+        # reported by the context subscription
+        self._present_ids = set()
+
+        # simulation time (in ms) of the last update, used to detect updates
+        # following several simulation steps
+        self._last_update_time = None
+
+    def pass_api(self, kernel_api):
+        """See parent class.
+
+        If context subscriptions are used, this also subscribes to the state
+        of all vehicles in the network.
+        """
+        KernelVehicle.pass_api(self, kernel_api)
+
+        if self._context_subscription:
+            self._present_ids = set()
+            self.kernel_api.simulation.subscribeContext(
+                "", tc.CMD_GET_VEHICLE_VARIABLE, 0, CONTEXT_SUBSCRIPTION_VARS)
+
+    def restore_subscriptions(self):
+        """Resubscribe to all vehicles after a simulation state was loaded.
+
+        Loading a saved simulation state in sumo discards all subscriptions,
+        as well as the speed and lane change modes of all vehicles. This
+        reintroduces them for all vehicles currently in the vehicles kernel.
+        Note that the simulation-wide subscriptions are reintroduced by
+        `pass_api`.
+        """
+        for veh_id in self.__ids:
+            if not self._context_subscription:
+                self.kernel_api.vehicle.subscribe(veh_id, SUBSCRIPTION_VARS)
+            self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+
+            veh_type = self.__vehicles[veh_id]["type"]
+            self.kernel_api.vehicle.setSpeedMode(
+                veh_id, self.type_parameters[veh_type][
+                    "car_following_params"].speed_mode)
+            self.kernel_api.vehicle.setLaneChangeMode(
+                veh_id, self.type_parameters[veh_type][
+                    "lane_change_params"].lane_change_mode)
+
+        if self._context_subscription:
+            self._present_ids = set(self.__ids)
+
     def initialize(self, vehicles):
         """Initialize vehicle state information.
 
@@ -93,6 +185,8 @@ class TraCIVehicle(KernelVehicle):
         self.num_rl_vehicles = 0
 
         self.__vehicles.clear()
+        if self._state is not None:
+            self._state.clear()
         for typ in vehicles.initial:
             for i in range(typ['num_vehicles']):
                 veh_id = '{}_{}'.format(typ['veh_id'], i)
@@ -114,18 +208,39 @@ class TraCIVehicle(KernelVehicle):
         * If vehicles exit the network, they are removed from the vehicles
           class, and newly departed vehicles are introduced to the class.
 
+        If the simulation was advanced by several steps since the last update
+        (see TraCISimulation.simulation_step), the vehicles that departed or
+        arrived during these steps are attributed to the last one.
+
         Parameters
         ----------
         reset : bool
             specifies whether the simulator was reset in the last simulation
             step
         """
+        if self._context_subscription:
+            context_obs = self._get_context_obs()
+        else:
+            context_obs = None
+
         vehicle_obs = {}
-        for veh_id in self.__ids:
-            vehicle_obs[veh_id] = \
-                self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+        if context_obs is not None:
+            for veh_id in self.__ids:
+                vehicle_obs[veh_id] = context_obs.get(veh_id, {})
+        else:
+            for veh_id in self.__ids:
+                vehicle_obs[veh_id] = \
+                    self.kernel_api.vehicle.getSubscriptionResults(veh_id)
         sim_obs = self.kernel_api.simulation.getSubscriptionResults()
 
+        # number of simulation steps performed since the last update
+        num_steps = 1
+        if not reset and self._last_update_time is not None:
+            num_steps = max(int(round(
+                (sim_obs[tc.VAR_TIME_STEP] - self._last_update_time) /
+                (1000 * self.sim_step))), 1)
+        self._last_update_time = sim_obs[tc.VAR_TIME_STEP]
+
         # remove exiting vehicles from the vehicles class
         for veh_id in sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]:
             if veh_id in sim_obs[tc.VAR_TELEPORT_STARTING_VEHICLES_IDS]:
@@ -135,23 +250,27 @@ class TraCIVehicle(KernelVehicle):
             self.remove(veh_id)
             # remove exiting vehicles from the vehicle subscription if they
             # haven't been removed already
-            if vehicle_obs[veh_id] is None:
+            if not vehicle_obs.get(veh_id):
                 vehicle_obs.pop(veh_id, None)
 
         # add entering vehicles into the vehicles class
         for veh_id in sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]:
-            if veh_id in self.get_ids() and vehicle_obs[veh_id] is not None:
+            if veh_id in self.__ids and vehicle_obs.get(veh_id):
                 # this occurs when a vehicle is actively being removed and
                 # placed again in the network to ensure a constant number of
                 # total vehicles (e.g. TrafficLightGridEnv). In this case, the vehicle
                 # is already in the class; its state data just needs to be
                 # updated
-                pass
+                continue
+            if context_obs is not None:
+                obs = self._add_departed(
+                    veh_id, context_obs[veh_id][tc.VAR_TYPE],
+                    context_obs[veh_id])
             else:
                 veh_type = self.kernel_api.vehicle.getTypeID(veh_id)
                 obs = self._add_departed(veh_id, veh_type)
-                # add the subscription information of the new vehicle
-                vehicle_obs[veh_id] = obs
+            # add the subscription information of the new vehicle
+            vehicle_obs[veh_id] = obs
 
         if reset:
             self.time_counter = 0
@@ -180,14 +299,20 @@ class TraCIVehicle(KernelVehicle):
                     self.kernel_api.vehicle.addFull(
                         veh_id, 'route{}_0'.format(veh_id), **vals)
         else:
-            self.time_counter += 1
+            self.time_counter += num_steps
             # update the "last_lc" variable
             for veh_id in self.__rl_ids:
                 prev_lane = self.get_lane(veh_id)
                 if vehicle_obs[veh_id][tc.VAR_LANE_INDEX] != prev_lane:
                     self.__vehicles[veh_id]["last_lc"] = self.time_counter
 
-            # updated the list of departed and arrived vehicles
+            # updated the list of departed and arrived vehicles. Nothing is
+            # recorded for the intermediate steps of multi-step advances.
+            for _ in range(num_steps - 1):
+                self._num_departed.append(0)
+                self._num_arrived.append(0)
+                self._departed_ids.append(())
+                self._arrived_ids.append(())
             self._num_departed.append(
                 len(sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]))
             self._num_arrived.append(len(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]))
@@ -231,13 +356,38 @@ class TraCIVehicle(KernelVehicle):
         # update the sumo observations variable
         self.__sumo_obs = vehicle_obs.copy()
 
-        # update the lane leaders data for each vehicle
-        self._multi_lane_headways()
+        # update the columnar state of all vehicles (if requested)
+        if self._state is not None:
+            self._update_state_arrays()
+
+        # mark the lane leaders data of all vehicles as outdated. These are
+        # recomputed the next time they are requested.
+        self._lane_ordering = None
+        self._lane_data_ids = set()
+
+    def _get_context_obs(self):
+        """Collect the state of all vehicles from the context subscription.
 
-        # make sure the rl vehicle list is still sorted
-        self.__rl_ids.sort()
+        The leader of every vehicle is merged into its observation from the
+        individual leader subscription of the vehicle. These results arrive
+        with the response to the simulation step, and as such do not require
+        any additional communication with sumo.
 
-    def _add_departed(self, veh_id, veh_type):
+        Returns
+        -------
+        dict < str, dict >
+            subscription results for every vehicle in the network
+        """
+        context_obs = self.kernel_api.simulation.getContextSubscriptionResults(
+            "") or {}
+        for veh_id, obs in context_obs.items():
+            leader_obs = self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+            if leader_obs and tc.VAR_LEADER in leader_obs:
+                obs[tc.VAR_LEADER] = leader_obs[tc.VAR_LEADER]
+        self._present_ids = set(context_obs.keys())
+        return context_obs
+
+    def _add_departed(self, veh_id, veh_type, obs=None):
         """Add a vehicle that entered the network from an inflow or reset.
 
         Parameters
@@ -246,6 +396,10 @@ class TraCIVehicle(KernelVehicle):
             name of the vehicle
         veh_type: str
             type of vehicle, as specified to sumo
+        obs : dict, optional
+            subscription results of the vehicle, if they have already been
+            collected by the context subscription. If not specified, the
+            vehicle is subscribed to and its state is queried from sumo.
 
         Returns
         -------
@@ -255,8 +409,9 @@ class TraCIVehicle(KernelVehicle):
         if veh_type not in self.type_parameters:
             raise KeyError("Entering vehicle is not a valid type.")
 
-        if veh_id not in self.__ids:
-            self.__ids.append(veh_id)
+        self.__ids.add(veh_id)
+        if self._state is not None:
+            self._state.add(veh_id)
         if veh_id not in self.__vehicles:
             self.num_vehicles += 1
             self.__vehicles[veh_id] = dict()
@@ -289,30 +444,31 @@ class TraCIVehicle(KernelVehicle):
         else:
             self.__vehicles[veh_id]["router"] = None
 
-        # add the vehicle's id to the list of vehicle ids
+        # add the vehicle's id to the list of vehicle ids. The rl ids are
+        # kept sorted by the set they are stored in.
         if accel_controller[0] == RLController:
-            if veh_id not in self.__rl_ids:
-                self.__rl_ids.append(veh_id)
+            if self.__rl_ids.add(veh_id):
                 self.num_rl_vehicles += 1
         else:
-            if veh_id not in self.__human_ids:
-                self.__human_ids.append(veh_id)
+            if self.__human_ids.add(veh_id):
                 if accel_controller[0] != SimCarFollowingController:
-                    self.__controlled_ids.append(veh_id)
+                    self.__controlled_ids.add(veh_id)
                 if lc_controller[0] != SimLaneChangeController:
-                    self.__controlled_lc_ids.append(veh_id)
-
-        # subscribe the new vehicle
-        self.kernel_api.vehicle.subscribe(veh_id, [
-            tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID,
-            tc.VAR_SPEED, tc.VAR_EDGES, tc.VAR_POSITION, tc.VAR_ANGLE,
-            tc.VAR_SPEED_WITHOUT_TRACI
-        ])
+                    self.__controlled_lc_ids.add(veh_id)
+
+        # subscribe the new vehicle. When using context subscriptions, only
+        # the leader needs to be subscribed to individually, as the leader
+        # variable requires a lookahead distance parameter
+        if obs is None:
+            self.kernel_api.vehicle.subscribe(veh_id, SUBSCRIPTION_VARS)
         self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
 
         # some constant vehicle parameters to the vehicles class
-        self.__vehicles[veh_id]["length"] = self.kernel_api.vehicle.getLength(
-            veh_id)
+        if obs is not None:
+            self.__vehicles[veh_id]["length"] = obs[tc.VAR_LENGTH]
+        else:
+            self.__vehicles[veh_id]["length"] = \
+                self.kernel_api.vehicle.getLength(veh_id)
 
         # set the "last_lc" parameter of the vehicle
         self.__vehicles[veh_id]["last_lc"] = -float("inf")
@@ -331,6 +487,15 @@ class TraCIVehicle(KernelVehicle):
             "lane_change_params"].lane_change_mode
         self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
 
+        if obs is not None:
+            # the state of the vehicle was provided by the context
+            # subscription, so only the leader needs to be added
+            self.__sumo_obs[veh_id] = obs
+            leader_obs = self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+            if leader_obs and tc.VAR_LEADER in leader_obs:
+                obs[tc.VAR_LEADER] = leader_obs[tc.VAR_LEADER]
+            return obs
+
         # get initial state info
         self.__sumo_obs[veh_id] = dict()
         self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = \
@@ -342,9 +507,6 @@ class TraCIVehicle(KernelVehicle):
         self.__sumo_obs[veh_id][tc.VAR_SPEED] = \
             self.kernel_api.vehicle.getSpeed(veh_id)
 
-        # make sure that the order of rl_ids is kept sorted
-        self.__rl_ids.sort()
-
         # get the subscription results from the new vehicle
         new_obs = self.kernel_api.vehicle.getSubscriptionResults(veh_id)
 
@@ -352,13 +514,23 @@ class TraCIVehicle(KernelVehicle):
 
     def remove(self, veh_id):
         """See parent class."""
-        # remove from sumo
-        if veh_id in self.kernel_api.vehicle.getIDList():
+        # commands that were buffered for the vehicle must be sent first
+        self.master_kernel.simulation.flush_commands()
+
+        # remove from sumo. Vehicles collected through the context
+        # subscription do not need to be unsubscribed from, and the ids of
+        # the vehicles in the network are already known.
+        if self._context_subscription:
+            if veh_id in self._present_ids:
+                self._present_ids.discard(veh_id)
+                self.kernel_api.vehicle.remove(veh_id)
+        elif veh_id in self.kernel_api.vehicle.getIDList():
             self.kernel_api.vehicle.unsubscribe(veh_id)
             self.kernel_api.vehicle.remove(veh_id)
 
-        if veh_id in self.__ids:
-            self.__ids.remove(veh_id)
+        self.__ids.discard(veh_id)
+        # quantities derived from the state of the vehicles are outdated
+        self.master_kernel.cache.clear()
 
         # remove from the vehicles kernel
         if veh_id in self.__vehicles:
@@ -367,37 +539,64 @@ class TraCIVehicle(KernelVehicle):
         if veh_id in self.__sumo_obs:
             del self.__sumo_obs[veh_id]
 
+        if self._state is not None:
+            self._state.remove(veh_id)
+
         # remove it from all other id lists (if it is there)
-        if veh_id in self.__human_ids:
-            self.__human_ids.remove(veh_id)
-            if veh_id in self.__controlled_ids:
-                self.__controlled_ids.remove(veh_id)
-            if veh_id in self.__controlled_lc_ids:
-                self.__controlled_lc_ids.remove(veh_id)
-        elif veh_id in self.__rl_ids:
-            self.__rl_ids.remove(veh_id)
-            # make sure that the rl ids remain sorted
-            self.__rl_ids.sort()
+        if self.__human_ids.discard(veh_id):
+            self.__controlled_ids.discard(veh_id)
+            self.__controlled_lc_ids.discard(veh_id)
+        else:
+            self.__rl_ids.discard(veh_id)
 
         # modify the number of vehicles and RL vehicles
-        self.num_vehicles = len(self.get_ids())
-        self.num_rl_vehicles = len(self.get_rl_ids())
+        self.num_vehicles = len(self.__ids)
+        self.num_rl_vehicles = len(self.__rl_ids)
+
+    def _update_state_arrays(self):
+        """Copy the current state of all vehicles into the columnar store."""
+        state = self._state
+        ids = self.__ids.ids()
+        slots = np.array([state.add(veh_id) for veh_id in ids], dtype=int)
+        obs = [self.__sumo_obs.get(veh_id) or {} for veh_id in ids]
+        vehicles = [self.__vehicles[veh_id] for veh_id in ids]
+
+        state.speed[slots] = [o.get(tc.VAR_SPEED, -1001) for o in obs]
+        state.position[slots] = [
+            o.get(tc.VAR_LANEPOSITION, -1001) for o in obs]
+        state.lane[slots] = [o.get(tc.VAR_LANE_INDEX, -1001) for o in obs]
+        state.edge[slots] = [
+            state.intern_edge(o[tc.VAR_ROAD_ID])
+            if o.get(tc.VAR_ROAD_ID) else -1 for o in obs]
+        state.headway[slots] = [v.get("headway", -1001) for v in vehicles]
+        state.leader[slots] = state.slots([v.get("leader") for v in vehicles])
+        state.length[slots] = [v.get("length", -1001) for v in vehicles]
 
     def test_set_speed(self, veh_id, speed):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_SPEED] = speed
+        if self._state is not None and veh_id in self._state:
+            self._state.set_state(veh_id, speed=speed)
+        self.master_kernel.cache.clear()
 
     def test_set_edge(self, veh_id, edge):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = edge
+        if self._state is not None and veh_id in self._state:
+            self._state.set_state(veh_id, edge=edge)
+        self.master_kernel.cache.clear()
 
     def set_follower(self, veh_id, follower):
         """Set the follower of the specified vehicle."""
         self.__vehicles[veh_id]["follower"] = follower
+        self.master_kernel.cache.clear()
 
     def set_headway(self, veh_id, headway):
         """Set the headway of the specified vehicle."""
         self.__vehicles[veh_id]["headway"] = headway
+        if self._state is not None and veh_id in self._state:
+            self._state.set_state(veh_id, headway=headway)
+        self.master_kernel.cache.clear()
 
     def get_orientation(self, veh_id):
         """See parent class."""
@@ -421,64 +620,86 @@ class TraCIVehicle(KernelVehicle):
 
     def get_ids(self):
         """See parent class."""
-        return self.__ids
+        return self.__ids.ids()
 
     def get_human_ids(self):
         """See parent class."""
-        return self.__human_ids
+        return self.__human_ids.ids()
 
     def get_controlled_ids(self):
         """See parent class."""
-        return self.__controlled_ids
+        return self.__controlled_ids.ids()
 
     def get_controlled_lc_ids(self):
         """See parent class."""
-        return self.__controlled_lc_ids
+        return self.__controlled_lc_ids.ids()
 
     def get_rl_ids(self):
         """See parent class."""
-        return self.__rl_ids
+        return self.__rl_ids.ids()
 
     def set_observed(self, veh_id):
         """See parent class."""
-        if veh_id not in self.__observed_ids:
-            self.__observed_ids.append(veh_id)
+        self.__observed_ids.add(veh_id)
 
     def remove_observed(self, veh_id):
         """See parent class."""
-        if veh_id in self.__observed_ids:
-            self.__observed_ids.remove(veh_id)
+        self.__observed_ids.discard(veh_id)
 
     def get_observed_ids(self):
         """See parent class."""
-        return self.__observed_ids
+        return self.__observed_ids.ids()
 
     def get_ids_by_edge(self, edges):
-        """See parent class."""
+        """See parent class.
+
+        The vehicles located in every edge are computed at most once per time
+        step, and shared through the cache of the kernel.
+        """
+        cache = self.master_kernel.cache
         if isinstance(edges, (list, np.ndarray)):
-            return sum([self.get_ids_by_edge(edge) for edge in edges], [])
-        return self._ids_by_edge.get(edges, []) or []
+            return cache.get(('ids_by_edge', tuple(edges)), lambda: sum(
+                [self.get_ids_by_edge(edge) for edge in edges], []))
+        ids_by_edge = cache.get(
+            ('ids_by_edge',), lambda: self._get_lane_ordering().ids_by_edge())
+        return ids_by_edge.get(edges, []) or []
 
     def get_inflow_rate(self, time_span):
-        """See parent class."""
-        if len(self._num_departed) == 0:
-            return 0
-        num_inflow = self._num_departed[-int(time_span / self.sim_step):]
-        return 3600 * sum(num_inflow) / (len(num_inflow) * self.sim_step)
+        """See parent class.
+
+        The time span is limited to the "rate_horizon" term in SumoParams.
+        """
+        return self._get_rate(self._num_departed, time_span)
 
     def get_outflow_rate(self, time_span):
-        """See parent class."""
-        if len(self._num_arrived) == 0:
+        """See parent class.
+
+        The time span is limited to the "rate_horizon" term in SumoParams.
+        """
+        return self._get_rate(self._num_arrived, time_span)
+
+    def _get_rate(self, counts, time_span):
+        """Return the rate (in veh/hr) of a count over a time span.
+
+        A warning is issued if the time span is truncated to the
+        "rate_horizon" term in SumoParams.
+        """
+        if len(counts) == 0:
             return 0
-        num_outflow = self._num_arrived[-int(time_span / self.sim_step):]
-        return 3600 * sum(num_outflow) / (len(num_outflow) * self.sim_step)
+        requested = int(time_span / self.sim_step)
+        total, num_steps = counts.window(requested)
+        if requested <= 0:
+            requested = len(counts)
+        if num_steps < min(requested, len(counts)):
+            warnings.warn(
+                'Rates requested over time spans longer than the '
+                '"rate_horizon" term in SumoParams are computed over this '
+                'horizon only.', RuntimeWarning)
+        return 3600 * total / (num_steps * self.sim_step)
 
     def get_num_arrived(self):
         """See parent class."""
-        if len(self._num_arrived) > 0:
-            return self._num_arrived[-1]
-        else:
-            return 0
+        return self._num_arrived.last()
 
     def get_arrived_ids(self):
         """See parent class."""
@@ -592,9 +813,68 @@ class TraCIVehicle(KernelVehicle):
             ]
         return self.__vehicles.get(veh_id, {}).get("router", error)
 
+    def get_speed_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_speed_array(self, veh_ids, error)
+        return self._state.get("speed", veh_ids, error)
+
+    def get_position_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_position_array(self, veh_ids, error)
+        return self._state.get("position", veh_ids, error)
+
+    def get_lane_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_lane_array(self, veh_ids, error)
+        return self._state.get("lane", veh_ids, error)
+
+    def get_headway_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_headway_array(self, veh_ids, error)
+        return self._state.get("headway", veh_ids, error)
+
+    def get_length_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_length_array(self, veh_ids, error)
+        return self._state.get("length", veh_ids, error)
+
+    def get_x_array(self, veh_ids):
+        """See parent class."""
+        network = self.master_kernel.network
+        veh_ids = list(veh_ids)
+
+        if self._state is None:
+            edges = self.get_edge(veh_ids)
+            x = network.get_x_batch(edges, self.get_position_array(veh_ids))
+            # vehicles that are not located on any edge (e.g. after a
+            # collision)
+            x[np.array([len(edge) == 0 for edge in edges], dtype=bool)] = 0.
+            return x
+
+        # map the edge indices of the columnar store to those of the network
+        state = self._state
+        slots = state.slots(veh_ids)
+        edge = np.where(slots < 0, -1, state.edge[slots])
+        index = network.get_edge_index([''] + state.edge_ids)[edge + 1]
+        x = network.get_x_batch(index, state.position[slots])
+        x[edge < 0] = 0.
+        return x
+
+    def get_leader_speed_array(self, veh_ids, error=-1001):
+        """See parent class."""
+        if self._state is None:
+            return KernelVehicle.get_leader_speed_array(self, veh_ids, error)
+        return self._state.get_leader_field("speed", veh_ids, error)
+
     def set_lane_headways(self, veh_id, lane_headways):
         """Set the lane headways of the specified vehicle."""
         self.__vehicles[veh_id]["lane_headways"] = lane_headways
+        self._lane_data_ids.add(veh_id)
 
     def get_lane_headways(self, veh_id, error=None):
         """See parent class."""
@@ -602,6 +882,7 @@ class TraCIVehicle(KernelVehicle):
             error = list()
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_lane_headways(vehID, error) for vehID in veh_id]
+        self._update_lane_data(veh_id)
         return self.__vehicles.get(veh_id, {}).get("lane_headways", error)
 
     def get_lane_leaders_speed(self, veh_id, error=None):
@@ -619,6 +900,7 @@ class TraCIVehicle(KernelVehicle):
     def set_lane_leaders(self, veh_id, lane_leaders):
         """Set the lane leaders of the specified vehicle."""
         self.__vehicles[veh_id]["lane_leaders"] = lane_leaders
+        self._lane_data_ids.add(veh_id)
 
     def get_lane_leaders(self, veh_id, error=None):
         """See parent class."""
@@ -626,11 +908,13 @@ class TraCIVehicle(KernelVehicle):
             error = list()
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_lane_leaders(vehID, error) for vehID in veh_id]
+        self._update_lane_data(veh_id)
         return self.__vehicles[veh_id]["lane_leaders"]
 
     def set_lane_tailways(self, veh_id, lane_tailways):
         """Set the lane tailways of the specified vehicle."""
         self.__vehicles[veh_id]["lane_tailways"] = lane_tailways
+        self._lane_data_ids.add(veh_id)
 
     def get_lane_tailways(self, veh_id, error=None):
         """See parent class."""
@@ -638,11 +922,13 @@ class TraCIVehicle(KernelVehicle):
             error = list()
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_lane_tailways(vehID, error) for vehID in veh_id]
+        self._update_lane_data(veh_id)
         return self.__vehicles.get(veh_id, {}).get("lane_tailways", error)
 
     def set_lane_followers(self, veh_id, lane_followers):
         """Set the lane followers of the specified vehicle."""
         self.__vehicles[veh_id]["lane_followers"] = lane_followers
+        self._lane_data_ids.add(veh_id)
 
     def get_lane_followers(self, veh_id, error=None):
         """See parent class."""
@@ -650,85 +936,57 @@ class TraCIVehicle(KernelVehicle):
             error = list()
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_lane_followers(vehID, error) for vehID in veh_id]
+        self._update_lane_data(veh_id)
         return self.__vehicles.get(veh_id, {}).get("lane_followers", error)
 
-    def _multi_lane_headways(self):
-        """Compute multi-lane data for all vehicles.
+    def _get_lane_ordering(self):
+        """Return the vehicles sorted by edge, lane and position.
 
-        This includes the lane leaders/followers/headways/tailways/
-        leader velocity/follower velocity for all
-        vehicles in the network.
+        The ordering is computed at most once per time step, the first time
+        it is needed after the vehicle states have been updated.
         """
-        edge_list = self.master_kernel.network.get_edge_list()
-        junction_list = self.master_kernel.network.get_junction_list()
-        tot_list = edge_list + junction_list
-        num_edges = (len(self.master_kernel.network.get_edge_list()) + len(
-            self.master_kernel.network.get_junction_list()))
-
-        # maximum number of lanes in the network
-        max_lanes = max([self.master_kernel.network.num_lanes(edge_id)
-                         for edge_id in tot_list])
-
-        # Key = edge id
-        # Element = list, with the ith element containing tuples with the name
-        #           and position of all vehicles in lane i
-        edge_dict = dict.fromkeys(tot_list)
-
-        # add the vehicles to the edge_dict element
-        for veh_id in self.get_ids():
-            edge = self.get_edge(veh_id)
-            lane = self.get_lane(veh_id)
-            pos = self.get_position(veh_id)
-            if edge:
-                if edge_dict[edge] is None:
-                    edge_dict[edge] = [[] for _ in range(max_lanes)]
-                edge_dict[edge][lane].append((veh_id, pos))
-
-        # sort all lanes in each edge by position
-        for edge in tot_list:
-            if edge_dict[edge] is None:
-                del edge_dict[edge]
-            else:
-                for lane in range(max_lanes):
-                    edge_dict[edge][lane].sort(key=lambda x: x[1])
-
-        for veh_id in self.get_rl_ids():
-            # collect the lane leaders, followers, headways, and tailways for
-            # each vehicle
-            edge = self.get_edge(veh_id)
-            if edge:
-                headways, tailways, leaders, followers = \
-                    self._multi_lane_headways_util(veh_id, edge_dict,
-                                                   num_edges)
-
-                # add the above values to the vehicles class
-                self.set_lane_headways(veh_id, headways)
-                self.set_lane_tailways(veh_id, tailways)
-                self.set_lane_leaders(veh_id, leaders)
-                self.set_lane_followers(veh_id, followers)
-
-        self._ids_by_edge = dict().fromkeys(edge_list)
-
-        for edge_id in edge_dict:
-            edges = list(itertools.chain.from_iterable(edge_dict[edge_id]))
-            # check for edges with no vehicles
-            if len(edges) > 0:
-                edges, _ = zip(*edges)
-                self._ids_by_edge[edge_id] = list(edges)
-            else:
-                self._ids_by_edge[edge_id] = []
-
-    def _multi_lane_headways_util(self, veh_id, edge_dict, num_edges):
+        if self._lane_ordering is None:
+            ids = self.get_ids()
+            self._lane_ordering = LaneOrdering(
+                ids,
+                edges=self.get_edge(ids),
+                lanes=self.get_lane(ids),
+                positions=self.get_position(ids))
+        return self._lane_ordering
+
+    def _update_lane_data(self, veh_id):
+        """Compute the multi-lane data of a vehicle for the current step.
+
+        This includes the lane leaders/followers/headways/tailways of the
+        vehicle. The computation is performed lazily, i.e. only for the
+        vehicles whose multi-lane data is requested, and at most once per
+        vehicle and time step. Vehicles that are not located on any edge keep
+        their multi-lane data from previous time steps.
+        """
+        if veh_id in self._lane_data_ids or veh_id not in self.__vehicles:
+            return
+        self._lane_data_ids.add(veh_id)
+
+        if self.get_edge(veh_id):
+            headways, tailways, leaders, followers = \
+                self._multi_lane_headways_util(
+                    veh_id, self._get_lane_ordering())
+
+            # add the above values to the vehicles class
+            self.__vehicles[veh_id]["lane_headways"] = headways
+            self.__vehicles[veh_id]["lane_tailways"] = tailways
+            self.__vehicles[veh_id]["lane_leaders"] = leaders
+            self.__vehicles[veh_id]["lane_followers"] = followers
+
+    def _multi_lane_headways_util(self, veh_id, ordering):
         """Compute multi-lane data for the specified vehicle.
 
         Parameters
         ----------
         veh_id : str
             name of the vehicle
-        edge_dict : dict < list<tuple> >
-            Key = Edge name
-                Index = lane index
-                Element = list sorted by position of (vehicle id, position)
+        ordering : flow.core.kernel.vehicle.columnar.LaneOrdering
+            all vehicles in the network, sorted by edge, lane and position
 
         Returns
         -------
@@ -738,12 +996,6 @@ class TraCIVehicle(KernelVehicle):
         tailway : list<float>
             Index = lane index
             Element = tailway at this lane
-        lead_speed : list<str>
-            Index = lane index
-            Element = speed of leader at this lane
-        follow_speed : list<str>
-            Index = lane index
-            Element = speed of follower at this lane
         leader : list<str>
             Index = lane index
             Element = leader at this lane
@@ -764,52 +1016,50 @@ class TraCIVehicle(KernelVehicle):
 
         for lane in range(num_lanes):
             # check the vehicle's current  edge for lane leaders and followers
-            if len(edge_dict[this_edge][lane]) > 0:
-                ids, positions = zip(*edge_dict[this_edge][lane])
-                ids = list(ids)
-                positions = list(positions)
-                index = bisect_left(positions, this_pos)
+            start, end = ordering.lane_bounds(this_edge, lane)
+            if end > start:
+                positions = ordering.positions[start:end]
+                index = int(np.searchsorted(positions, this_pos, side='left'))
+                num_veh = end - start
 
                 # if you are at the end or the front of the edge, the lane
                 # leader is in the edges in front of you
-                if (lane == this_lane and index < len(positions) - 1) \
-                        or (lane != this_lane and index < len(positions)):
+                if (lane == this_lane and index < num_veh - 1) \
+                        or (lane != this_lane and index < num_veh):
                     # check if the index does not correspond to the current
                     # vehicle
-                    if ids[index] == veh_id:
-                        leader[lane] = ids[index + 1]
-                        headway[lane] = (positions[index + 1] - this_pos -
-                                         self.get_length(leader[lane]))
-                    else:
-                        leader[lane] = ids[index]
-                        headway[lane] = (positions[index] - this_pos
-                                         - self.get_length(leader[lane]))
+                    lead = index
+                    if ordering.ids[start + index] == veh_id:
+                        lead += 1
+                    leader[lane] = ordering.ids[start + lead]
+                    headway[lane] = (positions[lead] - this_pos -
+                                     self.get_length(leader[lane]))
 
                 # you are in the back of the queue, the lane follower is in the
                 # edges behind you
                 if index > 0:
-                    follower[lane] = ids[index - 1]
+                    follower[lane] = ordering.ids[start + index - 1]
                     tailway[lane] = (this_pos - positions[index - 1]
                                      - self.get_length(veh_id))
 
             # if lane leader not found, check next edges
             if leader[lane] == "":
                 headway[lane], leader[lane] = self._next_edge_leaders(
-                    veh_id, edge_dict, lane, num_edges)
+                    veh_id, ordering, lane)
 
             # if lane follower not found, check previous edges
             if follower[lane] == "":
                 tailway[lane], follower[lane] = self._prev_edge_followers(
-                    veh_id, edge_dict, lane, num_edges)
+                    veh_id, ordering, lane)
 
         return headway, tailway, leader, follower
 
-    def _next_edge_leaders(self, veh_id, edge_dict, lane, num_edges):
+    def _next_edge_leaders(self, veh_id, ordering, lane):
         """Search for leaders in the next edge.
 
         Looks to the edges/junctions in front of the vehicle's current edge
-        for potential leaders. This is currently done by only looking one
-        edge/junction forwards.
+        for potential leaders, following the first edge/lane pair connected
+        to every edge/lane pair (see the lane graph of the network kernel).
 
         Returns
         -------
@@ -823,38 +1073,29 @@ class TraCIVehicle(KernelVehicle):
 
         headway = 1000  # env.network.length
         leader = ""
-        add_length = 0  # length increment in headway
-
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.network.next_edge(edge, lane)) == 0:
-                break
-
-            add_length += self.master_kernel.network.edge_length(edge)
-            edge, lane = self.master_kernel.network.next_edge(edge, lane)[0]
 
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    leader = edge_dict[edge][lane][0][0]
-                    headway = edge_dict[edge][lane][0][1] - pos + add_length \
-                        - self.get_length(leader)
-            except KeyError:
-                # current edge has no vehicles, so move on
-                # print(traceback.format_exc())
-                continue
+        graph = self.master_kernel.network.get_lane_graph()
+        node = graph.node(edge, lane)
+        if node < 0:
+            return headway, leader
 
-            # stop if a lane follower is found
-            if leader != "":
-                break
+        first, count = ordering.lane_slices(graph)
+        node, add_length = graph.search(
+            node, count > 0, self._num_edges(), forward=True)
+        if node >= 0:
+            start = first[node]
+            leader = ordering.ids[start]
+            headway = ordering.positions[start] - pos + add_length \
+                - self.get_length(leader)
 
         return headway, leader
 
-    def _prev_edge_followers(self, veh_id, edge_dict, lane, num_edges):
+    def _prev_edge_followers(self, veh_id, ordering, lane):
         """Search for followers in the previous edge.
 
         Looks to the edges/junctions behind the vehicle's current edge for
-        potential followers. This is currently done by only looking one
-        edge/junction backwards.
+        potential followers, following the first edge/lane pair preceding
+        every edge/lane pair (see the lane graph of the network kernel).
 
         Returns
         -------
@@ -868,32 +1109,28 @@ class TraCIVehicle(KernelVehicle):
 
         tailway = 1000  # env.network.length
         follower = ""
-        add_length = 0  # length increment in headway
 
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.network.prev_edge(edge, lane)) == 0:
-                break
+        graph = self.master_kernel.network.get_lane_graph()
+        node = graph.node(edge, lane)
+        if node < 0:
+            return tailway, follower
 
-            edge, lane = self.master_kernel.network.prev_edge(edge, lane)[0]
-            add_length += self.master_kernel.network.edge_length(edge)
-
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    tailway = pos - edge_dict[edge][lane][-1][1] + add_length \
-                              - self.get_length(veh_id)
-                    follower = edge_dict[edge][lane][-1][0]
-            except KeyError:
-                # current edge has no vehicles, so move on
-                # print(traceback.format_exc())
-                continue
-
-            # stop if a lane follower is found
-            if follower != "":
-                break
+        first, count = ordering.lane_slices(graph)
+        node, add_length = graph.search(
+            node, count > 0, self._num_edges(), forward=False)
+        if node >= 0:
+            end = first[node] + count[node]
+            tailway = pos - ordering.positions[end - 1] + add_length \
+                - self.get_length(veh_id)
+            follower = ordering.ids[end - 1]
 
         return tailway, follower
 
+    def _num_edges(self):
+        """Return the number of edges and junctions in the network."""
+        return len(self.master_kernel.network.get_edge_list()) + \
+            len(self.master_kernel.network.get_junction_list())
+
     def apply_acceleration(self, veh_ids, acc):
         """See parent class."""
         # to hand the case of a single vehicle
@@ -901,11 +1138,18 @@ class TraCIVehicle(KernelVehicle):
             veh_ids = [veh_ids]
             acc = [acc]
 
+        # accelerations held over several steps are applied by changing the
+        # speed of the vehicles linearly over these steps
+        duration = self.action_steps * self.sim_step
+        slow_down_duration = 1e-3 if self.action_steps == 1 else duration
+
         for i, vid in enumerate(veh_ids):
-            if acc[i] is not None and vid in self.get_ids():
+            if acc[i] is not None and vid in self.__ids:
                 this_vel = self.get_speed(vid)
-                next_vel = max([this_vel + acc[i] * self.sim_step, 0])
-                self.kernel_api.vehicle.slowDown(vid, next_vel, 1e-3)
+                next_vel = max([this_vel + acc[i] * duration, 0])
+                self.master_kernel.simulation.send_command(
+                    self.kernel_api.vehicle.slowDown, vid, next_vel,
+                    slow_down_duration)
 
     def apply_lane_change(self, veh_ids, direction):
         """See parent class."""
@@ -934,10 +1178,11 @@ class TraCIVehicle(KernelVehicle):
 
             # perform the requested lane action action in TraCI
             if target_lane != this_lane:
-                self.kernel_api.vehicle.changeLane(
+                self.master_kernel.simulation.send_command(
+                    self.kernel_api.vehicle.changeLane,
                     veh_id, int(target_lane), 100000)
 
-                if veh_id in self.get_rl_ids():
+                if veh_id in self.__rl_ids:
                     self.prev_last_lc[veh_id] = \
                         self.__vehicles[veh_id]["last_lc"]
 
@@ -950,7 +1195,8 @@ class TraCIVehicle(KernelVehicle):
 
         for i, veh_id in enumerate(veh_ids):
             if route_choices[i] is not None:
-                self.kernel_api.vehicle.setRoute(
+                self.master_kernel.simulation.send_command(
+                    self.kernel_api.vehicle.setRoute,
                     vehID=veh_id, edgeList=route_choices[i])
 
     def get_x_by_id(self, veh_id):
@@ -973,15 +1219,15 @@ class TraCIVehicle(KernelVehicle):
             try:
                 # color rl vehicles red
                 self.set_color(veh_id=veh_id, color=RED)
-            except (FatalTraCIError, TraCIException) as e:
+            except TRACI_EXCEPTIONS as e:
                 print('Error when updating rl vehicle colors:', e)
 
         # color vehicles white if not observed and cyan if observed
         for veh_id in self.get_human_ids():
             try:
-                color = CYAN if veh_id in self.get_observed_ids() else WHITE
+                color = CYAN if veh_id in self.__observed_ids else WHITE
                 self.set_color(veh_id=veh_id, color=color)
-            except (FatalTraCIError, TraCIException) as e:
+            except TRACI_EXCEPTIONS as e:
                 print('Error when updating human vehicle colors:', e)
 
         # clear the list of observed vehicles
@@ -0,0 +1,1139 @@
+"""Declarative specification of the observations of environments.
+
+Observations are described by an ObservationSpec: a list of per-vehicle
+features (e.g. the speed of every vehicle, or the gap to its leader),
+normalized by constants of the network, and optionally followed by features
+of the vehicles located on some edges. The spec is compiled for an
+environment into an ObservationExtractor, which computes the observation at
+every step with the vectorized getters of the vehicle kernel, writing every
+feature directly into its slice of a float32 array, and which provides the
+matching gym observation space.
+
+For example, the observation of flow.envs.AccelEnv (the speeds and positions
+of all vehicles, sorted by position) is described by:
+
+>>> spec = ObservationSpec(
+>>>     features=[Speed(scale='max_speed'), Position(scale='length')],
+>>>     vehicles=lambda env: env.sorted_ids,
+>>>     num_vehicles=env.initial_vehicles.num_vehicles)
+>>> extractor = spec.compile(env)
+>>> extractor.observation_space
+Box(0.0, 1.0, (2 * num_vehicles,), float32)
+>>> obs = extractor(env)
+
+Observations that also contain statistics of edges (see EdgeSpec) or other
+arrays maintained by the environment (see ArraySpec, e.g. the states of
+traffic lights) are described by concatenating several specs with a
+ConcatenatedSpec. In multi-agent environments in which every vehicle is an
+agent, the observations of all agents are computed together by
+`ObservationExtractor.per_vehicle`.
+"""
+import numpy as np
+from gym.spaces import Box
+
+# supported layouts of the per-vehicle features:
+#
+# * "feature": the values of the first feature for all vehicles, followed by
+#   the values of the second feature for all vehicles, etc.
+# * "vehicle": the values of all features for the first vehicle, followed by
+#   the values of all features for the second vehicle, etc.
+LAYOUTS = ('feature', 'vehicle')
+
+# supported layouts of the edge features, see LAYOUTS
+EDGE_LAYOUTS = ('feature', 'edge')
+
+
+def _max_lanes(env):
+    """Return the largest number of lanes of the edges in the network."""
+    return max(env.k.network.num_lanes(edge)
+               for edge in env.k.network.get_edge_list())
+
+
+def _max_speed_limit(env):
+    """Return the largest speed limit of the edges in the network."""
+    return max(env.k.network.speed_limit(edge)
+               for edge in env.k.network.get_edge_list())
+
+
+# constants of the network that features may be normalized by
+NORMALIZERS = {
+    'max_speed': lambda env: env.k.network.max_speed(),
+    'max_speed_limit': _max_speed_limit,
+    'length': lambda env: env.k.network.length(),
+    'max_lanes': _max_lanes,
+}
+
+
+def resolve_normalizer(scale, env):
+    """Return the value of a normalizer.
+
+    Parameters
+    ----------
+    scale : float or str or callable
+        a constant, the name of a constant of the network (see NORMALIZERS),
+        or a function returning the constant given the environment
+    env : flow.envs.Env
+        the environment
+
+    Returns
+    -------
+    float
+        the value of the normalizer
+
+    Raises
+    ------
+    ValueError
+        if the normalizer is unknown
+    """
+    if isinstance(scale, str):
+        if scale not in NORMALIZERS:
+            raise ValueError('Unknown normalizer "{}". Must be one of: {}'
+                             .format(scale, ', '.join(NORMALIZERS)))
+        scale = NORMALIZERS[scale]
+    if callable(scale):
+        scale = scale(env)
+    return float(scale)
+
+
+def _check_layout(layout, layouts):
+    """Raise a ValueError if a layout is not one of the supported layouts."""
+    if layout not in layouts:
+        raise ValueError('Unknown layout "{}". Must be one of: {}'.format(
+            layout, ', '.join(layouts)))
+
+
+class Feature(object):
+    """Base class of the features of the vehicles in an observation.
+
+    A feature computes one or several values per vehicle (see `width`), which
+    are divided by the value of its normalizer.
+
+    Attributes
+    ----------
+    scale : float or str or callable
+        normalizer of the feature, see resolve_normalizer
+    low : float
+        lower bound of the normalized feature in the observation space
+    high : float
+        upper bound of the normalized feature in the observation space
+    fill : float or None
+        value of the feature of missing vehicles, or None to use the value
+        of the spec
+    """
+
+    def __init__(self, scale=1., low=0., high=1., fill=None):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        scale : float or str or callable, optional
+            normalizer of the feature, see resolve_normalizer
+        low : float, optional
+            lower bound of the normalized feature in the observation space
+        high : float, optional
+            upper bound of the normalized feature in the observation space
+        fill : float, optional
+            value of the feature of missing vehicles. Defaults to the `fill`
+            value of the spec
+        """
+        self.scale = scale
+        self.low = low
+        self.high = high
+        self.fill = fill
+
+    def width(self, env):
+        """Return the number of values of the feature per vehicle."""
+        return 1
+
+    def compute(self, env, veh_ids):
+        """Compute the (unnormalized) feature of some vehicles.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        veh_ids : list of str
+            ids of the vehicles
+
+        Returns
+        -------
+        np.ndarray
+            the values of the vehicles, with shape (len(veh_ids),) or
+            (len(veh_ids), width)
+        """
+        raise NotImplementedError
+
+    def normalize(self, env, veh_ids, values, scale, default=None):
+        """Normalize the values computed by `compute`.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        veh_ids : list of str
+            ids of the vehicles
+        values : np.ndarray
+            values of the vehicles, with shape (len(veh_ids), width)
+        scale : float
+            value of the normalizer of the feature
+        default : float or None
+            value of the `default` term of the feature (if any)
+
+        Returns
+        -------
+        np.ndarray
+            the normalized values
+        """
+        return values / scale
+
+
+class _PaddedFeature(Feature):
+    """Base class of the features that are not available for all vehicles.
+
+    Unavailable values (e.g. the speed of a leader, for vehicles without a
+    leader) are computed as NaN, and replaced by either the unnormalized
+    `default` value, or the normalized `missing` value.
+    """
+
+    def __init__(self, scale=1., low=0., high=1., fill=None, missing=1.,
+                 default=None):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        scale, low, high, fill : see parent class
+        missing : float, optional
+            normalized value of unavailable values
+        default : float or str or callable, optional
+            unnormalized value of unavailable values, see resolve_normalizer.
+            It is normalized like other values, and overrides `missing`
+        """
+        super().__init__(scale=scale, low=low, high=high, fill=fill)
+        self.missing = missing
+        self.default = default
+
+    def transform(self, env, veh_ids, values):
+        """Transform the values before they are normalized."""
+        return values
+
+    def normalize(self, env, veh_ids, values, scale, default=None):
+        """See parent class."""
+        unavailable = np.isnan(values)
+        if default is not None:
+            values[unavailable] = default
+        values = self.transform(env, veh_ids, values) / scale
+        if default is None:
+            values[unavailable] = self.missing
+        return values
+
+
+class Speed(Feature):
+    """Speed of the vehicles."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        return env.k.vehicle.get_speed_array(veh_ids)
+
+
+class Position(Feature):
+    """Absolute position of the vehicles (see KernelVehicle.get_x_by_id)."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        return env.k.vehicle.get_x_array(veh_ids)
+
+
+class Lane(Feature):
+    """Lane index of the vehicles."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        return env.k.vehicle.get_lane_array(veh_ids)
+
+
+class Headway(Feature):
+    """Headway of the vehicles (see KernelVehicle.get_headway)."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        return env.k.vehicle.get_headway_array(veh_ids)
+
+
+class LaneOneHot(Feature):
+    """One-hot encoding of the lane index of the vehicles.
+
+    The encoding has one value per lane of the edge with the most lanes, and
+    is not normalized.
+    """
+
+    def __init__(self):
+        """Instantiate the feature."""
+        super().__init__()
+
+    def width(self, env):
+        """See parent class."""
+        return _max_lanes(env)
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        lanes = env.k.vehicle.get_lane_array(veh_ids)
+        width = self.width(env)
+        one_hot = np.zeros((len(lanes), width))
+        valid = (lanes >= 0) & (lanes < width)
+        one_hot[np.flatnonzero(valid), lanes[valid]] = 1
+        return one_hot
+
+
+class DistanceToEdgeEnd(Feature):
+    """Distance between the vehicles and the end of their edges."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        lengths = [env.k.network.edge_length(edge)
+                   for edge in env.k.vehicle.get_edge(list(veh_ids))]
+        return np.asarray(lengths, dtype=float) - \
+            env.k.vehicle.get_position_array(veh_ids)
+
+
+class EdgeNumber(_PaddedFeature):
+    """Number identifying the edge of the vehicles.
+
+    The number is computed from the id of the edge by `convert`. Vehicles on
+    internal edges (or whose edge is unknown) are assigned the value
+    `missing`, which is not normalized.
+    """
+
+    def __init__(self, convert=int, scale=1., low=0., high=1., fill=None,
+                 missing=-1.):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        convert : callable, optional
+            function returning the number of an edge given its id. Defaults
+            to parsing the id as an integer
+        scale, low, high, fill : see parent class
+        missing : float, optional
+            normalized value of vehicles on internal or unknown edges
+        """
+        super().__init__(scale=scale, low=low, high=high, fill=fill,
+                         missing=missing)
+        self.convert = convert
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        return np.array(
+            [np.nan if not edge or edge[0] == ':' else self.convert(edge)
+             for edge in env.k.vehicle.get_edge(list(veh_ids))], dtype=float)
+
+
+class _NeighborFeature(_PaddedFeature):
+    """Base class of the features of the leaders/followers of vehicles.
+
+    Vehicles without a leader/follower are assigned the value `missing`,
+    which is not normalized, unless a `default` value is specified.
+    """
+
+
+class LeaderGap(_NeighborFeature):
+    """Bumper-to-bumper gap between the vehicles and their leaders."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        vehicle = env.k.vehicle
+        gaps = vehicle.get_headway_array(veh_ids)
+        has_leader = np.array([bool(leader) for leader in
+                               vehicle.get_leader(list(veh_ids))], dtype=bool)
+        return np.where(has_leader, gaps, np.nan)
+
+
+class LeaderDistance(_NeighborFeature):
+    """Distance to the leaders of the vehicles, from absolute positions.
+
+    This is the difference between the absolute positions (see
+    KernelVehicle.get_x_by_id) of the leaders and of the vehicles, minus the
+    length of the vehicles.
+    """
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        vehicle = env.k.vehicle
+        leaders = vehicle.get_leader(list(veh_ids))
+        has_leader = np.array([bool(leader) for leader in leaders],
+                              dtype=bool)
+        dist = np.full(len(leaders), np.nan)
+        if has_leader.any():
+            ids = [veh_id for veh_id, leader in zip(veh_ids, leaders)
+                   if leader]
+            dist[has_leader] = \
+                vehicle.get_x_array([leader for leader in leaders if leader]) \
+                - vehicle.get_x_array(ids) - vehicle.get_length_array(ids)
+        return dist
+
+
+class _NeighborSpeed(_NeighborFeature):
+    """Base class of the speeds of the leaders/followers of vehicles.
+
+    The speeds may be observed relative to the speed of the vehicles (see
+    `relative`), in which case the `default` value of vehicles without a
+    leader/follower is an absolute speed as well.
+    """
+
+    # sign of the relative speed, such that positive values correspond to
+    # increasing gaps
+    _sign = 1.
+
+    def __init__(self, scale=1., low=0., high=1., fill=None, missing=1.,
+                 default=None, relative=False):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        scale, low, high, fill, missing, default : see parent class
+        relative : bool, optional
+            whether the speeds are observed relative to the speed of the
+            vehicles: the speed of the leader minus the speed of the vehicle,
+            or the speed of the vehicle minus the speed of the follower
+        """
+        super().__init__(scale=scale, low=low, high=high, fill=fill,
+                         missing=missing, default=default)
+        self.relative = relative
+
+    def transform(self, env, veh_ids, values):
+        """See parent class."""
+        if not self.relative:
+            return values
+        speeds = env.k.vehicle.get_speed_array(veh_ids).reshape(values.shape)
+        return self._sign * (values - speeds)
+
+
+class LeaderSpeed(_NeighborSpeed):
+    """Speed of the leaders of the vehicles."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        vehicle = env.k.vehicle
+        speeds = vehicle.get_leader_speed_array(veh_ids)
+        has_leader = np.array([bool(leader) for leader in
+                               vehicle.get_leader(list(veh_ids))], dtype=bool)
+        return np.where(has_leader, speeds, np.nan)
+
+
+class FollowerGap(_NeighborFeature):
+    """Bumper-to-bumper gap between the vehicles and their followers."""
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        vehicle = env.k.vehicle
+        followers = vehicle.get_follower(list(veh_ids))
+        has_follower = np.array([bool(f) for f in followers], dtype=bool)
+        gaps = np.full(len(followers), np.nan)
+        if has_follower.any():
+            gaps[has_follower] = vehicle.get_headway_array(
+                [f for f in followers if f])
+        return gaps
+
+
+class FollowerSpeed(_NeighborSpeed):
+    """Speed of the followers of the vehicles."""
+
+    _sign = -1.
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        vehicle = env.k.vehicle
+        followers = vehicle.get_follower(list(veh_ids))
+        has_follower = np.array([bool(f) for f in followers], dtype=bool)
+        speeds = np.full(len(followers), np.nan)
+        if has_follower.any():
+            speeds[has_follower] = vehicle.get_speed_array(
+                [f for f in followers if f])
+        return speeds
+
+
+class _LaneFeature(_PaddedFeature):
+    """Base class of the features of the vehicles on every lane.
+
+    These features have one value per lane of the edge of the vehicles (see
+    e.g. KernelVehicle.get_lane_headways). Lanes beyond the number of lanes
+    of the edge are assigned the value `missing`, which is not normalized.
+    """
+
+    # name of the method of the vehicle kernel returning the values of a
+    # vehicle on every lane
+    _getter = None
+
+    def __init__(self, num_lanes='max_lanes', scale=1., low=0., high=1.,
+                 fill=None, missing=1.):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        num_lanes : int or str or callable, optional
+            number of lanes observed per vehicle, see resolve_normalizer
+        scale, low, high, fill : see parent class
+        missing : float, optional
+            normalized value of the lanes the edge of a vehicle lacks
+        """
+        super().__init__(scale=scale, low=low, high=high, fill=fill,
+                         missing=missing)
+        self.num_lanes = num_lanes
+
+    def width(self, env):
+        """See parent class."""
+        return int(resolve_normalizer(self.num_lanes, env))
+
+    def compute(self, env, veh_ids):
+        """See parent class."""
+        width = self.width(env)
+        getter = getattr(env.k.vehicle, self._getter)
+        values = np.full((len(veh_ids), width), np.nan)
+        for i, veh_id in enumerate(veh_ids):
+            lane_values = getter(veh_id)[:width]
+            values[i, :len(lane_values)] = lane_values
+        return values
+
+
+class LaneHeadways(_LaneFeature):
+    """Headways between the vehicles and their leaders on every lane."""
+
+    _getter = 'get_lane_headways'
+
+
+class LaneTailways(_LaneFeature):
+    """Tailways between the vehicles and their followers on every lane."""
+
+    _getter = 'get_lane_tailways'
+
+
+class LaneLeaderSpeeds(_LaneFeature):
+    """Speeds of the leaders of the vehicles on every lane.
+
+    Lanes without a leader have a speed of zero.
+    """
+
+    _getter = 'get_lane_leaders_speed'
+
+
+class LaneFollowerSpeeds(_LaneFeature):
+    """Speeds of the followers of the vehicles on every lane.
+
+    Lanes without a follower have a speed of zero.
+    """
+
+    _getter = 'get_lane_followers_speed'
+
+
+class NearestOnEdges(object):
+    """Features of the k vehicles closest to the end of some edges.
+
+    For every edge, the vehicles on the edge are sorted by their distance to
+    the end of the edge (e.g. to the intersection they are heading towards),
+    and the distance and speed of the k closest vehicles are observed. Edges
+    with fewer than k vehicles are padded with zeros.
+
+    The observation contains, for every edge, the normalized distances of
+    the k closest vehicles, followed by their normalized speeds.
+    """
+
+    def __init__(self, edges, k, distance_scale=1., speed_scale='max_speed'):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        edges : list of str
+            ids of the edges
+        k : int
+            number of vehicles observed per edge
+        distance_scale : float or str or callable, optional
+            normalizer of the distances, see resolve_normalizer
+        speed_scale : float or str or callable, optional
+            normalizer of the speeds, see resolve_normalizer
+        """
+        self.edges = list(edges)
+        self.k = k
+        self.distance_scale = distance_scale
+        self.speed_scale = speed_scale
+        self.low = 0.
+        self.high = 1.
+
+    def size(self):
+        """Return the number of values of the feature."""
+        return 2 * self.k * len(self.edges)
+
+    def compute(self, env, out, distance_scale, speed_scale):
+        """Write the normalized feature into an array.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        out : np.ndarray
+            array of shape (num_edges, 2, k) the feature is written to
+        distance_scale : float
+            value of the normalizer of the distances
+        speed_scale : float
+            value of the normalizer of the speeds
+        """
+        vehicle = env.k.vehicle
+        out.fill(0.)
+        for i, edge in enumerate(self.edges):
+            veh_ids = vehicle.get_ids_by_edge(edge)
+            if len(veh_ids) == 0:
+                continue
+            dist = env.k.network.edge_length(edge) - \
+                vehicle.get_position_array(veh_ids)
+            # the k closest vehicles, ordered by their distance
+            if len(veh_ids) > self.k:
+                closest = np.argpartition(dist, self.k - 1)[:self.k]
+                closest = closest[np.argsort(dist[closest], kind='stable')]
+            else:
+                closest = np.argsort(dist, kind='stable')
+            num = len(closest)
+            out[i, 0, :num] = dist[closest] / distance_scale
+            out[i, 1, :num] = vehicle.get_speed_array(
+                [veh_ids[j] for j in closest]) / speed_scale
+
+
+class EdgeFeature(object):
+    """Base class of the features of edges in an observation.
+
+    Attributes
+    ----------
+    scale : float or str or callable
+        normalizer of the feature, see resolve_normalizer
+    low : float
+        lower bound of the normalized feature in the observation space
+    high : float
+        upper bound of the normalized feature in the observation space
+    """
+
+    def __init__(self, scale=1., low=0., high=1.):
+        """Instantiate the feature.
+
+        Parameters
+        ----------
+        scale : float or str or callable, optional
+            normalizer of the feature, see resolve_normalizer
+        low : float, optional
+            lower bound of the normalized feature in the observation space
+        high : float, optional
+            upper bound of the normalized feature in the observation space
+        """
+        self.scale = scale
+        self.low = low
+        self.high = high
+
+    def compute(self, env, edges):
+        """Compute the (unnormalized) feature of some edges.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        edges : list of str
+            ids of the edges
+
+        Returns
+        -------
+        np.ndarray
+            the values of the edges, with shape (len(edges),)
+        """
+        raise NotImplementedError
+
+
+class EdgeMeanSpeed(EdgeFeature):
+    """Average speed of the vehicles on the edges (0 on empty edges)."""
+
+    def compute(self, env, edges):
+        """See parent class."""
+        speeds = np.zeros(len(edges))
+        for i, edge in enumerate(edges):
+            veh_ids = env.k.vehicle.get_ids_by_edge(edge)
+            if len(veh_ids) > 0:
+                speeds[i] = np.mean(env.k.vehicle.get_speed_array(veh_ids))
+        return speeds
+
+
+class EdgeDensity(EdgeFeature):
+    """Number of vehicles per meter on the edges."""
+
+    def compute(self, env, edges):
+        """See parent class."""
+        return np.array([len(env.k.vehicle.get_ids_by_edge(edge)) /
+                         env.k.network.edge_length(edge) for edge in edges])
+
+
+class ObservationSpec(object):
+    """Declarative specification of the observation of an environment.
+
+    The observation consists of the features of a fixed number of vehicles
+    (see `layout` for their order), followed by the features of the vehicles
+    on some edges (see NearestOnEdges). If fewer vehicles are observed, the
+    remaining values are set to `fill`; if more vehicles are observed, only
+    the first `num_vehicles` are. The function returning the observed
+    vehicles may also leave some positions empty (with None or an empty
+    string), which are filled as well.
+    """
+
+    def __init__(self,
+                 features=(),
+                 vehicles=None,
+                 num_vehicles=0,
+                 layout='feature',
+                 fill=0.,
+                 edge_features=()):
+        """Instantiate the spec.
+
+        Parameters
+        ----------
+        features : list of Feature, optional
+            features of the observed vehicles
+        vehicles : callable, optional
+            function returning the ids of the observed vehicles given the
+            environment. Defaults to all vehicles in the network
+        num_vehicles : int, optional
+            number of observed vehicles
+        layout : str, optional
+            order of the features of the vehicles, one of LAYOUTS
+        fill : float, optional
+            value of the features of missing vehicles
+        edge_features : list of NearestOnEdges, optional
+            features of the vehicles on some edges
+
+        Raises
+        ------
+        ValueError
+            if the layout is unknown
+        """
+        _check_layout(layout, LAYOUTS)
+        self.features = list(features)
+        self.vehicles = vehicles
+        self.num_vehicles = num_vehicles
+        self.layout = layout
+        self.fill = fill
+        self.edge_features = list(edge_features)
+
+    def compile(self, env):
+        """Compile the spec into an extractor for an environment.
+
+        The normalizers of the features are evaluated once, when the spec is
+        compiled.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+
+        Returns
+        -------
+        ObservationExtractor
+            the extractor of the observations of the environment
+        """
+        return ObservationExtractor(self, env)
+
+
+class EdgeSpec(object):
+    """Declarative specification of the features of edges in observations.
+
+    The observation consists of the features of a fixed list of edges, in
+    the order specified by `layout` ("feature": the values of the first
+    feature for all edges, followed by those of the second feature, etc.;
+    "edge": the values of all features for the first edge, followed by those
+    of the second edge, etc.).
+    """
+
+    def __init__(self, features, edges=None, layout='feature'):
+        """Instantiate the spec.
+
+        Parameters
+        ----------
+        features : list of EdgeFeature
+            features of the edges
+        edges : list of str or callable, optional
+            ids of the observed edges, or function returning them given the
+            environment (evaluated once, when the spec is compiled). Defaults
+            to all edges in the network
+        layout : str, optional
+            order of the features of the edges, one of EDGE_LAYOUTS
+
+        Raises
+        ------
+        ValueError
+            if the layout is unknown
+        """
+        _check_layout(layout, EDGE_LAYOUTS)
+        self.features = list(features)
+        self.edges = edges
+        self.layout = layout
+
+    def compile(self, env):
+        """Compile the spec into an extractor, see ObservationSpec.compile."""
+        return EdgeExtractor(self, env)
+
+
+class ArraySpec(object):
+    """Specification of observations computed by a function.
+
+    This is meant for data that is maintained by the environment itself,
+    e.g. the states of the traffic lights it controls.
+    """
+
+    def __init__(self, function, size, low=0., high=1.):
+        """Instantiate the spec.
+
+        Parameters
+        ----------
+        function : callable
+            function returning the (normalized) values given the environment
+        size : int
+            number of values returned by the function
+        low : float, optional
+            lower bound of the values in the observation space
+        high : float, optional
+            upper bound of the values in the observation space
+        """
+        self.function = function
+        self.size = size
+        self.low = low
+        self.high = high
+
+    def compile(self, env):
+        """Compile the spec into an extractor, see ObservationSpec.compile."""
+        return ArrayExtractor(self, env)
+
+
+class ConcatenatedSpec(object):
+    """Specification of the concatenation of the observations of specs."""
+
+    def __init__(self, specs):
+        """Instantiate the spec.
+
+        Parameters
+        ----------
+        specs : list of ObservationSpec or EdgeSpec or ArraySpec
+            specs of the parts of the observation, in order
+        """
+        self.specs = list(specs)
+
+    def compile(self, env):
+        """Compile the spec into an extractor, see ObservationSpec.compile."""
+        return ConcatenatedExtractor(self, env)
+
+
+class Extractor(object):
+    """Base class of the extractors of observations, compiled from a spec.
+
+    Attributes
+    ----------
+    spec : object
+        the spec the extractor was compiled from
+    size : int
+        number of values in the observations
+    observation_space : gym.spaces.Box
+        the observation space of the observations
+    last_observation : np.ndarray or None
+        the last observation returned by the extractor
+    """
+
+    def __init__(self, spec, low, high):
+        """Instantiate the extractor.
+
+        Parameters
+        ----------
+        spec : object
+            the spec the extractor was compiled from
+        low : np.ndarray
+            lower bounds of the values of the observations
+        high : np.ndarray
+            upper bounds of the values of the observations
+        """
+        self.spec = spec
+        self.size = len(low)
+        self._low = np.asarray(low, dtype=np.float32)
+        self._high = np.asarray(high, dtype=np.float32)
+
+        if self.size > 0 and np.all(self._low == self._low[:1]) \
+                and np.all(self._high == self._high[:1]):
+            # scalar bounds, as used by the hand-written observation spaces
+            self.observation_space = Box(
+                low=float(self._low[0]), high=float(self._high[0]),
+                shape=(self.size,), dtype=np.float32)
+        else:
+            self.observation_space = Box(
+                low=self._low, high=self._high, dtype=np.float32)
+
+        self.last_observation = None
+
+    def __call__(self, env, out=None):
+        """Compute the observation of the environment.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        out : np.ndarray, optional
+            float32 array the observation is written to. A new array is
+            allocated if none is specified, so that the observations that
+            are returned are never modified afterwards
+
+        Returns
+        -------
+        np.ndarray
+            the observation
+        """
+        if out is None:
+            out = np.empty(self.size, dtype=np.float32)
+        self._fill(env, out)
+        self.last_observation = out
+        return out
+
+    def _fill(self, env, out):
+        """Write the observation of the environment into an array."""
+        raise NotImplementedError
+
+
+class ObservationExtractor(Extractor):
+    """Vectorized extractor of observations, compiled from an ObservationSpec.
+
+    Attributes
+    ----------
+    last_vehicle_ids : list of str
+        ids of the vehicles observed by the last call (with empty positions,
+        if any)
+    """
+
+    def __init__(self, spec, env):
+        """Compile a spec for an environment.
+
+        See ObservationSpec.compile.
+        """
+        self.spec = spec
+        num_vehicles = spec.num_vehicles
+
+        # slices of the flat observation containing every feature, as well
+        # as their normalizers
+        self._widths = [feature.width(env) for feature in spec.features]
+        self._scales = [resolve_normalizer(feature.scale, env)
+                        for feature in spec.features]
+        self._defaults = [
+            resolve_normalizer(feature.default, env)
+            if getattr(feature, 'default', None) is not None else None
+            for feature in spec.features]
+        self._fills = [spec.fill if feature.fill is None else feature.fill
+                       for feature in spec.features]
+        vehicle_size = num_vehicles * sum(self._widths)
+
+        self._edge_scales = [
+            (resolve_normalizer(feature.distance_scale, env),
+             resolve_normalizer(feature.speed_scale, env))
+            for feature in spec.edge_features]
+        size = vehicle_size + sum(
+            feature.size() for feature in spec.edge_features)
+
+        # bounds of the observation space
+        low = np.empty(size, dtype=np.float32)
+        high = np.empty(size, dtype=np.float32)
+        for feature, (start, end, _) in zip(
+                spec.features, self._vehicle_slices(low)):
+            low[start:end] = feature.low
+            high[start:end] = feature.high
+        offset = vehicle_size
+        for feature in spec.edge_features:
+            low[offset:offset + feature.size()] = feature.low
+            high[offset:offset + feature.size()] = feature.high
+            offset += feature.size()
+
+        super().__init__(spec, low, high)
+        self.last_vehicle_ids = []
+
+    def _vehicle_slices(self, out):
+        """Yield the views of an observation containing every feature.
+
+        Yields
+        ------
+        int
+            start of the values of the feature in the observation in the
+            "feature" layout (only used to compute the bounds)
+        int
+            end of the values of the feature, see above
+        np.ndarray
+            view of the values of the feature, with shape
+            (num_vehicles, width)
+        """
+        num_vehicles = self.spec.num_vehicles
+        total_width = sum(self._widths)
+        offset = 0
+        column = 0
+        for width in self._widths:
+            size = num_vehicles * width
+            if self.spec.layout == 'feature':
+                view = out[offset:offset + size].reshape(
+                    (num_vehicles, width))
+            else:
+                view = out[:num_vehicles * total_width].reshape(
+                    (num_vehicles, total_width))[:, column:column + width]
+            yield offset, offset + size, view
+            offset += size
+            column += width
+
+    def _observed_ids(self, env):
+        """Return the ids of all observed vehicles (and empty positions)."""
+        if self.spec.vehicles is None:
+            return env.k.vehicle.get_ids()
+        return self.spec.vehicles(env)
+
+    def _feature_values(self, env, index, veh_ids):
+        """Return the normalized values of a feature for some vehicles."""
+        feature = self.spec.features[index]
+        values = np.asarray(feature.compute(env, veh_ids), dtype=float)
+        return feature.normalize(
+            env, veh_ids, values.reshape((len(veh_ids), -1)),
+            self._scales[index], self._defaults[index])
+
+    def _fill(self, env, out):
+        """See parent class."""
+        spec = self.spec
+        veh_ids = list(self._observed_ids(env)[:spec.num_vehicles])
+        self.last_vehicle_ids = veh_ids
+
+        # positions of the vehicles, which differ from the first positions if
+        # some of them are empty
+        rows = [i for i, veh_id in enumerate(veh_ids) if veh_id]
+        contiguous = len(rows) == len(veh_ids)
+        if not contiguous:
+            veh_ids = [veh_ids[i] for i in rows]
+        num = len(veh_ids)
+
+        for i, (_, _, view) in enumerate(self._vehicle_slices(out)):
+            if contiguous:
+                if num > 0:
+                    view[:num] = self._feature_values(env, i, veh_ids)
+                view[num:] = self._fills[i]
+            else:
+                view[:] = self._fills[i]
+                if num > 0:
+                    view[rows] = self._feature_values(env, i, veh_ids)
+
+        offset = spec.num_vehicles * sum(self._widths)
+        for feature, (dist_scale, speed_scale) in zip(
+                spec.edge_features, self._edge_scales):
+            size = feature.size()
+            feature.compute(
+                env,
+                out[offset:offset + size].reshape((len(feature.edges), 2,
+                                                   feature.k)),
+                dist_scale,
+                speed_scale)
+            offset += size
+
+    def per_vehicle(self, env):
+        """Compute the observations of all observed vehicles separately.
+
+        This is meant for multi-agent environments in which every vehicle is
+        an agent: the features of all vehicles are computed together, and
+        the observation of every vehicle matches that of a spec observing
+        this vehicle alone (i.e. with `num_vehicles` set to 1). The number
+        of vehicles is not limited, and edge features are not included.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+
+        Returns
+        -------
+        dict of (str, np.ndarray)
+            the float32 observation of every observed vehicle
+        """
+        veh_ids = [veh_id for veh_id in self._observed_ids(env) if veh_id]
+        if len(veh_ids) == 0:
+            return {}
+        values = np.concatenate(
+            [self._feature_values(env, i, veh_ids)
+             for i in range(len(self.spec.features))],
+            axis=1).astype(np.float32)
+        return dict(zip(veh_ids, values))
+
+
+class EdgeExtractor(Extractor):
+    """Extractor of the features of edges, compiled from an EdgeSpec."""
+
+    def __init__(self, spec, env):
+        """Compile a spec for an environment.
+
+        See EdgeSpec.compile.
+        """
+        if spec.edges is None:
+            self.edges = list(env.k.network.get_edge_list())
+        elif callable(spec.edges):
+            self.edges = list(spec.edges(env))
+        else:
+            self.edges = list(spec.edges)
+        self._scales = [resolve_normalizer(feature.scale, env)
+                        for feature in spec.features]
+
+        num_edges = len(self.edges)
+        low = np.empty((len(spec.features), num_edges), dtype=np.float32)
+        high = np.empty((len(spec.features), num_edges), dtype=np.float32)
+        for i, feature in enumerate(spec.features):
+            low[i] = feature.low
+            high[i] = feature.high
+        if spec.layout == 'edge':
+            low, high = low.T, high.T
+
+        super().__init__(spec, low.flatten(), high.flatten())
+
+    def _fill(self, env, out):
+        """See parent class."""
+        num_features = len(self.spec.features)
+        if self.spec.layout == 'feature':
+            values = out.reshape((num_features, len(self.edges)))
+        else:
+            values = out.reshape((len(self.edges), num_features)).T
+        for i, feature in enumerate(self.spec.features):
+            values[i] = feature.compute(env, self.edges) / self._scales[i]
+
+
+class ArrayExtractor(Extractor):
+    """Extractor of observations computed by a function of an ArraySpec."""
+
+    def __init__(self, spec, env):
+        """Compile a spec for an environment.
+
+        See ArraySpec.compile.
+        """
+        super().__init__(spec, np.full(spec.size, spec.low),
+                         np.full(spec.size, spec.high))
+
+    def _fill(self, env, out):
+        """See parent class."""
+        out[:] = self.spec.function(env)
+
+
+class ConcatenatedExtractor(Extractor):
+    """Extractor of the concatenation of observations of several specs.
+
+    Attributes
+    ----------
+    extractors : list of Extractor
+        the extractors of the parts of the observation
+    """
+
+    def __init__(self, spec, env):
+        """Compile a spec for an environment.
+
+        See ConcatenatedSpec.compile.
+        """
+        self.extractors = [part.compile(env) for part in spec.specs]
+        super().__init__(
+            spec,
+            np.concatenate([e._low for e in self.extractors] + [[]]),
+            np.concatenate([e._high for e in self.extractors] + [[]]))
+
+    def _fill(self, env, out):
+        """See parent class."""
+        offset = 0
+        for extractor in self.extractors:
+            extractor._fill(env, out[offset:offset + extractor.size])
+            offset += extractor.size
@@ -556,6 +556,126 @@ class SumoParams(SimParams):
         they teleport after teleport_time seconds
     num_clients : int, optional
         Number of clients that will connect to Traci
+    columnar_state : bool, optional
+        specifies whether the vehicle kernel should additionally store the
+        state of all vehicles in preallocated numpy arrays. This speeds up
+        the vectorized getters of the vehicle kernel (e.g.
+        `get_speed_array`), and is recommended for networks with many
+        vehicles. Defaults to False
+    context_subscription : bool, optional
+        specifies whether the state of all vehicles should be collected from
+        sumo through a single context subscription, rather than through one
+        subscription per vehicle. This reduces the number of TraCI commands
+        issued whenever vehicles enter or exit the network, and is
+        recommended for networks with inflows. Defaults to False
+    num_prewarmed_instances : int, optional
+        number of sumo instances that are started in the background ahead of
+        time when "restart_instance" is set to True. Upon a restart, a
+        prewarmed instance is swapped in instead of starting (and waiting
+        for) a new sumo process. Prewarmed instances are not used when
+        rendering, when emission data is exported, or when more than one
+        client connects to sumo. Defaults to 0 (no prewarming)
+    snapshot_reset : bool, optional
+        specifies whether the state of the simulation after the first reset
+        (including any warmup steps) should be saved, and loaded during all
+        subsequent resets instead of reintroducing the initial vehicles and
+        replaying the warmup steps. This is not used if the initial
+        positions of vehicles are shuffled upon reset. Note that only the
+        state of the simulation and of the Flow kernel is restored;
+        environments that store additional state between steps should
+        update it in their own `reset` method. The restored state includes
+        the random number generators of sumo, so all rollouts after the
+        first one replay the same sumo randomness (e.g. driver imperfection,
+        speed deviations, and the departures of probabilistic inflows), and
+        the seed is not used by these resets. For the same reason, sumo is
+        not restarted by these resets if restart_instance is set. Randomness
+        introduced by Flow itself (e.g. the noise of its controllers) is not
+        affected. This option should therefore not be used if rollouts are
+        meant to differ through sumo's randomness. A warning is issued when
+        the snapshot is first saved. Defaults to False
+    buffer_commands : bool, optional
+        specifies whether the actions applied to vehicles and traffic lights
+        (accelerations, lane changes, routes, and traffic light states)
+        should be collected during a step and sent to sumo in a single TraCI
+        message before the simulation is advanced, rather than in one
+        message per command. This relies on private attributes of TraCI
+        connections, and was tested with TraCI 1.28. With TraCI releases
+        lacking these attributes, commands are sent one at a time instead.
+        Defaults to False
+    rate_horizon : float, optional
+        maximum time span (in seconds) over which the inflow and outflow
+        rates of the network can be computed. The number of departed and
+        arrived vehicles is only stored for this many seconds, so that the
+        memory used remains constant over long rollouts. Rates requested
+        over longer time spans are computed over this horizon instead, and
+        a warning is issued the first time this happens. Defaults to 3600
+    id_history : int, optional
+        number of time steps for which the ids of departed and arrived
+        vehicles are stored. Defaults to 1 (the last time step)
+    net_cache_dir : str, optional
+        directory in which the networks generated by netconvert are cached,
+        along with the edge and connection data imported from them.
+        Generating a network that is identical to a cached one (e.g. upon
+        restarts, or in other processes using the same directory) then
+        skips netconvert and the parsing of the generated .net.xml file.
+        Defaults to None (no caching)
+    cache_templates : bool, optional
+        whether the edge and connection data imported from network templates
+        (see NetParams) is stored in the net_cache_dir directory as well,
+        under a hash of the path and contents of the template .net.xml file.
+        Later imports of the unmodified template then skip parsing it. Has
+        no effect if net_cache_dir is None. Defaults to False
+    trajectory_path : str, optional
+        directory in which the trajectories of all vehicles are recorded by
+        the kernel, without relying on sumo's emission output (see
+        flow/core/kernel/trajectory.py). Defaults to None (no recording)
+    trajectory_fields : list of str, optional
+        fields of the vehicles to record, defaults to all fields (id, time,
+        edge, lane, pos, x, speed, accel, leader, and headway)
+    trajectory_period : int, optional
+        number of simulation steps between recorded samples. Defaults to 1
+    trajectory_chunk_size : int, optional
+        number of rows stored in every trajectory file. Defaults to 100000
+    trajectory_format : str, optional
+        format of the trajectory files, one of {"npz", "parquet"}. Defaults
+        to "npz"
+    profile : bool, optional
+        whether to record the wall time and number of calls of the phases of
+        environment steps, of the updates of the kernel subclasses, and of
+        every type of TraCI command (see flow/core/kernel/profiler.py). The
+        statistics are available via ``env.perf_stats()``, and the time
+        spent in every phase of a step is added to the info dict under the
+        "perf" key. Defaults to False
+    profile_path : str, optional
+        json file the profiling statistics are periodically written to.
+        Defaults to None (no dumps)
+    profile_period : int, optional
+        number of environment steps between dumps of the profiling
+        statistics. Defaults to 1000
+    pipeline_steps : bool, optional
+        whether rollouts performed by flow.core.experiment.Experiment and by
+        the rllib visualizer overlap the simulation of every step with the
+        processing of the previous one, using the non-blocking step API of
+        environments (see Env.step_async). sumo then advances while Python
+        records trajectories, renders frames, and aggregates the metrics of
+        the previous step. Only effective when communicating with sumo over
+        a TraCI connection, and when a single simulation step is performed
+        per environment step (see EnvParams.sims_per_step). This relies on
+        private attributes of TraCI connections, and was tested with TraCI
+        1.28. With TraCI releases lacking these attributes, steps are
+        performed synchronously instead. Defaults to False
+    multi_step_advance : bool, optional
+        whether environment steps performing several simulation steps (see
+        EnvParams.sims_per_step) advance sumo by all of them with a single
+        command, whenever no vehicle is controlled by a Flow car-following,
+        lane-changing, or routing controller. The kernel is then updated
+        once per environment step: vehicles that departed, arrived, or
+        collided during the intermediate steps are attributed to the last
+        one, and trajectories are only recorded at the end of every
+        environment step. The actions of the RL agent and the additional
+        commands of the environment are applied once per environment step,
+        and accelerations are held over all of its simulation steps.
+        Defaults to False
     """
 
     def __init__(self,
@@ -574,7 +694,26 @@ class SumoParams(SimParams):
                  restart_instance=False,
                  print_warnings=True,
                  teleport_time=-1,
-                 num_clients=1):
+                 num_clients=1,
+                 columnar_state=False,
+                 context_subscription=False,
+                 num_prewarmed_instances=0,
+                 snapshot_reset=False,
+                 buffer_commands=False,
+                 rate_horizon=3600,
+                 id_history=1,
+                 net_cache_dir=None,
+                 cache_templates=False,
+                 trajectory_path=None,
+                 trajectory_fields=None,
+                 trajectory_period=1,
+                 trajectory_chunk_size=100000,
+                 trajectory_format='npz',
+                 profile=False,
+                 profile_path=None,
+                 profile_period=1000,
+                 pipeline_steps=False,
+                 multi_step_advance=False):
         """Instantiate SumoParams."""
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
@@ -587,6 +726,25 @@ class SumoParams(SimParams):
         self.print_warnings = print_warnings
         self.teleport_time = teleport_time
         self.num_clients = num_clients
+        self.columnar_state = columnar_state
+        self.context_subscription = context_subscription
+        self.num_prewarmed_instances = num_prewarmed_instances
+        self.snapshot_reset = snapshot_reset
+        self.buffer_commands = buffer_commands
+        self.rate_horizon = rate_horizon
+        self.id_history = id_history
+        self.net_cache_dir = net_cache_dir
+        self.cache_templates = cache_templates
+        self.trajectory_path = trajectory_path
+        self.trajectory_fields = trajectory_fields
+        self.trajectory_period = trajectory_period
+        self.trajectory_chunk_size = trajectory_chunk_size
+        self.trajectory_format = trajectory_format
+        self.profile = profile
+        self.profile_path = profile_path
+        self.profile_period = profile_period
+        self.pipeline_steps = pipeline_steps
+        self.multi_step_advance = multi_step_advance
 
 
 class EnvParams:
@@ -1,7 +1,110 @@
-"""A series of reward functions."""
+"""A series of reward functions.
+
+Most reward functions take the environment as input, and collect the state
+they need from its kernel. The array-native variants (e.g.
+`desired_velocity_array` and `delay_array`) compute the same quantities
+directly from arrays of the vehicle kernel, such as those returned by
+`get_speed_array`, and may be used to compute rewards for other sets of
+vehicles without collecting their state again. Cumulative metrics, such as
+the total delay and the travel times of vehicles, are maintained
+incrementally across steps by `TravelMetrics`.
+"""
+import weakref
 
 import numpy as np
 
+# speed limits of the edges of every network kernel, computed once per network
+# (see _edge_speed_limits)
+_SPEED_LIMITS = weakref.WeakKeyDictionary()
+
+
+def _speeds(env, edge_list=None):
+    """Return the speeds of the vehicles in the network (or in some edges).
+
+    The speeds are computed at most once per time step, and shared between
+    all reward functions through the cache of the kernel. The returned array
+    must not be modified.
+    """
+    if edge_list is None:
+        key = ('speeds',)
+    elif isinstance(edge_list, (list, np.ndarray)):
+        key = ('speeds', tuple(edge_list))
+    else:
+        key = ('speeds', edge_list)
+    return env.k.cache.get(key, _compute_speeds, env, edge_list)
+
+
+def _compute_speeds(env, edge_list):
+    """Compute the speeds of the vehicles in the network (or in some edges)."""
+    if edge_list is None:
+        veh_ids = env.k.vehicle.get_ids()
+    else:
+        veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
+    return env.k.vehicle.get_speed_array(veh_ids)
+
+
+def _edge_speed_limits(network):
+    """Return the speed limits of the (non-internal) edges of a network.
+
+    The speed limits are computed once per network, i.e. again only if a new
+    network is generated by the network kernel.
+    """
+    edge_list = network.get_edge_list()
+    cached = _SPEED_LIMITS.get(network)
+    if cached is None or cached[0] is not edge_list:
+        cached = (edge_list,
+                  {edge: network.speed_limit(edge) for edge in edge_list})
+        _SPEED_LIMITS[network] = cached
+    return cached[1]
+
+
+def _delays(env):
+    """Return the normalized delays of the vehicles in the network.
+
+    The delays are ordered as the ids returned by env.k.vehicle.get_ids(),
+    and computed at most once per time step. See delay_array.
+    """
+    return env.k.cache.get(('delays',), _compute_delays, env)
+
+
+def _compute_delays(env):
+    """Compute the normalized delays of the vehicles in the network."""
+    veh_ids = env.k.vehicle.get_ids()
+    limits = _edge_speed_limits(env.k.network)
+    # vehicles on internal edges (junctions) are not assigned a speed limit
+    speed_limits = np.fromiter(
+        (limits.get(edge, np.nan) for edge in env.k.vehicle.get_edge(veh_ids)),
+        dtype=np.float64, count=len(veh_ids))
+    return delay_array(_speeds(env), speed_limits)
+
+
+def delay_array(speeds, speed_limits):
+    """Compute the normalized delays of vehicles.
+
+    The normalized delay of a vehicle is the relative deviation of its speed
+    from the speed limit, i.e. (speed_limit - speed) / speed_limit. Summed
+    over time steps and multiplied by the duration of a step, this is the
+    time the vehicle lost compared to driving at the speed limit.
+
+    Parameters
+    ----------
+    speeds : array_like
+        speeds of the vehicles (m/s)
+    speed_limits : float or array_like
+        speed limit of the edge of every vehicle (m/s). Vehicles with a speed
+        limit of NaN (e.g. located on junctions) are assigned no delay.
+
+    Returns
+    -------
+    np.ndarray
+        normalized delay of every vehicle
+    """
+    speed_limits = np.asarray(speed_limits, dtype=np.float64)
+    delays = (speed_limits - np.asarray(speeds, dtype=np.float64)) \
+        / speed_limits
+    delays[np.isnan(delays)] = 0.
+    return delays
+
 
 def desired_velocity(env, fail=False, edge_list=None):
     r"""Encourage proximity to a desired velocity.
@@ -35,23 +138,48 @@ def desired_velocity(env, fail=False, edge_list=None):
     float
         reward value
     """
-    if edge_list is None:
-        veh_ids = env.k.vehicle.get_ids()
-    else:
-        veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
+    target_vel = env.env_params.additional_params['target_velocity']
+    edges = edge_list
+    if isinstance(edge_list, (list, np.ndarray)):
+        edges = tuple(edge_list)
 
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_vehicles = len(veh_ids)
+    # the reward is shared by all agents in multi-agent environments, and as
+    # such is only computed once per time step
+    return env.k.cache.get(
+        ('desired_velocity', fail, edges, target_vel),
+        _desired_velocity, env, fail, edge_list, target_vel)
 
-    if any(vel < -100) or fail or num_vehicles == 0:
-        return 0.
 
-    target_vel = env.env_params.additional_params['target_velocity']
-    max_cost = np.array([target_vel] * num_vehicles)
-    max_cost = np.linalg.norm(max_cost)
+def _desired_velocity(env, fail, edge_list, target_vel):
+    """Compute the desired velocity reward (see desired_velocity)."""
+    return desired_velocity_array(_speeds(env, edge_list), target_vel, fail)
+
 
-    cost = vel - target_vel
-    cost = np.linalg.norm(cost)
+def desired_velocity_array(speeds, target_velocity, fail=False):
+    """Compute the desired velocity reward from the speeds of vehicles.
+
+    See desired_velocity.
+
+    Parameters
+    ----------
+    speeds : np.ndarray
+        speeds of the vehicles (m/s)
+    target_velocity : float
+        desired velocity (m/s)
+    fail : bool, optional
+        specifies if any crash or other failure occurred in the system
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    num_vehicles = len(speeds)
+    if fail or num_vehicles == 0 or np.any(speeds < -100):
+        return 0.
+
+    max_cost = np.linalg.norm(np.full(num_vehicles, target_velocity))
+    cost = np.linalg.norm(speeds - target_velocity)
 
     # epsilon term (to deal with ZeroDivisionError exceptions)
     eps = np.finfo(np.float32).eps
@@ -78,9 +206,9 @@ def average_velocity(env, fail=False):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+    vel = _speeds(env)
 
-    if any(vel < -100) or fail:
+    if fail or np.any(vel < -100):
         return 0.
     if len(vel) == 0:
         return 0.
@@ -104,7 +232,7 @@ def rl_forward_progress(env, gain=0.1):
     float
         reward value
     """
-    rl_velocity = env.k.vehicle.get_speed(env.k.vehicle.get_rl_ids())
+    rl_velocity = env.k.vehicle.get_speed_array(env.k.vehicle.get_rl_ids())
     rl_norm_vel = np.linalg.norm(rl_velocity, 1)
     return rl_norm_vel * gain
 
@@ -131,20 +259,36 @@ def min_delay(env):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+    return min_delay_array(_speeds(env), env.k.network.max_speed(),
+                           env.sim_step)
 
-    vel = vel[vel >= -1e-6]
-    v_top = max(
-        env.k.network.speed_limit(edge)
-        for edge in env.k.network.get_edge_list())
-    time_step = env.sim_step
 
-    max_cost = time_step * sum(vel.shape)
+def min_delay_array(speeds, max_speed, sim_step):
+    """Compute the min_delay reward from the speeds of vehicles.
+
+    See min_delay.
+
+    Parameters
+    ----------
+    speeds : np.ndarray
+        speeds of the vehicles (m/s)
+    max_speed : float
+        largest speed limit in the network (m/s)
+    sim_step : float
+        duration of a simulation step (s)
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    vel = speeds[speeds >= -1e-6]
+    max_cost = sim_step * len(vel)
 
     # epsilon term (to deal with ZeroDivisionError exceptions)
     eps = np.finfo(np.float32).eps
 
-    cost = time_step * sum((v_top - vel) / v_top)
+    cost = sim_step * np.sum(delay_array(vel, max_speed))
     return max((max_cost - cost) / (max_cost + eps), 0)
 
 
@@ -163,17 +307,10 @@ def avg_delay_specified_vehicles(env, veh_ids):
     float
         average delay
     """
-    sum = 0
-    for edge in env.k.network.get_edge_list():
-        for veh_id in env.k.vehicle.get_ids_by_edge(edge):
-            v_top = env.k.network.speed_limit(edge)
-            sum += (v_top - env.k.vehicle.get_speed(veh_id)) / v_top
-    time_step = env.sim_step
-    try:
-        cost = time_step * sum
-        return cost / len(veh_ids)
-    except ZeroDivisionError:
+    if len(veh_ids) == 0:
         return 0
+    cost = env.sim_step * np.sum(_delays(env))
+    return cost / len(veh_ids)
 
 
 def min_delay_unscaled(env):
@@ -190,18 +327,16 @@ def min_delay_unscaled(env):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+    vel = _speeds(env)
 
     vel = vel[vel >= -1e-6]
-    v_top = max(
-        env.k.network.speed_limit(edge)
-        for edge in env.k.network.get_edge_list())
+    v_top = env.k.network.max_speed()
     time_step = env.sim_step
 
     # epsilon term (to deal with ZeroDivisionError exceptions)
     eps = np.finfo(np.float32).eps
 
-    cost = time_step * sum((v_top - vel) / v_top)
+    cost = time_step * np.sum(delay_array(vel, v_top))
     return cost / (env.k.vehicle.num_vehicles + eps)
 
 
@@ -225,9 +360,8 @@ def penalize_standstill(env, gain=1):
     float
         reward value
     """
-    veh_ids = env.k.vehicle.get_ids()
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_standstill = len(vel[vel == 0])
+    vel = _speeds(env)
+    num_standstill = np.count_nonzero(vel == 0)
     penalty = gain * num_standstill
     return -penalty
 
@@ -249,9 +383,8 @@ def penalize_near_standstill(env, thresh=0.3, gain=1):
     gain : float
         multiplicative factor on the action penalty
     """
-    veh_ids = env.k.vehicle.get_ids()
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    penalize = len(vel[vel < thresh])
+    vel = _speeds(env)
+    penalize = np.count_nonzero(vel < thresh)
     penalty = gain * penalize
     return -penalty
 
@@ -278,9 +411,7 @@ def penalize_headway_variance(vehicles,
         used to allow exponential punishing of smaller headways
     """
     headways = penalty_gain * np.power(
-        np.array(
-            [vehicles.get_headway(veh_id) / normalization
-             for veh_id in vids]), penalty_exponent)
+        vehicles.get_headway_array(vids) / normalization, penalty_exponent)
     return -np.var(headways)
 
 
@@ -304,3 +435,113 @@ def punish_rl_lane_changes(env, penalty=1):
             total_lane_change_penalty -= penalty
 
     return total_lane_change_penalty
+
+
+class TravelMetrics(object):
+    """Cumulative delay and travel times of the vehicles in the network.
+
+    The metrics are updated incrementally, by calling `update` once per
+    environment step (e.g. from compute_reward). Every update adds the delay
+    accumulated by the vehicles since the previous update to the total
+    delay, and records the travel times of the vehicles that left the
+    network, so that cumulative metrics never require the history of the
+    rollout to be processed again.
+
+    Travel times are measured with the resolution of the updates: vehicles
+    depart when they are first observed by an update, and arrive when they
+    are no longer observed. The metrics are reset automatically when the
+    environment is reset.
+
+    Usage
+    -----
+    >>> metrics = TravelMetrics()
+    >>> # at every step of the environment
+    >>> metrics.update(env)
+    >>> reward = -metrics.step_delay
+    >>> metrics.total_delay, metrics.travel_times
+
+    Attributes
+    ----------
+    total_delay : float
+        time lost by all vehicles compared to driving at the speed limit
+        since the start of the rollout (s), see delay_array
+    step_delay : float
+        time lost by all vehicles since the previous update (s)
+    """
+
+    def __init__(self):
+        """Instantiate the metrics."""
+        self.reset()
+
+    def reset(self):
+        """Clear all metrics."""
+        self.total_delay = 0.
+        self.step_delay = 0.
+        # time of the last update (s)
+        self._time = None
+        # Key = id of a vehicle in the network, Element = departure time
+        self._departures = {}
+        # travel times of the vehicles that left the network
+        self._travel_times = []
+
+    @property
+    def travel_times(self):
+        """Return the travel times of the vehicles that left the network."""
+        return np.array(self._travel_times)
+
+    def current_travel_times(self, env):
+        """Return the time spent in the network by its current vehicles.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+
+        Returns
+        -------
+        np.ndarray
+            time since the departure of every vehicle in the network, ordered
+            as env.k.vehicle.get_ids()
+        """
+        time = env.time_counter * env.sim_step
+        get = self._departures.get
+        veh_ids = env.k.vehicle.get_ids()
+        departures = np.fromiter((get(veh_id, time) for veh_id in veh_ids),
+                                 dtype=np.float64, count=len(veh_ids))
+        return time - departures
+
+    def update(self, env):
+        """Update the metrics with the current state of the environment.
+
+        Only the first call per environment step updates the metrics.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment
+        """
+        time = env.time_counter * env.sim_step
+        if self._time is not None:
+            if time == self._time:
+                return
+            if time < self._time:
+                # the environment was reset
+                self.reset()
+        if self._time is None:
+            # the delay of the first update is accumulated over one step
+            prev_time = max(
+                time - env.sim_step * env.env_params.sims_per_step, 0.)
+        else:
+            prev_time = self._time
+        self._time = time
+
+        self.step_delay = (time - prev_time) * np.sum(_delays(env))
+        self.total_delay += self.step_delay
+
+        veh_ids = env.k.vehicle.get_ids()
+        present = set(veh_ids)
+        departures = self._departures
+        for veh_id in self._departures.keys() - present:
+            self._travel_times.append(time - departures.pop(veh_id))
+        for veh_id in present.difference(departures):
+            departures[veh_id] = time
@@ -2,9 +2,13 @@
 
 import csv
 import errno
+import heapq
+import multiprocessing
 import os
+import shutil
+import tempfile
 from lxml import etree
-from xml.etree import ElementTree
+from operator import itemgetter
 
 
 def makexml(name, nsl):
@@ -32,13 +36,253 @@ def ensure_dir(path):
     return path
 
 
-def emission_to_csv(emission_path, output_path=None):
+def iterparse_elements(path, tags):
+    """Iterate over the top-level elements of an xml file with bounded memory.
+
+    The file is parsed incrementally, and every top-level element is removed
+    from memory once it has been processed, along with any other top-level
+    elements preceding it. This allows very large files (e.g. city-scale
+    .net.xml files) to be read without building the entire tree.
+
+    Parameters
+    ----------
+    path : str
+        path to the xml file
+    tags : tuple of str
+        tags of the top-level elements to yield
+
+    Yields
+    ------
+    lxml.etree.Element
+        every top-level element with one of the specified tags, including
+        its children. The element is cleared once the next element is
+        requested.
+    """
+    context = etree.iterparse(
+        path, events=('end',), tag=tags, recover=True, huge_tree=True)
+    for _, elem in context:
+        parent = elem.getparent()
+        if parent is None or parent.getparent() is not None:
+            # not a top-level element (e.g. the route of a vehicle)
+            continue
+
+        yield elem
+
+        # free the element and all top-level elements preceding it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+# attributes of the vehicles in emission files, and the name and type of the
+# corresponding columns in the csv files generated by emission_to_csv. The
+# "time", "edge_id", and "lane_number" columns are computed separately.
+EMISSION_ATTRIBUTES = [
+    ('CO', 'CO', float),
+    ('y', 'y', float),
+    ('CO2', 'CO2', float),
+    ('electricity', 'electricity', float),
+    ('type', 'type', str),
+    ('id', 'id', str),
+    ('eclass', 'eclass', str),
+    ('waiting', 'waiting', float),
+    ('NOx', 'NOx', float),
+    ('fuel', 'fuel', float),
+    ('HC', 'HC', float),
+    ('x', 'x', float),
+    ('route', 'route', str),
+    ('relative_position', 'pos', float),
+    ('noise', 'noise', float),
+    ('angle', 'angle', float),
+    ('PMx', 'PMx', float),
+    ('speed', 'speed', float),
+]
+
+# columns of the csv files generated by emission_to_csv
+EMISSION_COLUMNS = ['time'] + [col for col, _, _ in EMISSION_ATTRIBUTES] + \
+    ['edge_id', 'lane_number']
+
+# maximum number of sorted runs merged at once by emission_to_csv
+_MERGE_FAN_IN = 64
+
+
+class _XMLRange(object):
+    """File-like view of the elements within a byte range of an xml file.
+
+    The bytes of the range are wrapped into a root element, so that they can
+    be parsed as a complete xml document.
+    """
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+        self._prefix = b'<range>'
+        self._suffix = b'</range>'
+
+    def read(self, size=-1):
+        """Read at most `size` bytes from the range (all if negative)."""
+        if self._prefix:
+            data, self._prefix = self._prefix, b''
+            return data
+        if self._remaining > 0:
+            if size < 0 or size > self._remaining:
+                size = self._remaining
+            data = self._file.read(size)
+            self._remaining -= len(data)
+            if data:
+                return data
+            self._remaining = 0
+        data, self._suffix = self._suffix, b''
+        return data
+
+    def close(self):
+        """Close the underlying file."""
+        self._file.close()
+
+
+def _emission_rows(source):
+    """Yield the rows of the csv file corresponding to an emission file.
+
+    Vehicles missing any of the attributes of an emission file are skipped.
+    """
+    for time in iterparse_elements(source, ('timestep',)):
+        t = float(time.attrib['time'])
+        for car in time:
+            try:
+                row = [t]
+                for _, attr, cast in EMISSION_ATTRIBUTES:
+                    row.append(cast(car.attrib[attr]))
+                edge_id, _, lane_number = car.attrib['lane'].rpartition('_')
+            except KeyError:
+                continue
+            row.append(edge_id)
+            row.append(lane_number)
+            yield row
+
+
+def _write_run(rows, tmp_dir):
+    """Sort rows by vehicle id and write them to a temporary csv file."""
+    id_index = EMISSION_COLUMNS.index('id')
+    # the sort is stable, so that the rows of every vehicle remain in the
+    # order of the emission file
+    rows.sort(key=itemgetter(id_index))
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+    with os.fdopen(fd, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+
+def _sorted_runs(source, tmp_dir, max_rows):
+    """Split the rows of an emission file into sorted runs.
+
+    Parameters
+    ----------
+    source : str or tuple
+        path to the emission file, or a (path, start, end) tuple of the byte
+        range of the file to read
+    tmp_dir : str
+        directory in which the runs are written
+    max_rows : int
+        maximum number of rows per run
+
+    Returns
+    -------
+    list of str
+        paths to the runs, in the order of the emission file
+    """
+    if isinstance(source, tuple):
+        source = _XMLRange(*source)
+
+    runs = []
+    try:
+        rows = []
+        for row in _emission_rows(source):
+            rows.append(row)
+            if len(rows) >= max_rows:
+                runs.append(_write_run(rows, tmp_dir))
+                rows = []
+        if rows or not runs:
+            runs.append(_write_run(rows, tmp_dir))
+    finally:
+        if isinstance(source, _XMLRange):
+            source.close()
+
+    return runs
+
+
+def _merge_runs(runs, output_file):
+    """Merge sorted runs into a single csv writer."""
+    id_index = EMISSION_COLUMNS.index('id')
+    files = [open(path, 'r', newline='') for path in runs]
+    try:
+        # rows with the same id are taken from the earliest run first, which
+        # preserves the order of the emission file
+        readers = [csv.reader(f) for f in files]
+        output_file.writerows(
+            heapq.merge(*readers, key=itemgetter(id_index)))
+    finally:
+        for f in files:
+            f.close()
+
+
+def _split_timesteps(emission_path, num_splits):
+    """Split an emission file into byte ranges of complete timesteps.
+
+    Returns
+    -------
+    list of (str, int, int)
+        path to the file, and start and end offsets of every range
+    """
+    size = os.path.getsize(emission_path)
+    offsets = []
+    with open(emission_path, 'rb') as f:
+        for i in range(num_splits):
+            # find the first timestep following the target offset
+            buf_start = size * i // num_splits
+            f.seek(buf_start)
+            buf = b''
+            while True:
+                block = f.read(1 << 16)
+                if not block:
+                    index = -1
+                    break
+                buf += block
+                index = buf.find(b'<timestep')
+                if index >= 0:
+                    index += buf_start
+                    break
+                # keep the end of the buffer, in case the tag overlaps blocks
+                keep = min(len(b'<timestep') - 1, len(buf))
+                buf_start += len(buf) - keep
+                buf = buf[len(buf) - keep:]
+            if index >= 0 and (not offsets or index > offsets[-1]):
+                offsets.append(index)
+
+        # the last range ends at the closing tag of the root element
+        f.seek(max(size - (1 << 16), 0))
+        tail = f.read()
+        end = size - len(tail) + tail.rfind(b'</')
+
+    offsets.append(end)
+    return [(emission_path, start, stop)
+            for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def emission_to_csv(emission_path, output_path=None, max_rows=100000,
+                    num_workers=1):
     """Convert an emission file generated by sumo into a csv file.
 
     Note that the emission file contains information generated by sumo, not
     flow. This means that some data, such as absolute position, is not
     immediately available from the emission file, but can be recreated.
 
+    The rows of the csv file are sorted by vehicle id, and then by time. The
+    emission file is parsed incrementally, and rows are sorted with an
+    external merge sort, using temporary files of at most `max_rows` rows,
+    so that the memory used by the conversion does not grow with the size of
+    the emission file.
+
     Parameters
     ----------
     emission_path : str
@@ -46,54 +290,46 @@ def emission_to_csv(emission_path, output_path=None):
     output_path : str
         path to the csv file that will be generated, default is the same
         directory as the emission file, with the same name
+    max_rows : int, optional
+        maximum number of rows held in memory and sorted at once
+    num_workers : int, optional
+        number of processes used to parse the emission file. If greater than
+        one, the file is split into ranges of timesteps, which are parsed and
+        sorted in parallel before being merged.
     """
-    parser = etree.XMLParser(recover=True)
-    tree = ElementTree.parse(emission_path, parser=parser)
-    root = tree.getroot()
-
-    # parse the xml data into a dict
-    out_data = []
-    for time in root.findall('timestep'):
-        t = float(time.attrib['time'])
-
-        for car in time:
-            out_data.append(dict())
-            try:
-                out_data[-1]['time'] = t
-                out_data[-1]['CO'] = float(car.attrib['CO'])
-                out_data[-1]['y'] = float(car.attrib['y'])
-                out_data[-1]['CO2'] = float(car.attrib['CO2'])
-                out_data[-1]['electricity'] = float(car.attrib['electricity'])
-                out_data[-1]['type'] = car.attrib['type']
-                out_data[-1]['id'] = car.attrib['id']
-                out_data[-1]['eclass'] = car.attrib['eclass']
-                out_data[-1]['waiting'] = float(car.attrib['waiting'])
-                out_data[-1]['NOx'] = float(car.attrib['NOx'])
-                out_data[-1]['fuel'] = float(car.attrib['fuel'])
-                out_data[-1]['HC'] = float(car.attrib['HC'])
-                out_data[-1]['x'] = float(car.attrib['x'])
-                out_data[-1]['route'] = car.attrib['route']
-                out_data[-1]['relative_position'] = float(car.attrib['pos'])
-                out_data[-1]['noise'] = float(car.attrib['noise'])
-                out_data[-1]['angle'] = float(car.attrib['angle'])
-                out_data[-1]['PMx'] = float(car.attrib['PMx'])
-                out_data[-1]['speed'] = float(car.attrib['speed'])
-                out_data[-1]['edge_id'] = car.attrib['lane'].rpartition('_')[0]
-                out_data[-1]['lane_number'] = car.attrib['lane'].\
-                    rpartition('_')[-1]
-            except KeyError:
-                del out_data[-1]
-
-    # sort the elements of the dictionary by the vehicle id
-    out_data = sorted(out_data, key=lambda k: k['id'])
-
     # default output path
     if output_path is None:
         output_path = emission_path[:-3] + 'csv'
 
-    # output the dict data into a csv file
-    keys = out_data[0].keys()
-    with open(output_path, 'w') as output_file:
-        dict_writer = csv.DictWriter(output_file, keys)
-        dict_writer.writeheader()
-        dict_writer.writerows(out_data)
+    max_rows = max(int(max_rows), 1)
+    tmp_dir = tempfile.mkdtemp(
+        dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        if num_workers > 1:
+            ranges = _split_timesteps(emission_path, num_workers)
+            with multiprocessing.Pool(min(num_workers, len(ranges))) as pool:
+                runs = pool.starmap(
+                    _sorted_runs,
+                    [(r, tmp_dir, max_rows) for r in ranges])
+            runs = [path for range_runs in runs for path in range_runs]
+        else:
+            runs = _sorted_runs(emission_path, tmp_dir, max_rows)
+
+        # merge the runs in several passes if there are too many of them to
+        # be opened at once
+        while len(runs) > _MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), _MERGE_FAN_IN):
+                fd, path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+                with os.fdopen(fd, 'w', newline='') as f:
+                    _merge_runs(runs[i:i + _MERGE_FAN_IN], csv.writer(f))
+                merged.append(path)
+            runs = merged
+
+        # output the merged data into a csv file
+        with open(output_path, 'w') as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(EMISSION_COLUMNS)
+            _merge_runs(runs, writer)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -4,7 +4,9 @@ from copy import deepcopy
 import os
 import atexit
 import time
+import tempfile
 import traceback
+import warnings
 import numpy as np
 import random
 from flow.renderer.pyglet_renderer import PygletRenderer as Renderer
@@ -13,14 +15,13 @@ from flow.utils.flow_warnings import deprecated_attribute
 import gym
 from gym.spaces import Box
 from gym.spaces import Tuple
-from traci.exceptions import FatalTraCIError
-from traci.exceptions import TraCIException
 
 import sumolib
 
 
 from flow.core.util import ensure_dir
 from flow.core.kernel import Kernel
+from flow.core.kernel.simulation.libsumo import TRACI_EXCEPTIONS
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -58,7 +59,7 @@ class Env(gym.Env):
     network : flow.networks.Network
         see flow/networks/base.py
     simulator : str
-        the simulator used, one of {'traci', 'aimsun'}
+        the simulator used, one of {'traci', 'libsumo', 'aimsun'}
     k : flow.core.kernel.Kernel
         Flow kernel object, using for state acquisition and issuing commands to
         the certain components of the simulator. For more information, see:
@@ -95,8 +96,14 @@ class Env(gym.Env):
         renderer class, used to collect image-based representations of the
         traffic network. This attribute is set to None if `sim_params.render`
         is set to True or False.
+    observation_extractor : flow.core.observations.ObservationExtractor
+        extractor of the observations, if the environment declares them
+        with an observation spec (see flow/core/observations.py). None
+        otherwise
     """
 
+    observation_extractor = None
+
     def __init__(self,
                  env_params,
                  sim_params,
@@ -114,7 +121,8 @@ class Env(gym.Env):
         network : flow.networks.Network
             see flow/networks/base.py
         simulator : str
-            the simulator used, one of {'traci', 'aimsun'}. Defaults to 'traci'
+            the simulator used, one of {'traci', 'libsumo', 'aimsun'}.
+            Defaults to 'traci'
 
         Raises
         ------
@@ -128,12 +136,14 @@ class Env(gym.Env):
         self.net_params = self.network.net_params
         self.initial_config = self.network.initial_config
         self.sim_params = sim_params
-        time_stamp = ''.join(str(time.time()).split('.'))
-        if os.environ.get("TEST_FLAG", 0):
-            # 1.0 works with stress_test_start 10k times
-            time.sleep(1.0 * int(time_stamp[-6:]) / 1e6)
-        # FIXME: this is sumo-specific
-        self.sim_params.port = sumolib.miscutils.getFreeSocketPort()
+        # libsumo runs sumo within this process, and needs no port
+        if simulator != 'libsumo':
+            time_stamp = ''.join(str(time.time()).split('.'))
+            if os.environ.get("TEST_FLAG", 0):
+                # 1.0 works with stress_test_start 10k times
+                time.sleep(1.0 * int(time_stamp[-6:]) / 1e6)
+            # FIXME: this is sumo-specific
+            self.sim_params.port = sumolib.miscutils.getFreeSocketPort()
         # time_counter: number of steps taken since the start of a rollout
         self.time_counter = 0
         # step_counter: number of total steps taken
@@ -149,6 +159,19 @@ class Env(gym.Env):
         # the simulator used by this environment
         self.simulator = simulator
 
+        # state of the simulation after the first reset, see
+        # SumoParams.snapshot_reset
+        self._reset_snapshot = None
+
+        # actions of the step started by step_async, whether a collision
+        # already occurred within it, and the number of simulation steps of
+        # its last advance. None if no step is in progress.
+        self._pending_step = None
+        # number of simulation steps of the last step completed by step_wait
+        # whose trajectories and frame are still to be recorded and rendered
+        # (0 if there are none)
+        self._deferred_work = 0
+
         # create the Flow kernel
         self.k = Kernel(simulator=self.simulator,
                         sim_params=sim_params)
@@ -313,33 +336,234 @@ class Env(gym.Env):
         info : dict
             contains other diagnostic information from the previous action
         """
-        for _ in range(self.env_params.sims_per_step):
-            self.time_counter += 1
-            self.step_counter += 1
+        if self._pending_step is not None:
+            raise RuntimeError('step cannot be called while a step started '
+                               'by step_async is in progress.')
+        self._run_deferred_work()
+
+        profiler = self.k.profiler
+        profiler.begin_step()
+
+        num_steps = self._steps_per_advance()
+        for _ in range(self.env_params.sims_per_step // num_steps):
+            self._apply_substep_actions(rl_actions, num_steps)
+
+            # advance the simulation in the simulator by one step (or by all
+            # steps of the environment step at once, see _steps_per_advance)
+            with profiler.phase('simulation_step'):
+                self.k.simulation.simulation_step(num_steps)
+
+            crash = self._update_substep(num_steps=num_steps)
+
+            # stop collecting new simulation steps if there is a collision
+            if crash:
+                break
+
+            # render a frame
+            with profiler.phase('render'):
+                self.render()
+
+        return self._complete_step(rl_actions, crash)
+
+    def step_async(self, rl_actions):
+        """Start advancing the environment by one step, without waiting.
+
+        The actions are applied as in `step`, after which the last simulation
+        step is started without waiting for the simulator (see
+        KernelSimulation.simulation_step_async). The step is completed by
+        `step_wait`, which returns the results of `step`.
+
+        In the meantime, the simulator advances while the caller is free to
+        perform other work that does not send commands to the simulator. This
+        includes reading the state stored in the kernel, which still
+        describes the last completed simulation step. If a single simulation
+        step is performed per environment step, this is the previous
+        environment step, whose metrics may then be aggregated. The
+        environment itself uses this time to record the trajectories of the
+        vehicles and to render the frame of the previous step.
+
+        Usage
+        -----
+        >>> state = env.reset()
+        >>> env.step_async(rl_actions(state))
+        >>> # ... post-process the previous step
+        >>> state, reward, done, info = env.step_wait()
+
+        Parameters
+        ----------
+        rl_actions : array_like
+            an list of actions provided by the rl algorithm
+
+        Raises
+        ------
+        RuntimeError
+            if a step is already in progress
+        """
+        if self._pending_step is not None:
+            raise RuntimeError('step_async cannot be called while a step '
+                               'started by step_async is in progress.')
+        num_steps = self._steps_per_advance()
+        num_substeps = self.env_params.sims_per_step // num_steps
+        # the trajectories are recorded in order, so the work deferred from
+        # the previous step can only overlap with the last simulation step
+        if num_substeps > 1:
+            self._run_deferred_work()
+
+        profiler = self.k.profiler
+        profiler.begin_step()
+
+        crash = False
+        for i in range(num_substeps):
+            self._apply_substep_actions(rl_actions, num_steps)
+
+            if i == num_substeps - 1:
+                with profiler.phase('simulation_step'):
+                    self.k.simulation.simulation_step_async(num_steps)
+                break
+
+            with profiler.phase('simulation_step'):
+                self.k.simulation.simulation_step()
+
+            crash = self._update_substep(num_steps=num_steps)
+            if crash:
+                break
+
+            with profiler.phase('render'):
+                self.render()
+
+        # overlap the work deferred from the previous step with the last
+        # simulation step
+        self._run_deferred_work()
 
-            # perform acceleration actions for controlled human-driven vehicles
+        self._pending_step = (rl_actions, crash, num_steps)
+
+    def step_wait(self):
+        """Wait for the step started by `step_async` to complete.
+
+        Returns
+        -------
+        tuple
+            the observation, reward, done, and info dict of the step, see
+            `step`
+
+        Raises
+        ------
+        RuntimeError
+            if no step was started by step_async
+        """
+        if self._pending_step is None:
+            raise RuntimeError('step_wait can only be called after '
+                               'step_async.')
+        rl_actions, crash, num_steps = self._pending_step
+        self._pending_step = None
+
+        if not crash:
+            profiler = self.k.profiler
+            with profiler.phase('simulation_wait'):
+                self.k.simulation.simulation_step_wait()
+
+            # the trajectories are recorded and the frame is rendered during
+            # the next step (see _run_deferred_work). Frames are not rendered
+            # upon collisions, see step.
+            crash = self._update_substep(record=False, num_steps=num_steps)
+            if crash:
+                self.k.record(reset=False, num_steps=num_steps)
+            else:
+                self._deferred_work = num_steps
+
+        return self._complete_step(rl_actions, crash)
+
+    def _run_deferred_work(self):
+        """Perform the work deferred from the previous step (if any).
+
+        This records the trajectories of the vehicles and renders the frame
+        of the last step completed by `step_wait`, from the state stored in
+        the kernel.
+        """
+        num_steps = self._deferred_work
+        if not num_steps:
+            return
+        self._deferred_work = 0
+        self.k.record(reset=False, num_steps=num_steps)
+        with self.k.profiler.phase('render'):
+            self.render()
+
+    def _finish_pending_step(self):
+        """Complete any step started by step_async, and its deferred work."""
+        if self._pending_step is not None:
+            self.step_wait()
+        self._run_deferred_work()
+
+    def _steps_per_advance(self):
+        """Return the number of simulation steps performed per command.
+
+        If requested (see SumoParams.multi_step_advance), all simulation
+        steps of an environment step are performed with a single command
+        whenever no Flow controller needs to act in between them, i.e. if no
+        vehicle has a Flow car-following, lane-changing, or routing
+        controller. Otherwise, the simulation is advanced one step at a time.
+        """
+        num_steps = self.env_params.sims_per_step
+        if num_steps == 1:
+            return 1
+        try:
+            multi_step_advance = self.sim_params.multi_step_advance
+        except AttributeError:
+            multi_step_advance = False
+        if not multi_step_advance:
+            return 1
+
+        vehicle = self.k.vehicle
+        if len(vehicle.get_controlled_ids()) > 0 or \
+                len(vehicle.get_controlled_lc_ids()) > 0:
+            return 1
+        for veh_id in vehicle.get_ids():
+            if vehicle.get_routing_controller(veh_id) is not None:
+                return 1
+
+        return num_steps
+
+    def _apply_substep_actions(self, rl_actions, num_steps=1):
+        """Apply the actions of all agents before a simulation step.
+
+        See step.
+
+        Parameters
+        ----------
+        rl_actions : array_like
+            an list of actions provided by the rl algorithm
+        num_steps : int, optional
+            number of simulation steps the actions are applied for, see
+            _steps_per_advance
+        """
+        profiler = self.k.profiler
+        self.time_counter += num_steps
+        self.step_counter += num_steps
+
+        # perform acceleration actions for controlled human-driven vehicles
+        with profiler.phase('controllers'):
             if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    action = self.k.vehicle.get_acc_controller(
-                        veh_id).get_action(self)
-                    accel.append(action)
+                accel = self.get_controller_actions(
+                    self.k.vehicle.get_controlled_ids())
                 self.k.vehicle.apply_acceleration(
                     self.k.vehicle.get_controlled_ids(), accel)
 
-            # perform lane change actions for controlled human-driven vehicles
+        # perform lane change actions for controlled human-driven vehicles
+        with profiler.phase('lane_changes'):
             if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
                 direction = []
                 for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
+                    target_lane = \
+                        self.k.vehicle.get_lane_changing_controller(
+                            veh_id).get_action(self)
                     direction.append(target_lane)
                 self.k.vehicle.apply_lane_change(
                     self.k.vehicle.get_controlled_lc_ids(),
                     direction=direction)
 
-            # perform (optionally) routing actions for all vehicles in the
-            # network, including RL and SUMO-controlled vehicles
+        # perform (optionally) routing actions for all vehicles in the
+        # network, including RL and SUMO-controlled vehicles
+        with profiler.phase('routing'):
             routing_ids = []
             routing_actions = []
             for veh_id in self.k.vehicle.get_ids():
@@ -352,38 +576,66 @@ class Env(gym.Env):
 
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
-            self.apply_rl_actions(rl_actions)
+        with profiler.phase('rl_actions'):
+            # accelerations are held over all steps, see apply_acceleration
+            self.k.vehicle.action_steps = num_steps
+            try:
+                self.apply_rl_actions(rl_actions)
+            finally:
+                self.k.vehicle.action_steps = 1
 
+        with profiler.phase('additional_command'):
             self.additional_command()
 
-            # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
+    def _update_substep(self, record=True, num_steps=1):
+        """Update the kernel after a simulation step.
+
+        Parameters
+        ----------
+        record : bool, optional
+            whether the trajectories of the vehicles are recorded, see
+            flow.core.kernel.Kernel.update
+        num_steps : int, optional
+            number of simulation steps performed since the last update
+
+        Returns
+        -------
+        bool
+            whether the simulator experienced a collision
+        """
+        profiler = self.k.profiler
 
-            # store new observations in the vehicles and traffic lights class
-            self.k.update(reset=False)
+        # store new observations in the vehicles and traffic lights class
+        with profiler.phase('update'):
+            self.k.update(reset=False, record=record, num_steps=num_steps)
 
-            # update the colors of vehicles
-            if self.sim_params.render:
+        # update the colors of vehicles
+        if self.sim_params.render:
+            with profiler.phase('colors'):
                 self.k.vehicle.update_vehicle_colors()
 
-            # crash encodes whether the simulator experienced a collision
-            crash = self.k.simulation.check_collision()
+        # crash encodes whether the simulator experienced a collision
+        with profiler.phase('check_collision'):
+            return self.k.simulation.check_collision()
 
-            # stop collecting new simulation steps if there is a collision
-            if crash:
-                break
+    def _complete_step(self, rl_actions, crash):
+        """Compute the results of a step once the simulation has advanced.
 
-            # render a frame
-            self.render()
+        See step.
+        """
+        profiler = self.k.profiler
 
-        states = self.get_state()
+        with profiler.phase('get_state'):
+            states = self.get_state()
 
         # collect information of the state of the network based on the
         # environment class used
         self.state = np.asarray(states).T
 
-        # collect observation new state associated with action
-        next_observation = np.copy(states)
+        # collect observation new state associated with action. Observations
+        # computed by the observation extractor are new arrays, which do not
+        # need to be copied.
+        next_observation = self._own_observation(states)
 
         # test if the environment should terminate due to a collision or the
         # time horizon being met
@@ -394,11 +646,17 @@ class Env(gym.Env):
         infos = {}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            rl_clipped = self.clip_actions(rl_actions)
-            reward = self.compute_reward(rl_clipped, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with profiler.phase('compute_reward'):
+            if self.env_params.clip_actions:
+                rl_clipped = self.clip_actions(rl_actions)
+                reward = self.compute_reward(rl_clipped, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
+
+        # time spent in every phase of the step (if profiling is enabled)
+        step_times = profiler.end_step()
+        if step_times is not None:
+            infos['perf'] = step_times
 
         return next_observation, reward, done, infos
 
@@ -418,6 +676,9 @@ class Env(gym.Env):
             the initial observation of the space. The initial reward is assumed
             to be zero.
         """
+        # complete any step in progress, which uses the current simulation
+        self._finish_pending_step()
+
         # reset the time counter
         self.time_counter = 0
 
@@ -436,7 +697,14 @@ class Env(gym.Env):
                 "**********************************************************"
             )
 
-        if self.sim_params.restart_instance or \
+        # whether the state of the simulation is loaded from a snapshot saved
+        # during a previous reset
+        load_snapshot = self._use_reset_snapshot() \
+            and self._reset_snapshot is not None
+
+        # restarting the simulation is not needed if a snapshot is loaded, as
+        # the snapshot replaces its state along with its random seed
+        if (self.sim_params.restart_instance and not load_snapshot) or \
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
@@ -451,12 +719,21 @@ class Env(gym.Env):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
+        # load the state of the simulation after a previous reset (if saved)
+        if load_snapshot:
+            observation = self._load_reset_snapshot()
+
+            # render a frame
+            self.render(reset=True)
+
+            return observation
+
         # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
+        if self.simulator in ['traci', 'libsumo']:
             for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
                 try:
                     self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
+                except TRACI_EXCEPTIONS:
                     print(traceback.format_exc())
 
         # clear all vehicles from the network and the vehicles class
@@ -468,7 +745,7 @@ class Env(gym.Env):
                 continue
             try:
                 self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
+            except TRACI_EXCEPTIONS:
                 print("Error during start: {}".format(traceback.format_exc()))
 
         # reintroduce the initial vehicles to the network
@@ -484,11 +761,11 @@ class Env(gym.Env):
                     lane=lane_index,
                     pos=pos,
                     speed=speed)
-            except (FatalTraCIError, TraCIException):
+            except TRACI_EXCEPTIONS:
                 # if a vehicle was not removed in the first attempt, remove it
                 # now and then reintroduce it
                 self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
                 self.k.vehicle.add(
                     veh_id=veh_id,
@@ -508,7 +785,7 @@ class Env(gym.Env):
         if self.sim_params.render:
             self.k.vehicle.update_vehicle_colors()
 
-        if self.simulator == 'traci':
+        if self.simulator in ['traci', 'libsumo']:
             initial_ids = self.k.kernel_api.vehicle.getIDList()
         else:
             initial_ids = self.initial_ids
@@ -529,21 +806,156 @@ class Env(gym.Env):
         self.state = np.asarray(states).T
 
         # observation associated with the reset (no warm-up steps)
-        observation = np.copy(states)
+        observation = self._own_observation(states)
 
         # perform (optional) warm-up steps before training
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
 
+        # save the state of the simulation for future resets (if requested)
+        if self._use_reset_snapshot():
+            self._save_reset_snapshot(observation)
+
         # render a frame
         self.render(reset=True)
 
         return observation
 
+    def _use_reset_snapshot(self):
+        """Return whether resets should save and load simulation snapshots.
+
+        Snapshots are not used if the network was replaced since the snapshot
+        was saved (in which case the snapshot is discarded), or if vehicles
+        are shuffled upon reset.
+        """
+        try:
+            snapshot_reset = self.sim_params.snapshot_reset
+        except AttributeError:
+            snapshot_reset = False
+
+        if self._reset_snapshot is not None \
+                and self._reset_snapshot["network"] is not self.network:
+            self._discard_reset_snapshot()
+
+        return snapshot_reset \
+            and self.simulator in ['traci', 'libsumo'] \
+            and not self.initial_config.shuffle
+
+    def _save_reset_snapshot(self, observation):
+        """Save the current state of the simulation and the Flow kernel.
+
+        Parameters
+        ----------
+        observation : array_like
+            the observation returned by the reset
+        """
+        self._discard_reset_snapshot()
+
+        warnings.warn(
+            "snapshot_reset is enabled: all following resets load the state "
+            "of the simulation saved now, including the random number "
+            "generators of sumo. Rollouts will replay the same sumo "
+            "randomness, and the seed and restart_instance options are not "
+            "used by these resets.", RuntimeWarning)
+
+        fd, path = tempfile.mkstemp(suffix='.xml', prefix='flow_state_')
+        os.close(fd)
+        self.k.kernel_api.simulation.saveState(path)
+
+        # the vehicles kernel is stored without its references to the
+        # simulator, as was done for the initial vehicles
+        self.k.vehicle.kernel_api = None
+        self.k.vehicle.master_kernel = None
+        vehicle = deepcopy(self.k.vehicle)
+        self.k.vehicle.kernel_api = self.k.kernel_api
+        self.k.vehicle.master_kernel = self.k
+
+        self._reset_snapshot = {
+            "network": self.network,
+            "path": path,
+            "vehicle": vehicle,
+            "time_counter": self.time_counter,
+            "state": deepcopy(self.state),
+            "observation": deepcopy(observation),
+        }
+
+    def _load_reset_snapshot(self):
+        """Restore the simulation and the Flow kernel from a saved snapshot.
+
+        Returns
+        -------
+        array_like
+            the observation returned by the reset the snapshot was saved in
+        """
+        snapshot = self._reset_snapshot
+
+        self.k.kernel_api.simulation.loadState(snapshot["path"])
+
+        self.k.vehicle = deepcopy(snapshot["vehicle"])
+        self.k.vehicle.master_kernel = self.k
+        # loading the state discards all subscriptions, so pass the api to
+        # the kernels again to reintroduce them
+        self.k.pass_api(self.k.kernel_api)
+        self.k.vehicle.restore_subscriptions()
+
+        # update the colors of vehicles
+        if self.sim_params.render:
+            self.k.vehicle.update_vehicle_colors()
+
+        self.time_counter = snapshot["time_counter"]
+        self.state = deepcopy(snapshot["state"])
+
+        return deepcopy(snapshot["observation"])
+
+    def _discard_reset_snapshot(self):
+        """Delete the saved snapshot of the simulation (if any)."""
+        if self._reset_snapshot is not None:
+            try:
+                os.remove(self._reset_snapshot["path"])
+            except OSError:
+                pass
+            self._reset_snapshot = None
+
     def additional_command(self):
         """Additional commands that may be performed by the step method."""
         pass
 
+    def get_controller_actions(self, veh_ids):
+        """Return the actions of the acceleration controllers of vehicles.
+
+        Vehicles are grouped by the class of their acceleration controller,
+        and the actions of every group are computed together (see
+        `BaseController.get_action_batch`). This is equivalent to calling the
+        `get_action` method of every controller, except for the order in
+        which noise is sampled when several controller classes are used.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle ids
+
+        Returns
+        -------
+        list of float or None
+            the action of every vehicle's acceleration controller
+        """
+        controllers = [self.k.vehicle.get_acc_controller(veh_id)
+                       for veh_id in veh_ids]
+
+        # group the vehicles by the class of their controller
+        groups = {}
+        for i, controller in enumerate(controllers):
+            groups.setdefault(type(controller), []).append(i)
+
+        accel = [None] * len(veh_ids)
+        for controller_class, index in groups.items():
+            actions = controller_class.get_action_batch(
+                [controllers[i] for i in index], self)
+            for i, action in zip(index, actions):
+                accel[i] = action
+
+        return accel
+
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent.
 
@@ -658,6 +1070,35 @@ class Env(gym.Env):
         """
         return 0
 
+    def _own_observation(self, states):
+        """Return an observation that is not shared with the environment.
+
+        Observations are copied, unless they were computed by the
+        observation extractor of the environment (which allocates a new
+        array for every observation).
+        """
+        if self.observation_extractor is not None and \
+                states is self.observation_extractor.last_observation:
+            return states
+        return np.copy(states)
+
+    def perf_stats(self):
+        """Return the profiling statistics of the environment.
+
+        Statistics are only collected if profiling is enabled (see the
+        "profile" attribute of SumoParams).
+
+        Returns
+        -------
+        dict < str, dict < str, dict > >
+            the number of calls, total wall time, and mean wall time per call
+            of the phases of the steps ("phases"), of the updates of the
+            kernel subclasses ("kernels"), and of every type of command sent
+            to the simulator ("traci"). See
+            flow.core.kernel.profiler.StepProfiler.stats
+        """
+        return self.k.profiler.stats()
+
     def terminate(self):
         """Close the TraCI I/O connection.
 
@@ -665,8 +1106,15 @@ class Env(gym.Env):
         environment opens the TraCI connection.
         """
         try:
+            # complete any step in progress
+            self._finish_pending_step()
             # close everything within the kernel
             self.k.close()
+            # kill any sumo instances that were started ahead of time
+            if self.simulator == 'traci':
+                self.k.simulation.close_prewarmed_instances()
+            # delete the saved snapshot of the simulation
+            self._discard_reset_snapshot()
             # close pyglet renderer
             if self.sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
                 self.renderer.close()
@@ -21,6 +21,10 @@ import numpy as np
 from gym.spaces.box import Box
 
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, EdgeSpec, \
+    ConcatenatedSpec, Speed, Position, Lane, EdgeNumber, LaneHeadways, \
+    LaneTailways, LaneLeaderSpeeds, LaneFollowerSpeeds, EdgeMeanSpeed, \
+    EdgeDensity
 from flow.envs.base import Env
 
 MAX_LANES = 4  # base number of largest number of lanes in the network
@@ -285,7 +289,7 @@ class BottleneckEnv(Env):
             if self.k.vehicle.get_edge(veh_id) == EDGE_AFTER_RAMP_METER:
                 color = self.cars_before_ramp[veh_id]['color']
                 self.k.vehicle.set_color(veh_id, color)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = self.cars_before_ramp[veh_id][
                         'lane_change_mode']
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -301,7 +305,7 @@ class BottleneckEnv(Env):
             for veh_id, pos in cars_in_lane:
                 if pos > RAMP_METER_AREA:
                     if veh_id not in self.cars_waiting_for_toll:
-                        if self.simulator == 'traci':
+                        if self.simulator in ['traci', 'libsumo']:
                             # Disable lane changes inside Toll Area
                             lane_change_mode = \
                                 self.k.kernel_api.vehicle.getLaneChangeMode(
@@ -377,7 +381,7 @@ class BottleneckEnv(Env):
                 lane = self.k.vehicle.get_lane(veh_id)
                 color = self.cars_waiting_for_toll[veh_id]["color"]
                 self.k.vehicle.set_color(veh_id, color)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     lane_change_mode = \
                         self.cars_waiting_for_toll[veh_id]["lane_change_mode"]
                     self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -409,7 +413,7 @@ class BottleneckEnv(Env):
                 if pos > TOLL_BOOTH_AREA:
                     if veh_id not in self.cars_waiting_for_toll:
                         # Disable lane changes inside Toll Area
-                        if self.simulator == 'traci':
+                        if self.simulator in ['traci', 'libsumo']:
                             lane_change_mode = self.k.kernel_api.vehicle.\
                                 getLaneChangeMode(veh_id)
                             self.k.kernel_api.vehicle.setLaneChangeMode(
@@ -526,111 +530,76 @@ class BottleneckAccelEnv(BottleneckEnv):
         self.rl_id_list = deepcopy(self.initial_vehicles.get_rl_ids())
         self.max_speed = self.k.network.max_speed()
 
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def observation_space(self):
         """See class definition."""
-        num_edges = len(self.k.network.get_edge_list())
-        num_rl_veh = self.num_rl
-        num_obs = 2 * num_edges + 4 * MAX_LANES * self.scaling \
-            * num_rl_veh + 4 * num_rl_veh
+        return self.observation_extractor.observation_space
 
-        return Box(low=0, high=1, shape=(num_obs, ), dtype=np.float32)
+    def observation_spec(self):
+        """Return the specification of the observations.
 
-    def get_state(self):
-        """See class definition."""
-        headway_scale = 1000
+        The observations consist of the absolute position, speed, lane and
+        edge number of every RL vehicle, followed by the headways, tailways,
+        and speeds of the leaders and followers of every RL vehicle on all
+        lanes, and by the average speed and density of every edge. RL
+        vehicles are observed at their index in rl_id_list, and the values
+        of the vehicles that have exited the network are set to zero.
 
-        rl_ids = self.k.vehicle.get_rl_ids()
+        Returns
+        -------
+        flow.core.observations.ConcatenatedSpec
+        """
+        num_lanes = MAX_LANES * self.scaling
+        return ConcatenatedSpec([
+            ObservationSpec(
+                features=[
+                    Position(scale=1000),
+                    Speed(scale='max_speed'),
+                    Lane(scale=MAX_LANES),
+                    EdgeNumber(scale=6)],
+                vehicles=lambda env: env._rl_slots(),
+                num_vehicles=self.num_rl,
+                layout='vehicle'),
+            ObservationSpec(
+                features=[
+                    LaneHeadways(num_lanes, scale=1000),
+                    LaneTailways(num_lanes, scale=1000),
+                    LaneLeaderSpeeds(num_lanes, scale='max_speed',
+                                     missing=0),
+                    LaneFollowerSpeeds(num_lanes, scale='max_speed',
+                                       missing=0)],
+                vehicles=lambda env: env._rl_slots(),
+                num_vehicles=self.num_rl,
+                layout='vehicle'),
+            EdgeSpec(
+                features=[EdgeMeanSpeed(scale='max_speed'), EdgeDensity()],
+                layout='edge'),
+        ])
 
-        # rl vehicle data (absolute position, speed, and lane index)
-        rl_obs = np.empty(0)
-        id_counter = 0
-        for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                rl_obs = np.concatenate(
-                    (rl_obs, np.zeros(4 * (rl_id_num - id_counter))))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
+    def _rl_slots(self):
+        """Return the ids of the RL vehicles at their index in rl_id_list.
 
-            # get the edge and convert it to a number
-            edge_num = self.k.vehicle.get_edge(veh_id)
-            if edge_num is None or edge_num == '' or edge_num[0] == ':':
-                edge_num = -1
-            else:
-                edge_num = int(edge_num) / 6
-            rl_obs = np.concatenate((rl_obs, [
-                self.k.vehicle.get_x_by_id(veh_id) / 1000,
-                (self.k.vehicle.get_speed(veh_id) / self.max_speed),
-                (self.k.vehicle.get_lane(veh_id) / MAX_LANES), edge_num
-            ]))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(rl_obs.shape[0] / 4)
-        if diff > 0:
-            rl_obs = np.concatenate((rl_obs, np.zeros(4 * diff)))
-
-        # relative vehicles data (lane headways, tailways, vel_ahead, and
-        # vel_behind)
-        relative_obs = np.empty(0)
-        id_counter = 0
+        The RL vehicles that are not in the network are replaced by None.
+        RL vehicles that are not in rl_id_list yet (e.g. the ones that are
+        only added to the network once the simulation starts) are appended
+        to it, up to num_rl vehicles.
+        """
+        rl_ids = self.k.vehicle.get_rl_ids()
         for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                pad_mat = np.zeros(
-                    4 * MAX_LANES * self.scaling * (rl_id_num - id_counter))
-                relative_obs = np.concatenate((relative_obs, pad_mat))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
-            num_lanes = MAX_LANES * self.scaling
-            headway = np.asarray([1000] * num_lanes) / headway_scale
-            tailway = np.asarray([1000] * num_lanes) / headway_scale
-            vel_in_front = np.asarray([0] * num_lanes) / self.max_speed
-            vel_behind = np.asarray([0] * num_lanes) / self.max_speed
-
-            lane_leaders = self.k.vehicle.get_lane_leaders(veh_id)
-            lane_followers = self.k.vehicle.get_lane_followers(veh_id)
-            lane_headways = self.k.vehicle.get_lane_headways(veh_id)
-            lane_tailways = self.k.vehicle.get_lane_tailways(veh_id)
-            headway[0:len(lane_headways)] = (
-                np.asarray(lane_headways) / headway_scale)
-            tailway[0:len(lane_tailways)] = (
-                np.asarray(lane_tailways) / headway_scale)
-            for i, lane_leader in enumerate(lane_leaders):
-                if lane_leader != '':
-                    vel_in_front[i] = (
-                        self.k.vehicle.get_speed(lane_leader) / self.max_speed)
-            for i, lane_follower in enumerate(lane_followers):
-                if lane_followers != '':
-                    vel_behind[i] = (self.k.vehicle.get_speed(lane_follower) /
-                                     self.max_speed)
-
-            relative_obs = np.concatenate((relative_obs, headway, tailway,
-                                           vel_in_front, vel_behind))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(relative_obs.shape[0] / (4 * MAX_LANES))
-        if diff > 0:
-            relative_obs = np.concatenate((relative_obs,
-                                           np.zeros(4 * MAX_LANES * diff)))
-
-        # per edge data (average speed, density
-        edge_obs = []
-        for edge in self.k.network.get_edge_list():
-            veh_ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(veh_ids) > 0:
-                avg_speed = (sum(self.k.vehicle.get_speed(veh_ids)) /
-                             len(veh_ids)) / self.max_speed
-                density = len(veh_ids) / self.k.network.edge_length(edge)
-                edge_obs += [avg_speed, density]
-            else:
-                edge_obs += [0, 0]
+            if veh_id not in self.rl_id_list and \
+                    len(self.rl_id_list) < self.num_rl:
+                self.rl_id_list.append(veh_id)
+        slots = [None] * len(self.rl_id_list)
+        for veh_id in rl_ids:
+            if veh_id in self.rl_id_list:
+                slots[self.rl_id_list.index(veh_id)] = veh_id
+        return slots
 
-        return np.concatenate((rl_obs, relative_obs, edge_obs))
+    def get_state(self):
+        """See class definition."""
+        return self.observation_extractor(self)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
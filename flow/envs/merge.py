@@ -7,6 +7,8 @@ TODO(ak): add paper after it has been published.
 
 from flow.envs.base import Env
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, Speed, LeaderSpeed, \
+    LeaderDistance, FollowerSpeed, FollowerGap
 
 from gym.spaces.box import Box
 
@@ -92,6 +94,8 @@ class MergePOEnv(Env):
 
         super().__init__(env_params, sim_params, network, simulator)
 
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def action_space(self):
         """See class definition."""
@@ -104,7 +108,34 @@ class MergePOEnv(Env):
     @property
     def observation_space(self):
         """See class definition."""
-        return Box(low=0, high=1, shape=(5 * self.num_rl, ), dtype=np.float32)
+        return self.observation_extractor.observation_space
+
+    def observation_spec(self):
+        """Return the specification of the observations.
+
+        The observations consist, for every controlled vehicle in rl_veh, of
+        its speed, the speed of its leader relative to its own speed, the
+        distance to its leader, its speed relative to the speed of its
+        follower, and the headway of its follower. Missing leaders are
+        observed at the maximum speed and at the length of the network, and
+        missing followers at a speed of zero and at the length of the
+        network.
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        return ObservationSpec(
+            features=[
+                Speed(scale='max_speed'),
+                LeaderSpeed(scale='max_speed', default='max_speed',
+                            relative=True),
+                LeaderDistance(scale='length'),
+                FollowerSpeed(scale='max_speed', default=0, relative=True),
+                FollowerGap(scale='length')],
+            vehicles=lambda env: env.rl_veh,
+            num_vehicles=self.num_rl,
+            layout='vehicle')
 
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
@@ -116,46 +147,7 @@ class MergePOEnv(Env):
 
     def get_state(self, rl_id=None, **kwargs):
         """See class definition."""
-        self.leader = []
-        self.follower = []
-
-        # normalizing constants
-        max_speed = self.k.network.max_speed()
-        max_length = self.k.network.length()
-
-        observation = [0 for _ in range(5 * self.num_rl)]
-        for i, rl_id in enumerate(self.rl_veh):
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation[5 * i + 0] = this_speed / max_speed
-            observation[5 * i + 1] = (lead_speed - this_speed) / max_speed
-            observation[5 * i + 2] = lead_head / max_length
-            observation[5 * i + 3] = (this_speed - follow_speed) / max_speed
-            observation[5 * i + 4] = follow_head / max_length
-
-        return observation
+        return self.observation_extractor(self)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -191,13 +183,21 @@ class MergePOEnv(Env):
 
         This method performs to auxiliary tasks:
 
-        * Define which vehicles are observed for visualization purposes.
+        * Define which vehicles are observed for visualization purposes: the
+          leaders and followers of the controlled vehicles, as observed at
+          the last step.
         * Maintains the "rl_veh" and "rl_queue" variables to ensure the RL
           vehicles that are represented in the state space does not change
           until one of the vehicles in the state space leaves the network.
           Then, the next vehicle in the queue is added to the state space and
           provided with actions from the policy.
         """
+        # the leaders and followers observed at the last step
+        self.leader = [veh_id for veh_id in
+                       self.k.vehicle.get_leader(self.rl_veh) if veh_id]
+        self.follower = [veh_id for veh_id in
+                         self.k.vehicle.get_follower(self.rl_veh) if veh_id]
+
         # add rl vehicles that just entered the network into the rl queue
         for veh_id in self.k.vehicle.get_rl_ids():
             if veh_id not in list(self.rl_queue) + self.rl_veh:
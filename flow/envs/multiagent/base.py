@@ -6,11 +6,10 @@ import random
 import traceback
 from gym.spaces import Box
 
-from traci.exceptions import FatalTraCIError
-from traci.exceptions import TraCIException
 
 from ray.rllib.env import MultiAgentEnv
 
+from flow.core.kernel.simulation.libsumo import TRACI_EXCEPTIONS
 from flow.envs.base import Env
 from flow.utils.exceptions import FatalFlowError
 
@@ -48,64 +47,37 @@ class MultiEnv(MultiAgentEnv, Env):
         info : dict
             contains other diagnostic information from the previous action
         """
-        for _ in range(self.env_params.sims_per_step):
-            self.time_counter += 1
-            self.step_counter += 1
-
-            # perform acceleration actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    accel_contr = self.k.vehicle.get_acc_controller(veh_id)
-                    action = accel_contr.get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
-
-            # perform lane change actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
-                direction = []
-                for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
-                    direction.append(target_lane)
-                self.k.vehicle.apply_lane_change(
-                    self.k.vehicle.get_controlled_lc_ids(),
-                    direction=direction)
-
-            # perform (optionally) routing actions for all vehicle in the
-            # network, including rl and sumo-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-            self.k.vehicle.choose_routes(routing_ids, routing_actions)
-
-            self.apply_rl_actions(rl_actions)
-
-            self.additional_command()
-
-            # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
-
-            # store new observations in the vehicles and traffic lights class
-            self.k.update(reset=False)
-
-            # update the colors of vehicles
-            if self.sim_params.render:
-                self.k.vehicle.update_vehicle_colors()
-
-            # crash encodes whether the simulator experienced a collision
-            crash = self.k.simulation.check_collision()
+        if self._pending_step is not None:
+            raise RuntimeError('step cannot be called while a step started '
+                               'by step_async is in progress.')
+        self._run_deferred_work()
+
+        profiler = self.k.profiler
+        profiler.begin_step()
+
+        num_steps = self._steps_per_advance()
+        for _ in range(self.env_params.sims_per_step // num_steps):
+            self._apply_substep_actions(rl_actions, num_steps)
+
+            # advance the simulation in the simulator by one step (or by all
+            # steps of the environment step at once, see _steps_per_advance)
+            with profiler.phase('simulation_step'):
+                self.k.simulation.simulation_step(num_steps)
+
+            crash = self._update_substep(num_steps=num_steps)
 
             # stop collecting new simulation steps if there is a collision
             if crash:
                 break
 
-        states = self.get_state()
+        return self._complete_step(rl_actions, crash)
+
+    def _complete_step(self, rl_actions, crash):
+        """See parent class."""
+        profiler = self.k.profiler
+
+        with profiler.phase('get_state'):
+            states = self.get_state()
         done = {key: key in self.k.vehicle.get_arrived_ids()
                 for key in states.keys()}
         if crash:
@@ -115,11 +87,16 @@ class MultiEnv(MultiAgentEnv, Env):
         infos = {key: {} for key in states.keys()}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            clipped_actions = self.clip_actions(rl_actions)
-            reward = self.compute_reward(clipped_actions, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with profiler.phase('compute_reward'):
+            if self.env_params.clip_actions:
+                clipped_actions = self.clip_actions(rl_actions)
+                reward = self.compute_reward(clipped_actions, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
+
+        # the infos are keyed by agent, so the time spent in every phase is
+        # only available through perf_stats
+        profiler.end_step()
 
         return states, reward, done, infos
 
@@ -139,6 +116,9 @@ class MultiEnv(MultiAgentEnv, Env):
             the initial observation of the space. The initial reward is assumed
             to be zero.
         """
+        # complete any step in progress, which uses the current simulation
+        self._finish_pending_step()
+
         # reset the time counter
         self.time_counter = 0
 
@@ -172,12 +152,21 @@ class MultiEnv(MultiAgentEnv, Env):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
+        # load the state of the simulation after a previous reset (if saved)
+        if self._use_reset_snapshot() and self._reset_snapshot is not None:
+            self._load_reset_snapshot()
+
+            # render a frame
+            self.render(reset=True)
+
+            return self.get_state()
+
         # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
+        if self.simulator in ['traci', 'libsumo']:
             for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
                 try:
                     self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
+                except TRACI_EXCEPTIONS:
                     print(traceback.format_exc())
 
         # clear all vehicles from the network and the vehicles class
@@ -189,7 +178,7 @@ class MultiEnv(MultiAgentEnv, Env):
                 continue
             try:
                 self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
+            except TRACI_EXCEPTIONS:
                 print("Error during start: {}".format(traceback.format_exc()))
 
         # reintroduce the initial vehicles to the network
@@ -205,11 +194,11 @@ class MultiEnv(MultiAgentEnv, Env):
                     lane=lane_index,
                     pos=pos,
                     speed=speed)
-            except (FatalTraCIError, TraCIException):
+            except TRACI_EXCEPTIONS:
                 # if a vehicle was not removed in the first attempt, remove it
                 # now and then reintroduce it
                 self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
+                if self.simulator in ['traci', 'libsumo']:
                     self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
                 self.k.vehicle.add(
                     veh_id=veh_id,
@@ -243,6 +232,10 @@ class MultiEnv(MultiAgentEnv, Env):
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
 
+        # save the state of the simulation for future resets (if requested)
+        if self._use_reset_snapshot():
+            self._save_reset_snapshot(None)
+
         # render a frame
         self.render(reset=True)
 
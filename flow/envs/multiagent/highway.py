@@ -2,6 +2,8 @@
 import numpy as np
 from gym.spaces.box import Box
 from flow.core.rewards import desired_velocity
+from flow.core.observations import ObservationSpec, Speed, LeaderSpeed, \
+    LeaderGap, FollowerSpeed, FollowerGap
 from flow.envs.multiagent.base import MultiEnv
 
 
@@ -65,10 +67,39 @@ class MultiAgentHighwayPOEnv(MultiEnv):
 
         super().__init__(env_params, sim_params, network, simulator)
 
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def observation_space(self):
         """See class definition."""
-        return Box(-float('inf'), float('inf'), shape=(5,), dtype=np.float32)
+        return self.observation_extractor.observation_space
+
+    def observation_spec(self):
+        """Return the specification of the observations of an agent.
+
+        The observations consist of the speed of the RL vehicle, the speed of
+        its leader relative to its own speed, its headway, its speed relative
+        to the speed of its follower, and the headway of its follower.
+        Missing leaders are observed at the maximum speed and at the length of
+        the network, and missing followers at a speed of zero and at the
+        length of the network.
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        bounds = dict(low=-float('inf'), high=float('inf'))
+        return ObservationSpec(
+            features=[
+                Speed(scale='max_speed', **bounds),
+                LeaderSpeed(scale='max_speed', default='max_speed',
+                            relative=True, **bounds),
+                LeaderGap(scale='length', **bounds),
+                FollowerSpeed(scale='max_speed', default=0, relative=True,
+                              **bounds),
+                FollowerGap(scale='length', **bounds)],
+            vehicles=lambda env: env.k.vehicle.get_rl_ids(),
+            num_vehicles=1)
 
     @property
     def action_space(self):
@@ -96,44 +127,7 @@ class MultiAgentHighwayPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
-
-        # normalizing constants
-        max_speed = self.k.network.max_speed()
-        max_length = self.k.network.length()
-
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_headway(lead_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation = np.array([
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-            obs.update({rl_id: observation})
-
-        return obs
+        return self.observation_extractor.per_vehicle(self)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -2,6 +2,7 @@
 
 import numpy as np
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, Speed, Position
 from flow.envs.ring.accel import AccelEnv
 from flow.envs.multiagent.base import MultiEnv
 
@@ -39,14 +40,26 @@ class MultiAgentAccelEnv(AccelEnv, MultiEnv):
             reward = rewards.desired_velocity(self, fail=kwargs['fail'])
             return {'av': reward, 'adversary': -reward}
 
+    def observation_spec(self):
+        """Return the specification of the observations.
+
+        The observations consist of the speed and absolute position of every
+        vehicle, sorted by position (see sorted_ids).
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        return ObservationSpec(
+            features=[Speed(scale='max_speed'), Position(scale='length')],
+            vehicles=lambda env: env.sorted_ids,
+            num_vehicles=self.initial_vehicles.num_vehicles,
+            layout='vehicle')
+
     def get_state(self, **kwargs):
         """See class definition for the state.
 
         The adversary state and the agent state are identical.
         """
-        state = np.array([[
-            self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed(),
-            self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-        ] for veh_id in self.sorted_ids])
-        state = np.ndarray.flatten(state)
+        state = self.observation_extractor(self)
         return {'av': state, 'adversary': state}
@@ -10,6 +10,8 @@ abs/1710.05465, 2017. [Online]. Available: https://arxiv.org/abs/1710.05465
 
 import numpy as np
 from gym.spaces.box import Box
+from flow.core.observations import ObservationSpec, Speed, LeaderSpeed, \
+    Headway
 from flow.envs.multiagent.base import MultiEnv
 
 ADDITIONAL_ENV_PARAMS = {
@@ -46,10 +48,38 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
 
     """
 
+    def __init__(self, env_params, sim_params, network, simulator='traci'):
+        super().__init__(env_params, sim_params, network, simulator)
+
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def observation_space(self):
         """See class definition."""
-        return Box(low=-1, high=1, shape=(3,), dtype=np.float32)
+        return self.observation_extractor.observation_space
+
+    def observation_spec(self):
+        """Return the specification of the observations of an agent.
+
+        The observations consist of the speed of the RL vehicle, the speed of
+        its leader relative to its own speed (zero if it has no leader), and
+        its headway.
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        # normalizers
+        max_speed = 15.
+        max_length = self.env_params.additional_params['ring_length'][1]
+        return ObservationSpec(
+            features=[
+                Speed(scale=max_speed, low=-1),
+                LeaderSpeed(scale=max_speed, low=-1, missing=0,
+                            relative=True),
+                Headway(scale=max_length, low=-1)],
+            vehicles=lambda env: env.k.vehicle.get_rl_ids(),
+            num_vehicles=1)
 
     @property
     def action_space(self):
@@ -64,24 +94,7 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            lead_id = self.k.vehicle.get_leader(rl_id) or rl_id
-
-            # normalizers
-            max_speed = 15.
-            max_length = self.env_params.additional_params['ring_length'][1]
-
-            observation = np.array([
-                self.k.vehicle.get_speed(rl_id) / max_speed,
-                (self.k.vehicle.get_speed(lead_id) -
-                 self.k.vehicle.get_speed(rl_id))
-                / max_speed,
-                self.k.vehicle.get_headway(rl_id) / max_length
-            ])
-            obs.update({rl_id: observation})
-
-        return obs
+        return self.observation_extractor.per_vehicle(self)
 
     def _apply_rl_actions(self, rl_actions):
         """Split the accelerations by ring."""
@@ -9,6 +9,8 @@ from gym.spaces.box import Box
 from gym.spaces.discrete import Discrete
 
 from flow.core import rewards
+from flow.core.observations import EdgeSpec, ArraySpec, ConcatenatedSpec, \
+    EdgeDensity, EdgeMeanSpeed
 from flow.envs.traffic_light_grid import TrafficLightGridPOEnv
 from flow.envs.multiagent import MultiEnv
 
@@ -57,6 +59,12 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         self.num_local_edges = env_params.additional_params.get(
             "num_local_edges", 4)
 
+    def _compile_observation_spec(self):
+        """Compile the specifications of the observations of all agents."""
+        self.observation_extractors = {
+            rl_id: self.agent_observation_spec(rl_id).compile(self)
+            for rl_id in self.k.traffic_light.get_ids()}
+
     @property
     def observation_space(self):
         """State space that is partially observed.
@@ -75,6 +83,42 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
             dtype=np.float32)
         return tl_box
 
+    def agent_observation_spec(self, rl_id):
+        """Return the specification of the observations of an agent.
+
+        The observations consist of the speeds, distances to the
+        intersection and edge numbers of the self.num_observed vehicles
+        closest to the intersection on every edge leading to the
+        intersection of the agent, followed by the density and average speed
+        of these edges, and by the states of the traffic lights of the
+        intersection and of its neighbors (see `_light_states`). Missing
+        vehicles are observed with a speed and a distance of one, and an
+        edge number of zero.
+
+        Parameters
+        ----------
+        rl_id : str
+            id of the traffic light of the agent
+
+        Returns
+        -------
+        flow.core.observations.ConcatenatedSpec
+        """
+        rl_id_num = int(rl_id.split("center")[ID_IDX])
+        local_edges = self.network.node_mapping[rl_id_num][1]
+        local_id_nums = [rl_id_num, self._get_relative_node(rl_id, "top"),
+                         self._get_relative_node(rl_id, "bottom"),
+                         self._get_relative_node(rl_id, "left"),
+                         self._get_relative_node(rl_id, "right")]
+        return ConcatenatedSpec([
+            self._observed_vehicles_spec(local_edges, fill=(1, 1, 0)),
+            EdgeSpec([EdgeDensity(scale=0.2),
+                      EdgeMeanSpeed(scale='max_speed_limit')],
+                     edges=local_edges),
+            ArraySpec(lambda env: env._light_states(local_id_nums),
+                      3 * len(local_id_nums)),
+        ])
+
     @property
     def action_space(self):
         """See class definition."""
@@ -94,112 +138,14 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         - For the self.num_observed number of vehicles closest and incoming
         towards traffic light agent, gives the vehicle velocity, distance to
         intersection, edge number.
-        - For edges in the network, gives the density and average velocity.
+        - For the edges leading to the traffic light agent, gives the density
+        and average velocity.
         - For the self.num_local_lights number of nearest lights (itself
         included), gives the traffic light information, including the last
         change time, light direction (i.e. phase), and a currently_yellow flag.
         """
-        # Normalization factors
-        max_speed = max(
-            self.k.network.speed_limit(edge)
-            for edge in self.k.network.get_edge_list())
-        grid_array = self.net_params.additional_params["grid_array"]
-        max_dist = max(grid_array["short_length"], grid_array["long_length"],
-                       grid_array["inner_length"])
-
-        # TODO(cathywu) refactor TrafficLightGridPOEnv with convenience
-        # methods for observations, but remember to flatten for single-agent
-
-        # Observed vehicle information
-        speeds = []
-        dist_to_intersec = []
-        edge_number = []
-        all_observed_ids = []
-        for _, edges in self.network.node_mapping:
-            local_speeds = []
-            local_dists_to_intersec = []
-            local_edge_numbers = []
-            for edge in edges:
-                observed_ids = \
-                    self.get_closest_to_intersection(edge, self.num_observed)
-                all_observed_ids.append(observed_ids)
-
-                # check which edges we have so we can always pad in the right
-                # positions
-                local_speeds.extend(
-                    [self.k.vehicle.get_speed(veh_id) / max_speed for veh_id in
-                     observed_ids])
-                local_dists_to_intersec.extend([(self.k.network.edge_length(
-                    self.k.vehicle.get_edge(
-                        veh_id)) - self.k.vehicle.get_position(
-                    veh_id)) / max_dist for veh_id in observed_ids])
-                local_edge_numbers.extend([self._convert_edge(
-                    self.k.vehicle.get_edge(veh_id)) / (
-                    self.k.network.network.num_edges - 1) for veh_id in
-                                           observed_ids])
-
-                if len(observed_ids) < self.num_observed:
-                    diff = self.num_observed - len(observed_ids)
-                    local_speeds.extend([1] * diff)
-                    local_dists_to_intersec.extend([1] * diff)
-                    local_edge_numbers.extend([0] * diff)
-
-            speeds.append(local_speeds)
-            dist_to_intersec.append(local_dists_to_intersec)
-            edge_number.append(local_edge_numbers)
-
-        # Edge information
-        density = []
-        velocity_avg = []
-        for edge in self.k.network.get_edge_list():
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(ids) > 0:
-                # TODO(cathywu) Why is there a 5 here?
-                density += [5 * len(ids) / self.k.network.edge_length(edge)]
-                velocity_avg += [np.mean(
-                    [self.k.vehicle.get_speed(veh_id) for veh_id in
-                     ids]) / max_speed]
-            else:
-                density += [0]
-                velocity_avg += [0]
-        density = np.array(density)
-        velocity_avg = np.array(velocity_avg)
-        self.observed_ids = all_observed_ids
-
-        # Traffic light information
-        last_change = self.last_change.flatten()
-        direction = self.direction.flatten()
-        currently_yellow = self.currently_yellow.flatten()
-        # This is a catch-all for when the relative_node method returns a -1
-        # (when there is no node in the direction sought). We add a last
-        # item to the lists here, which will serve as a default value.
-        # TODO(cathywu) are these values reasonable?
-        last_change = np.append(last_change, [0])
-        direction = np.append(direction, [0])
-        currently_yellow = np.append(currently_yellow, [1])
-
-        obs = {}
-        # TODO(cathywu) allow differentiation between rl and non-rl lights
-        node_to_edges = self.network.node_mapping
-        for rl_id in self.k.traffic_light.get_ids():
-            rl_id_num = int(rl_id.split("center")[ID_IDX])
-            local_edges = node_to_edges[rl_id_num][1]
-            local_edge_numbers = [self.k.network.get_edge_list().index(e)
-                                  for e in local_edges]
-            local_id_nums = [rl_id_num, self._get_relative_node(rl_id, "top"),
-                             self._get_relative_node(rl_id, "bottom"),
-                             self._get_relative_node(rl_id, "left"),
-                             self._get_relative_node(rl_id, "right")]
-
-            observation = np.array(np.concatenate(
-                [speeds[rl_id_num], dist_to_intersec[rl_id_num],
-                 edge_number[rl_id_num], density[local_edge_numbers],
-                 velocity_avg[local_edge_numbers], last_change[local_id_nums],
-                 direction[local_id_nums], currently_yellow[local_id_nums]
-                 ]))
-            obs.update({rl_id: observation})
-
-        return obs
+        return {rl_id: extractor(self)
+                for rl_id, extractor in self.observation_extractors.items()}
 
     def _apply_rl_actions(self, rl_actions):
         """
@@ -258,10 +204,3 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         for rl_id in rl_actions.keys():
             rews[rl_id] = rew
         return rews
-
-    def additional_command(self):
-        """See class definition."""
-        # specify observed vehicles
-        for veh_ids in self.observed_ids:
-            for veh_id in veh_ids:
-                self.k.vehicle.set_observed(veh_id)
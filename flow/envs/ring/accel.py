@@ -1,6 +1,7 @@
 """Environment for training the acceleration behavior of vehicles in a ring."""
 
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, Speed, Position
 from flow.envs.base import Env
 
 from gym.spaces.box import Box
@@ -79,6 +80,8 @@ class AccelEnv(Env):
 
         super().__init__(env_params, sim_params, network, simulator)
 
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def action_space(self):
         """See class definition."""
@@ -92,11 +95,22 @@ class AccelEnv(Env):
     def observation_space(self):
         """See class definition."""
         self.obs_var_labels = ['Velocity', 'Absolute_pos']
-        return Box(
-            low=0,
-            high=1,
-            shape=(2 * self.initial_vehicles.num_vehicles, ),
-            dtype=np.float32)
+        return self.observation_extractor.observation_space
+
+    def observation_spec(self):
+        """Return the specification of the observations.
+
+        The observations consist of the speeds of all vehicles, followed by
+        their absolute positions, sorted by position (see sorted_ids).
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        return ObservationSpec(
+            features=[Speed(scale='max_speed'), Position(scale='length')],
+            vehicles=lambda env: env.sorted_ids,
+            num_vehicles=self.initial_vehicles.num_vehicles)
 
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
@@ -115,12 +129,7 @@ class AccelEnv(Env):
 
     def get_state(self):
         """See class definition."""
-        speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
-                 for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-               for veh_id in self.sorted_ids]
-
-        return np.array(speed + pos)
+        return self.observation_extractor(self)
 
     def additional_command(self):
         """See parent class.
@@ -134,8 +143,9 @@ class AccelEnv(Env):
                 self.k.vehicle.set_observed(veh_id)
 
         # update the "absolute_position" variable
-        for veh_id in self.k.vehicle.get_ids():
-            this_pos = self.k.vehicle.get_x_by_id(veh_id)
+        veh_ids = self.k.vehicle.get_ids()
+        x = self.k.vehicle.get_x_array(veh_ids).tolist()
+        for veh_id, this_pos in zip(veh_ids, x):
 
             if this_pos == -1001:
                 # in case the vehicle isn't in the network
@@ -147,6 +157,9 @@ class AccelEnv(Env):
                     % self.k.network.length()
                 self.prev_pos[veh_id] = this_pos
 
+        # the sorting of vehicles depends on their absolute positions
+        self.k.cache.discard(('sorted_ids',))
+
     @property
     def sorted_ids(self):
         """Sort the vehicle ids of vehicles in the network by position.
@@ -154,13 +167,17 @@ class AccelEnv(Env):
         This environment does this by sorting vehicles by their absolute
         position, defined as their initial position plus distance traveled.
 
+        The sorted ids are computed at most once per time step, and shared
+        through the cache of the kernel.
+
         Returns
         -------
         list of str
             a list of all vehicle IDs sorted by position
         """
         if self.env_params.additional_params['sort_vehicles']:
-            return sorted(self.k.vehicle.get_ids(), key=self._get_abs_position)
+            return self.k.cache.get(('sorted_ids',), lambda: sorted(
+                self.k.vehicle.get_ids(), key=self._get_abs_position))
         else:
             return self.k.vehicle.get_ids()
 
@@ -176,8 +193,11 @@ class AccelEnv(Env):
         """
         obs = super().reset()
 
-        for veh_id in self.k.vehicle.get_ids():
-            self.absolute_position[veh_id] = self.k.vehicle.get_x_by_id(veh_id)
-            self.prev_pos[veh_id] = self.k.vehicle.get_x_by_id(veh_id)
+        veh_ids = self.k.vehicle.get_ids()
+        x = self.k.vehicle.get_x_array(veh_ids).tolist()
+        for veh_id, this_pos in zip(veh_ids, x):
+            self.absolute_position[veh_id] = this_pos
+            self.prev_pos[veh_id] = this_pos
+        self.k.cache.discard(('sorted_ids',))
 
         return obs
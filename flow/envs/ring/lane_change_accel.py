@@ -2,6 +2,7 @@
 
 from flow.envs.ring.accel import AccelEnv
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, Speed, Position, Lane
 
 from gym.spaces.box import Box
 import numpy as np
@@ -88,14 +89,17 @@ class LaneChangeAccelEnv(AccelEnv):
 
         return Box(np.array(lb), np.array(ub), dtype=np.float32)
 
-    @property
-    def observation_space(self):
-        """See class definition."""
-        return Box(
-            low=0,
-            high=1,
-            shape=(3 * self.initial_vehicles.num_vehicles, ),
-            dtype=np.float32)
+    def observation_spec(self):
+        """See parent class.
+
+        The observations also include the lane indices of all vehicles.
+        """
+        return ObservationSpec(
+            features=[Speed(scale='max_speed'),
+                      Position(scale='length'),
+                      Lane(scale='max_lanes')],
+            vehicles=lambda env: env.sorted_ids,
+            num_vehicles=self.initial_vehicles.num_vehicles)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -111,24 +115,6 @@ class LaneChangeAccelEnv(AccelEnv):
 
         return reward
 
-    def get_state(self):
-        """See class definition."""
-        # normalizers
-        max_speed = self.k.network.max_speed()
-        length = self.k.network.length()
-        max_lanes = max(
-            self.k.network.num_lanes(edge)
-            for edge in self.k.network.get_edge_list())
-
-        speed = [self.k.vehicle.get_speed(veh_id) / max_speed
-                 for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / length
-               for veh_id in self.sorted_ids]
-        lane = [self.k.vehicle.get_lane(veh_id) / max_lanes
-                for veh_id in self.sorted_ids]
-
-        return np.array(speed + pos + lane)
-
     def _apply_rl_actions(self, actions):
         """See class definition."""
         acceleration = actions[::2]
@@ -142,10 +142,10 @@ class WaveAttenuationEnv(Env):
         """See class definition."""
         speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
                  for veh_id in self.k.vehicle.get_ids()]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-               for veh_id in self.k.vehicle.get_ids()]
+        pos = self.k.vehicle.get_x_array(self.k.vehicle.get_ids()) / \
+            self.k.network.length()
 
-        return np.array(speed + pos)
+        return np.concatenate((speed, pos))
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -262,13 +262,13 @@ class WaveAttenuationPOEnv(WaveAttenuationEnv):
         else:
             max_length = self.k.network.length()
 
+        lead_x, rl_x = self.k.vehicle.get_x_array([lead_id, rl_id])
+
         observation = np.array([
             self.k.vehicle.get_speed(rl_id) / max_speed,
             (self.k.vehicle.get_speed(lead_id) -
              self.k.vehicle.get_speed(rl_id)) / max_speed,
-            (self.k.vehicle.get_x_by_id(lead_id) -
-             self.k.vehicle.get_x_by_id(rl_id)) % self.k.network.length()
-            / max_length
+            (lead_x - rl_x) % self.k.network.length() / max_length
         ])
 
         return observation
@@ -12,6 +12,9 @@ from gym.spaces.discrete import Discrete
 from gym.spaces import Tuple
 
 from flow.core import rewards
+from flow.core.observations import ObservationSpec, EdgeSpec, ArraySpec, \
+    ConcatenatedSpec, Speed, DistanceToEdgeEnd, EdgeNumber, EdgeDensity, \
+    EdgeMeanSpeed
 from flow.envs.base import Env
 
 ADDITIONAL_ENV_PARAMS = {
@@ -629,6 +632,12 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
         # used during visualization
         self.observed_ids = []
 
+        self._compile_observation_spec()
+
+    def _compile_observation_spec(self):
+        """Compile the specification of the observations."""
+        self.observation_extractor = self.observation_spec().compile(self)
+
     @property
     def observation_space(self):
         """State space that is partially observed.
@@ -637,14 +646,82 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
         vehicles) from each direction, edge information, and traffic light
         state.
         """
-        tl_box = Box(
-            low=0.,
-            high=1,
-            shape=(3 * 4 * self.num_observed * self.num_traffic_lights +
-                   2 * len(self.k.network.get_edge_list()) +
-                   3 * self.num_traffic_lights,),
-            dtype=np.float32)
-        return tl_box
+        return self.observation_extractor.observation_space
+
+    def observation_spec(self):
+        """Return the specification of the observations.
+
+        The observations consist of the speeds, distances to the
+        intersection and edge numbers of the self.num_observed vehicles
+        closest to the intersection on every edge leading to an
+        intersection, followed by the density and average speed of every
+        edge, and by the states of the traffic lights (see
+        `_light_states`). Missing vehicles are observed as zeros.
+
+        Returns
+        -------
+        flow.core.observations.ConcatenatedSpec
+        """
+        edges = [edge for _, node_edges in self.network.node_mapping
+                 for edge in node_edges]
+        nodes = list(range(self.num_traffic_lights))
+        return ConcatenatedSpec([
+            self._observed_vehicles_spec(edges),
+            EdgeSpec([EdgeDensity(scale=0.2),
+                      EdgeMeanSpeed(scale='max_speed_limit')]),
+            ArraySpec(lambda env: env._light_states(nodes), 3 * len(nodes)),
+        ])
+
+    def _observed_vehicles_spec(self, edges, fill=(0, 0, 0)):
+        """Return the spec of the vehicles closest to the intersections.
+
+        Parameters
+        ----------
+        edges : list of str
+            the edges whose vehicles are observed
+        fill : tuple of float, optional
+            values of the speed, distance to the intersection and edge number
+            of missing vehicles
+
+        Returns
+        -------
+        flow.core.observations.ObservationSpec
+        """
+        grid_array = self.net_params.additional_params["grid_array"]
+        max_dist = max(grid_array["short_length"], grid_array["long_length"],
+                       grid_array["inner_length"])
+        return ObservationSpec(
+            features=[
+                Speed(scale='max_speed_limit', fill=fill[0]),
+                DistanceToEdgeEnd(scale=max_dist, fill=fill[1]),
+                EdgeNumber(convert=self._convert_edge,
+                           scale=self.k.network.network.num_edges - 1,
+                           fill=fill[2])],
+            vehicles=lambda env: env._closest_to_intersections(edges),
+            num_vehicles=self.num_observed * len(edges))
+
+    def _closest_to_intersections(self, edges):
+        """Return the ids of the vehicles closest to the intersections.
+
+        These are the self.num_observed vehicles closest to the end of every
+        edge, padded with empty strings.
+        """
+        return [veh_id for edge in edges for veh_id in
+                self.get_closest_to_intersection(
+                    edge, self.num_observed, padding=True)]
+
+    def _light_states(self, nodes):
+        """Return the states of the traffic lights of some intersections.
+
+        The states are the last change times of the traffic lights, followed
+        by their directions, and by whether they are currently yellow.
+        Intersections of index -1 are observed with the default values 0, 0
+        and 1, respectively.
+        """
+        states = np.concatenate(
+            [self.last_change, self.direction, self.currently_yellow], axis=1)
+        states = np.concatenate([states, [[0, 0, 1]]])
+        return states[nodes].T.flatten()
 
     def get_state(self):
         """See parent class.
@@ -653,69 +730,7 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
         light and for each vehicle its velocity, distance to intersection,
         edge_number traffic light state. This is partially observed
         """
-        speeds = []
-        dist_to_intersec = []
-        edge_number = []
-        max_speed = max(
-            self.k.network.speed_limit(edge)
-            for edge in self.k.network.get_edge_list())
-        grid_array = self.net_params.additional_params["grid_array"]
-        max_dist = max(grid_array["short_length"], grid_array["long_length"],
-                       grid_array["inner_length"])
-        all_observed_ids = []
-
-        for _, edges in self.network.node_mapping:
-            for edge in edges:
-                observed_ids = \
-                    self.get_closest_to_intersection(edge, self.num_observed)
-                all_observed_ids += observed_ids
-
-                # check which edges we have so we can always pad in the right
-                # positions
-                speeds += [
-                    self.k.vehicle.get_speed(veh_id) / max_speed
-                    for veh_id in observed_ids
-                ]
-                dist_to_intersec += [
-                    (self.k.network.edge_length(
-                        self.k.vehicle.get_edge(veh_id)) -
-                        self.k.vehicle.get_position(veh_id)) / max_dist
-                    for veh_id in observed_ids
-                ]
-                edge_number += \
-                    [self._convert_edge(self.k.vehicle.get_edge(veh_id)) /
-                     (self.k.network.network.num_edges - 1)
-                     for veh_id in observed_ids]
-
-                if len(observed_ids) < self.num_observed:
-                    diff = self.num_observed - len(observed_ids)
-                    speeds += [0] * diff
-                    dist_to_intersec += [0] * diff
-                    edge_number += [0] * diff
-
-        # now add in the density and average velocity on the edges
-        density = []
-        velocity_avg = []
-        for edge in self.k.network.get_edge_list():
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(ids) > 0:
-                vehicle_length = 5
-                density += [vehicle_length * len(ids) /
-                            self.k.network.edge_length(edge)]
-                velocity_avg += [np.mean(
-                    [self.k.vehicle.get_speed(veh_id) for veh_id in
-                     ids]) / max_speed]
-            else:
-                density += [0]
-                velocity_avg += [0]
-        self.observed_ids = all_observed_ids
-        return np.array(
-            np.concatenate([
-                speeds, dist_to_intersec, edge_number, density, velocity_avg,
-                self.last_change.flatten().tolist(),
-                self.direction.flatten().tolist(),
-                self.currently_yellow.flatten().tolist()
-            ]))
+        return self.observation_extractor(self)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -728,7 +743,13 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
     def additional_command(self):
         """See class definition."""
         # specify observed vehicles
-        [self.k.vehicle.set_observed(veh_id) for veh_id in self.observed_ids]
+        edges = [edge for _, node_edges in self.network.node_mapping
+                 for edge in node_edges]
+        self.observed_ids = [
+            veh_id for veh_id in self._closest_to_intersections(edges)
+            if veh_id]
+        for veh_id in self.observed_ids:
+            self.k.vehicle.set_observed(veh_id)
 
 
 class TrafficLightGridTestEnv(TrafficLightGridEnv):
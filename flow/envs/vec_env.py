@@ -0,0 +1,430 @@
+"""Contains a vectorized environment running Flow environments in parallel."""
+
+from copy import deepcopy
+import mmap
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import traceback
+
+import numpy as np
+from gym.spaces import Box
+
+from flow.utils.registry import make_create_env
+
+# default maximum number of agents per environment whose observations,
+# rewards, and dones are exchanged through shared memory in multi-agent
+# environments
+DEFAULT_MAX_AGENTS = 64
+
+# directory of the files backing the shared buffers. /dev/shm is a memory
+# filesystem, so that the buffers are never written to disk where available.
+_BUFFER_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class FlowVectorEnv(object):
+    """Vectorized environment running several Flow environments in parallel.
+
+    Every environment is created from the same flow_params (see
+    flow.utils.registry.make_create_env) in its own worker process, so that
+    the environments are stepped concurrently, while the caller is free to
+    perform other computations (e.g. policy inference) in between
+    `step_async` and `step_wait`.
+
+    Observations, rewards, and dones are written by the workers into numpy
+    arrays backed by shared memory, rather than pickled and sent through a
+    pipe at every step. Only the actions, the info dicts, and (in multi-agent
+    environments) the ids of the agents are exchanged through pipes.
+
+    Environments are reset automatically once they are done. The last
+    observation of the rollout is then available in the info dict of the
+    environment under the "terminal_observation" key, while the returned
+    observation is the first observation of the next rollout.
+
+    Multi-agent environments (see flow.envs.multiagent.MultiEnv) are
+    supported as well, in which case observations, rewards, and dones are
+    returned as one dict per environment. The values of up to `max_agents`
+    agents per environment are exchanged through shared memory, and any
+    additional agents are sent through the pipe.
+
+    Usage
+    -----
+    >>> env = FlowVectorEnv(flow_params, num_envs=8)
+    >>> obs = env.reset()
+    >>> env.step_async(actions)  # one action per environment
+    >>> # ... compute something else while the environments are stepped
+    >>> obs, rewards, dones, infos = env.step_wait()
+    >>> env.close()
+
+    Attributes
+    ----------
+    num_envs : int
+        number of environments
+    observation_space : gym.spaces.Box
+        observation space of a single environment (or of a single agent)
+    action_space : gym.spaces.Space
+        action space of a single environment (or of a single agent)
+    multiagent : bool
+        whether the environments are multi-agent environments
+    """
+
+    def __init__(self,
+                 flow_params,
+                 num_envs,
+                 version=0,
+                 render=None,
+                 seed=None,
+                 max_agents=DEFAULT_MAX_AGENTS):
+        """Start the worker processes and create the environments.
+
+        Parameters
+        ----------
+        flow_params : dict
+            flow-related parameters, see flow.utils.registry.make_create_env
+        num_envs : int
+            number of environments
+        version : int, optional
+            environment version number, see make_create_env
+        render : bool, optional
+            specifies whether to use the gui, see make_create_env
+        seed : int, optional
+            if specified, the simulation and the random number generators
+            (random and np.random) of the i-th environment are seeded with
+            seed + i. Otherwise, the seed in flow_params is used by all
+            environments, and the random number generators are inherited from
+            the main process.
+        max_agents : int, optional
+            maximum number of agents per environment whose observations,
+            rewards, and dones are exchanged through shared memory (only
+            used by multi-agent environments)
+
+        Raises
+        ------
+        TypeError
+            if the observation space of the environments is not a Box
+        RuntimeError
+            if an environment could not be created
+        """
+        self.num_envs = num_envs
+        self.max_agents = max_agents
+        self.closed = False
+        self.waiting = False
+
+        # start the workers. They are forked from the current process, so
+        # that flow_params does not need to be picklable.
+        ctx = multiprocessing.get_context('fork')
+        self._pipes = []
+        self._processes = []
+        for i in range(num_envs):
+            params = deepcopy(flow_params)
+            worker_seed = None
+            if seed is not None:
+                worker_seed = seed + i
+                params['sim'].seed = worker_seed
+            parent_pipe, worker_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(i, worker_pipe, parent_pipe, params, version, render,
+                      worker_seed))
+            process.daemon = True
+            process.start()
+            worker_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        # collect the spaces of the environments
+        self._buffers = {}
+        try:
+            spaces = [self._receive(pipe) for pipe in self._pipes]
+        except RuntimeError:
+            self.close()
+            raise
+        self.observation_space, self.action_space, self.multiagent = spaces[0]
+        if not isinstance(self.observation_space, Box):
+            self.close()
+            raise TypeError('FlowVectorEnv only supports Box observation '
+                            'spaces, got {}'.format(self.observation_space))
+
+        # allocate the shared buffers, and pass them to the workers
+        obs_shape = self.observation_space.shape
+        if self.multiagent:
+            shapes = {
+                'obs': ((num_envs, max_agents) + obs_shape,
+                        self.observation_space.dtype),
+                'rew': ((num_envs, max_agents), np.float64),
+                'done': ((num_envs, max_agents), np.bool_),
+            }
+        else:
+            shapes = {
+                'obs': ((num_envs,) + obs_shape,
+                        self.observation_space.dtype),
+                'rew': ((num_envs,), np.float64),
+                'done': ((num_envs,), np.bool_),
+            }
+        specs = {}
+        paths = []
+        try:
+            for key, (shape, dtype) in shapes.items():
+                dtype = np.dtype(dtype)
+                size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+                fd, path = tempfile.mkstemp(prefix='flow_vec_env_',
+                                            dir=_BUFFER_DIR)
+                paths.append(path)
+                self._buffers[key] = np.ndarray(
+                    shape, dtype=dtype, buffer=_map(fd, size))
+                specs[key] = (path, shape, dtype.str)
+            for pipe in self._pipes:
+                pipe.send(('buffers', specs))
+            for pipe in self._pipes:
+                self._receive(pipe)
+        except Exception:
+            self.close()
+            raise
+        finally:
+            # the mappings remain valid once the files are removed, so that
+            # no file is left behind if the processes are killed
+            for path in paths:
+                os.unlink(path)
+
+    def reset(self):
+        """Reset all environments.
+
+        Returns
+        -------
+        np.ndarray or list of dict
+            the initial observation of every environment
+        """
+        for pipe in self._pipes:
+            pipe.send(('reset', None))
+        metas = [self._receive(pipe) for pipe in self._pipes]
+        return self._observations(metas)
+
+    def step_async(self, actions):
+        """Send actions to all environments, without waiting for the results.
+
+        Parameters
+        ----------
+        actions : array_like or list of dict
+            the action of every environment (a dict of per-agent actions for
+            multi-agent environments)
+        """
+        for pipe, action in zip(self._pipes, actions):
+            pipe.send(('step', action))
+        self.waiting = True
+
+    def step_wait(self):
+        """Wait for the results of the actions sent with `step_async`.
+
+        Returns
+        -------
+        np.ndarray or list of dict
+            the observation of every environment
+        np.ndarray or list of dict
+            the reward of every environment
+        np.ndarray or list of dict
+            the done flag of every environment
+        list of dict
+            the info dict of every environment
+        """
+        metas = [self._receive(pipe) for pipe in self._pipes]
+        self.waiting = False
+        infos = [meta['info'] for meta in metas]
+        obs = self._observations(metas)
+
+        if not self.multiagent:
+            return (obs, self._buffers['rew'].copy(),
+                    self._buffers['done'].copy(), infos)
+
+        rewards = [_read_dict(self._buffers['rew'], i, *meta['rew'])
+                   for i, meta in enumerate(metas)]
+        dones = [_read_dict(self._buffers['done'], i, *meta['done'])
+                 for i, meta in enumerate(metas)]
+        return obs, rewards, dones, infos
+
+    def step(self, actions):
+        """Step all environments, and wait for the results.
+
+        See `step_async` and `step_wait`.
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        """Terminate the environments and the worker processes."""
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.waiting:
+            for pipe in self._pipes:
+                try:
+                    pipe.recv()
+                except (EOFError, OSError):
+                    pass
+        for pipe, process in zip(self._pipes, self._processes):
+            if process.is_alive():
+                try:
+                    pipe.send(('close', None))
+                    pipe.recv()
+                except (EOFError, OSError, BrokenPipeError):
+                    pass
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+            pipe.close()
+
+        # the mappings are released once no array refers to them
+        self._buffers = {}
+
+    def _receive(self, pipe):
+        """Receive the response of a worker, and re-raise its errors."""
+        status, value = pipe.recv()
+        if status == 'error':
+            raise RuntimeError(
+                'An error occurred in a FlowVectorEnv worker:\n' + value)
+        return value
+
+    def _observations(self, metas):
+        """Collect the observations written by the workers."""
+        if not self.multiagent:
+            return self._buffers['obs'].copy()
+        return [_read_dict(self._buffers['obs'], i, *meta['obs'])
+                for i, meta in enumerate(metas)]
+
+
+def _write_dict(values, buffer, index):
+    """Write the values of a dict of agents into a shared buffer.
+
+    Returns
+    -------
+    list
+        keys of the values written in the slots of the buffer, in order
+    dict
+        values that did not fit in the buffer
+    """
+    keys = list(values.keys())
+    num_slots = buffer.shape[1]
+    for slot, key in enumerate(keys[:num_slots]):
+        buffer[index, slot] = values[key]
+    return keys[:num_slots], {key: values[key] for key in keys[num_slots:]}
+
+
+def _read_dict(buffer, index, keys, overflow):
+    """Read the values of a dict of agents written with _write_dict."""
+    ret = {key: buffer[index, slot].copy()
+           if buffer.ndim > 2 else buffer[index, slot].item()
+           for slot, key in enumerate(keys)}
+    ret.update(overflow)
+    return ret
+
+
+def _map(fd, size):
+    """Map a file shared between processes into memory, and close it.
+
+    The file is resized to the requested size if needed.
+    """
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _attach(spec):
+    """Attach to a shared buffer created by the main process."""
+    path, shape, dtype = spec
+    dtype = np.dtype(dtype)
+    size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    return np.ndarray(shape, dtype=dtype,
+                      buffer=_map(os.open(path, os.O_RDWR), size))
+
+
+def _is_multiagent(env):
+    """Return whether an environment is a multi-agent environment."""
+    # multi-agent environments can only exist if their module was imported
+    module = sys.modules.get('flow.envs.multiagent.base')
+    return module is not None and isinstance(env, module.MultiEnv)
+
+
+def _worker(index, pipe, parent_pipe, flow_params, version, render, seed):
+    """Run an environment in a worker process.
+
+    Parameters
+    ----------
+    index : int
+        index of the environment
+    pipe : multiprocessing.connection.Connection
+        connection to the main process
+    parent_pipe : multiprocessing.connection.Connection
+        end of the connection held by the main process (closed by the worker)
+    flow_params : dict
+        flow-related parameters
+    version : int
+        environment version number
+    render : bool
+        specifies whether to use the gui
+    seed : int or None
+        seed of the random number generators of the worker
+    """
+    parent_pipe.close()
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    env = None
+    try:
+        create_env, _ = make_create_env(flow_params, version, render)
+        # the Flow environment is driven directly, since it already enforces
+        # its horizon and the gym wrappers only check the api of its calls
+        env = create_env().unwrapped
+        multiagent = _is_multiagent(env)
+        pipe.send(('ok', (env.observation_space, env.action_space,
+                          multiagent)))
+
+        _, specs = pipe.recv()
+        buffers = {}
+        for key, spec in specs.items():
+            buffers[key] = _attach(spec)
+        pipe.send(('ok', None))
+
+        def write_obs(obs):
+            if multiagent:
+                return _write_dict(obs, buffers['obs'], index)
+            buffers['obs'][index] = obs
+            return None
+
+        while True:
+            cmd, data = pipe.recv()
+            if cmd == 'reset':
+                pipe.send(('ok', {'obs': write_obs(env.reset())}))
+            elif cmd == 'step':
+                obs, reward, done, info = env.step(data)
+                done_all = done['__all__'] if multiagent else done
+                if done_all:
+                    info = dict(info)
+                    info['terminal_observation'] = obs
+                    obs = env.reset()
+                meta = {'obs': write_obs(obs), 'info': info}
+                if multiagent:
+                    meta['rew'] = _write_dict(reward, buffers['rew'], index)
+                    meta['done'] = _write_dict(done, buffers['done'], index)
+                else:
+                    buffers['rew'][index] = reward
+                    buffers['done'][index] = done
+                pipe.send(('ok', meta))
+            elif cmd == 'close':
+                pipe.send(('ok', None))
+                break
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        try:
+            pipe.send(('error', traceback.format_exc()))
+        except (BrokenPipeError, OSError):
+            pass
+    finally:
+        if env is not None:
+            env.terminate()
+        pipe.close()
@@ -4,10 +4,10 @@ from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
 from flow.core.params import SumoCarFollowingParams
 from flow.core.params import SumoLaneChangeParams
+from flow.core.util import iterparse_elements
 import time
 import xml.etree.ElementTree as ElementTree
 from lxml import etree
-from collections import defaultdict
 
 # default sumo probability value  TODO (ak): remove
 DEFAULT_PROBABILITY = 0
@@ -688,42 +688,57 @@ class Network(object):
 
         vehicle_data = dict()
         routes_data = dict()
-        type_data = defaultdict(int)
 
         for filename in file_names:
-            # import the .net.xml file containing all edge/type data
-            parser = etree.XMLParser(recover=True)
-            tree = ElementTree.parse(filename, parser=parser)
-            root = tree.getroot()
-
-            # collect the departure properties and routes and vehicles whose
-            # properties are instantiated within the .rou.xml file. This will
-            # only apply if such data is within the file (it is not implemented
-            # by networks in Flow).
-            for vehicle in root.findall('vehicle'):
-                # collect the edges the vehicle is meant to traverse
-                route = vehicle.find('route')
-                route_edges = route.attrib["edges"].split(' ')
-
-                # collect the names of each vehicle type and number of vehicles
-                # of each type
-                type_vehicle = vehicle.attrib['type']
-                type_data[type_vehicle] += 1
-
-                vehicle_data[vehicle.attrib['id']] = {
-                    'departSpeed': vehicle.attrib['departSpeed'],
-                    'depart': vehicle.attrib['depart'],
-                    'typeID': type_vehicle,
-                    'departPos': vehicle.attrib['departPos'],
-                }
+            data = Network._import_routes(filename)
+            vehicle_data.update(data[0])
+            routes_data.update(data[1])
+
+        return vehicle_data, routes_data
+
+    @staticmethod
+    def _import_routes(filename):
+        """Import the vehicles and routes of a single .rou.xml file.
+
+        The file is parsed incrementally, so that the memory used does not
+        grow with the number of vehicles and routes in the file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the xml file to load
 
-                routes_data[vehicle.attrib['id']] = route_edges
+        Returns
+        -------
+        dict <dict>
+            departure properties of every vehicle, see `_vehicle_infos`
+        dict <list>
+            edges of every route, including the routes of vehicles
+        """
+        vehicle_data = dict()
+        routes_data = dict()
 
-            # collect the edges the vehicle is meant to traverse for the given
-            # sets of routes that are not associated with individual vehicles
-            for route in root.findall('route'):
-                route_edges = route.attrib["edges"].split(' ')
-                routes_data[route.attrib['id']] = route_edges
+        for elem in iterparse_elements(filename, tags=('vehicle', 'route')):
+            if elem.tag == 'vehicle':
+                # collect the departure properties and routes and vehicles
+                # whose properties are instantiated within the .rou.xml file.
+                # This will only apply if such data is within the file (it is
+                # not implemented by networks in Flow).
+                route = elem.find('route')
+                vehicle_data[elem.attrib['id']] = {
+                    'departSpeed': elem.attrib['departSpeed'],
+                    'depart': elem.attrib['depart'],
+                    'typeID': elem.attrib['type'],
+                    'departPos': elem.attrib['departPos'],
+                }
+                routes_data[elem.attrib['id']] = \
+                    route.attrib["edges"].split(' ')
+            else:
+                # collect the edges the vehicle is meant to traverse for the
+                # given sets of routes that are not associated with individual
+                # vehicles
+                routes_data[elem.attrib['id']] = \
+                    elem.attrib["edges"].split(' ')
 
         return vehicle_data, routes_data
 
@@ -1,9 +1,11 @@
 """Generate a time space diagram for some networks.
 
 This method accepts as input a csv file containing the sumo-formatted emission
-file, and then uses this data to generate a time-space diagram, with the x-axis
-being the time (in seconds), the y-axis being the position of a vehicle, and
-color representing the speed of te vehicles.
+file (or the trajectories recorded by the Flow kernel, see
+flow/core/kernel/trajectory.py), and then uses this data to generate a
+time-space diagram, with the x-axis being the time (in seconds), the y-axis
+being the position of a vehicle, and color representing the speed of te
+vehicles.
 
 If the number of simulation steps is too dense, you can plot every nth step in
 the plot by setting the input `--steps=n`.
@@ -15,15 +17,18 @@ Usage
 -----
 ::
     python time_space_diagram.py </path/to/emission>.csv </path/to/params>.json
+    python time_space_diagram.py </path/to/trajectories> </path/to/params>.json
 """
+from flow.core.kernel.trajectory import load_trajectories
 from flow.utils.rllib import get_flow_params
 from flow.networks import RingNetwork, FigureEightNetwork, MergeNetwork
-import csv
 from matplotlib import pyplot as plt
 from matplotlib.collections import LineCollection
 import matplotlib.colors as colors
 import numpy as np
+import pandas as pd
 import argparse
+import os
 
 # networks that can be plotted by this method
 ACCEPTABLE_NETWORKS = [
@@ -32,6 +37,92 @@ ACCEPTABLE_NETWORKS = [
     MergeNetwork,
 ]
 
+# columns of the data used to generate time space diagrams
+COLUMNS = ['id', 'time', 'edge', 'pos', 'vel']
+
+
+def import_columns(fp):
+    """Import the relevant columns of an emission or trajectory file.
+
+    Parameters
+    ----------
+    fp : str
+        one of the following:
+
+        * the path to an emission (.csv) file
+        * the path to trajectory files recorded by the kernel (see
+          flow/core/kernel/trajectory.py), or to the directory containing
+          them
+        * the path to a directory containing one .npy file per column
+          ("id.npy", "time.npy", "edge.npy", "pos.npy", and "vel.npy"),
+          which are memory-mapped rather than loaded into memory
+
+    Returns
+    -------
+    dict < str, np.ndarray >
+        the "id", "time", "edge", "pos", and "vel" columns, with one element
+        per sample
+    """
+    if fp.endswith('.csv'):
+        df = pd.read_csv(
+            fp, usecols=['id', 'time', 'edge_id', 'relative_position',
+                         'speed'],
+            dtype={'id': str, 'edge_id': str}, keep_default_na=False,
+            float_precision='round_trip')
+        return {
+            'id': df['id'].to_numpy(),
+            'time': df['time'].to_numpy(dtype=float),
+            'edge': df['edge_id'].to_numpy(),
+            'pos': df['relative_position'].to_numpy(dtype=float),
+            'vel': df['speed'].to_numpy(dtype=float),
+        }
+
+    if os.path.isdir(fp) and os.path.exists(os.path.join(fp, 'id.npy')):
+        return {key: np.load(os.path.join(fp, key + '.npy'), mmap_mode='r')
+                for key in COLUMNS}
+
+    data = load_trajectories(fp, fields=['id', 'time', 'edge', 'pos', 'speed'])
+    data['vel'] = data.pop('speed')
+    return data
+
+
+def _columns_to_dict(columns):
+    """Group the columns of an emission file by vehicle ID."""
+    # group the samples by vehicle ID, preserving their order in time
+    order = np.argsort(columns['id'], kind='stable')
+    veh_ids, starts = np.unique(
+        np.asarray(columns['id'])[order], return_index=True)
+    stops = np.append(starts[1:], len(order))
+
+    ret = {}
+    for veh_id, start, stop in zip(veh_ids, starts, stops):
+        index = order[start:stop]
+        ret[str(veh_id)] = {
+            'time': np.asarray(columns['time'])[index].tolist(),
+            'edge': [str(edge) for edge in
+                     np.asarray(columns['edge'])[index]],
+            'pos': np.asarray(columns['pos'])[index].tolist(),
+            'vel': np.asarray(columns['vel'])[index].tolist(),
+        }
+
+    return ret
+
+
+def _dict_to_columns(data):
+    """Convert data grouped by vehicle ID into columns (see import_columns)."""
+    columns = {key: [] for key in COLUMNS}
+    for veh_id in data.keys():
+        num_samples = len(data[veh_id]['time'])
+        columns['id'].extend([veh_id] * num_samples)
+        for key in ['time', 'edge', 'pos', 'vel']:
+            columns[key].extend(data[veh_id][key])
+
+    ret = {key: np.asarray(columns[key], dtype=float)
+           for key in ['time', 'pos', 'vel']}
+    ret['id'] = np.asarray(columns['id'], dtype=object)
+    ret['edge'] = np.asarray(columns['edge'], dtype=object)
+    return ret
+
 
 def import_data_from_emission(fp):
     r"""Import relevant data from the predefined emission (.csv) file.
@@ -51,27 +142,30 @@ def import_data_from_emission(fp):
         * "pos": relative position at every sample
         * "vel": speed at every sample
     """
-    # initialize all output variables
-    veh_id, t, edge, rel_pos, vel = [], [], [], [], []
-
-    # import relevant data from emission file
-    for record in csv.DictReader(open(fp)):
-        veh_id.append(record['id'])
-        t.append(record['time'])
-        edge.append(record['edge_id'])
-        rel_pos.append(record['relative_position'])
-        vel.append(record['speed'])
-
-    # we now want to separate data by vehicle ID
-    ret = {key: {'time': [], 'edge': [], 'pos': [], 'vel': []}
-           for key in np.unique(veh_id)}
-    for i in range(len(veh_id)):
-        ret[veh_id[i]]['time'].append(float(t[i]))
-        ret[veh_id[i]]['edge'].append(edge[i])
-        ret[veh_id[i]]['pos'].append(float(rel_pos[i]))
-        ret[veh_id[i]]['vel'].append(float(vel[i]))
+    return _columns_to_dict(import_columns(fp))
 
-    return ret
+
+def import_data_from_trajectory(fp):
+    r"""Import relevant data from trajectory files recorded by the kernel.
+
+    Parameters
+    ----------
+    fp : str
+        path to a trajectory file, or to the directory containing the
+        trajectory files (see flow/core/kernel/trajectory.py). The files
+        must contain the "id", "time", "edge", "pos", and "speed" fields.
+
+    Returns
+    -------
+    dict of dict
+        Key = "veh_id": name of the vehicle \n Elements:
+
+        * "time": time step at every sample
+        * "edge": edge ID at every sample
+        * "pos": relative position at every sample
+        * "vel": speed at every sample
+    """
+    return _columns_to_dict(import_columns(fp))
 
 
 def get_time_space_data(data, params):
@@ -79,13 +173,16 @@ def get_time_space_data(data, params):
 
     Parameters
     ----------
-    data : dict of dict
+    data : dict of dict or dict of array_like
         Key = "veh_id": name of the vehicle \n Elements:
 
         * "time": time step at every sample
         * "edge": edge ID at every sample
         * "pos": relative position at every sample
         * "vel": speed at every sample
+
+        The data may also be provided as columns with one element per sample
+        (see import_columns), including memory-mapped arrays.
     params : dict
         flow-specific parameters, including:
 
@@ -126,22 +223,69 @@ def get_time_space_data(data, params):
         FigureEightNetwork: _figure_eight
     }
 
-    # Collect a list of all the unique times.
-    all_time = []
-    for veh_id in data.keys():
-        all_time.extend(data[veh_id]['time'])
-    all_time = np.sort(np.unique(all_time))
+    if all(isinstance(value, dict) for value in data.values()):
+        data = _dict_to_columns(data)
+
+    # factorize the times and vehicle IDs of all samples, so that the samples
+    # can be scattered into the rows and columns of the output matrices
+    all_time, time_index = np.unique(data['time'], return_inverse=True)
+    veh_ids, veh_index = np.unique(data['id'], return_inverse=True)
+    samples = {
+        'time_index': time_index,
+        'veh_index': veh_index,
+        'shape': (len(all_time), len(veh_ids)),
+        'edge': np.asarray(data['edge']),
+        'pos': np.asarray(data['pos'], dtype=float),
+        'vel': np.asarray(data['vel'], dtype=float),
+    }
 
     # Get the function from switcher dictionary
     func = switcher[params['network']]
 
     # Execute the function
-    pos, speed = func(data, params, all_time)
+    pos, speed = func(samples, params, all_time)
 
     return pos, speed, all_time
 
 
-def _merge(data, params, all_time):
+def _scatter(samples, abs_pos, mask=None):
+    """Scatter the samples into n_steps x n_veh position and speed matrices.
+
+    Parameters
+    ----------
+    samples : dict
+        factorized samples, see get_time_space_data
+    abs_pos : np.ndarray
+        absolute position of every sample
+    mask : np.ndarray, optional
+        samples to include, defaults to all samples
+
+    Returns
+    -------
+    np.ndarray
+        position matrix. Set to zero if a vehicle is not sampled at a time
+        step.
+    np.ndarray
+        speed matrix. Set to zero if a vehicle is not sampled at a time step.
+    """
+    time_index = samples['time_index']
+    veh_index = samples['veh_index']
+    vel = samples['vel']
+    if mask is not None:
+        time_index = time_index[mask]
+        veh_index = veh_index[mask]
+        abs_pos = abs_pos[mask]
+        vel = vel[mask]
+
+    pos = np.zeros(samples['shape'])
+    speed = np.zeros(samples['shape'])
+    pos[time_index, veh_index] = abs_pos
+    speed[time_index, veh_index] = vel
+
+    return pos, speed
+
+
+def _merge(samples, params, all_time):
     r"""Generate position and speed data for the merge.
 
     This only include vehicles on the main highway, and not on the adjacent
@@ -149,13 +293,8 @@ def _merge(data, params, all_time):
 
     Parameters
     ----------
-    data : dict of dict
-        Key = "veh_id": name of the vehicle \n Elements:
-
-        * "time": time step at every sample
-        * "edge": edge ID at every sample
-        * "pos": relative position at every sample
-        * "vel": speed at every sample
+    samples : dict
+        factorized samples, see get_time_space_data
     params : dict
         flow-specific parameters
     all_time : array_like
@@ -192,30 +331,17 @@ def _merge(data, params, all_time):
     }
 
     # compute the absolute position
-    for veh_id in data.keys():
-        data[veh_id]['abs_pos'] = _get_abs_pos(data[veh_id]['edge'],
-                                               data[veh_id]['pos'], edgestarts)
+    abs_pos = _get_abs_pos(samples['edge'], samples['pos'], edgestarts)
 
     # prepare the speed and absolute position in a way that is compatible with
-    # the space-time diagram, and compute the number of vehicles at each step
-    pos = np.zeros((all_time.shape[0], len(data.keys())))
-    speed = np.zeros((all_time.shape[0], len(data.keys())))
-    for i, veh_id in enumerate(sorted(data.keys())):
-        for spd, abs_pos, ti, edge in zip(data[veh_id]['vel'],
-                                          data[veh_id]['abs_pos'],
-                                          data[veh_id]['time'],
-                                          data[veh_id]['edge']):
-            # avoid vehicles outside the main highway
-            if edge in ['inflow_merge', 'bottom', ':bottom_0']:
-                continue
-            ind = np.where(ti == all_time)[0]
-            pos[ind, i] = abs_pos
-            speed[ind, i] = spd
+    # the space-time diagram, avoiding vehicles outside the main highway
+    mask = ~np.isin(samples['edge'], ['inflow_merge', 'bottom', ':bottom_0'])
+    pos, speed = _scatter(samples, abs_pos, mask)
 
     return pos, speed
 
 
-def _ring_road(data, params, all_time):
+def _ring_road(samples, params, all_time):
     r"""Generate position and speed data for the ring road.
 
     Vehicles that reach the top of the plot simply return to the bottom and
@@ -223,13 +349,8 @@ def _ring_road(data, params, all_time):
 
     Parameters
     ----------
-    data : dict of dict
-        Key = "veh_id": name of the vehicle \n Elements:
-
-        * "time": time step at every sample
-        * "edge": edge ID at every sample
-        * "pos": relative position at every sample
-        * "vel": speed at every sample
+    samples : dict
+        factorized samples, see get_time_space_data
     params : dict
         flow-specific parameters
     all_time : array_like
@@ -263,25 +384,15 @@ def _ring_road(data, params, all_time):
     }
 
     # compute the absolute position
-    for veh_id in data.keys():
-        data[veh_id]['abs_pos'] = _get_abs_pos(data[veh_id]['edge'],
-                                               data[veh_id]['pos'], edgestarts)
+    abs_pos = _get_abs_pos(samples['edge'], samples['pos'], edgestarts)
 
     # create the output variables
-    pos = np.zeros((all_time.shape[0], len(data.keys())))
-    speed = np.zeros((all_time.shape[0], len(data.keys())))
-    for i, veh_id in enumerate(sorted(data.keys())):
-        for spd, abs_pos, ti in zip(data[veh_id]['vel'],
-                                    data[veh_id]['abs_pos'],
-                                    data[veh_id]['time']):
-            ind = np.where(ti == all_time)[0]
-            pos[ind, i] = abs_pos
-            speed[ind, i] = spd
+    pos, speed = _scatter(samples, abs_pos)
 
     return pos, speed
 
 
-def _figure_eight(data, params, all_time):
+def _figure_eight(samples, params, all_time):
     r"""Generate position and speed data for the figure eight.
 
     The vehicles traveling towards the intersection from one side will be
@@ -290,13 +401,8 @@ def _figure_eight(data, params, all_time):
 
     Parameters
     ----------
-    data : dict of dict
-        Key = "veh_id": name of the vehicle \n Elements:
-
-        * "time": time step at every sample
-        * "edge": edge ID at every sample
-        * "pos": relative position at every sample
-        * "vel": speed at every sample
+    samples : dict
+        factorized samples, see get_time_space_data
     params : dict
         flow-specific parameters
     all_time : array_like
@@ -342,20 +448,10 @@ def _figure_eight(data, params, all_time):
     }
 
     # compute the absolute position
-    for veh_id in data.keys():
-        data[veh_id]['abs_pos'] = _get_abs_pos(data[veh_id]['edge'],
-                                               data[veh_id]['pos'], edgestarts)
+    abs_pos = _get_abs_pos(samples['edge'], samples['pos'], edgestarts)
 
     # create the output variables
-    pos = np.zeros((all_time.shape[0], len(data.keys())))
-    speed = np.zeros((all_time.shape[0], len(data.keys())))
-    for i, veh_id in enumerate(sorted(data.keys())):
-        for spd, abs_pos, ti in zip(data[veh_id]['vel'],
-                                    data[veh_id]['abs_pos'],
-                                    data[veh_id]['time']):
-            ind = np.where(ti == all_time)[0]
-            pos[ind, i] = abs_pos
-            speed[ind, i] = spd
+    pos, speed = _scatter(samples, abs_pos)
 
     # reorganize data for space-time plot
     figure_eight_len = 6*ring_edgelen + 2*intersection + 2*junction + 10*inner
@@ -377,22 +473,58 @@ def _get_abs_pos(edge, rel_pos, edgestarts):
 
     Parameters
     ----------
-    edge : list of str
-        list of edges at every time step
-    rel_pos : list of float
-        list of relative positions at every time step
+    edge : array_like
+        edge of every sample
+    rel_pos : array_like
+        relative position of every sample
     edgestarts : dict
         the absolute starting position of every edge
 
     Returns
     -------
-    list of float
-        the absolute positive for every sample
+    np.ndarray
+        the absolute position of every sample
     """
-    ret = []
-    for edge_i, pos_i in zip(edge, rel_pos):
-        ret.append(pos_i + edgestarts[edge_i])
-    return ret
+    # look up the start of every distinct edge once
+    edge_ids, edge_index = np.unique(np.asarray(edge), return_inverse=True)
+    starts = np.array([edgestarts[edge_id] for edge_id in edge_ids],
+                      dtype=float)
+    return np.asarray(rel_pos, dtype=float) + starts[edge_index]
+
+
+def _get_segments(pos, speed, time):
+    """Compute the line segments of the trajectories of all vehicles.
+
+    Parameters
+    ----------
+    pos : np.ndarray
+        n_steps x n_veh matrix of the position of every vehicle
+    speed : np.ndarray
+        n_steps x n_veh matrix of the speed of every vehicle
+    time : np.ndarray
+        (n_steps,) vector of the time steps
+
+    Returns
+    -------
+    np.ndarray
+        (n_segments, 2, 2) array of the start and end points of every
+        segment, in (time, position) coordinates
+    np.ndarray
+        speed at the start of every segment, used to color the segments
+    """
+    # segments between consecutive time steps, for every vehicle
+    start_pos, end_pos = pos[:-1], pos[1:]
+    start_time = np.broadcast_to(time[:-1, None], start_pos.shape)
+    end_time = np.broadcast_to(time[1:, None], end_pos.shape)
+
+    # discontinuity from wraparound
+    keep = np.abs(end_pos - start_pos) < 10
+
+    segments = np.stack([
+        np.stack([start_time[keep], start_pos[keep]], axis=-1),
+        np.stack([end_time[keep], end_pos[keep]], axis=-1),
+    ], axis=1)
+    return segments, speed[:-1][keep]
 
 
 if __name__ == '__main__':
@@ -405,7 +537,8 @@ if __name__ == '__main__':
 
     # required arguments
     parser.add_argument('emission_path', type=str,
-                        help='path to the csv file.')
+                        help='path to the csv file, or to the trajectory '
+                             'files recorded by the kernel.')
     parser.add_argument('flow_params', type=str,
                         help='path to the flow_params json file.')
 
@@ -426,8 +559,8 @@ if __name__ == '__main__':
     # flow_params is imported as a dictionary
     flow_params = get_flow_params(args.flow_params)
 
-    # import data from the emission.csv file
-    emission_data = import_data_from_emission(args.emission_path)
+    # import data from the emission.csv file or the trajectory files
+    emission_data = import_columns(args.emission_path)
 
     # compute the position and speed for all vehicles at all times
     pos, speed, time = get_time_space_data(emission_data, flow_params)
@@ -444,7 +577,6 @@ if __name__ == '__main__':
     fig = plt.figure(figsize=(16, 9))
     ax = plt.axes()
     norm = plt.Normalize(0, args.max_speed)
-    cols = []
 
     xmin = max(time[0], args.start)
     xmax = min(time[-1], args.stop)
@@ -455,31 +587,19 @@ if __name__ == '__main__':
     ax.set_xlim(xmin - xbuffer, xmax + xbuffer)
     ax.set_ylim(ymin - ybuffer, ymax + ybuffer)
 
-    for indx_car in range(pos.shape[1]):
-        unique_car_pos = pos[:, indx_car]
-
-        # discontinuity from wraparound
-        disc = np.where(np.abs(np.diff(unique_car_pos)) >= 10)[0] + 1
-        unique_car_time = np.insert(time, disc, np.nan)
-        unique_car_pos = np.insert(unique_car_pos, disc, np.nan)
-        unique_car_speed = np.insert(speed[:, indx_car], disc, np.nan)
-
-        points = np.array(
-            [unique_car_time, unique_car_pos]).T.reshape(-1, 1, 2)
-        segments = np.concatenate([points[:-1], points[1:]], axis=1)
-        lc = LineCollection(segments, cmap=my_cmap, norm=norm)
+    # plot the trajectories of all vehicles as a single collection
+    segments, segment_speed = _get_segments(pos, speed, time)
+    lc = LineCollection(segments, cmap=my_cmap, norm=norm)
 
-        # Set the values used for color mapping
-        lc.set_array(unique_car_speed)
-        lc.set_linewidth(1.75)
-        cols.append(lc)
+    # Set the values used for color mapping
+    lc.set_array(segment_speed)
+    lc.set_linewidth(1.75)
 
     plt.title(args.title, fontsize=25)
     plt.ylabel('Position (m)', fontsize=20)
     plt.xlabel('Time (s)', fontsize=20)
 
-    for col in cols:
-        line = ax.add_collection(col)
+    line = ax.add_collection(lc)
     cbar = plt.colorbar(line, ax=ax)
     cbar.set_label('Velocity (m/s)', fontsize=20)
     cbar.ax.tick_params(labelsize=18)
@@ -189,6 +189,14 @@ def visualizer_rllib(args):
     env.restart_simulation(
         sim_params=sim_params, render=sim_params.render)
 
+    # whether the simulation of every step overlaps with the aggregation of
+    # the metrics of the previous step, see SumoParams.pipeline_steps
+    try:
+        pipeline_steps = sim_params.pipeline_steps
+    except AttributeError:
+        pipeline_steps = False
+    pipeline_steps = pipeline_steps and env_params.sims_per_step == 1
+
     # Simulate and collect metrics
     final_outflows = []
     final_inflows = []
@@ -203,7 +211,8 @@ def visualizer_rllib(args):
             ret = 0
         for _ in range(env_params.horizon):
             vehicles = env.unwrapped.k.vehicle
-            vel.append(np.mean(vehicles.get_speed(vehicles.get_ids())))
+            if not pipeline_steps:
+                vel.append(np.mean(vehicles.get_speed(vehicles.get_ids())))
             if multiagent:
                 action = {}
                 for agent_id in state.keys():
@@ -217,7 +226,15 @@ def visualizer_rllib(args):
                             state[agent_id], policy_id=policy_map_fn(agent_id))
             else:
                 action = agent.compute_action(state)
-            state, reward, done, _ = env.step(action)
+            if pipeline_steps:
+                # the state stored in the kernel still describes the previous
+                # step while the next one is simulated. The horizon is
+                # enforced by this loop.
+                env.unwrapped.step_async(action)
+                vel.append(np.mean(vehicles.get_speed(vehicles.get_ids())))
+                state, reward, done, _ = env.unwrapped.step_wait()
+            else:
+                state, reward, done, _ = env.step(action)
             if multiagent:
                 for actor, rew in reward.items():
                     ret[policy_map_fn(actor)][0] += rew
@@ -10,6 +10,7 @@ from flow.controllers.car_following_models import IDMController, \
     OVMController, BCMController, LinearOVM, CFMController, LACController
 from flow.controllers import FollowerStopper, PISaturation
 from tests.setup_scripts import ring_road_exp_setup
+from copy import deepcopy
 import os
 import numpy as np
 
@@ -635,5 +636,76 @@ class TestLACController(unittest.TestCase):
         np.testing.assert_array_almost_equal(requested_accel, expected_accel)
 
 
+class TestBatchedControllers(unittest.TestCase):
+    """
+    Tests that the batched evaluation of controllers returns the same actions
+    as the evaluation of every controller individually.
+    """
+
+    def run_controller(self, controller, num_steps=5):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=controller,
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=3, decel=5, speed_mode="aggressive"),
+            num_vehicles=8)
+        initial_config = InitialConfig(perturbation=5)
+        env, _ = ring_road_exp_setup(
+            vehicles=vehicles, initial_config=initial_config)
+
+        for _ in range(num_steps):
+            ids = env.k.vehicle.get_controlled_ids()
+            controllers = [env.k.vehicle.get_acc_controller(veh_id)
+                           for veh_id in ids]
+
+            # compute the individual actions on copies of the controllers, as
+            # some controllers update their state when computing actions
+            copies = deepcopy(controllers)
+            np.random.seed(0)
+            expected = [c.get_action(env) for c in copies]
+            np.random.seed(0)
+            actual = controller[0].get_action_batch(controllers, env)
+
+            self.assertEqual([a is None for a in actual],
+                             [a is None for a in expected])
+            np.testing.assert_array_almost_equal(
+                [a for a in actual if a is not None],
+                [a for a in expected if a is not None])
+            for c_1, c_2 in zip(controllers, copies):
+                self.assertEqual(
+                    getattr(c_1, "v_cmd", None), getattr(c_2, "v_cmd", None))
+                self.assertEqual(
+                    getattr(c_1, "a", None), getattr(c_2, "a", None))
+
+            env.step(rl_actions=None)
+
+        env.terminate()
+
+    def test_car_following_models(self):
+        self.run_controller((IDMController, {"noise": 0.2}))
+        self.run_controller((IDMController, {"fail_safe": "instantaneous"}))
+        self.run_controller((OVMController, {"fail_safe": "safe_velocity"}))
+        self.run_controller((BCMController, {"noise": 0.1}))
+        self.run_controller((LinearOVM, {"fail_safe": "instantaneous"}))
+        self.run_controller((CFMController, {}))
+        self.run_controller((LACController, {}))
+
+    def test_velocity_controllers(self):
+        self.run_controller((FollowerStopper, {"v_des": 5}))
+        self.run_controller((FollowerStopper, {"v_des": None}))
+        self.run_controller((PISaturation, {}), num_steps=20)
+
+    def test_supports_batch(self):
+        class CustomIDM(IDMController):
+            def get_accel(self, env):
+                return 1
+
+        self.assertTrue(IDMController.supports_batch())
+        self.assertFalse(CustomIDM.supports_batch())
+        self.run_controller((CustomIDM, {}))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,18 +1,33 @@
 import unittest
+from unittest import mock
 
 from flow.core.params import SumoParams, EnvParams, InitialConfig, \
-    NetParams, SumoCarFollowingParams, SumoLaneChangeParams
+    NetParams, SumoCarFollowingParams, SumoLaneChangeParams, InFlows
 from flow.core.params import VehicleParams
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController
-from flow.controllers import RLController
+from flow.controllers import RLController, SimCarFollowingController
 from flow.envs.ring.accel import ADDITIONAL_ENV_PARAMS
 from flow.utils.exceptions import FatalFlowError
-from flow.envs import Env, TestEnv
+from flow.envs import Env, TestEnv, AccelEnv
+from flow.envs.vec_env import FlowVectorEnv
+from flow.networks import RingNetwork
+from flow.networks.ring import ADDITIONAL_NET_PARAMS as RING_PARAMS
+from flow.utils.registry import make_create_env
+from flow.core.kernel.simulation.libsumo import TRACI_EXCEPTIONS
+import flow.core.kernel.simulation.traci as traci_simulation
+from flow.core.kernel.trajectory import load_trajectories
+from flow.core.experiment import Experiment
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
+from copy import deepcopy
+import json
 import os
+import random
+import shutil
+import tempfile
+import warnings
 import numpy as np
 import gym.spaces as spaces
 
@@ -303,6 +318,752 @@ class TestSimsPerStep(unittest.TestCase):
         self.assertEqual(t2 - t1, sims_per_step)
 
 
+class TestLibsumo(unittest.TestCase):
+    """Ensures that environments simulated in-process via libsumo match those
+    simulated via TraCI."""
+
+    def test_matches_traci(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+
+        speeds = {}
+        for simulator in ["traci", "libsumo"]:
+            env, network = ring_road_exp_setup(vehicles=vehicles)
+            if simulator == "libsumo":
+                # recreate the environment using the libsumo simulator
+                env.terminate()
+                env = env.__class__(
+                    env_params=env.env_params,
+                    sim_params=env.sim_params,
+                    network=network,
+                    simulator=simulator)
+
+            env.reset()
+            speeds[simulator] = []
+            for _ in range(50):
+                env.step(rl_actions=None)
+                ids = sorted(env.k.vehicle.get_ids())
+                speeds[simulator].append(env.k.vehicle.get_speed(ids))
+
+            # make sure the environment can be reset in-process
+            env.reset()
+            self.assertEqual(env.time_counter, 0)
+            env.terminate()
+
+        np.testing.assert_array_almost_equal(
+            speeds["traci"], speeds["libsumo"])
+
+    def test_no_port(self):
+        """Check that no port is allocated for libsumo."""
+        env, network = ring_road_exp_setup()
+        env.terminate()
+        with mock.patch("sumolib.miscutils.getFreeSocketPort") as get_port:
+            env = env.__class__(
+                env_params=env.env_params,
+                sim_params=env.sim_params,
+                network=network,
+                simulator="libsumo")
+            env.reset()
+            env.step(rl_actions=None)
+            env.terminate()
+        get_port.assert_not_called()
+
+
+class TestPrewarmedInstances(unittest.TestCase):
+    """Ensures that sumo instances started ahead of time are swapped in when
+    restarting the simulation upon reset."""
+
+    def test_restart(self):
+        sim_params = SumoParams(
+            sim_step=0.1,
+            restart_instance=True,
+            num_prewarmed_instances=1)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        pool = env.k.simulation.prewarm_pool
+
+        for _ in range(3):
+            self.assertEqual(len(pool), 1)
+            prewarmed_pid = pool._instances[0].proc.pid
+
+            env.reset()
+
+            # the prewarmed instance is used, and a new one takes its place
+            self.assertEqual(env.k.simulation.sumo_proc.pid, prewarmed_pid)
+            self.assertEqual(len(pool), 1)
+            self.assertCountEqual(env.k.vehicle.get_ids(), env.initial_ids)
+            env.step(rl_actions=None)
+
+        # the prewarmed instances are killed upon termination
+        proc = pool._instances[0].proc
+        env.terminate()
+        self.assertEqual(len(pool), 0)
+        self.assertIsNotNone(proc.poll())
+
+
+class TestSnapshotReset(unittest.TestCase):
+    """Ensures that resetting from a saved snapshot of the simulation matches
+    the rollout that followed the reset in which it was saved."""
+
+    def test_matches_original_reset(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {"noise": 0}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        env_params = EnvParams(
+            warmup_steps=50, additional_params=ADDITIONAL_ENV_PARAMS)
+        sim_params = SumoParams(sim_step=0.1, snapshot_reset=True)
+
+        # the snapshot is saved during the reset performed by the setup
+        env, _ = ring_road_exp_setup(
+            vehicles=vehicles, env_params=env_params, sim_params=sim_params)
+        path = env._reset_snapshot["path"]
+
+        rollouts = []
+        for i in range(3):
+            if i > 0:
+                env.reset()
+            self.assertEqual(env.time_counter, 50)
+
+            rollout = []
+            for _ in range(20):
+                env.step(rl_actions=None)
+                ids = sorted(env.k.vehicle.get_ids())
+                rollout.append(env.k.vehicle.get_speed(ids) +
+                               env.k.vehicle.get_headway(ids) +
+                               env.k.vehicle.get_leader(ids))
+            rollouts.append(rollout)
+
+        self.assertEqual(rollouts[0], rollouts[1])
+        self.assertEqual(rollouts[0], rollouts[2])
+
+        # the snapshot is deleted upon termination
+        env.terminate()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replays_sumo_randomness(self):
+        """Check that the randomness of sumo is replayed by every rollout."""
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(SimCarFollowingController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(sigma=0.9),
+            num_vehicles=8)
+        env_params = EnvParams(
+            warmup_steps=20, additional_params=ADDITIONAL_ENV_PARAMS)
+
+        rollouts = {}
+        for snapshot_reset in [False, True]:
+            sim_params = SumoParams(
+                sim_step=0.1, snapshot_reset=snapshot_reset)
+            env, _ = ring_road_exp_setup(
+                vehicles=vehicles, env_params=env_params,
+                sim_params=sim_params)
+
+            rollouts[snapshot_reset] = []
+            for i in range(2):
+                if i > 0:
+                    env.reset()
+                rollout = []
+                for _ in range(30):
+                    env.step(rl_actions=None)
+                    ids = sorted(env.k.vehicle.get_ids())
+                    rollout.append(env.k.vehicle.get_speed(ids))
+                rollouts[snapshot_reset].append(rollout)
+            env.terminate()
+
+        # the imperfection of drivers differs between regular resets, but
+        # is the same after every snapshot reset
+        self.assertNotEqual(rollouts[False][0], rollouts[False][1])
+        self.assertEqual(rollouts[True][0], rollouts[True][1])
+
+    def test_restart_instance(self):
+        """Check that sumo is not restarted by resets loading a snapshot."""
+        sim_params = SumoParams(
+            sim_step=0.1, snapshot_reset=True, restart_instance=True)
+
+        # users are warned once the snapshot is saved
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            env, _ = ring_road_exp_setup(sim_params=sim_params)
+        self.assertEqual(
+            [str(w.message).split(':')[0] for w in caught
+             if issubclass(w.category, RuntimeWarning)],
+            ["snapshot_reset is enabled"])
+
+        with mock.patch.object(env, 'restart_simulation') as restart:
+            env.reset()
+        restart.assert_not_called()
+        self.assertEqual(env.time_counter, 0)
+
+        env.step(rl_actions=None)
+        env.terminate()
+
+
+class TestBufferedCommands(unittest.TestCase):
+    """Ensures that buffering setter commands until the next simulation step
+    does not modify the rollouts of an environment."""
+
+    def test_matches_unbuffered(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {"noise": 0}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+
+        speeds = {}
+        for buffer_commands in [False, True]:
+            sim_params = SumoParams(
+                sim_step=0.1, buffer_commands=buffer_commands)
+            env, _ = ring_road_exp_setup(
+                vehicles=vehicles, sim_params=sim_params)
+            buffer = env.k.simulation.command_buffer
+            self.assertEqual(buffer is not None, buffer_commands)
+
+            speeds[buffer_commands] = []
+            for _ in range(50):
+                env.step(rl_actions=None)
+                ids = sorted(env.k.vehicle.get_ids())
+                speeds[buffer_commands].append(env.k.vehicle.get_speed(ids))
+
+            if buffer_commands:
+                # commands are held until the next simulation step
+                ids = env.k.vehicle.get_ids()
+                env.k.vehicle.apply_acceleration(ids, [1] * len(ids))
+                self.assertEqual(len(buffer), len(ids))
+                env.k.simulation.simulation_step()
+                self.assertEqual(len(buffer), 0)
+
+            env.terminate()
+
+        np.testing.assert_array_almost_equal(speeds[False], speeds[True])
+
+    def test_error_on_flush(self):
+        sim_params = SumoParams(sim_step=0.1, buffer_commands=True)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        kernel_api = env.k.kernel_api
+
+        # errors in buffered commands are raised when the buffer is flushed
+        env.k.simulation.send_command(
+            kernel_api.vehicle.slowDown, "not_a_vehicle", 0, 1e-3)
+        self.assertRaises(TRACI_EXCEPTIONS, env.k.simulation.flush_commands)
+
+        # the connection can still be used afterwards
+        env.step(rl_actions=None)
+        self.assertEqual(len(env.k.simulation.command_buffer), 0)
+        env.terminate()
+
+    def test_unsupported_traci(self):
+        sim_params = SumoParams(sim_step=0.1, buffer_commands=True)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+
+        # commands are sent one at a time if the connection does not have
+        # the private attributes needed to buffer them
+        with mock.patch.object(traci_simulation, "BUFFER_ATTRIBUTES",
+                               ("_not_an_attribute",)):
+            env.k.simulation.pass_api(env.k.kernel_api)
+        self.assertIsNone(env.k.simulation.command_buffer)
+        env.step(rl_actions=None)
+        env.terminate()
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+    """Tests the recording of vehicle trajectories by the kernel."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_recorded_trajectories(self):
+        sim_params = SumoParams(
+            sim_step=0.1,
+            trajectory_path=self.tmp_dir,
+            trajectory_period=2,
+            trajectory_chunk_size=5)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+
+        expected = {"id": [], "x": [], "speed": []}
+        for i in range(20):
+            env.step(rl_actions=None)
+            if i % 2 == 0:
+                continue
+            ids = env.k.vehicle.get_ids()
+            expected["id"].extend(ids)
+            expected["x"].extend(env.k.vehicle.get_x_array(ids))
+            expected["speed"].extend(env.k.vehicle.get_speed(ids))
+
+        # all rows are written once the kernel is closed
+        env.terminate()
+        self.assertGreater(len(os.listdir(self.tmp_dir)), 1)
+
+        data = load_trajectories(self.tmp_dir)
+        self.assertCountEqual(
+            data.keys(),
+            ["id", "time", "edge", "lane", "pos", "x", "speed", "accel",
+             "leader", "headway"])
+
+        # only the samples after the last reset are compared
+        num_rows = len(expected["id"])
+        self.assertListEqual(data["id"][-num_rows:].tolist(), expected["id"])
+        np.testing.assert_array_almost_equal(
+            data["x"][-num_rows:], expected["x"])
+        np.testing.assert_array_almost_equal(
+            data["speed"][-num_rows:], expected["speed"])
+
+        # samples are taken every other step
+        times = np.unique(data["time"])
+        np.testing.assert_array_almost_equal(np.diff(times), 0.2)
+
+    def test_fields(self):
+        sim_params = SumoParams(
+            trajectory_path=self.tmp_dir,
+            trajectory_fields=["id", "time", "accel"])
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        speeds = []
+        for _ in range(3):
+            env.step(rl_actions=None)
+            speeds.append(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+        env.terminate()
+
+        data = load_trajectories(self.tmp_dir, fields=["id", "accel"])
+        self.assertCountEqual(data.keys(), ["id", "accel"])
+        np.testing.assert_array_almost_equal(
+            data["accel"][-len(speeds[-1]):],
+            (np.array(speeds[-1]) - np.array(speeds[-2])) / 0.1)
+
+    def test_unknown_field(self):
+        sim_params = SumoParams(
+            trajectory_path=self.tmp_dir, trajectory_fields=["fuel"])
+        self.assertRaises(
+            ValueError, ring_road_exp_setup, sim_params=sim_params)
+
+
+class TestStepProfiler(unittest.TestCase):
+    """Tests the profiling of the phases of environment steps."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disabled(self):
+        env, _ = ring_road_exp_setup()
+        env.reset()
+        _, _, _, info = env.step(rl_actions=None)
+        self.assertNotIn("perf", info)
+        self.assertDictEqual(
+            env.perf_stats(), {"phases": {}, "kernels": {}, "traci": {}})
+        env.terminate()
+
+    def test_perf_stats(self):
+        path = os.path.join(self.tmp_dir, "perf.json")
+        sim_params = SumoParams(
+            sim_step=0.1, profile=True, profile_path=path, profile_period=2)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        for _ in range(3):
+            _, _, _, info = env.step(rl_actions=None)
+
+        # the time spent in every phase of the last step is in the info dict
+        for phase in ["controllers", "simulation_step", "update", "get_state",
+                      "compute_reward", "step", "traci"]:
+            self.assertIn(phase, info["perf"])
+        self.assertGreaterEqual(info["perf"]["step"],
+                                info["perf"]["simulation_step"])
+
+        stats = env.perf_stats()
+        self.assertEqual(stats["phases"]["step"]["calls"], 3)
+        self.assertEqual(stats["phases"]["simulation_step"]["calls"], 3)
+        self.assertGreaterEqual(stats["kernels"]["vehicle"]["calls"], 3)
+        self.assertGreaterEqual(stats["traci"]["simulationStep"]["calls"], 3)
+        self.assertIn("vehicle.slowDown", stats["traci"])
+
+        # the statistics were dumped after the second step, and are dumped
+        # again when the environment is terminated
+        with open(path) as f:
+            self.assertEqual(json.load(f)["num_steps"], 2)
+        env.terminate()
+        with open(path) as f:
+            self.assertEqual(json.load(f)["num_steps"], 3)
+
+
+class TestPipelinedSteps(unittest.TestCase):
+    """Tests the non-blocking step API of environments."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, simulator, pipelined, sims_per_step=1):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        path = os.path.join(self.tmp_dir, "{}_{}".format(
+            simulator, pipelined))
+        sim_params = SumoParams(sim_step=0.1, trajectory_path=path)
+        env_params = EnvParams(sims_per_step=sims_per_step,
+                               additional_params=ADDITIONAL_ENV_PARAMS)
+        env, network = ring_road_exp_setup(
+            vehicles=vehicles, sim_params=sim_params, env_params=env_params)
+        if simulator == "libsumo":
+            env.terminate()
+            env = env.__class__(
+                env_params=env.env_params,
+                sim_params=env.sim_params,
+                network=network,
+                simulator=simulator)
+
+        env.reset()
+        results = []
+        for _ in range(10):
+            if pipelined:
+                env.step_async(None)
+                # the kernel still describes the previous step
+                speeds = env.k.vehicle.get_speed(env.k.vehicle.get_ids())
+                if results and sims_per_step == 1:
+                    np.testing.assert_array_almost_equal(
+                        speeds, results[-1][0])
+                _, reward, done, _ = env.step_wait()
+            else:
+                _, reward, done, _ = env.step(None)
+            results.append(
+                (env.k.vehicle.get_speed(env.k.vehicle.get_ids()), reward))
+        env.terminate()
+        return results, load_trajectories(path)
+
+    def test_matches_step(self):
+        for simulator in ["traci", "libsumo"]:
+            for sims_per_step in [1, 2]:
+                if sims_per_step > 1 and simulator == "libsumo":
+                    continue
+                results, data = self._run(simulator, False, sims_per_step)
+                results_async, data_async = self._run(
+                    simulator, True, sims_per_step)
+                for (speeds, reward), (speeds_async, reward_async) in \
+                        zip(results, results_async):
+                    np.testing.assert_array_almost_equal(
+                        speeds, speeds_async)
+                    self.assertAlmostEqual(reward, reward_async)
+
+                # the trajectories of all steps were recorded in order
+                self.assertListEqual(data["id"].tolist(),
+                                     data_async["id"].tolist())
+                np.testing.assert_array_almost_equal(
+                    data["time"], data_async["time"])
+                np.testing.assert_array_almost_equal(
+                    data["speed"], data_async["speed"])
+
+    def test_errors(self):
+        env, _ = ring_road_exp_setup()
+        env.reset()
+        self.assertRaises(RuntimeError, env.step_wait)
+        env.step_async(None)
+        self.assertRaises(RuntimeError, env.step, None)
+        self.assertRaises(RuntimeError, env.step_async, None)
+
+        # steps in progress are completed upon resets
+        env.reset()
+        self.assertEqual(env.time_counter, 0)
+        env.step(None)
+        env.step_async(None)
+        env.terminate()
+
+    def test_unsupported_traci(self):
+        env, _ = ring_road_exp_setup()
+        env.reset()
+        self.assertTrue(env.k.simulation._async_steps)
+
+        # steps are performed synchronously if the connection does not have
+        # the private attributes needed to send them ahead of time
+        with mock.patch.object(traci_simulation, "ASYNC_STEP_ATTRIBUTES",
+                               ("_not_an_attribute",)):
+            env.k.simulation.pass_api(env.k.kernel_api)
+        self.assertFalse(env.k.simulation._async_steps)
+        env.step_async(None)
+        self.assertIsNone(env.k.simulation._pending_step)
+        env.step_wait()
+        env.terminate()
+
+    def test_experiment(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {"noise": 0.2}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        info = {}
+        for pipeline_steps in [False, True]:
+            sim_params = SumoParams(
+                sim_step=0.1, pipeline_steps=pipeline_steps, seed=0)
+            env, _ = ring_road_exp_setup(
+                vehicles=vehicles, sim_params=sim_params)
+            np.random.seed(0)
+            info[pipeline_steps] = Experiment(env).run(1, 20)
+        self.assertAlmostEqual(info[False]["returns"][0],
+                               info[True]["returns"][0])
+        np.testing.assert_array_almost_equal(
+            info[False]["velocities"][0], info[True]["velocities"][0])
+
+
+class TestMultiStepAdvance(unittest.TestCase):
+    """Tests advancing sumo by several steps per environment step at once."""
+
+    def _ring(self, multi_step_advance, controller, simulator="traci"):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="human",
+            acceleration_controller=controller,
+            num_vehicles=10)
+        vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            num_vehicles=1)
+        sim_params = SumoParams(
+            sim_step=0.1, multi_step_advance=multi_step_advance,
+            profile=True)
+        env_params = EnvParams(
+            sims_per_step=4, additional_params=ADDITIONAL_ENV_PARAMS)
+        env, network = ring_road_exp_setup(
+            vehicles=vehicles, sim_params=sim_params, env_params=env_params)
+        if simulator != "traci":
+            env.terminate()
+            env = env.__class__(
+                env_params=env.env_params,
+                sim_params=env.sim_params,
+                network=network,
+                simulator=simulator)
+        return env
+
+    def _rollout(self, env):
+        env.reset()
+        results = []
+        for i in range(40):
+            accel = 0.3 if (i // 10) % 2 == 0 else -0.3
+            _, reward, _, _ = env.step([accel])
+            ids = sorted(env.k.vehicle.get_ids())
+            results.append((env.k.vehicle.get_speed(ids), reward))
+        num_calls = sum(stats["calls"] for stats in
+                        env.k.profiler.stats()["traci"].values())
+        self.assertEqual(env.time_counter, 160)
+        self.assertEqual(env.k.vehicle.time_counter, 160)
+        env.terminate()
+        return results, num_calls
+
+    def test_held_accelerations(self):
+        """Check that the rl accelerations are held over all steps."""
+        for simulator in ["traci", "libsumo"]:
+            results, num_calls = self._rollout(self._ring(
+                False, (SimCarFollowingController, {}), simulator))
+            results_fast, num_calls_fast = self._rollout(self._ring(
+                True, (SimCarFollowingController, {}), simulator))
+
+            for (speeds, reward), (speeds_fast, reward_fast) in \
+                    zip(results, results_fast):
+                np.testing.assert_array_almost_equal(speeds, speeds_fast)
+                self.assertAlmostEqual(reward, reward_fast)
+            self.assertLess(num_calls_fast, num_calls / 2)
+
+    def test_flow_controllers(self):
+        """Check that vehicles with flow controllers are stepped as usual."""
+        results, num_calls = self._rollout(self._ring(
+            False, (IDMController, {})))
+        results_fast, num_calls_fast = self._rollout(self._ring(
+            True, (IDMController, {})))
+        self.assertEqual(num_calls, num_calls_fast)
+        for (speeds, reward), (speeds_fast, reward_fast) in \
+                zip(results, results_fast):
+            np.testing.assert_array_almost_equal(speeds, speeds_fast)
+
+    def test_trajectories(self):
+        """Check the times and accelerations of recorded trajectories."""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            env = self._ring(True, (SimCarFollowingController, {}))
+            env.sim_params.trajectory_path = tmp_dir
+            env.terminate()
+            env = env.__class__(
+                env_params=env.env_params,
+                sim_params=env.sim_params,
+                network=env.network)
+            env.reset()
+            ids = env.k.vehicle.get_rl_ids()
+            for _ in range(10):
+                env.step([1.])
+            speed = env.k.vehicle.get_speed(ids[0])
+            env.terminate()
+
+            data = load_trajectories(tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        # samples are taken at the end of every environment step
+        times = np.unique(data["time"])
+        np.testing.assert_array_almost_equal(np.diff(times), 0.4)
+
+        # the held acceleration is realized over the environment steps
+        rows = data["id"] == ids[0]
+        np.testing.assert_array_almost_equal(data["accel"][rows][-5:], 1.)
+        self.assertAlmostEqual(data["speed"][rows][-1], speed)
+
+    def test_departures_and_arrivals(self):
+        """Check that the vehicles entering and exiting are all accounted."""
+        # the reference rollout performs one simulation step per environment
+        # step, so that no departure or arrival is missed
+        results = {}
+        for multi_step_advance in [False, True]:
+            sims_per_step = 5 if multi_step_advance else 1
+            vehicles = VehicleParams()
+            vehicles.add(
+                veh_id="human",
+                acceleration_controller=(SimCarFollowingController, {}),
+                num_vehicles=0)
+            inflow = InFlows()
+            inflow.add(veh_type="human", edge="highway_0",
+                       vehs_per_hour=3600, depart_speed=20)
+            net_params = NetParams(
+                inflows=inflow,
+                additional_params={"length": 100, "lanes": 1,
+                                   "speed_limit": 30, "resolution": 40,
+                                   "num_edges": 1})
+            sim_params = SumoParams(
+                sim_step=0.1, multi_step_advance=multi_step_advance, seed=0)
+            env_params = EnvParams(
+                sims_per_step=sims_per_step,
+                additional_params=ADDITIONAL_ENV_PARAMS)
+            env, _ = highway_exp_setup(
+                vehicles=vehicles, sim_params=sim_params,
+                env_params=env_params, net_params=net_params)
+
+            departed, arrived = [], []
+            for _ in range(150 // sims_per_step):
+                env.step(None)
+                departed.extend(env.k.vehicle.get_departed_ids())
+                arrived.extend(env.k.vehicle.get_arrived_ids())
+            results[multi_step_advance] = (
+                departed, arrived,
+                env.k.vehicle.get_inflow_rate(15),
+                env.k.vehicle.get_outflow_rate(15),
+                sorted(env.k.vehicle.get_ids()))
+            env.terminate()
+
+        departed, arrived, inflow_rate, outflow_rate, ids = results[True]
+        self.assertGreater(len(departed), 0)
+        self.assertGreater(len(arrived), 0)
+        self.assertListEqual(sorted(departed), sorted(results[False][0]))
+        self.assertListEqual(sorted(arrived), sorted(results[False][1]))
+        self.assertAlmostEqual(inflow_rate, results[False][2])
+        self.assertAlmostEqual(outflow_rate, results[False][3])
+        self.assertListEqual(ids, results[False][4])
+
+
+class TestFlowVectorEnv(unittest.TestCase):
+    """Tests the environments stepped in parallel by FlowVectorEnv."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {"noise": 0.2}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=3)
+        vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=1)
+
+        self.flow_params = dict(
+            exp_tag="vec_env_test",
+            env_name=AccelEnv,
+            network=RingNetwork,
+            simulator='traci',
+            sim=SumoParams(sim_step=0.1, render=False),
+            env=EnvParams(
+                horizon=5,
+                additional_params=ADDITIONAL_ENV_PARAMS),
+            net=NetParams(additional_params=RING_PARAMS.copy()),
+            veh=vehicles,
+            initial=InitialConfig())
+
+    def test_matches_single_env(self):
+        actions = np.linspace(-1, 1, 8).reshape((4, 2, 1))
+
+        vec_env = FlowVectorEnv(self.flow_params, num_envs=2, seed=7)
+        try:
+            vec_obs = [vec_env.reset()]
+            vec_rews, vec_dones, vec_infos = [], [], []
+            for action in actions:
+                obs, rew, done, info = vec_env.step(action)
+                vec_obs.append(obs)
+                vec_rews.append(rew)
+                vec_dones.append(done)
+                vec_infos.append(info)
+        finally:
+            vec_env.close()
+
+        self.assertEqual(vec_obs[0].shape,
+                         (2,) + vec_env.observation_space.shape)
+        self.assertFalse(vec_env.multiagent)
+
+        # every environment behaves as a separate environment seeded with
+        # seed + index
+        for i in range(2):
+            params = deepcopy(self.flow_params)
+            params['sim'].seed = 7 + i
+            random.seed(7 + i)
+            np.random.seed(7 + i)
+            create_env, _ = make_create_env(params, version=0)
+            env = create_env().unwrapped
+            np.testing.assert_array_almost_equal(
+                vec_obs[0][i], env.reset(), decimal=5)
+            for t, action in enumerate(actions):
+                obs, rew, done, _ = env.step(action[i])
+                np.testing.assert_array_almost_equal(
+                    vec_obs[t + 1][i], obs, decimal=5)
+                self.assertAlmostEqual(vec_rews[t][i], rew)
+                self.assertEqual(vec_dones[t][i], done)
+            env.terminate()
+
+    def test_auto_reset(self):
+        self.flow_params['env'].horizon = 2
+        vec_env = FlowVectorEnv(self.flow_params, num_envs=2)
+        try:
+            initial_obs = vec_env.reset()
+            _, _, dones, infos = vec_env.step(np.zeros((2, 1)))
+            self.assertFalse(dones.any())
+            obs, _, dones, infos = vec_env.step(np.zeros((2, 1)))
+        finally:
+            vec_env.close()
+
+        # the environments are reset once they are done
+        self.assertTrue(dones.all())
+        for i in range(2):
+            self.assertIn("terminal_observation", infos[i])
+        np.testing.assert_array_almost_equal(obs, initial_obs)
+
+    def test_worker_error(self):
+        self.flow_params['env'].additional_params = {}
+        self.assertRaises(
+            RuntimeError, FlowVectorEnv, self.flow_params, num_envs=1)
+
+
 class TestAbstractMethods(unittest.TestCase):
     """
     These series of tests are meant to ensure that the environment abstractions
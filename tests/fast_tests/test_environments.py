@@ -546,6 +546,24 @@ class TestWaveAttenuationPOEnv(unittest.TestCase):
             )
         )
 
+    def test_get_state(self):
+        """Check that the headway matches the scalar position getters."""
+        env = WaveAttenuationPOEnv(
+            sim_params=self.sim_params,
+            network=self.network,
+            env_params=self.env_params
+        )
+        env.reset()
+        for _ in range(10):
+            env.step(rl_actions=[1])
+
+        length = env.k.network.length()
+        headway = (env.k.vehicle.get_x_by_id('human_0') -
+                   env.k.vehicle.get_x_by_id('rl_0')) % length
+        self.assertAlmostEqual(env.get_state()[2], headway / 270)
+
+        env.terminate()
+
     def test_reward(self):
         """Check the reward function for different values.
 
@@ -688,6 +706,33 @@ class TestMergePOEnv(unittest.TestCase):
             )
         )
 
+    def test_get_state(self):
+        """Checks the observations of the controlled vehicles."""
+        env = MergePOEnv(
+            sim_params=self.sim_params,
+            network=self.network,
+            env_params=self.env_params
+        )
+        env.reset()
+        env.step(None)
+        obs = env.get_state()
+        self.assertEqual(env.rl_veh, ["rl_0"])
+
+        # the human vehicle is ahead of the RL vehicle, which has no follower
+        max_speed = env.k.network.max_speed()
+        length = env.k.network.length()
+        speed = env.k.vehicle.get_speed("rl_0")
+        np.testing.assert_array_almost_equal(obs, [
+            speed / max_speed,
+            (env.k.vehicle.get_speed("human_0") - speed) / max_speed,
+            (env.k.vehicle.get_x_by_id("human_0") -
+             env.k.vehicle.get_x_by_id("rl_0") -
+             env.k.vehicle.get_length("rl_0")) / length,
+            speed / max_speed,
+            1] + [0] * 20)
+
+        env.terminate()
+
 
 class TestTestEnv(unittest.TestCase):
 
@@ -874,6 +919,21 @@ class TestBottleneckAccelEnv(unittest.TestCase):
             expected_max=1)
         )
 
+    def test_get_state(self):
+        """Checks the average speeds and densities of the edges."""
+        self.env.step([])
+        obs = self.env.get_state()
+        self.assertTrue(self.env.observation_space.contains(obs))
+
+        expected = []
+        for edge in self.env.k.network.get_edge_list():
+            veh_ids = self.env.k.vehicle.get_ids_by_edge(edge)
+            speed = np.mean(self.env.k.vehicle.get_speed(veh_ids)) \
+                if veh_ids else 0
+            expected += [speed / self.env.max_speed,
+                         len(veh_ids) / self.env.k.network.edge_length(edge)]
+        np.testing.assert_array_almost_equal(obs, expected)
+
 
 class TestBottleneckDesiredVelocityEnv(unittest.TestCase):
 
@@ -1048,6 +1108,30 @@ class TestMultiAgentHighwayPOEnv(unittest.TestCase):
             )
         )
 
+    def test_get_state(self):
+        """Checks the observations of the RL vehicles."""
+        env = MultiAgentHighwayPOEnv(
+            sim_params=self.sim_params,
+            network=self.network,
+            env_params=self.env_params
+        )
+        env.reset()
+        obs = env.get_state()
+        self.assertEqual(list(obs.keys()), ["rl_0"])
+
+        # the human vehicle is ahead of the RL vehicle, which has no follower
+        max_speed = env.k.network.max_speed()
+        length = env.k.network.length()
+        speed = env.k.vehicle.get_speed("rl_0")
+        np.testing.assert_array_almost_equal(obs["rl_0"], [
+            speed / max_speed,
+            (env.k.vehicle.get_speed("human_0") - speed) / max_speed,
+            env.k.vehicle.get_headway("rl_0") / length,
+            speed / max_speed,
+            1])
+
+        env.terminate()
+
 
 ###############################################################################
 #                              Utility methods                                #
@@ -1,10 +1,12 @@
 import unittest
 import os
+import shutil
+import tempfile
 import time
 
 from flow.core.experiment import Experiment
 from flow.core.params import VehicleParams
-from flow.controllers import RLController, ContinuousRouter
+from flow.controllers import RLController, ContinuousRouter, IDMController
 from flow.core.params import SumoCarFollowingParams
 from flow.core.params import SumoParams
 
@@ -124,5 +126,50 @@ class TestConvertToCSV(unittest.TestCase):
             network.name)))
 
 
+class TestParallelRuns(unittest.TestCase):
+    """
+    Tests that runs distributed across several processes are seeded
+    independently of the number of processes, and merged in run order.
+    """
+
+    def test_parallel_runs(self):
+        tmp_dir = tempfile.mkdtemp()
+
+        info = {}
+        for num_workers in [2, 3]:
+            vehicles = VehicleParams()
+            vehicles.add(
+                veh_id="idm",
+                acceleration_controller=(IDMController, {"noise": 0.2}),
+                routing_controller=(ContinuousRouter, {}),
+                num_vehicles=5)
+            sim_params = SumoParams(sim_step=0.1, emission_path=tmp_dir)
+            env, network = ring_road_exp_setup(
+                vehicles=vehicles, sim_params=sim_params)
+            exp = Experiment(env)
+            info[num_workers] = exp.run(
+                num_runs=3, num_steps=20, num_workers=num_workers,
+                convert_to_csv=num_workers == 2)
+
+            if num_workers == 2:
+                # one emission file is generated and converted per run
+                self.assertCountEqual(
+                    os.listdir(tmp_dir),
+                    ["{}_run{}-emission.csv".format(network.name, i)
+                     for i in range(3)])
+
+        shutil.rmtree(tmp_dir)
+
+        self.assertEqual(len(info[2]["returns"]), 3)
+        np.testing.assert_array_almost_equal(
+            info[2]["returns"], info[3]["returns"])
+        np.testing.assert_array_almost_equal(
+            info[2]["velocities"], info[3]["velocities"])
+
+        # the noise of the vehicles differs between runs
+        self.assertNotAlmostEqual(info[2]["returns"][0],
+                                  info[2]["returns"][1])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,322 @@
+import unittest
+import os
+from unittest import mock
+import numpy as np
+from tests.setup_scripts import ring_road_exp_setup
+from flow.controllers import IDMController, RLController, ContinuousRouter
+from flow.core.params import EnvParams, NetParams, SumoParams, InitialConfig
+from flow.core.params import VehicleParams
+from flow.core.observations import ObservationSpec, EdgeSpec, ArraySpec, \
+    ConcatenatedSpec, Speed, Position, Lane, Headway, LaneOneHot, LeaderGap, \
+    LeaderDistance, LeaderSpeed, FollowerGap, FollowerSpeed, \
+    DistanceToEdgeEnd, EdgeNumber, LaneHeadways, LaneLeaderSpeeds, \
+    NearestOnEdges, EdgeDensity, EdgeMeanSpeed
+from flow.envs import AccelEnv
+from flow.envs.ring.accel import ADDITIONAL_ENV_PARAMS
+from flow.networks import RingNetwork
+from flow.networks.ring import ADDITIONAL_NET_PARAMS
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestObservationSpec(unittest.TestCase):
+    """Tests for the observations built in flow/core/observations.py."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=5)
+        self.env, _ = ring_road_exp_setup(vehicles=vehicles)
+        self.env.reset()
+        for _ in range(5):
+            self.env.step(rl_actions=None)
+        self.ids = sorted(self.env.k.vehicle.get_ids())
+
+    def tearDown(self):
+        self.env.terminate()
+
+    def test_layouts(self):
+        """Check the order of the features in both layouts."""
+        env = self.env
+        speeds = np.array(env.k.vehicle.get_speed(self.ids))
+        pos = env.k.vehicle.get_x_array(self.ids)
+        max_speed = env.k.network.max_speed()
+        length = env.k.network.length()
+
+        features = [Speed(scale='max_speed'), Position(scale='length')]
+        extractor = ObservationSpec(
+            features, vehicles=lambda env: self.ids,
+            num_vehicles=5).compile(env)
+        obs = extractor(env)
+        self.assertEqual(obs.dtype, np.float32)
+        self.assertEqual(extractor.observation_space.shape, (10,))
+        np.testing.assert_array_almost_equal(
+            obs, np.concatenate((speeds / max_speed, pos / length)))
+        self.assertIs(extractor.last_observation, obs)
+
+        extractor = ObservationSpec(
+            features, vehicles=lambda env: self.ids,
+            num_vehicles=5, layout='vehicle').compile(env)
+        np.testing.assert_array_almost_equal(
+            extractor(env),
+            np.stack((speeds / max_speed, pos / length), axis=1).flatten())
+
+        # every call returns a new array
+        self.assertIsNot(extractor(env), extractor(env))
+
+        self.assertRaises(ValueError, ObservationSpec, layout='unknown')
+
+    def test_padding(self):
+        """Check that missing vehicles are filled, and extra ones dropped."""
+        env = self.env
+        extractor = ObservationSpec(
+            [Speed(), Lane()], vehicles=lambda env: self.ids[:2],
+            num_vehicles=4, fill=-1.).compile(env)
+        obs = extractor(env)
+        np.testing.assert_array_almost_equal(
+            obs[:2], env.k.vehicle.get_speed(self.ids[:2]))
+        np.testing.assert_array_equal(obs[2:4], [-1, -1])
+        np.testing.assert_array_equal(obs[4:], [0, 0, -1, -1])
+
+        extractor = ObservationSpec(
+            [Speed()], num_vehicles=3).compile(env)
+        self.assertEqual(extractor(env).shape, (3,))
+
+    def test_neighbors(self):
+        """Check the one-hot lanes and the features of leaders/followers."""
+        env = self.env
+        obs = ObservationSpec(
+            [LaneOneHot(), LeaderGap(scale='length'), LeaderSpeed(),
+             FollowerGap(scale='length')],
+            vehicles=lambda env: self.ids, num_vehicles=5,
+            layout='vehicle').compile(env)(env).reshape((5, 4))
+        np.testing.assert_array_equal(obs[:, 0], 1)
+        np.testing.assert_array_almost_equal(
+            obs[:, 1],
+            env.k.vehicle.get_headway_array(self.ids) / env.k.network.length())
+        leaders = env.k.vehicle.get_leader(self.ids)
+        np.testing.assert_array_almost_equal(
+            obs[:, 2], env.k.vehicle.get_speed(leaders))
+
+        # vehicles without leaders are assigned the value of missing leaders
+        leaders = dict(zip(self.ids, leaders))
+        leaders[self.ids[0]] = None
+        with mock.patch.object(
+                env.k.vehicle, "get_leader",
+                lambda veh_ids, error="": [leaders[v] for v in veh_ids]):
+            obs = ObservationSpec(
+                [LeaderGap(missing=2.)], vehicles=lambda env: self.ids,
+                num_vehicles=5).compile(env)(env)
+        self.assertEqual(obs[0], 2.)
+        self.assertAlmostEqual(
+            obs[1], env.k.vehicle.get_headway(self.ids[1]), 4)
+
+    def test_nearest_on_edges(self):
+        """Check the features of the vehicles closest to the end of edges."""
+        env = self.env
+        edges = env.k.network.get_edge_list()
+        extractor = ObservationSpec(
+            edge_features=[NearestOnEdges(edges, k=2)]).compile(env)
+        obs = extractor(env).reshape((len(edges), 2, 2))
+        self.assertEqual(extractor.observation_space.shape,
+                         (4 * len(edges),))
+
+        for i, edge in enumerate(edges):
+            veh_ids = env.k.vehicle.get_ids_by_edge(edge)
+            dist = sorted(
+                (env.k.network.edge_length(edge) -
+                 env.k.vehicle.get_position(veh_id),
+                 env.k.vehicle.get_speed(veh_id)) for veh_id in veh_ids)[:2]
+            expected = np.zeros((2, 2))
+            for j, (d, s) in enumerate(dist):
+                expected[:, j] = [d, s / env.k.network.max_speed()]
+            np.testing.assert_array_almost_equal(obs[i], expected, 5)
+
+    def test_bounds(self):
+        """Check the bounds of the observation space."""
+        extractor = ObservationSpec(
+            [Speed(), Position(low=-1., high=2.)],
+            num_vehicles=2).compile(self.env)
+        space = extractor.observation_space
+        np.testing.assert_array_equal(space.low, [0, 0, -1, -1])
+        np.testing.assert_array_equal(space.high, [1, 1, 2, 2])
+
+    def test_empty_positions(self):
+        """Check that empty positions are filled with the feature fills."""
+        env = self.env
+        veh_ids = [self.ids[0], None, self.ids[2], '']
+        extractor = ObservationSpec(
+            [Speed(fill=-1.), Lane()], vehicles=lambda env: veh_ids,
+            num_vehicles=4, fill=2.).compile(env)
+        obs = extractor(env)
+        self.assertEqual(extractor.last_vehicle_ids, veh_ids)
+        np.testing.assert_array_almost_equal(
+            obs[[0, 2]], env.k.vehicle.get_speed([self.ids[0], self.ids[2]]))
+        np.testing.assert_array_equal(obs[[1, 3]], [-1, -1])
+        np.testing.assert_array_equal(obs[4:], [0, 2, 0, 2])
+
+    def test_relative_features(self):
+        """Check the relative speeds and the distances to leaders."""
+        env = self.env
+        vehicle = env.k.vehicle
+        speeds = vehicle.get_speed_array(self.ids)
+        leaders = vehicle.get_leader(self.ids)
+        followers = vehicle.get_follower(self.ids)
+        obs = ObservationSpec(
+            [LeaderSpeed(relative=True), FollowerSpeed(relative=True),
+             LeaderDistance(), Headway(), DistanceToEdgeEnd()],
+            vehicles=lambda env: self.ids, num_vehicles=5,
+            layout='vehicle').compile(env)(env).reshape((5, 5))
+        np.testing.assert_array_almost_equal(
+            obs[:, 0], vehicle.get_speed_array(leaders) - speeds, 4)
+        np.testing.assert_array_almost_equal(
+            obs[:, 1], speeds - vehicle.get_speed_array(followers), 4)
+        np.testing.assert_array_almost_equal(
+            obs[:, 2], (vehicle.get_x_array(leaders) -
+                        vehicle.get_x_array(self.ids) -
+                        vehicle.get_length_array(self.ids)), 3)
+        np.testing.assert_array_almost_equal(
+            obs[:, 3], vehicle.get_headway_array(self.ids), 4)
+        np.testing.assert_array_almost_equal(
+            obs[:, 4],
+            [env.k.network.edge_length(vehicle.get_edge(veh_id)) -
+             vehicle.get_position(veh_id) for veh_id in self.ids], 4)
+
+        # the default values of vehicles without leaders are transformed
+        # like the other values
+        leaders = dict(zip(self.ids, leaders))
+        leaders[self.ids[0]] = ''
+        with mock.patch.object(
+                env.k.vehicle, "get_leader",
+                lambda veh_ids, error="": [leaders[v] for v in veh_ids]):
+            obs = ObservationSpec(
+                [LeaderSpeed(scale=10, default=30, relative=True),
+                 LeaderSpeed(missing=-1, relative=True)],
+                vehicles=lambda env: self.ids[:1],
+                num_vehicles=1).compile(env)(env)
+        np.testing.assert_array_almost_equal(
+            obs, [(30 - speeds[0]) / 10, -1], 5)
+
+    def test_edge_numbers(self):
+        """Check the edge numbers of the vehicles."""
+        env = self.env
+        edges = env.k.network.get_edge_list()
+        edge = env.k.vehicle.get_edge(self.ids[0])
+        feature = EdgeNumber(convert=edges.index, scale=2)
+        obs = ObservationSpec(
+            [feature], vehicles=lambda env: self.ids[:1],
+            num_vehicles=1).compile(env)(env)
+        self.assertAlmostEqual(obs[0], edges.index(edge) / 2)
+
+        # vehicles on internal edges are assigned the value of missing edges
+        with mock.patch.object(
+                env.k.vehicle, "get_edge",
+                lambda veh_ids, error="": [':center_0'] * len(veh_ids)):
+            obs = ObservationSpec(
+                [feature], vehicles=lambda env: self.ids[:1],
+                num_vehicles=1).compile(env)(env)
+        self.assertEqual(obs[0], -1)
+
+    def test_lane_features(self):
+        """Check the features of the vehicles on all lanes."""
+        env = self.env
+        extractor = ObservationSpec(
+            [LaneHeadways(num_lanes=2, scale=100, missing=3.),
+             LaneLeaderSpeeds(num_lanes=2)],
+            vehicles=lambda env: self.ids, num_vehicles=5,
+            layout='vehicle').compile(env)
+        self.assertEqual(extractor.observation_space.shape, (20,))
+        obs = extractor(env).reshape((5, 4))
+        for i, veh_id in enumerate(self.ids):
+            np.testing.assert_array_almost_equal(
+                obs[i],
+                [env.k.vehicle.get_lane_headways(veh_id)[0] / 100, 3.,
+                 env.k.vehicle.get_lane_leaders_speed(veh_id)[0], 1.], 4)
+
+    def test_per_vehicle(self):
+        """Check the observations of every vehicle."""
+        env = self.env
+        features = [Speed(scale='max_speed'), LeaderGap(scale='length')]
+        obs = ObservationSpec(
+            features, vehicles=lambda env: self.ids[:3],
+            num_vehicles=1).compile(env).per_vehicle(env)
+        self.assertEqual(sorted(obs), self.ids[:3])
+        for veh_id in self.ids[:3]:
+            self.assertEqual(obs[veh_id].dtype, np.float32)
+            np.testing.assert_array_almost_equal(
+                obs[veh_id],
+                ObservationSpec(
+                    features, vehicles=lambda env: [veh_id],
+                    num_vehicles=1).compile(env)(env))
+
+    def test_edge_spec(self):
+        """Check the features of edges in both layouts."""
+        env = self.env
+        edges = env.k.network.get_edge_list()
+        density = [len(env.k.vehicle.get_ids_by_edge(edge)) /
+                   env.k.network.edge_length(edge) for edge in edges]
+        speeds = [np.mean(env.k.vehicle.get_speed(
+            env.k.vehicle.get_ids_by_edge(edge)) or [0]) for edge in edges]
+
+        extractor = EdgeSpec(
+            [EdgeDensity(scale=0.2), EdgeMeanSpeed()]).compile(env)
+        self.assertEqual(extractor.observation_space.shape,
+                         (2 * len(edges),))
+        np.testing.assert_array_almost_equal(
+            extractor(env), np.concatenate((np.array(density) / 0.2, speeds)))
+
+        extractor = EdgeSpec(
+            [EdgeDensity(), EdgeMeanSpeed()], edges=edges[:2],
+            layout='edge').compile(env)
+        np.testing.assert_array_almost_equal(
+            extractor(env),
+            [density[0], speeds[0], density[1], speeds[1]])
+
+        self.assertRaises(ValueError, EdgeSpec, [], layout='vehicle')
+
+    def test_concatenated_spec(self):
+        """Check the concatenation of specs."""
+        env = self.env
+        extractor = ConcatenatedSpec([
+            ObservationSpec([Speed()], vehicles=lambda env: self.ids[:2],
+                            num_vehicles=2),
+            ArraySpec(lambda env: [5, 6, 7], 3, low=-10, high=10),
+        ]).compile(env)
+        space = extractor.observation_space
+        np.testing.assert_array_equal(space.low, [0, 0, -10, -10, -10])
+        np.testing.assert_array_equal(space.high, [1, 1, 10, 10, 10])
+        obs = extractor(env)
+        self.assertIs(extractor.last_observation, obs)
+        np.testing.assert_array_almost_equal(
+            obs, list(env.k.vehicle.get_speed(self.ids[:2])) + [5, 6, 7])
+
+
+class TestAccelEnvObservation(unittest.TestCase):
+    """Tests the observations of an environment built from a spec."""
+
+    def test_no_copy(self):
+        """Check that the observations of env.step are not copied again."""
+        vehicles = VehicleParams()
+        vehicles.add("idm", acceleration_controller=(IDMController, {}),
+                     routing_controller=(ContinuousRouter, {}),
+                     num_vehicles=4)
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     routing_controller=(ContinuousRouter, {}),
+                     num_vehicles=1)
+        env_params = EnvParams(additional_params=ADDITIONAL_ENV_PARAMS)
+        network = RingNetwork(
+            "ring", vehicles,
+            NetParams(additional_params=ADDITIONAL_NET_PARAMS.copy()),
+            InitialConfig())
+        env = AccelEnv(env_params, SumoParams(sim_step=0.1), network)
+
+        obs = env.reset()
+        self.assertIs(obs, env.observation_extractor.last_observation)
+        obs, _, _, _ = env.step([0])
+        self.assertIs(obs, env.observation_extractor.last_observation)
+        self.assertEqual(env.observation_space.shape, (10,))
+        self.assertTrue(env.observation_space.contains(obs))
+        env.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
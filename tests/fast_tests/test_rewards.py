@@ -7,6 +7,9 @@ from flow.core.params import VehicleParams
 from flow.core.rewards import average_velocity, min_delay
 from flow.core.rewards import desired_velocity, boolean_action_penalty
 from flow.core.rewards import penalize_near_standstill, penalize_standstill
+from flow.core.rewards import avg_delay_specified_vehicles, delay_array
+from flow.core.rewards import desired_velocity_array, min_delay_array
+from flow.core.rewards import penalize_headway_variance, TravelMetrics
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -165,6 +168,134 @@ class TestRewards(unittest.TestCase):
         self.assertEqual(boolean_action_penalty(actions, gain=1), 2)
         self.assertEqual(boolean_action_penalty(actions, gain=2), 4)
 
+    def test_array_rewards(self):
+        """Test the array-native reward functions."""
+        speeds = np.array([0., 5., 10., -1001.])
+        np.testing.assert_array_almost_equal(
+            delay_array(speeds[:3], [10., 10., np.nan]), [1, 0.5, 0])
+        self.assertEqual(desired_velocity_array(speeds, 10), 0)
+        self.assertEqual(desired_velocity_array(speeds[:3], 10, fail=True), 0)
+        self.assertAlmostEqual(desired_velocity_array(speeds[:3], 10),
+                               1 - np.sqrt(125) / np.sqrt(300))
+        # vehicles with an invalid speed are ignored by min_delay
+        self.assertAlmostEqual(min_delay_array(speeds, 10, 0.1), 0.5, 5)
+
+    def test_avg_delay_specified_vehicles(self):
+        """Test the avg_delay_specified_vehicles method."""
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+        env.k.vehicle.test_set_speed("test_0", 15)
+
+        veh_ids = env.k.vehicle.get_ids()
+        expected = 0
+        for edge in env.k.network.get_edge_list():
+            for veh_id in env.k.vehicle.get_ids_by_edge(edge):
+                v_top = env.k.network.speed_limit(edge)
+                expected += (v_top - env.k.vehicle.get_speed(veh_id)) / v_top
+        expected *= env.sim_step / 5
+        self.assertAlmostEqual(
+            avg_delay_specified_vehicles(env, veh_ids[:5]), expected)
+        self.assertEqual(avg_delay_specified_vehicles(env, []), 0)
+
+        headways = [env.k.vehicle.get_headway(veh_id) / 2 for veh_id in veh_ids]
+        self.assertAlmostEqual(
+            penalize_headway_variance(env.k.vehicle, veh_ids, normalization=2),
+            -np.var(headways))
+        env.terminate()
+
+    def test_travel_metrics(self):
+        """Test the incremental computation of delays and travel times."""
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+        env.reset()
+
+        metrics = TravelMetrics()
+        metrics.update(env)
+        self.assertEqual(metrics.total_delay, 0)
+
+        total_delay = 0
+        for _ in range(3):
+            env.step(rl_actions=None)
+            # vehicles on junctions are not assigned any delay
+            veh_ids = env.k.vehicle.get_ids()
+            speed_limits = [
+                env.k.network.speed_limit(edge)
+                if edge in env.k.network.get_edge_list() else np.nan
+                for edge in env.k.vehicle.get_edge(veh_ids)]
+            delays = delay_array(
+                env.k.vehicle.get_speed_array(veh_ids), speed_limits)
+            metrics.update(env)
+            # further updates within the same step are ignored
+            metrics.update(env)
+            total_delay += env.sim_step * np.sum(delays)
+            self.assertAlmostEqual(metrics.step_delay,
+                                   env.sim_step * np.sum(delays))
+        self.assertAlmostEqual(metrics.total_delay, total_delay)
+        np.testing.assert_array_almost_equal(
+            metrics.current_travel_times(env), [0.3] * 10)
+
+        # vehicles that leave the network are assigned a travel time
+        env.k.vehicle.remove("test_0")
+        env.step(rl_actions=None)
+        metrics.update(env)
+        np.testing.assert_array_almost_equal(metrics.travel_times, [0.4])
+
+        # the metrics are reset with the environment
+        env.reset()
+        metrics.update(env)
+        self.assertEqual(metrics.total_delay, 0)
+        self.assertEqual(len(metrics.travel_times), 0)
+        env.terminate()
+
+    def test_step_cache(self):
+        """Test that rewards are computed once per step, and shared."""
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+
+        env_params = EnvParams(additional_params={
+            "target_velocity": 10, "max_accel": 1, "max_decel": 1,
+            "sort_vehicles": False})
+
+        env, _ = ring_road_exp_setup(vehicles=vehicles,
+                                     env_params=env_params)
+        env.reset()
+        env.step(rl_actions=None)
+
+        # the speeds are collected once, and shared by all reward functions
+        speeds = []
+        get_speed = env.k.vehicle.get_speed
+
+        def counted_get_speed(veh_id, *args, **kwargs):
+            if isinstance(veh_id, list):
+                speeds.append(veh_id)
+            return get_speed(veh_id, *args, **kwargs)
+
+        env.k.vehicle.get_speed = counted_get_speed
+        env.k.cache.clear()
+        reward = desired_velocity(env)
+        for _ in range(5):
+            self.assertEqual(desired_velocity(env), reward)
+        average_velocity(env)
+        min_delay(env)
+        self.assertEqual(len(speeds), 1)
+
+        # the cached values are outdated after the next simulation step
+        epoch = env.k.cache.epoch
+        env.step(rl_actions=None)
+        self.assertGreater(env.k.cache.epoch, epoch)
+        num_calls = len(speeds)
+        self.assertGreater(num_calls, 1)
+
+        # the speeds collected by the reward of the step are shared as well
+        desired_velocity(env)
+        desired_velocity(env)
+        self.assertEqual(len(speeds), num_calls)
+
+        env.k.vehicle.get_speed = get_speed
+        env.terminate()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,8 @@
 import unittest
 import os
+import shutil
+import tempfile
+from unittest import mock
 import numpy as np
 
 from flow.config import PROJECT_PATH
@@ -12,6 +15,9 @@ from flow.core.params import SumoCarFollowingParams
 from flow.networks.ring import RingNetwork, ADDITIONAL_NET_PARAMS
 from flow.envs import TestEnv
 from flow.networks import Network
+from flow.core.kernel.network.lane_graph import LaneGraph
+from flow.core.kernel.network.traci import TraCIKernelNetwork
+from flow.core.util import iterparse_elements
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController
@@ -64,6 +70,25 @@ class TestGetX(unittest.TestCase):
         pos = 4.72
         self.assertAlmostEqual(self.env.k.network.get_x(edge, pos), -1001)
 
+    def test_get_x_batch(self):
+        network = self.env.k.network
+        edges = ["bottom", ":bottom", "", ":bottom_0", ":unknown", "top"]
+        positions = [4.72, 0.1, 4.72, 0.1, 3, 10]
+
+        # the vectorized method matches the scalar one
+        expected = [network.get_x(edge, pos)
+                    for edge, pos in zip(edges, positions)]
+        np.testing.assert_array_almost_equal(
+            network.get_x_batch(edges, positions), expected)
+
+        # the indices of edges can be reused
+        index = network.get_edge_index(edges)
+        np.testing.assert_array_almost_equal(
+            network.get_x_batch(index, positions), expected)
+
+        # unknown non-internal edges are not accepted
+        self.assertRaises(KeyError, network.get_x_batch, ["unknown"], [0])
+
 
 class TestGetEdge(unittest.TestCase):
     """
@@ -92,6 +117,21 @@ class TestGetEdge(unittest.TestCase):
         self.assertTupleEqual(
             self.env.k.network.get_edge(x2), (":bottom", 0.1))
 
+    def test_get_edge_batch(self):
+        network = self.env.k.network
+        x = np.linspace(-1, network.length() + 1, 500)
+
+        # the vectorized method matches the scalar one
+        edges, positions = network.get_edge_batch(x)
+        for i, x_i in enumerate(x):
+            expected = network.get_edge(x_i)
+            if expected is None:
+                self.assertIsNone(edges[i])
+                self.assertTrue(np.isnan(positions[i]))
+            else:
+                self.assertEqual(edges[i], expected[0])
+                self.assertAlmostEqual(positions[i], expected[1])
+
 
 class TestEvenStartPos(unittest.TestCase):
     """
@@ -885,6 +925,78 @@ class TestNextPrevEdge(unittest.TestCase):
         self.assertTrue(len(prev_edge) == 0)
 
 
+class TestLaneGraph(unittest.TestCase):
+    """Tests the compiled lane connectivity graph of the network kernel."""
+
+    def test_matches_next_prev_edge(self):
+        env, _ = figure_eight_exp_setup()
+        network = env.k.network
+        graph = network.get_lane_graph()
+
+        def pair(node):
+            edge = graph.edge_ids[graph.node_edge[node]]
+            return edge, node - graph.node_offset[graph.edge_index[edge]]
+
+        edges = network.get_edge_list() + network.get_junction_list()
+        for edge in edges:
+            for lane in range(network.num_lanes(edge)):
+                node = graph.node(edge, lane)
+                self.assertEqual(pair(node), (edge, lane))
+                self.assertEqual(
+                    [pair(n) for n in graph.next_nodes[
+                        graph.next_ptr[node]:graph.next_ptr[node + 1]]],
+                    network.next_edge(edge, lane))
+                self.assertEqual(
+                    [pair(n) for n in graph.prev_nodes[
+                        graph.prev_ptr[node]:graph.prev_ptr[node + 1]]],
+                    network.prev_edge(edge, lane))
+
+        self.assertEqual(graph.node("bottom", 1), -1)
+        self.assertEqual(graph.node("unknown", 0), -1)
+        env.terminate()
+
+    def test_search(self):
+        env, _ = ring_road_exp_setup()
+        network = env.k.network
+        # test searches spanning several rows of the lookahead tables
+        graph = LaneGraph(network._edges, network._connections, lookahead=3)
+
+        # lanes visited when following the ring forward from the top edge
+        chain = [("top", 0)]
+        for _ in range(7):
+            chain.append(network.next_edge(*chain[-1])[0])
+
+        for hops in range(1, 8):
+            occupied = np.zeros(graph.num_nodes, dtype=bool)
+            occupied[graph.node(*chain[hops])] = True
+
+            # moving forward, the lengths of all lanes before the occupied
+            # lane are added
+            node, length = graph.search(
+                graph.node(*chain[0]), occupied, max_hops=8)
+            self.assertEqual(node, graph.node(*chain[hops]))
+            self.assertAlmostEqual(length, sum(
+                network.edge_length(edge) for edge, _ in chain[:hops]))
+
+            # moving backward, the lengths of all lanes after the starting
+            # lane are added
+            occupied = np.zeros(graph.num_nodes, dtype=bool)
+            occupied[graph.node(*chain[0])] = True
+            node, length = graph.search(
+                graph.node(*chain[hops]), occupied, max_hops=8, forward=False)
+            self.assertEqual(node, graph.node(*chain[0]))
+            self.assertAlmostEqual(length, sum(
+                network.edge_length(edge) for edge, _ in chain[:hops]))
+
+            # the search is limited to the specified number of hops
+            node, _ = graph.search(
+                graph.node(*chain[hops]), occupied, max_hops=hops - 1,
+                forward=False)
+            self.assertEqual(node, -1)
+
+        env.terminate()
+
+
 class TestDefaultRoutes(unittest.TestCase):
 
     def test_default_routes(self):
@@ -1057,5 +1169,96 @@ class TestNetworkTemplateGenerator(unittest.TestCase):
         self.assertDictEqual(network.routes, expected_routes)
 
 
+class TestNetCache(unittest.TestCase):
+    """Tests the cache of the networks generated by netconvert."""
+
+    def test_cache_hit(self):
+        cache_dir = tempfile.mkdtemp()
+        sim_params = SumoParams(sim_step=0.1, net_cache_dir=cache_dir)
+
+        # the first network is generated by netconvert and added to the cache
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        edges = {edge: (env.k.network.edge_length(edge),
+                        env.k.network.num_lanes(edge),
+                        env.k.network.speed_limit(edge))
+                 for edge in env.k.network.get_edge_list()}
+        next_edges = env.k.network.next_edge("top", 0)
+        env.terminate()
+        self.assertEqual(
+            sorted(os.path.splitext(f)[1] for f in os.listdir(cache_dir)),
+            ['.pkl', '.xml'])
+
+        # an identical network is loaded from the cache without netconvert
+        with mock.patch('flow.core.kernel.network.traci.subprocess.call') \
+                as call:
+            env, _ = ring_road_exp_setup(sim_params=sim_params)
+        call.assert_not_called()
+        self.assertDictEqual(
+            {edge: (env.k.network.edge_length(edge),
+                    env.k.network.num_lanes(edge),
+                    env.k.network.speed_limit(edge))
+             for edge in env.k.network.get_edge_list()}, edges)
+        self.assertEqual(env.k.network.next_edge("top", 0), next_edges)
+
+        # the cached network can be simulated
+        env.reset()
+        env.step(rl_actions=None)
+        env.terminate()
+
+        # a different network is not loaded from the cache
+        net_params = NetParams(additional_params={
+            "length": 260, "lanes": 1, "speed_limit": 30, "resolution": 40})
+        env, _ = ring_road_exp_setup(
+            sim_params=sim_params, net_params=net_params)
+        self.assertEqual(len(os.listdir(cache_dir)), 4)
+        env.terminate()
+
+        shutil.rmtree(cache_dir)
+
+    def test_template_cache(self):
+        """Check that the data of templates is only cached if requested."""
+        cache_dir = tempfile.mkdtemp()
+        template_dir = tempfile.mkdtemp()
+        net_file = os.path.join(template_dir, "fig8_test.net.xml")
+        shutil.copyfile(os.path.join(os.path.dirname(
+            os.path.realpath(__file__)), "test_files/fig8_test.net.xml"),
+            net_file)
+        net_params = NetParams(template={"net": net_file})
+
+        def import_edges(**kwargs):
+            sim_params = SumoParams(net_cache_dir=cache_dir, **kwargs)
+            k_network = TraCIKernelNetwork(None, sim_params)
+            k_network.netfn = net_file
+            return k_network._import_edges_from_net(net_params)
+
+        # templates are not cached by default
+        data = import_edges()
+        self.assertListEqual(os.listdir(cache_dir), [])
+
+        # the data of the template is stored in the cache directory, and not
+        # next to the template
+        self.assertEqual(import_edges(cache_templates=True), data)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        self.assertListEqual(os.listdir(template_dir), ["fig8_test.net.xml"])
+
+        # later imports are loaded from the cache without parsing the file
+        with mock.patch('flow.core.kernel.network.traci.iterparse_elements') \
+                as iterparse:
+            self.assertEqual(import_edges(cache_templates=True), data)
+        iterparse.assert_not_called()
+
+        # modifying the template invalidates the cached data
+        with open(net_file, 'a') as f:
+            f.write('\n')
+        with mock.patch('flow.core.kernel.network.traci.iterparse_elements',
+                        side_effect=iterparse_elements) as iterparse:
+            self.assertEqual(import_edges(cache_templates=True), data)
+        iterparse.assert_called()
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(template_dir)
+
+
 if __name__ == '__main__':
     unittest.main()
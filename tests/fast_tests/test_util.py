@@ -3,6 +3,8 @@ import csv
 import os
 import json
 import collections
+import shutil
+import tempfile
 
 from flow.envs import AccelEnv
 from flow.networks import FigureEightNetwork
@@ -11,7 +13,7 @@ from flow.core.params import TrafficLightParams
 from flow.controllers import IDMController, ContinuousRouter, RLController
 from flow.core.params import SumoParams, EnvParams, NetParams, InitialConfig, \
     InFlows, SumoCarFollowingParams
-from flow.core.util import emission_to_csv
+from flow.core.util import emission_to_csv, iterparse_elements
 from flow.envs import MergePOEnv
 from flow.networks import MergeNetwork
 from flow.utils.flow_warnings import deprecated_attribute
@@ -59,6 +61,62 @@ class TestEmissionToCSV(unittest.TestCase):
         # I don't think is a problem
         self.assertEqual(len(dict1), 104)
 
+    def test_emission_to_csv_external_sort(self):
+        """Check that the output does not depend on the sorting strategy."""
+        current_path = os.path.realpath(__file__).rsplit("/", 1)[0]
+        emission_path = current_path + "/test_files/test-emission.xml"
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            outputs = []
+            for i, kwargs in enumerate([{},
+                                        {"max_rows": 5},
+                                        {"num_workers": 3, "max_rows": 5}]):
+                output_path = os.path.join(tmp_dir, "{}.csv".format(i))
+                emission_to_csv(emission_path, output_path, **kwargs)
+                with open(output_path, "r") as f:
+                    outputs.append(f.read())
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+        # rows are sorted by vehicle id, and then by time
+        rows = list(csv.DictReader(outputs[0].splitlines()))
+        keys = [(row["id"], float(row["time"])) for row in rows]
+        self.assertListEqual(keys, sorted(keys))
+
+
+class TestStreamingImport(unittest.TestCase):
+    """Tests the streaming xml parser."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'test.rou.xml')
+        with open(self.path, 'w') as f:
+            f.write('<routes>'
+                    '<vehicle id="veh0"><route edges="a b"/></vehicle>'
+                    '<route id="route0" edges="b c"/>'
+                    '<vehicle id="veh1"><route edges="c d"/></vehicle>'
+                    '</routes>')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_iterparse_elements(self):
+        """Check that only top-level elements are yielded, in order."""
+        elements = [(elem.tag, elem.get('id')) for elem in
+                    iterparse_elements(self.path, ('vehicle', 'route'))]
+        self.assertListEqual(
+            elements,
+            [('vehicle', 'veh0'), ('route', 'route0'), ('vehicle', 'veh1')])
+
+        # children of the elements are available while they are processed
+        edges = [elem.find('route').get('edges') for elem in
+                 iterparse_elements(self.path, ('vehicle',))]
+        self.assertListEqual(edges, ['a b', 'c d'])
+
 
 class TestWarnings(unittest.TestCase):
     """Tests warning functions located in flow.utils.warnings"""
@@ -1,14 +1,19 @@
 import unittest
+from unittest import mock
 import os
+import warnings
 import numpy as np
 
 from flow.core.params import VehicleParams
 from flow.core.params import SumoCarFollowingParams, NetParams, \
-    InitialConfig, SumoParams, SumoLaneChangeParams
+    InitialConfig, SumoParams, SumoLaneChangeParams, InFlows
 from flow.controllers.car_following_models import IDMController, \
     SimCarFollowingController
 from flow.controllers.lane_change_controllers import StaticLaneChanger
 from flow.controllers.rlcontroller import RLController
+from flow.core.kernel.vehicle.columnar import VehicleStateArrays
+from flow.core.kernel.vehicle.id_sets import IndexedIdSet, SortedIdSet
+from flow.core.kernel.vehicle.history import RollingCount
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 
@@ -531,6 +536,43 @@ class TestMultiLaneData(unittest.TestCase):
         # TODO(ak): add test
         pass
 
+    def test_lazy_computation(self):
+        """
+        Test that the multi-lane data is only computed when requested, and
+        that it is computed for non-rl vehicles as well.
+        """
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(RLController, {}),
+            num_vehicles=3)
+        vehicles.add(
+            veh_id="human",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=3)
+
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+        env.step(None)
+
+        # nothing is computed until the multi-lane data is requested
+        self.assertIsNone(env.k.vehicle._lane_ordering)
+        self.assertEqual(len(env.k.vehicle._lane_data_ids), 0)
+
+        leaders = env.k.vehicle.get_lane_leaders("test_0")
+        self.assertEqual(len(leaders), 1)
+        self.assertIsNotNone(env.k.vehicle._lane_ordering)
+        self.assertEqual(env.k.vehicle._lane_data_ids, {"test_0"})
+
+        # human-driven vehicles have multi-lane data as well
+        self.assertEqual(env.k.vehicle.get_lane_leaders("human_0"),
+                         [env.k.vehicle.get_leader("human_0")])
+
+        # the data is invalidated after every step
+        env.step(None)
+        self.assertIsNone(env.k.vehicle._lane_ordering)
+
+        env.terminate()
+
 
 class TestIdsByEdge(unittest.TestCase):
     """
@@ -588,5 +630,283 @@ class TestObservedIDs(unittest.TestCase):
         self.assertCountEqual(env.k.vehicle.get_observed_ids(), ["test_1"])
 
 
+class TestColumnarState(unittest.TestCase):
+    """Tests the columnar vehicle state store and the vectorized getters."""
+
+    def test_slots(self):
+        state = VehicleStateArrays(capacity=2)
+
+        # slots are assigned in order, and the arrays grow when needed
+        self.assertEqual(state.add("a"), 0)
+        self.assertEqual(state.add("b"), 1)
+        self.assertEqual(state.add("c"), 2)
+        self.assertEqual(state.add("a"), 0)
+        self.assertEqual(state.capacity, 4)
+        self.assertEqual(len(state), 3)
+
+        state.set_state("a", speed=1, edge="e1", leader="b")
+        state.set_state("b", speed=2, edge="e2")
+        np.testing.assert_array_equal(
+            state.get("speed", ["b", "a", "d"]), [2, 1, -1001])
+        np.testing.assert_array_equal(
+            state.get("edge", ["a", "b", "c"]), [0, 1, -1])
+        np.testing.assert_array_equal(
+            state.get_leader_field("speed", ["a", "b"], error=0), [2, 0])
+
+        # removed slots are recycled, and followers lose their leader
+        state.remove("b")
+        self.assertNotIn("b", state)
+        self.assertEqual(state.slot("a"), 0)
+        np.testing.assert_array_equal(
+            state.get_leader_field("speed", ["a"], error=0), [0])
+        self.assertEqual(state.add("d"), 1)
+        self.assertEqual(state.get("speed", ["d"])[0], -1001)
+
+    def test_vectorized_getters(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=10)
+
+        for columnar_state in [False, True]:
+            sim_params = SumoParams(sim_step=0.1, render=False,
+                                    columnar_state=columnar_state)
+            env, _ = ring_road_exp_setup(vehicles=vehicles,
+                                         sim_params=sim_params)
+            for _ in range(10):
+                env.step(None)
+
+            ids = env.k.vehicle.get_ids()
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_speed_array(ids),
+                env.k.vehicle.get_speed(ids))
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_position_array(ids),
+                env.k.vehicle.get_position(ids))
+            np.testing.assert_array_equal(
+                env.k.vehicle.get_lane_array(ids),
+                env.k.vehicle.get_lane(ids))
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_headway_array(ids),
+                env.k.vehicle.get_headway(ids))
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_length_array(ids),
+                env.k.vehicle.get_length(ids))
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_leader_speed_array(ids),
+                env.k.vehicle.get_speed(env.k.vehicle.get_leader(ids)))
+            np.testing.assert_array_almost_equal(
+                env.k.vehicle.get_x_array(ids + ["missing"]),
+                [env.k.vehicle.get_x_by_id(veh_id)
+                 for veh_id in ids + ["missing"]])
+
+            # missing vehicles are assigned the error value
+            np.testing.assert_array_equal(
+                env.k.vehicle.get_speed_array(["missing"], error=-1), [-1])
+
+            env.terminate()
+
+
+class TestIdSets(unittest.TestCase):
+    """Tests the sets used to store the ids of vehicles."""
+
+    def test_indexed_id_set(self):
+        ids = IndexedIdSet(["c", "a"])
+        self.assertTrue(ids.add("b"))
+        self.assertFalse(ids.add("a"))
+        view = ids.ids()
+        self.assertEqual(view, ["c", "a", "b"])
+
+        # the insertion order is preserved upon removal, and previously
+        # returned lists are not modified
+        self.assertTrue(ids.discard("a"))
+        self.assertFalse(ids.discard("a"))
+        ids.add("d")
+        self.assertEqual(ids.ids(), ["c", "b", "d"])
+        self.assertEqual(list(ids), ["c", "b", "d"])
+        self.assertEqual(view, ["c", "a", "b"])
+        self.assertNotIn("a", ids)
+        self.assertEqual(len(ids), 3)
+
+    def test_sorted_id_set(self):
+        ids = SortedIdSet(["rl_2", "rl_0"])
+        self.assertTrue(ids.add("rl_1"))
+        self.assertFalse(ids.add("rl_0"))
+        view = ids.ids()
+        self.assertEqual(view, ["rl_0", "rl_1", "rl_2"])
+
+        # the ids remain sorted, and previously returned lists are not
+        # modified
+        self.assertTrue(ids.discard("rl_1"))
+        self.assertFalse(ids.discard("rl_1"))
+        ids.add("a")
+        self.assertEqual(ids.ids(), ["a", "rl_0", "rl_2"])
+        self.assertEqual(view, ["rl_0", "rl_1", "rl_2"])
+        self.assertIn("rl_2", ids)
+        self.assertEqual(len(ids), 3)
+
+    def test_kernel_ids(self):
+        vehicles = VehicleParams()
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=3)
+        vehicles.add("human", acceleration_controller=(IDMController, {}),
+                     num_vehicles=3)
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+
+        ids = env.k.vehicle.get_ids()
+        self.assertEqual(env.k.vehicle.get_rl_ids(),
+                         sorted(env.k.vehicle.get_rl_ids()))
+
+        # removing vehicles does not modify previously collected ids
+        for veh_id in ids:
+            env.k.vehicle.remove(veh_id)
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(env.k.vehicle.get_ids(), [])
+        self.assertEqual(env.k.vehicle.get_rl_ids(), [])
+        self.assertEqual(env.k.vehicle.get_human_ids(), [])
+        self.assertEqual(env.k.vehicle.get_controlled_ids(), [])
+        self.assertEqual(env.k.vehicle.num_vehicles, 0)
+        self.assertEqual(env.k.vehicle.num_rl_vehicles, 0)
+        env.terminate()
+
+    def test_membership_checks(self):
+        """Check that per-vehicle commands do not build lists of ids."""
+        vehicles = VehicleParams()
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=2)
+        vehicles.add("human", acceleration_controller=(IDMController, {}),
+                     num_vehicles=2)
+        env, _ = ring_road_exp_setup(vehicles=vehicles)
+        ids = env.k.vehicle.get_ids()
+        env.k.vehicle.set_observed(ids[-1])
+
+        vehicle = env.k.vehicle
+        with mock.patch.object(vehicle, "get_ids") as get_ids, \
+                mock.patch.object(vehicle, "get_rl_ids") as get_rl_ids, \
+                mock.patch.object(vehicle, "get_observed_ids",
+                                  return_value=[]) as get_observed_ids, \
+                mock.patch.object(vehicle, "set_color") as set_color:
+            # accelerations of vehicles that are not in the network are
+            # ignored
+            vehicle.apply_acceleration(ids + ["not_a_vehicle"], [1.] * 5)
+            vehicle.apply_lane_change(ids, [0] * 4)
+            vehicle.update_vehicle_colors()
+        get_ids.assert_not_called()
+        get_rl_ids.assert_called_once()
+        get_observed_ids.assert_called_once()
+
+        # observed human-driven vehicles are colored cyan
+        set_color.assert_any_call(veh_id=ids[-1], color=(0, 255, 255))
+        env.terminate()
+
+
+class TestRollingCount(unittest.TestCase):
+    """Tests the bounded history used to compute inflow and outflow rates."""
+
+    def test_window(self):
+        counts = RollingCount(capacity=5)
+        self.assertEqual(counts.last(), 0)
+        self.assertEqual(counts.window(3), (0, 0))
+
+        history = [3, 0, 1, 4, 1, 5, 9, 2, 6]
+        for i, count in enumerate(history):
+            counts.append(count)
+            self.assertEqual(counts.last(), count)
+            self.assertEqual(len(counts), i + 1)
+
+            # windows within the capacity match the complete history
+            for num_steps in range(1, 6):
+                window = history[max(i + 1 - num_steps, 0):i + 1]
+                self.assertEqual(counts.window(num_steps),
+                                 (sum(window), len(window)))
+
+        # longer windows are limited to the capacity, even if they cover all
+        # recorded steps
+        self.assertEqual(counts.window(7), (sum(history[-5:]), 5))
+        self.assertEqual(counts.window(9), (sum(history[-5:]), 5))
+        self.assertEqual(counts.window(12), (sum(history[-5:]), 5))
+        self.assertEqual(counts.window(0), (sum(history[-5:]), 5))
+
+        counts.clear()
+        self.assertEqual(len(counts), 0)
+        self.assertEqual(counts.window(3), (0, 0))
+
+    def test_truncated_rates(self):
+        """Check that rates beyond the horizon use it and issue a warning."""
+        env, _ = ring_road_exp_setup(
+            sim_params=SumoParams(sim_step=0.1, rate_horizon=1))
+        for _ in range(20):
+            env.step(rl_actions=None)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            rate = env.k.vehicle.get_inflow_rate(1)
+            self.assertEqual(len(caught), 0)
+
+            # spans longer than the horizon are truncated to it, whether or
+            # not they cover the entire rollout
+            self.assertEqual(env.k.vehicle.get_inflow_rate(1.5), rate)
+            self.assertEqual(env.k.vehicle.get_inflow_rate(100), rate)
+            self.assertEqual(env.k.vehicle.get_outflow_rate(100),
+                             env.k.vehicle.get_outflow_rate(1))
+        self.assertEqual(len(caught), 3)
+        self.assertTrue(all(issubclass(w.category, RuntimeWarning)
+                            for w in caught))
+
+        env.terminate()
+
+
+class TestContextSubscription(unittest.TestCase):
+    """Tests collecting the vehicle states through a context subscription."""
+
+    def test_matches_vehicle_subscriptions(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="human",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=5)
+
+        inflow = InFlows()
+        inflow.add(veh_type="human", edge="highway_0", vehs_per_hour=2000,
+                   depart_lane="free", depart_speed=10)
+        net_params = NetParams(
+            inflows=inflow,
+            additional_params={
+                "length": 200,
+                "lanes": 2,
+                "speed_limit": 30,
+                "resolution": 40,
+                "num_edges": 1
+            })
+
+        results = []
+        for context_subscription in [False, True]:
+            sim_params = SumoParams(
+                sim_step=0.1, render=False, seed=0,
+                context_subscription=context_subscription)
+            env, _ = highway_exp_setup(
+                sim_params=sim_params,
+                vehicles=vehicles,
+                net_params=net_params)
+
+            trace = []
+            for _ in range(200):
+                env.step(None)
+                ids = sorted(env.k.vehicle.get_ids())
+                trace.append((ids,
+                              env.k.vehicle.get_speed(ids),
+                              env.k.vehicle.get_headway(ids),
+                              env.k.vehicle.get_leader(ids),
+                              env.k.vehicle.get_length(ids),
+                              env.k.vehicle.get_num_arrived()))
+            results.append(trace)
+            env.terminate()
+
+        # vehicles should have entered and exited the network
+        self.assertGreater(sum(step[-1] for step in results[0]), 0)
+        self.assertEqual(results[0], results[1])
+
+
 if __name__ == '__main__':
     unittest.main()
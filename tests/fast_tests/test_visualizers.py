@@ -7,6 +7,8 @@ import flow.visualize.time_space_diagram as tsd
 import flow.visualize.plot_ray_results as prr
 
 import os
+import shutil
+import tempfile
 import unittest
 import ray
 import numpy as np
@@ -294,6 +296,41 @@ class TestPlotters(unittest.TestCase):
         np.testing.assert_array_almost_equal(pos, expected_pos)
         np.testing.assert_array_almost_equal(speed, expected_speed)
 
+    def test_time_space_diagram_columns(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        emission_path = os.path.join(dir_path, 'test_files/merge_emission.csv')
+        flow_params = tsd.get_flow_params(
+            os.path.join(dir_path, 'test_files/merge.json'))
+        expected = tsd.get_time_space_data(
+            tsd.import_data_from_emission(emission_path), flow_params)
+
+        # columns imported from the emission file
+        columns = tsd.import_columns(emission_path)
+        actual = tsd.get_time_space_data(columns, flow_params)
+        for expected_i, actual_i in zip(expected, actual):
+            np.testing.assert_array_almost_equal(expected_i, actual_i)
+
+        # memory-mapped columns
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for key in tsd.COLUMNS:
+                np.save(os.path.join(tmp_dir, key + '.npy'),
+                        columns[key].astype(str if key in ['id', 'edge']
+                                            else float))
+            actual = tsd.get_time_space_data(
+                tsd.import_columns(tmp_dir), flow_params)
+        finally:
+            shutil.rmtree(tmp_dir)
+        for expected_i, actual_i in zip(expected, actual):
+            np.testing.assert_array_almost_equal(expected_i, actual_i)
+
+        # segments of the trajectories, excluding discontinuities
+        pos, speed, time = actual
+        segments, segment_speed = tsd._get_segments(pos, speed, time)
+        self.assertEqual(len(segments), len(segment_speed))
+        self.assertTrue(np.all(
+            np.abs(segments[:, 1, 1] - segments[:, 0, 1]) < 10))
+
     def test_plot_ray_results(self):
         dir_path = os.path.dirname(os.path.realpath(__file__))
         file_path = os.path.join(dir_path, 'test_files/progress.csv')